@@ -1,5 +1,7 @@
 import requests
+import logging
 from typing import Dict, Any, Optional
+from src.utils.tracing import tracer
 
 
 class BilibiliAPI:
@@ -11,6 +13,7 @@ class BilibiliAPI:
         """
         初始化B站API客户端
         """
+        self.logger = logging.getLogger("BilibiliAPI")
         self.base_url = "https://api.live.bilibili.com"
         self.space_base_url = "https://api.bilibili.com"
         self.headers = {
@@ -33,17 +36,18 @@ class BilibiliAPI:
         }
         
         try:
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            with tracer.span("api.bilibili.get_room_info", room_id=room_id):
+                response = requests.get(url, params=params, headers=self.headers, timeout=10)
+                response.raise_for_status()
+                data = response.json()
             
             if data.get("code") == 0:
                 return data.get("data", {})
             else:
-                print(f"获取直播间信息失败: {data.get('message')}")
+                self.logger.error(f"获取直播间信息失败: {data.get('message')}")
                 return None
         except requests.exceptions.RequestException as e:
-            print(f"请求直播间信息失败: {e}")
+            self.logger.error(f"请求直播间信息失败: {e}")
             return None
     
     def get_live_status(self, room_id: str) -> tuple:
@@ -89,17 +93,18 @@ class BilibiliAPI:
         }
         
         try:
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            with tracer.span("api.bilibili.get_user_info", uid=uid):
+                response = requests.get(url, params=params, headers=self.headers, timeout=10)
+                response.raise_for_status()
+                data = response.json()
             
             if data.get("code") == 0:
                 return data.get("data", {})
             else:
-                print(f"获取用户信息失败: {data.get('message')}")
+                self.logger.error(f"获取用户信息失败: {data.get('message')}")
                 return None
         except requests.exceptions.RequestException as e:
-            print(f"请求用户信息失败: {e}")
+            self.logger.error(f"请求用户信息失败: {e}")
             return None
     
     def is_living(self, room_id: str) -> bool:
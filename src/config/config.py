@@ -1,11 +1,19 @@
 import os
+import logging
 import yaml
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from src.config.schema import (
+    ConfigError, FrozenDict, RoomConfig, CONFIG_SCHEMA, check_schema, check_rooms, build_room, freeze, flatten
+)
 
 
 class ConfigManager:
     """
     配置文件管理类
+
+    配置文件加载时按结构定义检查（未知配置项、类型和取值错误、重复房间），
+    无效时抛出ConfigError并列出所有错误；加载后的配置只读，并预先展开所有点分隔的配置键，
+    按id和 (平台, 房间号) 建立房间索引，查询配置和房间都不再逐层或逐个查找。
     """
     
     def __init__(self, config_dir: str = "config"):
@@ -15,35 +23,98 @@ class ConfigManager:
         Args:
             config_dir: 配置文件目录
         """
+        self.logger = logging.getLogger("ConfigManager")
         self.config_dir = config_dir
-        self.config: Dict[str, Any] = {}
-        self.rooms: Dict[str, Any] = {}
+        self.config = {}
+        self.rooms = {}
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        """
+        主配置（只读）
+        """
+        return self._config
+    
+    @config.setter
+    def config(self, value: Optional[Dict[str, Any]]):
+        config = freeze(value or {})
+        # 先生成索引再一次性替换，其他线程不会读到一半的配置
+        self._config, self._flat = config, flatten(config)
+    
+    @property
+    def rooms(self) -> Dict[str, Any]:
+        """
+        房间配置文件内容（只读）：{"rooms": (房间配置, ...)}
+        """
+        return self._rooms
+    
+    @rooms.setter
+    def rooms(self, value: Optional[Dict[str, Any]]):
+        value = value or {}
+        room_list = tuple(build_room(room) for room in value.get("rooms") or [] if isinstance(room, dict))
+        by_id = {room.id: room for room in room_list if room.id is not None}
+        by_key = {(room.platform, room.room_id): room for room in room_list}
+        self._rooms = FrozenDict(freeze(value), rooms=room_list)
+        self._room_index = (room_list, by_id, by_key)
+    
+    def _read_yaml(self, path: str, check) -> Dict[str, Any]:
+        """
+        读取并检查YAML配置文件
+        
+        Args:
+            path: 文件路径
+            check: 检查函数，返回错误说明列表
+            
+        Returns:
+            Dict[str, Any]: 文件内容
+            
+        Raises:
+            OSError: 文件无法读取
+            ConfigError: YAML语法错误或内容无效
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                # 错误信息中包含出错的行号和列号
+                raise ConfigError(path, [str(e)]) from None
+        
+        errors = check(data)
+        if errors:
+            raise ConfigError(path, errors)
+        return data or {}
+    
+    def _config_path(self, name: str) -> Optional[str]:
+        """
+        配置文件路径，不存在时使用示例配置文件
+        """
+        path = os.path.join(self.config_dir, f"{name}.yaml")
+        if os.path.exists(path):
+            return path
+        example_path = os.path.join(self.config_dir, f"{name}.example.yaml")
+        if os.path.exists(example_path):
+            return example_path
+        return None
         
     def load_config(self) -> bool:
         """
         加载主配置文件
         
         Returns:
-            bool: 加载成功返回True，失败返回False
+            bool: 加载成功返回True，文件不存在或无法读取返回False
+            
+        Raises:
+            ConfigError: 配置文件内容无效
         """
-        config_path = os.path.join(self.config_dir, "config.yaml")
-        
-        # 如果配置文件不存在，使用示例配置文件
-        if not os.path.exists(config_path):
-            example_path = os.path.join(self.config_dir, "config.example.yaml")
-            if os.path.exists(example_path):
-                with open(example_path, "r", encoding="utf-8") as f:
-                    self.config = yaml.safe_load(f)
-                return True
-            else:
-                return False
+        config_path = self._config_path("config")
+        if config_path is None:
+            return False
         
         try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                self.config = yaml.safe_load(f)
+            self.config = self._read_yaml(config_path, lambda data: check_schema(data, CONFIG_SCHEMA))
             return True
-        except Exception as e:
-            print(f"加载配置文件失败: {e}")
+        except OSError as e:
+            self.logger.error(f"加载配置文件失败: {e}")
             return False
     
     def load_rooms(self) -> bool:
@@ -51,26 +122,20 @@ class ConfigManager:
         加载房间配置文件
         
         Returns:
-            bool: 加载成功返回True，失败返回False
+            bool: 加载成功返回True，文件不存在或无法读取返回False
+            
+        Raises:
+            ConfigError: 房间配置文件内容无效
         """
-        rooms_path = os.path.join(self.config_dir, "rooms.yaml")
-        
-        # 如果配置文件不存在，使用示例配置文件
-        if not os.path.exists(rooms_path):
-            example_path = os.path.join(self.config_dir, "rooms.example.yaml")
-            if os.path.exists(example_path):
-                with open(example_path, "r", encoding="utf-8") as f:
-                    self.rooms = yaml.safe_load(f)
-                return True
-            else:
-                return False
+        rooms_path = self._config_path("rooms")
+        if rooms_path is None:
+            return False
         
         try:
-            with open(rooms_path, "r", encoding="utf-8") as f:
-                self.rooms = yaml.safe_load(f)
+            self.rooms = self._read_yaml(rooms_path, check_rooms)
             return True
-        except Exception as e:
-            print(f"加载房间配置文件失败: {e}")
+        except OSError as e:
+            self.logger.error(f"加载房间配置文件失败: {e}")
             return False
     
     def get(self, key: str, default: Any = None) -> Any:
@@ -84,25 +149,16 @@ class ConfigManager:
         Returns:
             Any: 配置值或默认值
         """
-        keys = key.split(".")
-        value = self.config
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        
-        return value
+        return self._flat.get(key, default)
     
-    def get_rooms(self) -> list:
+    def get_rooms(self) -> Tuple[RoomConfig, ...]:
         """
         获取所有房间配置
         
         Returns:
-            list: 房间配置列表
+            Tuple[RoomConfig, ...]: 房间配置列表（重新加载前始终是同一对象）
         """
-        return self.rooms.get("rooms", [])
+        return self._room_index[0]
     
     def get_room(self, room_id: str) -> dict:
         """
@@ -114,11 +170,21 @@ class ConfigManager:
         Returns:
             dict: 房间配置或空字典
         """
-        for room in self.get_rooms():
-            if room.get("id") == room_id:
-                return room
-        return {}
+        return self._room_index[1].get(str(room_id), {})
+    
+    def find_room(self, platform: str, room_id: str) -> Optional[RoomConfig]:
+        """
+        根据平台和房间号获取房间配置
+        
+        Args:
+            platform: 平台
+            room_id: 房间号
+            
+        Returns:
+            Optional[RoomConfig]: 房间配置，不存在返回None
+        """
+        return self._room_index[2].get((platform, str(room_id)))
 
 
 # 全局配置管理器实例
-config_manager = ConfigManager()
\ No newline at end of file
+config_manager = ConfigManager()
@@ -0,0 +1,421 @@
+import difflib
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+
+class ConfigError(ValueError):
+    """
+    配置文件内容无效（YAML语法错误、未知配置项、类型或取值错误、房间重复等）
+    """
+
+    def __init__(self, source: str, errors: List[str]):
+        self.source = source
+        self.errors = errors
+        super().__init__(f"配置文件 {source} 无效:\n" + "\n".join(f"  - {error}" for error in errors))
+
+
+class FrozenDict(dict):
+    """
+    只读字典
+
+    加载后的配置在所有线程间共享，禁止修改，需要修改时先复制（dict(value)）。
+    仍是dict的子类，原有的 .get、dict(...)、json.dumps 等用法不受影响。
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("配置为只读，请先复制后再修改")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __ior__(self, other):
+        self._readonly()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class RoomConfig(FrozenDict):
+    """
+    房间配置（只读）
+
+    加载时统一为字符串的id和room_id，未指定平台时补充为bilibili，
+    配置文件中写成数字的房间号也能与网页请求中的房间号匹配。
+    """
+
+    __slots__ = ()
+
+    @property
+    def id(self) -> Optional[str]:
+        return self.get("id")
+
+    @property
+    def platform(self) -> str:
+        return self["platform"]
+
+    @property
+    def room_id(self) -> str:
+        return self["room_id"]
+
+    @property
+    def key(self) -> str:
+        """
+        房间键：平台_房间号
+        """
+        return f"{self['platform']}_{self['room_id']}"
+
+    @property
+    def name(self) -> str:
+        return self.get("name") or f"房间{self['room_id']}"
+
+
+def freeze(value: Any) -> Any:
+    """
+    递归转换为只读结构：字典转换为FrozenDict，列表转换为元组
+    """
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def flatten(value: Dict[str, Any], prefix: str = "", into: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    预先展开所有点分隔的配置键，如 {"a": {"b": 1}} -> {"a": {...}, "a.b": 1}
+    """
+    if into is None:
+        into = {}
+    for key, item in value.items():
+        path = f"{prefix}{key}"
+        into[path] = item
+        if isinstance(item, dict):
+            flatten(item, path + ".", into)
+    return into
+
+
+class Field:
+    """
+    配置项的类型和取值约束
+    """
+
+    __slots__ = ("types", "choices", "minimum", "maximum")
+
+    def __init__(self, types: Tuple[type, ...], choices: Optional[Iterable[Any]] = None,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.types = types
+        self.choices = tuple(choices) if choices is not None else None
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def check(self, value: Any) -> Optional[str]:
+        """
+        检查取值
+
+        Returns:
+            Optional[str]: 错误说明，有效返回None
+        """
+        if value is None:
+            return None
+        # bool是int的子类，数值项不接受true/false
+        if isinstance(value, bool) and bool not in self.types:
+            return f"应为{_type_names(self.types)}，实际为 {value!r}"
+        if not isinstance(value, self.types):
+            return f"应为{_type_names(self.types)}，实际为 {value!r}"
+        if self.choices is not None and value not in self.choices:
+            return f"应为 {'/'.join(str(choice) for choice in self.choices)} 之一，实际为 {value!r}"
+        if self.minimum is not None and value < self.minimum:
+            return f"不能小于 {self.minimum}，实际为 {value!r}"
+        if self.maximum is not None and value > self.maximum:
+            return f"不能大于 {self.maximum}，实际为 {value!r}"
+        return None
+
+
+def _type_names(types: Tuple[type, ...]) -> str:
+    names = {bool: "布尔值", int: "整数", float: "数字", str: "字符串", dict: "字典", list: "列表"}
+    return "或".join(dict.fromkeys(names.get(t, t.__name__) for t in types))
+
+
+BOOL = Field((bool,))
+STR = Field((str,))
+INT = Field((int,), minimum=0)
+POSITIVE_INT = Field((int,), minimum=1)
+NUMBER = Field((int, float), minimum=0)
+# 内容不做检查的字典（如按名称定义的编码档位、录播姬配置）
+MAPPING = Field((dict,))
+STR_LIST = Field((list,))
+
+WATERMARK_SCHEMA = {
+    "enabled": BOOL,
+    "text": STR,
+    "font": STR,
+    "font_size": POSITIVE_INT,
+    "color": STR,
+    "position": Field((str,), choices=("top-left", "top-right", "bottom-left", "bottom-right", "center")),
+    "margin": INT,
+    "opacity": NUMBER,
+    "box": BOOL,
+    "box_color": STR,
+    "box_opacity": NUMBER,
+    "mode": Field((str,), choices=("overlay", "drawtext")),
+    "cache_dir": STR
+}
+
+CONFIG_SCHEMA: Dict[str, Any] = {
+    "system": {
+        "name": STR,
+        "version": STR,
+        "log_level": Field((str,), choices=("debug", "info", "warning", "error")),
+        "temp_dir": STR,
+        "data_dir": STR,
+        "log_dir": STR,
+        "logging": {
+            "console": BOOL,
+            "file": BOOL,
+            "max_bytes": POSITIVE_INT,
+            "backup_count": INT,
+            "queue_size": POSITIVE_INT,
+            "rate_limit_interval": NUMBER
+        },
+        "tracing": {
+            "enabled": BOOL,
+            "buffer_size": POSITIVE_INT,
+            "max_profile_seconds": NUMBER
+        }
+    },
+    "monitor": {
+        "enabled": BOOL,
+        "interval": POSITIVE_INT,
+        "stagger": NUMBER,
+        "platforms": STR_LIST
+    },
+    "recorder": {
+        "enabled": BOOL,
+        "auto_update": BOOL,
+        "default_output_format": STR,
+        "recorders": MAPPING,
+        "supervisor": {
+            "stall_timeout": NUMBER,
+            "check_interval": NUMBER,
+            "backoff_base": NUMBER,
+            "backoff_max": NUMBER,
+            "max_restarts": INT
+        }
+    },
+    "library": {
+        "enabled": BOOL,
+        "db_file": STR,
+        "workers": POSITIVE_INT,
+        "watch": BOOL,
+        "rescan_interval": NUMBER,
+        "session_gap": NUMBER
+    },
+    "processor": {
+        "enabled": BOOL,
+        "ffmpeg_path": STR,
+        "ffprobe_path": STR,
+        "delete_original": BOOL,
+        "fused": BOOL,
+        "repair_flv": BOOL,
+        "repair_max_gap": NUMBER,
+        "keyframe_index": BOOL,
+        "inject_keyframes": BOOL,
+        "live_remux": BOOL,
+        "pipeline_state_file": STR,
+        "pipeline_retention": NUMBER,
+        "stall_timeout": NUMBER,
+        "merge": {
+            "enabled": BOOL,
+            "max_gap": NUMBER,
+            "delete_segments": BOOL
+        },
+        "thumbnails": {
+            "enabled": BOOL,
+            "interval": NUMBER,
+            "width": POSITIVE_INT,
+            "height": POSITIVE_INT,
+            "columns": POSITIVE_INT,
+            "rows": POSITIVE_INT,
+            "cover_width": POSITIVE_INT,
+            "cover_position": Field((int, float), minimum=0, maximum=1),
+            "quality": POSITIVE_INT,
+            "cache_dir": STR
+        },
+        "preview": {
+            "enabled": BOOL,
+            "segment_time": NUMBER,
+            "list_size": POSITIVE_INT,
+            "idle_timeout": NUMBER,
+            "max_sessions": POSITIVE_INT,
+            "start_timeout": NUMBER,
+            "work_dir": STR
+        },
+        "default_profile": STR,
+        "profiles": MAPPING,
+        "parallel": {
+            "enabled": BOOL,
+            "workers": POSITIVE_INT,
+            "chunk_threads": POSITIVE_INT,
+            "min_duration": NUMBER,
+            "chunks_per_worker": POSITIVE_INT
+        },
+        "watermark": WATERMARK_SCHEMA,
+        "queue": {
+            "workers": INT,
+            "encode_threads": POSITIVE_INT,
+            "reserved_cores_per_recording": INT,
+            "max_pending": POSITIVE_INT,
+            "retry_delay": NUMBER,
+            "history_limit": INT,
+            "state_file": STR
+        }
+    },
+    "web": {
+        "enabled": BOOL,
+        "host": STR,
+        "port": Field((int,), minimum=1, maximum=65535),
+        "username": STR,
+        "password": STR,
+        "events": {
+            "coalesce_interval": NUMBER,
+            "heartbeat_interval": NUMBER,
+            "queue_size": POSITIVE_INT,
+            "max_clients": POSITIVE_INT
+        },
+        "tasks": {
+            "workers": POSITIVE_INT,
+            "history_limit": INT
+        },
+        "status": {
+            "max_age": NUMBER
+        },
+        "metrics": {
+            "enabled": BOOL
+        },
+        "debug": {
+            "enabled": BOOL
+        },
+        "ssl": {
+            "enabled": BOOL,
+            "cert_file": STR,
+            "key_file": STR
+        }
+    }
+}
+
+ROOM_SCHEMA: Dict[str, Any] = {
+    "id": Field((str, int)),
+    "platform": STR,
+    "room_id": Field((str, int)),
+    "name": STR,
+    "auto_record": BOOL,
+    "output_dir": STR,
+    "watermark": WATERMARK_SCHEMA,
+    "processor": {
+        "enabled": BOOL,
+        "format": STR,
+        "compress": BOOL,
+        "quality": STR,
+        "profile": STR,
+        "delete_original": BOOL,
+        "live_remux": BOOL,
+        "merge": BOOL
+    }
+}
+
+
+def check_schema(data: Any, schema: Dict[str, Any], path: str = "") -> List[str]:
+    """
+    按结构定义检查配置，收集全部错误（未知配置项附带最接近的有效名称）
+
+    Args:
+        data: 配置数据
+        schema: 结构定义，值为Field或嵌套的结构定义
+        path: 当前位置（用于错误说明）
+
+    Returns:
+        List[str]: 错误说明列表
+    """
+    if data is None:
+        return []
+    if not isinstance(data, dict):
+        return [f"{path or '顶层'}: 应为字典，实际为 {data!r}"]
+
+    errors = []
+    for key, value in data.items():
+        key_path = f"{path}.{key}" if path else str(key)
+        spec = schema.get(key)
+        if spec is None:
+            suggestion = difflib.get_close_matches(str(key), [str(k) for k in schema], n=1)
+            hint = f"，是否为 {path + '.' if path else ''}{suggestion[0]}？" if suggestion else ""
+            errors.append(f"{key_path}: 未知配置项{hint}")
+        elif isinstance(spec, Field):
+            error = spec.check(value)
+            if error:
+                errors.append(f"{key_path}: {error}")
+        else:
+            errors.extend(check_schema(value, spec, key_path))
+    return errors
+
+
+def check_rooms(data: Any) -> List[str]:
+    """
+    检查房间配置文件：结构、必填的room_id，以及id和 (平台, 房间号) 是否重复
+
+    Args:
+        data: 房间配置文件内容（{"rooms": [...]}）
+
+    Returns:
+        List[str]: 错误说明列表
+    """
+    if data is None:
+        return []
+    if not isinstance(data, dict):
+        return [f"顶层: 应为字典，实际为 {data!r}"]
+
+    errors = check_schema({key: value for key, value in data.items() if key != "rooms"}, {"rooms": None})
+    rooms = data.get("rooms") or []
+    if not isinstance(rooms, list):
+        return errors + [f"rooms: 应为列表，实际为 {rooms!r}"]
+
+    ids: Dict[str, int] = {}
+    keys: Dict[Tuple[str, str], int] = {}
+    for index, room in enumerate(rooms):
+        path = f"rooms[{index}]"
+        if not isinstance(room, dict):
+            errors.append(f"{path}: 应为字典，实际为 {room!r}")
+            continue
+        errors.extend(check_schema(room, ROOM_SCHEMA, path))
+        if room.get("room_id") in (None, ""):
+            errors.append(f"{path}: 缺少room_id")
+            continue
+
+        key = (str(room.get("platform") or "bilibili"), str(room["room_id"]))
+        if key in keys:
+            errors.append(f"{path}: 与 rooms[{keys[key]}] 的平台和房间号重复（{key[0]} {key[1]}）")
+        keys.setdefault(key, index)
+        if room.get("id") is not None:
+            room_id = str(room["id"])
+            if room_id in ids:
+                errors.append(f"{path}: id {room_id} 与 rooms[{ids[room_id]}] 重复")
+            ids.setdefault(room_id, index)
+    return errors
+
+
+def build_room(room: Dict[str, Any]) -> RoomConfig:
+    """
+    生成只读的房间配置
+    """
+    room = dict(room)
+    room["platform"] = str(room.get("platform") or "bilibili")
+    room["room_id"] = str(room.get("room_id"))
+    if room.get("id") is not None:
+        room["id"] = str(room["id"])
+    return RoomConfig((key, freeze(value)) for key, value in room.items())
@@ -0,0 +1,255 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    room_key TEXT NOT NULL,
+    session TEXT,
+    name TEXT NOT NULL,
+    ext TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    started_at REAL,
+    duration REAL,
+    format TEXT,
+    video_codec TEXT,
+    audio_codec TEXT,
+    width INTEGER,
+    height INTEGER,
+    bitrate INTEGER,
+    error TEXT,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_room ON recordings (room_key, started_at DESC, path);
+CREATE INDEX IF NOT EXISTS idx_recordings_started ON recordings (started_at DESC, path);
+CREATE INDEX IF NOT EXISTS idx_recordings_session ON recordings (session);
+"""
+
+COLUMNS = ("path", "room_key", "session", "name", "ext", "size", "mtime", "started_at", "duration", "format",
+           "video_codec", "audio_codec", "width", "height", "bitrate", "error", "indexed_at")
+
+# 允许排序的字段
+SORT_FIELDS = {"started_at", "size", "duration", "name", "mtime"}
+
+
+class RecordingCatalog:
+    """
+    录制文件目录（SQLite）
+
+    每个录制文件一行，记录房间、场次、时长、编码、码率和大小；
+    文件大小和修改时间作为缓存校验，未变化的文件不会重新读取。
+    按房间和开始时间建立索引，十万级文件的分页查询在毫秒级完成。
+    """
+
+    def __init__(self, db_file: str):
+        """
+        初始化录制文件目录
+
+        Args:
+            db_file: 数据库文件路径，":memory:" 表示内存数据库
+        """
+        self.db_file = db_file
+        if db_file != ":memory:":
+            db_dir = os.path.dirname(db_file)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        """
+        关闭数据库连接
+        """
+        with self._lock:
+            self._conn.close()
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        获取单个录制文件的记录
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            Optional[Dict[str, Any]]: 记录，不存在返回None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM recordings WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def file_states(self, room_key: Optional[str] = None) -> Dict[str, Tuple[int, float]]:
+        """
+        获取已记录文件的大小和修改时间，用于扫描时判断文件是否变化
+
+        Args:
+            room_key: 房间（平台_房间号），None表示全部
+
+        Returns:
+            Dict[str, Tuple[int, float]]: 文件路径 -> (大小, 修改时间)
+        """
+        sql = "SELECT path, size, mtime FROM recordings"
+        params: Tuple = ()
+        if room_key is not None:
+            sql += " WHERE room_key = ?"
+            params = (room_key,)
+        with self._lock:
+            return {row["path"]: (row["size"], row["mtime"]) for row in self._conn.execute(sql, params)}
+
+    def upsert(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        批量写入录制文件记录（一个事务），已存在的记录被覆盖
+
+        Args:
+            records: 记录列表，缺少的字段写入NULL
+
+        Returns:
+            int: 写入的记录数
+        """
+        rows = [tuple(record.get(column) for column in COLUMNS) for record in records]
+        if not rows:
+            return 0
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO recordings ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows
+            )
+        return len(rows)
+
+    def remove(self, paths: Iterable[str]) -> int:
+        """
+        批量删除录制文件记录
+
+        Args:
+            paths: 文件路径列表
+
+        Returns:
+            int: 删除的记录数
+        """
+        paths = [(path,) for path in paths]
+        if not paths:
+            return 0
+        with self._lock, self._conn:
+            cursor = self._conn.executemany("DELETE FROM recordings WHERE path = ?", paths)
+        return cursor.rowcount
+
+    def find_session(self, room_key: str, started_at: float, max_gap: float) -> Optional[str]:
+        """
+        查找开始时间紧接在已有录制之后的场次
+
+        同一房间中开始时间早于该文件的最后一个录制，若其结束时间与该文件开始时间相隔不超过max_gap，
+        则属于同一场直播。
+
+        Args:
+            room_key: 房间
+            started_at: 文件开始时间
+            max_gap: 同一场直播相邻分段之间的最大间隔（秒）
+
+        Returns:
+            Optional[str]: 场次标识，属于新的一场返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session, started_at, duration FROM recordings "
+                "WHERE room_key = ? AND started_at < ? ORDER BY started_at DESC LIMIT 1",
+                (room_key, started_at)
+            ).fetchone()
+        if row is None or row["session"] is None:
+            return None
+        if started_at - (row["started_at"] + (row["duration"] or 0)) > max_gap:
+            return None
+        return row["session"]
+
+    def query(self,
+              room_key: Optional[str] = None,
+              session: Optional[str] = None,
+              ext: Optional[str] = None,
+              since: Optional[float] = None,
+              until: Optional[float] = None,
+              search: Optional[str] = None,
+              sort: str = "started_at",
+              descending: bool = True,
+              offset: int = 0,
+              limit: int = 50) -> Dict[str, Any]:
+        """
+        分页查询录制文件
+
+        Args:
+            room_key: 按房间过滤
+            session: 按场次过滤
+            ext: 按扩展名过滤（如 flv、mp4）
+            since: 开始时间不早于（时间戳）
+            until: 开始时间早于（时间戳）
+            search: 文件名包含的文字
+            sort: 排序字段（started_at、size、duration、name、mtime）
+            descending: 是否倒序
+            offset: 跳过的记录数
+            limit: 返回的记录数（最多1000）
+
+        Returns:
+            Dict[str, Any]: 查询结果（total、offset、limit、items）
+        """
+        conditions = []
+        params: List[Any] = []
+        for column, value in (("room_key", room_key), ("session", session), ("ext", ext)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("started_at < ?")
+            params.append(until)
+        if search:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append("%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        if sort not in SORT_FIELDS:
+            sort = "started_at"
+        direction = "DESC" if descending else "ASC"
+        limit = max(min(int(limit), 1000), 1)
+        offset = max(int(offset), 0)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM recordings{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM recordings{where} ORDER BY {sort} {direction}, path {direction} LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return {"total": total, "offset": offset, "limit": limit, "items": [dict(row) for row in rows]}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        统计各房间的文件数、总大小和总时长
+
+        Returns:
+            Dict[str, Any]: 房间 -> 统计信息
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT room_key, COUNT(*) AS files, SUM(size) AS size, SUM(duration) AS duration, "
+                "COUNT(DISTINCT session) AS sessions FROM recordings GROUP BY room_key"
+            ).fetchall()
+        return {row["room_key"]: dict(row) for row in rows}
+
+
+def session_name(room_key: str, started_at: float) -> str:
+    """
+    生成场次标识：房间 + 该场第一个文件的开始时间
+    """
+    return f"{room_key}-{datetime.fromtimestamp(started_at).strftime('%Y%m%d-%H%M%S')}"
@@ -0,0 +1,284 @@
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Tuple
+from src.config.config import config_manager
+from src.library.catalog import RecordingCatalog, session_name
+from src.library.probe import probe_file
+from src.library.watcher import InotifyWatcher, EVENT_CHANGED, EVENT_DELETED
+from src.processor.clip import CLIP_DIR
+from src.processor.merge import parse_filename_time
+from src.processor.parallel import find_ffprobe
+from src.processor.flv import FLVError
+
+
+# 纳入目录的录制文件扩展名
+RECORDING_EXTENSIONS = (".flv", ".mp4", ".mkv", ".ts")
+
+
+def get_library_config() -> Dict[str, Any]:
+    """
+    获取录制文件目录配置
+
+    Returns:
+        Dict[str, Any]: 目录配置（enabled、db_file、workers、watch、rescan_interval、session_gap）
+    """
+    data_dir = config_manager.get("system.data_dir", "/opt/2233recorder/data")
+    library_config = {
+        "enabled": True,
+        "db_file": os.path.join(data_dir, "library.db"),
+        "workers": 4,
+        "watch": True,
+        "rescan_interval": 3600,
+        "session_gap": 300
+    }
+    library_config.update(config_manager.get("library", {}) or {})
+    return library_config
+
+
+class RecordingLibrary:
+    """
+    录制文件库
+
+    维护所有房间录制目录中录制文件的SQLite目录：
+    启动时并行扫描（只读取新增或变化的文件），之后由inotify增量更新，
+    不支持inotify时定期重新扫描。FLV使用内置解析器，其他格式使用ffprobe。
+    """
+
+    def __init__(self):
+        """
+        初始化录制文件库
+        """
+        self.logger = logging.getLogger("RecordingLibrary")
+        self.catalog: Optional[RecordingCatalog] = None
+        self.is_attached = False
+        self._output_dir_provider: Optional[Callable[[Dict[str, Any]], str]] = None
+        self._roots: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher: Optional[InotifyWatcher] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def attach(self, output_dir_provider: Callable[[Dict[str, Any]], str]):
+        """
+        打开目录数据库，在后台完成首次扫描并开始监听录制目录
+
+        Args:
+            output_dir_provider: 获取房间录制目录的函数
+        """
+        library_config = get_library_config()
+        with self._lock:
+            if self.is_attached or not library_config["enabled"]:
+                return
+            self._output_dir_provider = output_dir_provider
+            self.catalog = RecordingCatalog(library_config["db_file"])
+            self._stop_event.clear()
+            self.is_attached = True
+
+        self._thread = threading.Thread(target=self._run, name="RecordingLibrary", daemon=True)
+        self._thread.start()
+        self.logger.info("录制文件库已启动")
+
+    def detach(self):
+        """
+        停止监听并关闭目录数据库
+        """
+        with self._lock:
+            if not self.is_attached:
+                return
+            self.is_attached = False
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        with self._scan_lock:
+            self.catalog.close()
+
+    def scan(self, workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        扫描所有房间的录制目录，只读取新增或大小、修改时间变化的文件，删除已不存在的文件的记录
+
+        Args:
+            workers: 并行读取文件信息的线程数，默认读取配置
+
+        Returns:
+            Dict[str, int]: 扫描统计（files、indexed、removed）
+        """
+        workers = workers or get_library_config()["workers"]
+        result = {"files": 0, "indexed": 0, "removed": 0}
+        with self._scan_lock:
+            self._roots = self._load_roots()
+            for room_key, (room, root) in self._roots.items():
+                known = self.catalog.file_states(room_key)
+                changed = []
+                for path, stat in self._walk(root):
+                    result["files"] += 1
+                    if known.pop(path, None) != (stat.st_size, stat.st_mtime):
+                        changed.append((path, stat))
+
+                # 按文件开始时间顺序写入，场次由前一个文件决定
+                changed.sort(key=lambda item: (self._started_at(item[0], item[1], None), item[0]))
+                with ThreadPoolExecutor(max_workers=max(int(workers), 1)) as executor:
+                    infos = list(executor.map(lambda item: self._probe(item[0]), changed))
+                for (path, stat), info in zip(changed, infos):
+                    self._store(room_key, path, stat, info)
+                result["indexed"] += len(changed)
+                result["removed"] += self.catalog.remove(known)
+
+        self.logger.info(f"录制文件库扫描完成: {result['files']} 个文件，更新 {result['indexed']} 个，"
+                         f"移除 {result['removed']} 个")
+        return result
+
+    def update_file(self, path: str) -> bool:
+        """
+        更新单个文件的记录（文件已删除时删除记录）
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            bool: 文件属于某个房间的录制目录并已更新返回True
+        """
+        path = os.path.abspath(path)
+        room_key = self._room_for(path)
+        if room_key is None or not self._is_recording(os.path.basename(path)):
+            return False
+
+        with self._scan_lock:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self.catalog.remove([path])
+                return True
+            self._store(room_key, path, stat, self._probe(path))
+        return True
+
+    def query(self, **filters: Any) -> Dict[str, Any]:
+        """
+        分页查询录制文件，参数同RecordingCatalog.query
+        """
+        if self.catalog is None:
+            return {"total": 0, "offset": 0, "limit": 0, "items": []}
+        return self.catalog.query(**filters)
+
+    def _run(self):
+        """
+        后台线程：首次扫描后监听文件变化，不支持inotify时定期重新扫描
+        """
+        library_config = get_library_config()
+        try:
+            self.scan()
+        except Exception as e:
+            self.logger.error(f"扫描录制文件库失败: {e}")
+
+        if library_config["watch"]:
+            watcher = InotifyWatcher(self._on_file_event)
+            if watcher.start():
+                self._watcher = watcher
+                for _, root in self._roots.values():
+                    if os.path.isdir(root):
+                        watcher.add_tree(root)
+                self.logger.info("已通过inotify监听录制目录")
+            else:
+                self.logger.warning(f"不支持inotify，每 {library_config['rescan_interval']} 秒重新扫描录制目录")
+
+        while not self._stop_event.wait(library_config["rescan_interval"]):
+            # inotify无法感知新增房间的录制目录，定期扫描一次兜底
+            try:
+                self.scan()
+                if self._watcher is not None:
+                    for _, root in self._roots.values():
+                        if os.path.isdir(root):
+                            self._watcher.add_tree(root)
+            except Exception as e:
+                self.logger.error(f"扫描录制文件库失败: {e}")
+
+    def _on_file_event(self, event: str, path: str):
+        """
+        inotify事件：文件写入完成或移入时更新记录，删除或移出时删除记录，事件丢失时全量扫描
+        """
+        if event in (EVENT_CHANGED, EVENT_DELETED):
+            self.update_file(path)
+        else:
+            threading.Thread(target=self.scan, daemon=True).start()
+
+    def _load_roots(self) -> Dict[str, Tuple[Dict[str, Any], str]]:
+        roots = {}
+        for room in config_manager.get_rooms():
+            room_key = f"{room.get('platform', 'bilibili')}_{room.get('room_id')}"
+            roots[room_key] = (room, os.path.abspath(self._output_dir_provider(room)))
+        return roots
+
+    def _room_for(self, path: str) -> Optional[str]:
+        for room_key, (_, root) in self._roots.items():
+            if path.startswith(root + os.sep):
+                relative = os.path.relpath(os.path.dirname(path), root)
+                if CLIP_DIR not in relative.split(os.sep):
+                    return room_key
+        return None
+
+    def _is_recording(self, name: str) -> bool:
+        return name.lower().endswith(RECORDING_EXTENSIONS) and not name.startswith(".")
+
+    def _walk(self, root: str):
+        """
+        遍历录制目录中的录制文件（跳过剪辑目录和隐藏文件）
+        """
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d != CLIP_DIR and not d.startswith(".")]
+            for name in files:
+                if not self._is_recording(name):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    continue
+
+    def _probe(self, path: str) -> Dict[str, Any]:
+        ffprobe_path = find_ffprobe(config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg"))
+        try:
+            return probe_file(path, ffprobe_path)
+        except (FLVError, RuntimeError, OSError, ValueError) as e:
+            return {"error": str(e)}
+
+    def _started_at(self, path: str, stat: os.stat_result, duration: Optional[float]) -> float:
+        started_at = parse_filename_time(path)
+        if started_at is None:
+            started_at = stat.st_mtime - (duration or 0)
+        return started_at
+
+    def _store(self, room_key: str, path: str, stat: os.stat_result, info: Dict[str, Any]):
+        """
+        写入一个文件的记录，根据同一房间的前一个录制确定场次
+        """
+        started_at = self._started_at(path, stat, info.get("duration"))
+        existing = self.catalog.get(path)
+        session = existing["session"] if existing else None
+        if session is None:
+            session = (self.catalog.find_session(room_key, started_at, get_library_config()["session_gap"])
+                       or session_name(room_key, started_at))
+
+        record = dict(info)
+        record.update({
+            "path": path,
+            "room_key": room_key,
+            "session": session,
+            "name": os.path.basename(path),
+            "ext": os.path.splitext(path)[1].lstrip(".").lower(),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "started_at": started_at,
+            "indexed_at": time.time()
+        })
+        self.catalog.upsert([record])
+
+
+# 全局录制文件库实例
+library = RecordingLibrary()
@@ -0,0 +1,124 @@
+import os
+import json
+import subprocess
+from typing import Dict, Any, Optional
+from src.config.config import config_manager
+from src.processor.flv import FLVReader, FLVError
+from src.processor.keyframes import load_keyframe_index, read_metadata
+
+
+# FLV CodecID / SoundFormat 对应的编码名称（与ffprobe的codec_name一致）
+FLV_VIDEO_CODECS = {2: "flv1", 4: "vp6f", 7: "h264", 12: "hevc", 13: "av1"}
+FLV_AUDIO_CODECS = {2: "mp3", 10: "aac", 11: "speex", 13: "flac", 14: "mp3"}
+
+
+def probe_flv(path: str) -> Dict[str, Any]:
+    """
+    用内置FLV解析器读取录制文件信息，不启动外部进程
+
+    时长来自关键帧索引（已有索引时只扫描新增部分），编码来自序列头，分辨率来自onMetaData。
+
+    Args:
+        path: FLV文件路径
+
+    Returns:
+        Dict[str, Any]: 文件信息（format、duration、video_codec、audio_codec、width、height、bitrate）
+
+    Raises:
+        FLVError: 文件不是有效的FLV文件
+    """
+    index = load_keyframe_index(path, save=config_manager.get("processor.keyframe_index", False))
+    info = {
+        "format": "flv",
+        "duration": index.duration,
+        "video_codec": None,
+        "audio_codec": None,
+        "width": None,
+        "height": None,
+        "bitrate": None
+    }
+
+    with FLVReader(path) as reader:
+        if index.video_header_offset is not None:
+            first = reader.first_byte(next(reader.tags(start=index.video_header_offset)))
+            info["video_codec"] = FLV_VIDEO_CODECS.get(first & 0x0F) if not first & 0x80 else "enhanced"
+        if index.audio_header_offset is not None:
+            first = reader.first_byte(next(reader.tags(start=index.audio_header_offset)))
+            info["audio_codec"] = FLV_AUDIO_CODECS.get(first >> 4)
+
+    try:
+        metadata = read_metadata(path)
+    except (FLVError, ValueError, IndexError):
+        metadata = {}
+    for key in ("width", "height"):
+        if isinstance(metadata.get(key), (int, float)) and metadata[key] > 0:
+            info[key] = int(metadata[key])
+
+    if info["duration"] > 0:
+        info["bitrate"] = int(os.path.getsize(path) * 8 / info["duration"])
+    return info
+
+
+def probe_ffprobe(ffprobe_path: str, path: str, timeout: float = 60) -> Dict[str, Any]:
+    """
+    用ffprobe读取文件信息（只读取容器头部，不解码）
+
+    Args:
+        ffprobe_path: FFprobe可执行文件路径
+        path: 视频文件路径
+        timeout: 超时时间（秒）
+
+    Returns:
+        Dict[str, Any]: 文件信息，字段同probe_flv
+
+    Raises:
+        RuntimeError: ffprobe执行失败或输出无法解析
+    """
+    cmd = [ffprobe_path, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout)
+        data = json.loads(result.stdout or "{}")
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        raise RuntimeError(f"ffprobe执行失败: {e}")
+    if result.returncode != 0 or "format" not in data:
+        raise RuntimeError(f"ffprobe执行失败: {result.stderr.strip()[-500:]}")
+
+    video = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), {})
+    audio = next((s for s in data.get("streams", []) if s.get("codec_type") == "audio"), {})
+    fmt = data["format"]
+    return {
+        "format": fmt.get("format_name"),
+        "duration": _to_float(fmt.get("duration")),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "bitrate": int(fmt["bit_rate"]) if str(fmt.get("bit_rate", "")).isdigit() else None
+    }
+
+
+def probe_file(path: str, ffprobe_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    读取录制文件信息：FLV使用内置解析器，其他格式使用ffprobe
+
+    Args:
+        path: 视频文件路径
+        ffprobe_path: FFprobe可执行文件路径
+
+    Returns:
+        Dict[str, Any]: 文件信息
+
+    Raises:
+        FLVError: FLV文件格式错误
+        RuntimeError: ffprobe执行失败
+    """
+    if path.lower().endswith(".flv"):
+        return probe_flv(path)
+    return probe_ffprobe(ffprobe_path or "ffprobe", path)
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
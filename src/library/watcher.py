@@ -0,0 +1,199 @@
+import os
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import threading
+import logging
+from typing import Callable, Dict, Optional
+
+
+# inotify事件掩码（linux/inotify.h）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# 回调事件类型
+EVENT_CHANGED = "changed"
+EVENT_DELETED = "deleted"
+EVENT_OVERFLOW = "overflow"
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    if not all(hasattr(libc, name) for name in ("inotify_init1", "inotify_add_watch")):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class InotifyWatcher:
+    """
+    目录树变化监听类（Linux inotify，通过ctypes调用，无需第三方依赖）
+
+    只关注写入完成（IN_CLOSE_WRITE）、移入移出和删除事件，
+    正在录制的文件持续写入时不会产生事件，录制结束关闭文件后才通知。
+    新建的子目录自动加入监听。事件队列溢出时回调 overflow，调用方应全量重新扫描。
+    """
+
+    def __init__(self, callback: Callable[[str, str], None]):
+        """
+        初始化监听器
+
+        Args:
+            callback: 事件回调，参数为 (事件类型, 文件路径)，事件类型为 changed/deleted/overflow
+        """
+        self.callback = callback
+        self.logger = logging.getLogger("InotifyWatcher")
+        self._libc = _load_libc()
+        self._fd = -1
+        self._watches: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def available(self) -> bool:
+        """
+        当前系统是否支持inotify
+        """
+        return self._libc is not None
+
+    def start(self) -> bool:
+        """
+        创建inotify实例并启动读取线程
+
+        Returns:
+            bool: 启动成功返回True，不支持inotify时返回False
+        """
+        if not self.available:
+            return False
+        if self._fd >= 0:
+            return True
+
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            self.logger.warning(f"创建inotify实例失败: {os.strerror(ctypes.get_errno())}")
+            return False
+
+        self._fd = fd
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="InotifyWatcher", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """
+        停止监听并关闭inotify实例
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+            self._watches.clear()
+
+    def add_tree(self, root: str) -> int:
+        """
+        监听目录及其全部子目录
+
+        Args:
+            root: 目录路径
+
+        Returns:
+            int: 新增的监听数
+        """
+        added = 0
+        for directory, dirs, _ in os.walk(root):
+            if self._add_watch(directory):
+                added += 1
+        return added
+
+    def _add_watch(self, directory: str) -> bool:
+        with self._lock:
+            if self._fd < 0:
+                return False
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    self.logger.warning("inotify监听数已达系统上限（fs.inotify.max_user_watches）")
+                return False
+            self._watches[wd] = directory
+            return True
+
+    def _run(self):
+        """
+        读取并分发inotify事件
+        """
+        while not self._stop_event.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 1.0)
+                if not ready:
+                    continue
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except (OSError, ValueError):
+                break
+            self._dispatch(data)
+
+    def _dispatch(self, data: bytes):
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                self._notify(EVENT_OVERFLOW, "")
+                continue
+
+            with self._lock:
+                directory = self._watches.get(wd)
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+            if directory is None or mask & (IN_IGNORED | IN_DELETE_SELF):
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # 新目录中可能已有文件（移入的目录），先监听再逐个通知
+                    self.add_tree(path)
+                    for root, _, files in os.walk(path):
+                        for file in files:
+                            self._notify(EVENT_CHANGED, os.path.join(root, file))
+                elif mask & IN_MOVED_FROM:
+                    self._notify(EVENT_OVERFLOW, path)
+                continue
+
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._notify(EVENT_CHANGED, path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._notify(EVENT_DELETED, path)
+
+    def _notify(self, event: str, path: str):
+        try:
+            self.callback(event, path)
+        except Exception as e:
+            self.logger.error(f"处理文件变化事件出错: {path}: {e}")
@@ -1,9 +1,14 @@
 import time
 import threading
+import logging
 from typing import List, Dict, Any
 from src.api.bilibili_api import BilibiliAPI
 from src.config.config import config_manager
 from src.monitor.trigger import RecordTrigger
+from src.utils.events import event_bus
+from src.utils.logger import room_context
+from src.utils.tracing import tracer
+from src.utils.metrics import POLL_LAG, POLL_DURATION, POLL_ERRORS, DETECTION_LATENCY
 
 
 class Monitor:
@@ -15,10 +20,12 @@ class Monitor:
         """
         初始化监控器
         """
+        self.logger = logging.getLogger("Monitor")
         self.bilibili_api = BilibiliAPI()
         self.monitor_threads = []
         self.is_running = False
         self.interval = config_manager.get("monitor.interval", 300)
+        self.stagger = config_manager.get("monitor.stagger", 1)
         self.rooms = config_manager.get_rooms()
         self.trigger = RecordTrigger()
         
@@ -27,34 +34,34 @@ class Monitor:
         启动监控
         """
         if self.is_running:
-            print("监控已在运行中")
+            self.logger.warning("监控已在运行中")
             return
         
-        print("启动直播间监控")
+        self.logger.info("启动直播间监控")
         self.is_running = True
         
-        # 为每个房间创建一个监控线程
-        for room in self.rooms:
+        # 为每个房间创建一个监控线程，各线程错开首次查询时间，避免同时请求API
+        for index, room in enumerate(self.rooms):
             thread = threading.Thread(
                 target=self._monitor_room,
-                args=(room,),
+                args=(room, index * self.stagger),
                 daemon=True
             )
             self.monitor_threads.append(thread)
             thread.start()
-            time.sleep(1)  # 避免同时请求API
         
-        print(f"已启动 {len(self.monitor_threads)} 个监控线程")
+        self.logger.info(f"已启动 {len(self.monitor_threads)} 个监控线程")
+        event_bus.publish("monitor_state_changed", is_running=True)
     
     def stop(self):
         """
         停止监控
         """
         if not self.is_running:
-            print("监控未在运行")
+            self.logger.warning("监控未在运行")
             return
         
-        print("停止直播间监控")
+        self.logger.info("停止直播间监控")
         self.is_running = False
         
         # 等待所有监控线程结束
@@ -67,43 +74,80 @@ class Monitor:
         # 停止所有录制
         self.trigger.stop_all_recordings()
         
-        print("所有监控线程已停止")
+        self.logger.info("所有监控线程已停止")
+        event_bus.publish("monitor_state_changed", is_running=False)
     
-    def _monitor_room(self, room: Dict[str, Any]):
+    def _monitor_room(self, room: Dict[str, Any], delay: float = 0):
         """
-        监控单个房间
+        监控单个房间（监控线程中产生的日志都带上房间键）
         
         Args:
             room: 房间配置
+            delay: 首次查询前等待的时间（秒）
+        """
+        with room_context(f"{room.get('platform', 'bilibili')}_{room.get('room_id')}"):
+            self._poll_room(room, delay)
+    
+    def _poll_room(self, room: Dict[str, Any], delay: float):
+        """
+        按监控间隔查询房间直播状态
+        
+        Args:
+            room: 房间配置
+            delay: 首次查询前等待的时间（秒）
         """
         room_id = room.get("room_id")
         platform = room.get("platform", "bilibili")
         room_name = room.get("name", f"房间{room_id}")
         
-        print(f"开始监控 {platform} 房间 {room_name} ({room_id})")
+        self.logger.info(f"开始监控 {platform} 房间 {room_name} ({room_id})")
+        
+        # 本房间的指标序列，循环中直接更新
+        room_key = f"{platform}_{room_id}"
+        poll_lag = POLL_LAG.labels(room_key)
+        poll_duration = POLL_DURATION.labels(room_key)
+        poll_errors = POLL_ERRORS.labels(room_key)
+        detection_latency = DETECTION_LATENCY.labels(room_key)
+        
+        deadline = time.time() + delay
+        while self.is_running and time.time() < deadline:
+            time.sleep(max(0, min(1, deadline - time.time())))
         
+        scheduled = deadline
+        was_live = False
         while self.is_running:
-            try:
-                # 根据平台选择不同的API客户端
-                if platform == "bilibili":
-                    live_status, title, anchor_name = self.bilibili_api.get_live_status(room_id)
-                else:
-                    # 其他平台暂未实现
-                    live_status, title, anchor_name = False, "", ""
-                
-                # 调用录制触发逻辑
-                self._on_room_status_changed(room, live_status, title, anchor_name)
-                
-            except Exception as e:
-                print(f"监控房间 {room_id} 时发生错误: {e}")
+            poll_start = time.time()
+            poll_lag.observe(max(0.0, poll_start - scheduled))
+            with tracer.span("monitor.poll", room=room_key) as span:
+                try:
+                    # 根据平台选择不同的API客户端
+                    if platform == "bilibili":
+                        live_status, title, anchor_name = self.bilibili_api.get_live_status(room_id)
+                    else:
+                        # 其他平台暂未实现
+                        live_status, title, anchor_name = False, "", ""
+                    poll_duration.observe(time.time() - poll_start)
+                    
+                    # 调用录制触发逻辑
+                    self._on_room_status_changed(room, live_status, title, anchor_name)
+                    
+                    if live_status and not was_live and self.trigger.recorders.get(room_key):
+                        detection_latency.observe(time.time() - poll_start)
+                    was_live = live_status
+                    span.set(live=live_status)
+                    
+                except Exception as e:
+                    poll_errors.inc()
+                    self.logger.error(f"监控房间 {room_id} 时发生错误: {e}")
             
             # 等待下一次监控
+            scheduled = poll_start + self.interval
             for _ in range(self.interval):
                 if not self.is_running:
                     break
                 time.sleep(1)
         
-        print(f"停止监控 {platform} 房间 {room_name} ({room_id})")
+        self.logger.info(f"停止监控 {platform} 房间 {room_name} ({room_id})")
     
     def _on_room_status_changed(self, room: Dict[str, Any], live_status: bool, title: str, anchor_name: str):
         """
@@ -118,8 +162,10 @@ class Monitor:
         room_id = room.get("room_id")
         room_name = room.get("name", f"房间{room_id}")
         
+        # 每轮都会查询，状态不变时按限流窗口只记录一条；限流按状态区分，状态变化立即记录
         status_text = "直播中" if live_status else "未开播"
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {room_name} ({room_id}): {status_text}")
+        self.logger.info(f"{room_name} ({room_id}): {status_text}",
+                         extra={"rate_key": f"room_status:{live_status}", "live": live_status})
         
         # 调用录制触发逻辑
         self.trigger.on_room_status_changed(room, live_status, title, anchor_name)
@@ -1,7 +1,9 @@
 import os
 import subprocess
+import logging
 from typing import Dict, Any
 from src.recorder.core import Recorder
+from src.utils.tracing import tracer
 
 
 class RecordTrigger:
@@ -13,6 +15,7 @@ class RecordTrigger:
         """
         初始化录制触发器
         """
+        self.logger = logging.getLogger("RecordTrigger")
         self.recorders = {}
         self.recorder = Recorder()
     
@@ -30,14 +33,27 @@ class RecordTrigger:
         platform = room.get("platform", "bilibili")
         room_key = f"{platform}_{room_id}"
         
-        if live_status:
-            # 直播间开播，开始录制
-            if room_key not in self.recorders or not self.recorders[room_key]:
-                self._start_recording(room, title, anchor_name)
-        else:
-            # 直播间下播，停止录制
-            if room_key in self.recorders and self.recorders[room_key]:
-                self._stop_recording(room)
+        with tracer.span("trigger.decide", room=room_key, live=live_status):
+            if live_status:
+                # 直播间开播，开始录制
+                if not self.recorders.get(room_key) or self._is_retired(room_key):
+                    self._start_recording(room, title, anchor_name)
+            else:
+                # 直播间下播，停止录制
+                if room_key in self.recorders and self.recorders[room_key]:
+                    self._stop_recording(room)
+    
+    def _is_retired(self, room_key: str) -> bool:
+        """
+        判断录制是否已在录制核心之外结束（进程退出后守护器确认已下播，不再重启）
+        
+        Args:
+            room_key: 房间键（平台_房间号）
+            
+        Returns:
+            bool: 已没有录制进程且不在守护中返回True
+        """
+        return room_key not in self.recorder.record_processes and self.recorder.supervisor.get_state(room_key) is None
     
     def _start_recording(self, room: Dict[str, Any], title: str, anchor_name: str):
         """
@@ -53,7 +69,7 @@ class RecordTrigger:
         room_name = room.get("name", f"房间{room_id}")
         room_key = f"{platform}_{room_id}"
         
-        print(f"准备开始录制 {platform} 房间 {room_name} ({room_id})")
+        self.logger.info(f"准备开始录制 {platform} 房间 {room_name} ({room_id})")
         
         try:
             # 调用录制核心模块开始录制
@@ -61,12 +77,12 @@ class RecordTrigger:
             
             if recorder_process:
                 self.recorders[room_key] = recorder_process
-                print(f"✅ 成功开始录制 {platform} 房间 {room_name} ({room_id})")
+                self.logger.info(f"成功开始录制 {platform} 房间 {room_name} ({room_id})")
             else:
-                print(f"❌ 开始录制 {platform} 房间 {room_name} ({room_id}) 失败")
+                self.logger.error(f"开始录制 {platform} 房间 {room_name} ({room_id}) 失败")
         
         except Exception as e:
-            print(f"❌ 开始录制 {platform} 房间 {room_name} ({room_id}) 时发生错误: {e}")
+            self.logger.error(f"开始录制 {platform} 房间 {room_name} ({room_id}) 时发生错误: {e}")
     
     def _stop_recording(self, room: Dict[str, Any]):
         """
@@ -80,7 +96,7 @@ class RecordTrigger:
         room_name = room.get("name", f"房间{room_id}")
         room_key = f"{platform}_{room_id}"
         
-        print(f"准备停止录制 {platform} 房间 {room_name} ({room_id})")
+        self.logger.info(f"准备停止录制 {platform} 房间 {room_name} ({room_id})")
         
         try:
             # 调用录制核心模块停止录制
@@ -88,37 +104,37 @@ class RecordTrigger:
             
             if success:
                 self.recorders.pop(room_key, None)
-                print(f"✅ 成功停止录制 {platform} 房间 {room_name} ({room_id})")
+                self.logger.info(f"成功停止录制 {platform} 房间 {room_name} ({room_id})")
+            elif self._is_retired(room_key):
+                # 守护器已在进程退出后结束本次录制
+                self.recorders.pop(room_key, None)
+                self.logger.info(f"{platform} 房间 {room_name} ({room_id}) 的录制已结束")
             else:
-                print(f"❌ 停止录制 {platform} 房间 {room_name} ({room_id}) 失败")
+                self.logger.error(f"停止录制 {platform} 房间 {room_name} ({room_id}) 失败")
         
         except Exception as e:
-            print(f"❌ 停止录制 {platform} 房间 {room_name} ({room_id}) 时发生错误: {e}")
+            self.logger.error(f"停止录制 {platform} 房间 {room_name} ({room_id}) 时发生错误: {e}")
             self.recorders.pop(room_key, None)
     
     def stop_all_recordings(self):
         """
         停止所有录制
         """
-        print("准备停止所有录制")
+        self.logger.info("准备停止所有录制")
         
         for room_key in list(self.recorders.keys()):
             try:
                 # 解析房间信息
-                platform, room_id = room_key.split("_")
+                platform, room_id = room_key.split("_", 1)
                 # 查找房间配置
                 from src.config.config import config_manager
-                room = None
-                for r in config_manager.get_rooms():
-                    if r.get("platform") == platform and r.get("room_id") == room_id:
-                        room = r
-                        break
+                room = config_manager.find_room(platform, room_id)
                 
                 if room:
                     self._stop_recording(room)
             
             except Exception as e:
-                print(f"停止录制 {room_key} 时发生错误: {e}")
+                self.logger.error(f"停止录制 {room_key} 时发生错误: {e}")
                 self.recorders.pop(room_key, None)
         
-        print("所有录制已停止")
\ No newline at end of file
+        self.logger.info("所有录制已停止")
\ No newline at end of file
@@ -0,0 +1,260 @@
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+import threading
+import subprocess
+import logging
+from typing import Dict, Any, Optional, List
+from src.config.config import config_manager
+from src.processor.flv import FLVReader, FLVError, TAG_SCRIPT, TAG_HEADER_SIZE
+from src.processor.keyframes import load_keyframe_index, amf_encode
+from src.processor.runner import run_ffmpeg, FFmpegCancelled
+
+
+logger = logging.getLogger("ClipExtractor")
+
+# 每写入多少个标签检查一次取消事件
+CANCEL_CHECK_INTERVAL = 2000
+
+# 剪辑输出子目录（位于房间录制目录下，不参与后期处理）
+CLIP_DIR = "clips"
+
+
+def _tag_header(tag_type: int, data_size: int, timestamp: int) -> bytes:
+    timestamp = max(timestamp, 0) & 0xFFFFFFFF
+    return (bytes((tag_type,)) + data_size.to_bytes(3, "big") + (timestamp & 0xFFFFFF).to_bytes(3, "big")
+            + bytes(((timestamp >> 24) & 0xFF,)) + b"\x00\x00\x00")
+
+
+def copy_segments(input_files: List[str], start: float, end: Optional[float], output_file: str,
+                  cancel_event: Optional[threading.Event] = None,
+                  ffmpeg_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    将多个分段中的时间范围复制到一个文件（直接复制音视频数据，不解码不编码）
+
+    多个文件视为同一场直播按顺序排列的分段，时间从第一个分段开始计算。
+    利用关键帧索引直接定位到起点之前最近的关键帧所在的字节位置，
+    写入序列头后复制范围内的标签并把时间戳调整为从0开始，耗时只取决于剪辑本身的大小。
+    输出文件扩展名为.mp4时，再用FFmpeg将导出的FLV转封装为MP4。
+
+    Args:
+        input_files: 录制文件（FLV）列表，按时间顺序
+        start: 开始时间（秒）
+        end: 结束时间（秒），None表示到最后
+        output_file: 输出文件路径（.flv或.mp4）
+        cancel_event: 取消事件
+        ffmpeg_path: FFmpeg可执行文件路径，输出MP4时使用
+
+    Returns:
+        Dict[str, Any]: 导出结果（output_file、实际开始时间、时长、大小）
+
+    Raises:
+        FLVError: 录制文件格式错误或时间范围内没有数据
+        FFmpegCancelled: 任务被取消
+    """
+    if end is not None and end <= start:
+        raise FLVError("结束时间必须晚于开始时间")
+
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(output_dir, exist_ok=True)
+    remux = output_file.lower().endswith(".mp4")
+    flv_file = os.path.join(output_dir, f".{os.path.basename(output_file)}.part.flv")
+
+    segment_start = 0.0
+    actual_start = None
+    written_tags = 0
+    last_timestamp = 0
+    duration_offset = None
+    with open(flv_file, "wb") as out:
+        for path in input_files:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            index = load_keyframe_index(path)
+            segment_end = segment_start + index.duration
+            if segment_end < start or (end is not None and segment_start >= end) or not len(index):
+                segment_start = segment_end
+                continue
+
+            local_start = max(start - segment_start, 0)
+            local_end = end - segment_start if end is not None and end < segment_end else None
+            start_offset, end_offset, keyframe_timestamp = index.byte_range(local_start, local_end)
+            if actual_start is None:
+                actual_start = segment_start + (keyframe_timestamp - (index.first_timestamp or 0)) / 1000
+
+            # 后续分段紧接上一分段的最后一个时间戳
+            base = last_timestamp + (40 if written_tags else 0)
+
+            with FLVReader(path) as reader:
+                if duration_offset is None:
+                    out.write(bytes(reader.view[:reader.header["data_offset"]]))
+                    out.write(b"\x00\x00\x00\x00")
+                    metadata = amf_encode("onMetaData") + amf_encode({"duration": 0.0}, ecma_array=True)
+                    # duration的数值位于ECMA数组结束标记（3字节）之前，导出完成后回填
+                    duration_offset = out.tell() + TAG_HEADER_SIZE + len(metadata) - 3 - 8
+                    out.write(_tag_header(TAG_SCRIPT, len(metadata), 0) + metadata)
+                    out.write(struct.pack(">I", TAG_HEADER_SIZE + len(metadata)))
+
+                # 每个分段开头写入该分段的序列头，分段之间编码参数变化时解码器可以重新初始化
+                header_offsets = (index.video_header_offset, index.audio_header_offset)
+                for offset in header_offsets:
+                    if offset is None:
+                        continue
+                    tag = next(reader.tags(start=offset), None)
+                    if tag is not None:
+                        out.write(_tag_header(tag.tag_type, tag.data_size, base))
+                        out.write(reader.tag_data(tag))
+                        out.write(struct.pack(">I", TAG_HEADER_SIZE + tag.data_size))
+
+                for tag in reader.tags(start=start_offset):
+                    if tag.offset >= end_offset:
+                        break
+                    if tag.tag_type == TAG_SCRIPT or tag.offset in header_offsets:
+                        continue
+                    # 关键帧之前交错写入的音频时间戳略早于关键帧，对齐到起点
+                    timestamp = base + max(tag.timestamp - keyframe_timestamp, 0)
+                    out.write(_tag_header(tag.tag_type, tag.data_size, timestamp))
+                    out.write(reader.tag_data(tag))
+                    out.write(struct.pack(">I", TAG_HEADER_SIZE + tag.data_size))
+                    last_timestamp = max(last_timestamp, timestamp)
+                    written_tags += 1
+                    if written_tags % CANCEL_CHECK_INTERVAL == 0 and cancel_event is not None and cancel_event.is_set():
+                        break
+
+            segment_start = segment_end
+
+        if duration_offset is not None:
+            out.seek(duration_offset)
+            out.write(struct.pack(">d", last_timestamp / 1000))
+
+    if cancel_event is not None and cancel_event.is_set():
+        os.remove(flv_file)
+        raise FFmpegCancelled(output_file)
+
+    if not written_tags:
+        os.remove(flv_file)
+        raise FLVError(f"时间范围 {start}-{end} 内没有数据")
+
+    if remux:
+        ffmpeg_path = ffmpeg_path or config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg")
+        cmd = [ffmpeg_path, "-hide_banner", "-i", flv_file, "-c", "copy", "-movflags", "+faststart",
+               "-y", output_file]
+        try:
+            returncode, stderr = run_ffmpeg(cmd, timeout=600, cancel_event=cancel_event)
+        finally:
+            os.remove(flv_file)
+        if returncode != 0:
+            raise FLVError(f"剪辑转封装为MP4失败: {stderr}")
+    else:
+        os.replace(flv_file, output_file)
+
+    result = {
+        "output_file": output_file,
+        "start": actual_start,
+        "duration": last_timestamp / 1000,
+        "size": os.path.getsize(output_file),
+        "tags": written_tags
+    }
+    return result
+
+
+def extract_clip(input_files: List[str], start: float, end: Optional[float], output_file: str,
+                 cancel_event: Optional[threading.Event] = None,
+                 ffmpeg_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    按时间范围导出剪辑，参数和返回值同copy_segments
+    """
+    result = copy_segments(input_files, start, end, output_file, cancel_event, ffmpeg_path)
+    logger.info(f"已导出剪辑: {output_file}（开始 {result['start']:.3f} 秒，时长 {result['duration']:.1f} 秒）")
+    return result
+
+
+def benchmark_clip(ffmpeg_path: str, input_file: str, start: float, duration: float) -> Dict[str, Any]:
+    """
+    比较基于关键帧索引的剪辑导出与 ffmpeg -ss 直接复制的耗时
+
+    Args:
+        ffmpeg_path: FFmpeg可执行文件路径
+        input_file: 录制文件
+        start: 开始时间（秒）
+        duration: 剪辑时长（秒）
+
+    Returns:
+        Dict[str, Any]: 各方式的耗时（秒），索引方式分别统计建立索引和导出的耗时
+    """
+    result = {}
+    with tempfile.TemporaryDirectory(prefix="2233recorder-clip-") as temp_dir:
+        index_file = input_file + ".kfindex"
+        had_index = os.path.exists(index_file)
+
+        begin = time.time()
+        load_keyframe_index(input_file, save=not had_index)
+        result["index"] = time.time() - begin
+
+        begin = time.time()
+        extract_clip([input_file], start, start + duration, os.path.join(temp_dir, "indexed.flv"))
+        result["indexed"] = time.time() - begin
+
+        begin = time.time()
+        subprocess.run([ffmpeg_path, "-hide_banner", "-loglevel", "error", "-ss", str(start), "-i", input_file,
+                        "-t", str(duration), "-c", "copy", "-y", os.path.join(temp_dir, "ffmpeg.flv")],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        result["ffmpeg"] = time.time() - begin
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    剪辑导出命令行工具
+
+    用法:
+        python -m src.processor.clip extract part1.flv part2.flv --start 3600 --end 3660 -o clip.mp4
+        python -m src.processor.clip benchmark record.flv --start 3600 --duration 60
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.processor.clip", description="剪辑导出工具")
+    parser.add_argument("--config-dir", default="config", help="配置文件目录")
+    subparsers = parser.add_subparsers(dest="command")
+
+    extract_parser = subparsers.add_parser("extract", help="按时间范围导出剪辑")
+    extract_parser.add_argument("files", nargs="+", help="录制文件，按时间顺序")
+    extract_parser.add_argument("--start", type=float, required=True, help="开始时间（秒）")
+    extract_parser.add_argument("--end", type=float, default=None, help="结束时间（秒）")
+    extract_parser.add_argument("-o", "--output", required=True, help="输出文件（.flv或.mp4）")
+
+    bench_parser = subparsers.add_parser("benchmark", help="与 ffmpeg -ss 比较导出耗时")
+    bench_parser.add_argument("file", help="录制文件")
+    bench_parser.add_argument("--start", type=float, required=True, help="开始时间（秒）")
+    bench_parser.add_argument("--duration", type=float, default=60, help="剪辑时长（秒）")
+
+    args = parser.parse_args(argv)
+
+    config_manager.config_dir = args.config_dir
+    config_manager.load_config()
+    ffmpeg_path = config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg")
+
+    if args.command == "extract":
+        try:
+            result = extract_clip(args.files, args.start, args.end, args.output, ffmpeg_path=ffmpeg_path)
+        except (FLVError, OSError) as e:
+            print(f"导出失败: {e}", file=sys.stderr)
+            return 1
+        print(f"{result['output_file']}: 开始 {result['start']:.3f} 秒，时长 {result['duration']:.1f} 秒，"
+              f"{result['size'] / 1024 / 1024:.1f} MB")
+        return 0
+
+    if args.command == "benchmark":
+        result = benchmark_clip(ffmpeg_path, args.file, args.start, args.duration)
+        print(f"{'方式':<16}{'耗时(s)':>10}")
+        print(f"{'建立索引':<16}{result['index']:>10.3f}")
+        print(f"{'索引导出':<16}{result['indexed']:>10.3f}")
+        print(f"{'ffmpeg -ss':<16}{result['ffmpeg']:>10.3f}")
+        return 0
+
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,13 @@
 import os
 import subprocess
-from typing import Optional
+import threading
+from typing import Optional, Dict, Any, Callable
 import logging
+from src.config.config import config_manager
+from src.processor.runner import run_ffmpeg, FFmpegCancelled, DEFAULT_STALL_TIMEOUT
+from src.processor.parallel import parallel_encode, get_parallel_config
+from src.processor.profiles import build_encoder_args
+from src.processor.manifest import ProcessedManifest
 
 
 class VideoConverter:
@@ -19,14 +25,27 @@ class VideoConverter:
         self.ffmpeg_path = ffmpeg_path
         self.logger = logging.getLogger("VideoConverter")
     
-    def convert_flv_to_mp4(self, input_file: str, output_file: Optional[str] = None, delete_original: bool = False) -> bool:
+    def convert_flv_to_mp4(self, input_file: str, output_file: Optional[str] = None, delete_original: bool = False,
+                           cancel_event: Optional[threading.Event] = None, video_filter: Optional[str] = None,
+                           threads: int = 0, encoder_profile: Optional[Dict[str, Any]] = None,
+                           progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                           parallel_workers: int = 0) -> bool:
         """
         将FLV文件转换为MP4格式
         
+        默认直接复制音视频流；指定video_filter时在同一次FFmpeg调用中应用滤镜并重新编码视频，
+        例如转换的同时添加水印，避免先转换再添加水印时对整个文件的两次读写。
+        
         Args:
             input_file: 输入FLV文件路径
             output_file: 输出MP4文件路径，默认与输入文件同名
             delete_original: 转换完成后是否删除原文件
+            cancel_event: 取消事件，被设置后终止转换
+            video_filter: 视频滤镜，为None时不重新编码视频
+            threads: 编码线程数，0表示由FFmpeg自动决定，仅在重新编码时有效
+            encoder_profile: 编码档位，仅在重新编码时有效
+            progress_callback: 进度回调，参数为FFmpeg进度信息
+            parallel_workers: 重新编码时分块并行编码的进程数，大于1时启用，失败时退回单次编码
             
         Returns:
             bool: 转换成功返回True，失败返回False
@@ -54,27 +73,48 @@ class VideoConverter:
             # 构建FFmpeg命令
             cmd = [
                 self.ffmpeg_path,
-                "-i", input_file,
-                "-c:v", "copy",  # 复制视频流，不重新编码
+                "-i", input_file
+            ]
+            
+            if video_filter:
+                # 应用滤镜并重新编码视频
+                cmd.extend(["-vf", video_filter])
+                cmd.extend(build_encoder_args(encoder_profile, threads))
+            else:
+                cmd.extend(["-c:v", "copy"])  # 复制视频流，不重新编码
+            
+            cmd.extend([
                 "-c:a", "copy",  # 复制音频流，不重新编码
                 "-movflags", "+faststart",  # 优化MP4文件，适合Web播放
                 "-y",  # 覆盖输出文件
                 output_file
-            ]
+            ])
             
             self.logger.info(f"开始转换: {input_file} -> {output_file}")
             
-            # 执行转换命令
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=3600  # 1小时超时
-            )
+            parallel_config = get_parallel_config()
+            if video_filter and parallel_workers > 1 and parallel_encode(
+                    self.ffmpeg_path,
+                    input_file,
+                    output_file,
+                    video_filter,
+                    encoder_profile=encoder_profile,
+                    workers=parallel_workers,
+                    threads=threads,
+                    min_duration=parallel_config["min_duration"],
+                    chunks_per_worker=parallel_config["chunks_per_worker"],
+                    cancel_event=cancel_event,
+                    progress_callback=progress_callback):
+                returncode, stderr = 0, ""
+            else:
+                # 执行转换命令
+                # 编码时长随录像时长增长，不限制总时长，只在进度长时间不前进时终止
+                returncode, stderr = run_ffmpeg(cmd, cancel_event=cancel_event,
+                                                progress_callback=progress_callback,
+                                                stall_timeout=config_manager.get("processor.stall_timeout", DEFAULT_STALL_TIMEOUT))
             
             # 检查转换结果
-            if result.returncode == 0:
+            if returncode == 0:
                 self.logger.info(f"转换成功: {input_file} -> {output_file}")
                 
                 # 删除原文件
@@ -87,26 +127,35 @@ class VideoConverter:
                 
                 return True
             else:
-                self.logger.error(f"转换失败，返回码: {result.returncode}")
-                self.logger.error(f"错误输出: {result.stderr}")
+                self.logger.error(f"转换失败，返回码: {returncode}")
+                self.logger.error(f"错误输出: {stderr}")
                 return False
         
         except subprocess.TimeoutExpired:
-            self.logger.error(f"转换超时: {input_file}")
+            self.logger.error(f"转换超时（进度长时间未前进）: {input_file}")
+            return False
+        
+        except FFmpegCancelled:
+            self.logger.warning(f"转换已取消: {input_file}")
             return False
         
         except Exception as e:
             self.logger.error(f"转换过程中发生错误: {e}")
             return False
     
-    def batch_convert(self, input_dir: str, output_dir: Optional[str] = None, delete_original: bool = False) -> int:
+    def batch_convert(self, input_dir: str, output_dir: Optional[str] = None, delete_original: bool = False,
+                      use_manifest: bool = True) -> int:
         """
         批量转换目录中的FLV文件
         
+        使用处理清单时，已转换且源文件未变化的文件会被跳过；转换先写入临时文件，
+        成功后再重命名，被中断的转换不会留下不完整的输出，下次运行时重新转换。
+        
         Args:
             input_dir: 输入目录
             output_dir: 输出目录，默认与输入目录相同
             delete_original: 转换完成后是否删除原文件
+            use_manifest: 是否使用处理清单跳过已完成的文件
             
         Returns:
             int: 成功转换的文件数量
@@ -126,7 +175,12 @@ class VideoConverter:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
+        manifest = None
+        if use_manifest:
+            manifest = ProcessedManifest(os.path.join(output_dir, ".convert_manifest.json"), base_dir=input_dir)
+        
         success_count = 0
+        skipped_count = 0
         
         # 遍历目录中的所有FLV文件
         for root, dirs, files in os.walk(input_dir):
@@ -144,11 +198,38 @@ class VideoConverter:
                         os.makedirs(output_subdir, exist_ok=True)
                         output_file = os.path.join(output_subdir, os.path.splitext(file)[0] + ".mp4")
                     
-                    # 执行转换
-                    if self.convert_flv_to_mp4(input_file, output_file, delete_original):
-                        success_count += 1
+                    # 已转换且源文件未变化则跳过
+                    if manifest and manifest.is_done(input_file, output_file):
+                        skipped_count += 1
+                        continue
+                    
+                    # 先写入临时文件，成功后再重命名
+                    name, ext = os.path.splitext(output_file)
+                    temp_file = f"{name}.part{ext}"
+                    if not self.convert_flv_to_mp4(input_file, temp_file):
+                        if os.path.exists(temp_file):
+                            os.remove(temp_file)
+                        if manifest:
+                            manifest.mark_failed(input_file, "转换失败")
+                        continue
+                    
+                    os.replace(temp_file, output_file)
+                    if manifest:
+                        manifest.mark_done(input_file, output_file)
+                    success_count += 1
+                    
+                    # 删除原文件
+                    if delete_original:
+                        try:
+                            os.remove(input_file)
+                            self.logger.info(f"已删除原文件: {input_file}")
+                        except Exception as e:
+                            self.logger.error(f"删除原文件失败: {e}")
+        
+        if manifest:
+            manifest.save()
         
-        self.logger.info(f"批量转换完成，成功转换 {success_count} 个文件")
+        self.logger.info(f"批量转换完成，成功转换 {success_count} 个文件，跳过 {skipped_count} 个已转换文件")
         return success_count
     
     def check_ffmpeg(self) -> bool:
@@ -0,0 +1,513 @@
+import os
+import sys
+import mmap
+import shutil
+import struct
+import argparse
+from typing import Dict, Any, Optional, Iterator, List, NamedTuple
+
+
+# FLV标签类型
+TAG_AUDIO = 8
+TAG_VIDEO = 9
+TAG_SCRIPT = 18
+
+FLV_HEADER_SIZE = 9
+TAG_HEADER_SIZE = 11
+PREVIOUS_TAG_SIZE = 4
+
+# 视频帧类型
+FRAME_KEY = 1
+
+# 标签头：类型(1) + 数据大小(3) 合并为一个UI32，时间戳(3) + 扩展时间戳(1) 合并为一个UI32
+_TAG_HEADER = struct.Struct(">II")
+_UI32 = struct.Struct(">I")
+
+# 单个标签数据的合理上限，超过视为文件损坏
+MAX_TAG_DATA_SIZE = 16 * 1024 * 1024
+
+
+class FLVError(Exception):
+    """
+    FLV文件格式错误
+    """
+
+
+class FLVTag(NamedTuple):
+    """
+    FLV标签（只记录位置信息，数据通过FLVReader.tag_data按需读取）
+    """
+    offset: int
+    tag_type: int
+    data_size: int
+    timestamp: int
+
+    @property
+    def data_offset(self) -> int:
+        return self.offset + TAG_HEADER_SIZE
+
+    @property
+    def end(self) -> int:
+        """
+        标签结束位置（包含其后的PreviousTagSize）
+        """
+        return self.offset + TAG_HEADER_SIZE + self.data_size + PREVIOUS_TAG_SIZE
+
+
+class FLVReader:
+    """
+    基于mmap的FLV标签读取类
+
+    通过内存映射逐个解析标签头，不把文件读入内存，标签数据以memoryview方式按需访问，
+    可以用接近磁盘读取的速度遍历数GB的录制文件。
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        """
+        打开FLV文件
+
+        Args:
+            path: FLV文件路径
+            writable: 是否以可写方式映射（用于原地修复时间戳）
+
+        Raises:
+            FLVError: 文件不是有效的FLV文件
+        """
+        self.path = path
+        self.file_size = os.path.getsize(path)
+        if self.file_size < FLV_HEADER_SIZE + PREVIOUS_TAG_SIZE:
+            raise FLVError(f"文件过小，不是有效的FLV文件: {path}")
+
+        self._file = open(path, "r+b" if writable else "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.view = memoryview(self._mmap)
+
+        signature, version, flags, data_offset = struct.unpack_from(">3sBBI", self._mmap, 0)
+        if signature != b"FLV":
+            self.close()
+            raise FLVError(f"文件头不是FLV: {path}")
+
+        self.header = {
+            "version": version,
+            "has_audio": bool(flags & 0x04),
+            "has_video": bool(flags & 0x01),
+            "data_offset": data_offset
+        }
+        # 遍历结束后记录最后一个完整标签的结束位置和遇到的错误
+        self.valid_end = data_offset + PREVIOUS_TAG_SIZE
+        self.error: Optional[str] = None
+
+    def close(self):
+        """
+        关闭文件映射
+        """
+        self.view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 仍有标签数据的memoryview未释放，映射随其回收时关闭
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def tags(self, start: Optional[int] = None, check_previous_size: bool = True) -> Iterator[FLVTag]:
+        """
+        逐个遍历标签，遇到不完整或损坏的标签时停止，并记录valid_end和error
+
+        Args:
+            start: 开始位置（标签头位置），默认从第一个标签开始
+            check_previous_size: 是否校验每个标签后的PreviousTagSize
+
+        Yields:
+            FLVTag: 标签
+        """
+        mm = self._mmap
+        size = self.file_size
+        offset = start if start is not None else self.header["data_offset"] + PREVIOUS_TAG_SIZE
+        unpack_header = _TAG_HEADER.unpack_from
+        unpack_ui32 = _UI32.unpack_from
+        self.error = None
+
+        while offset + TAG_HEADER_SIZE <= size:
+            type_and_size, timestamp_raw = unpack_header(mm, offset)
+            tag_type = (type_and_size >> 24) & 0x1F
+            data_size = type_and_size & 0xFFFFFF
+            # 扩展时间戳是时间戳的高8位
+            timestamp = (timestamp_raw >> 8) | ((timestamp_raw & 0xFF) << 24)
+
+            if tag_type not in (TAG_AUDIO, TAG_VIDEO, TAG_SCRIPT) or data_size > MAX_TAG_DATA_SIZE:
+                self.error = f"位置 {offset} 的标签头无效（类型 {tag_type}，大小 {data_size}）"
+                break
+
+            end = offset + TAG_HEADER_SIZE + data_size + PREVIOUS_TAG_SIZE
+            if end > size:
+                self.error = f"位置 {offset} 的标签不完整（文件被截断）"
+                break
+
+            if check_previous_size and unpack_ui32(mm, end - PREVIOUS_TAG_SIZE)[0] != TAG_HEADER_SIZE + data_size:
+                self.error = f"位置 {offset} 的标签长度校验失败"
+                break
+
+            self.valid_end = end
+            yield FLVTag(offset, tag_type, data_size, timestamp)
+            offset = end
+
+        if offset < size and self.error is None:
+            self.error = f"位置 {offset} 之后有 {size - offset} 字节不完整数据"
+
+    def tag_end(self, offset: int) -> Optional[int]:
+        """
+        校验指定位置是否为完整的标签（标签头合法且PreviousTagSize匹配）
+
+        Args:
+            offset: 标签头位置
+
+        Returns:
+            Optional[int]: 标签结束位置，不是有效标签返回None
+        """
+        if offset < 0 or offset + TAG_HEADER_SIZE > self.file_size:
+            return None
+        type_and_size = _UI32.unpack_from(self._mmap, offset)[0]
+        tag_type = (type_and_size >> 24) & 0x1F
+        data_size = type_and_size & 0xFFFFFF
+        if tag_type not in (TAG_AUDIO, TAG_VIDEO, TAG_SCRIPT) or data_size > MAX_TAG_DATA_SIZE:
+            return None
+        end = offset + TAG_HEADER_SIZE + data_size + PREVIOUS_TAG_SIZE
+        if end > self.file_size or _UI32.unpack_from(self._mmap, end - PREVIOUS_TAG_SIZE)[0] != TAG_HEADER_SIZE + data_size:
+            return None
+        return end
+
+    def find_next_tag(self, start: int) -> Optional[int]:
+        """
+        从指定位置向后查找下一个有效标签（用于判断损坏之后是否还有有效数据）
+
+        候选位置需要是完整的标签，并且其后紧跟另一个完整标签或正好到文件末尾，
+        避免把音视频数据中偶然吻合的字节当作标签。
+
+        Args:
+            start: 开始查找的位置
+
+        Returns:
+            Optional[int]: 标签头位置，没有找到返回None
+        """
+        mm = self._mmap
+        positions = {tag_type: mm.find(bytes((tag_type,)), start) for tag_type in (TAG_AUDIO, TAG_VIDEO, TAG_SCRIPT)}
+        while True:
+            tag_type, offset = min(positions.items(), key=lambda item: item[1] if item[1] >= 0 else self.file_size)
+            if offset < 0:
+                return None
+            end = self.tag_end(offset)
+            if end is not None and (end == self.file_size or self.tag_end(end) is not None):
+                return offset
+            positions[tag_type] = mm.find(bytes((tag_type,)), offset + 1)
+
+    def tag_data(self, tag: FLVTag) -> memoryview:
+        """
+        获取标签数据（不复制）
+        """
+        return self.view[tag.data_offset:tag.data_offset + tag.data_size]
+
+    def first_byte(self, tag: FLVTag) -> int:
+        """
+        获取标签数据的第一个字节（音视频编码信息），空标签返回0
+        """
+        return self._mmap[tag.data_offset] if tag.data_size else 0
+
+    def is_keyframe(self, tag: FLVTag) -> bool:
+        """
+        判断视频标签是否为关键帧
+        """
+        return tag.tag_type == TAG_VIDEO and (self.first_byte(tag) >> 4) & 0x07 == FRAME_KEY
+
+    def is_sequence_header(self, tag: FLVTag) -> bool:
+        """
+        判断标签是否为音视频序列头（AVC/HEVC解码配置或AAC AudioSpecificConfig）
+        """
+        if tag.data_size < 2:
+            return False
+        first = self._mmap[tag.data_offset]
+        if tag.tag_type == TAG_VIDEO:
+            if first & 0x80:
+                # Enhanced RTMP扩展视频标签头，低4位为包类型，0为序列头
+                return first & 0x0F == 0
+            return first & 0x0F in (7, 12) and self._mmap[tag.data_offset + 1] == 0
+        if tag.tag_type == TAG_AUDIO:
+            return first >> 4 == 10 and self._mmap[tag.data_offset + 1] == 0
+        return False
+
+    def write_timestamp(self, tag: FLVTag, timestamp: int):
+        """
+        原地修改标签时间戳（需以可写方式打开）
+        """
+        timestamp &= 0xFFFFFFFF
+        offset = tag.offset + 4
+        self._mmap[offset:offset + 4] = bytes((
+            (timestamp >> 16) & 0xFF,
+            (timestamp >> 8) & 0xFF,
+            timestamp & 0xFF,
+            (timestamp >> 24) & 0xFF
+        ))
+
+
+def analyze_flv(path: str, max_gap: int = 1000) -> Dict[str, Any]:
+    """
+    校验FLV文件并统计音视频流信息
+
+    Args:
+        path: FLV文件路径
+        max_gap: 同一路流相邻时间戳超过该间隔（毫秒）视为时间戳跳变
+
+    Returns:
+        Dict[str, Any]: 校验结果和统计信息
+    """
+    stats = {
+        "path": path,
+        "file_size": 0,
+        "valid": False,
+        "error": None,
+        "valid_end": 0,
+        "trailing_bytes": 0,
+        "tags": 0,
+        "audio_tags": 0,
+        "video_tags": 0,
+        "script_tags": 0,
+        "keyframes": 0,
+        "audio_bytes": 0,
+        "video_bytes": 0,
+        "video_codec": None,
+        "audio_format": None,
+        "first_timestamp": None,
+        "last_timestamp": None,
+        "duration": 0.0,
+        "max_keyframe_interval": 0,
+        "timestamp_jumps": 0,
+        "timestamp_backwards": 0
+    }
+
+    try:
+        reader = FLVReader(path)
+    except (FLVError, OSError) as e:
+        stats["error"] = str(e)
+        return stats
+
+    with reader:
+        stats["file_size"] = reader.file_size
+        stats.update(reader.header)
+        last = {TAG_AUDIO: None, TAG_VIDEO: None}
+        last_keyframe = None
+        first_timestamp = None
+        last_timestamp = None
+
+        for tag in reader.tags():
+            stats["tags"] += 1
+            tag_type = tag.tag_type
+            if tag_type == TAG_SCRIPT:
+                stats["script_tags"] += 1
+                continue
+
+            timestamp = tag.timestamp
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            last_timestamp = timestamp if last_timestamp is None else max(last_timestamp, timestamp)
+
+            previous = last[tag_type]
+            if previous is not None:
+                if timestamp < previous:
+                    stats["timestamp_backwards"] += 1
+                elif timestamp - previous > max_gap:
+                    stats["timestamp_jumps"] += 1
+            last[tag_type] = timestamp
+
+            first = reader.first_byte(tag)
+            if tag_type == TAG_VIDEO:
+                stats["video_tags"] += 1
+                stats["video_bytes"] += tag.data_size
+                if stats["video_codec"] is None and tag.data_size:
+                    stats["video_codec"] = first & 0x0F if not first & 0x80 else "enhanced"
+                if (first >> 4) & 0x07 == FRAME_KEY:
+                    stats["keyframes"] += 1
+                    if last_keyframe is not None:
+                        stats["max_keyframe_interval"] = max(stats["max_keyframe_interval"], timestamp - last_keyframe)
+                    last_keyframe = timestamp
+            else:
+                stats["audio_tags"] += 1
+                stats["audio_bytes"] += tag.data_size
+                if stats["audio_format"] is None and tag.data_size:
+                    stats["audio_format"] = first >> 4
+
+        stats["error"] = reader.error
+        stats["valid_end"] = reader.valid_end
+        stats["trailing_bytes"] = reader.file_size - reader.valid_end
+
+    stats["first_timestamp"] = first_timestamp
+    stats["last_timestamp"] = last_timestamp
+    if first_timestamp is not None:
+        stats["duration"] = (last_timestamp - first_timestamp) / 1000
+    stats["valid"] = (stats["error"] is None and stats["timestamp_jumps"] == 0
+                      and stats["timestamp_backwards"] == 0)
+    return stats
+
+
+def truncate_flv(path: str) -> int:
+    """
+    截断文件末尾不完整的数据，只保留到最后一个完整标签
+
+    只在损坏位置之后再没有有效标签时截断（录制中断留下的半个标签），
+    文件中间损坏而之后仍有有效数据时不修改文件，避免丢掉损坏位置之后的全部录制内容。
+
+    Args:
+        path: FLV文件路径
+
+    Returns:
+        int: 截掉的字节数
+
+    Raises:
+        FLVError: 文件不是有效的FLV文件，或文件中间损坏
+    """
+    with FLVReader(path) as reader:
+        for _ in reader.tags():
+            pass
+        valid_end = reader.valid_end
+        file_size = reader.file_size
+        error = reader.error
+        resync = reader.find_next_tag(valid_end + 1) if valid_end < file_size else None
+
+    if valid_end >= file_size:
+        return 0
+    if resync is not None:
+        raise FLVError(f"{error}，但位置 {resync} 之后仍有有效标签，文件中间损坏，不截断: {path}")
+
+    os.truncate(path, valid_end)
+    return file_size - valid_end
+
+
+def repair_timestamps(path: str, output_file: Optional[str] = None, max_gap: int = 1000,
+                      rebase: bool = True) -> Dict[str, Any]:
+    """
+    修复时间戳跳变（断流重连后时间戳归零或突然跳跃）
+
+    按音频、视频分别跟踪时间戳，同一路流出现回退或超过max_gap的跳跃时，
+    调整全局偏移量使其紧接上一帧（间隔取该路流上一次的正常间隔），
+    音视频共用同一偏移量，保持两路流的相对同步。只修改标签头中的时间戳字节，
+    文件大小不变，可以原地修复。
+
+    Args:
+        path: FLV文件路径
+        output_file: 输出文件路径，默认原地修复
+        max_gap: 同一路流相邻时间戳允许的最大间隔（毫秒）
+        rebase: 是否把第一个音视频标签的时间戳调整为0
+
+    Returns:
+        Dict[str, Any]: 修复结果（修正的跳变次数、修改的标签数）
+
+    Raises:
+        FLVError: 文件不是有效的FLV文件
+    """
+    if output_file and os.path.abspath(output_file) != os.path.abspath(path):
+        shutil.copyfile(path, output_file)
+        path = output_file
+
+    result = {"path": path, "discontinuities": 0, "rewritten_tags": 0}
+    default_delta = {TAG_AUDIO: 23, TAG_VIDEO: 33}
+
+    with FLVReader(path, writable=True) as reader:
+        offset = 0
+        last: Dict[int, Optional[int]] = {TAG_AUDIO: None, TAG_VIDEO: None}
+        delta = dict(default_delta)
+
+        for tag in reader.tags():
+            if tag.tag_type == TAG_SCRIPT:
+                continue
+
+            if last[TAG_AUDIO] is None and last[TAG_VIDEO] is None and rebase:
+                offset = -tag.timestamp
+
+            timestamp = tag.timestamp + offset
+            previous = last[tag.tag_type]
+            if previous is not None:
+                gap = timestamp - previous
+                if gap < 0 or gap > max_gap:
+                    offset += previous + delta[tag.tag_type] - timestamp
+                    timestamp = previous + delta[tag.tag_type]
+                    result["discontinuities"] += 1
+                elif gap > 0:
+                    delta[tag.tag_type] = gap
+            elif last[TAG_AUDIO if tag.tag_type == TAG_VIDEO else TAG_VIDEO] is not None:
+                # 另一路流已开始时，新出现的流不早于其最后的时间戳太多
+                other = last[TAG_AUDIO if tag.tag_type == TAG_VIDEO else TAG_VIDEO]
+                if abs(timestamp - other) > max_gap:
+                    offset += other - timestamp
+                    timestamp = other
+                    result["discontinuities"] += 1
+
+            if timestamp != tag.timestamp:
+                reader.write_timestamp(tag, timestamp)
+                result["rewritten_tags"] += 1
+            last[tag.tag_type] = timestamp
+
+        result["error"] = reader.error
+
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    FLV检查与修复命令行工具
+
+    用法:
+        python -m src.processor.flv info record.flv
+        python -m src.processor.flv repair record.flv --max-gap 1000
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.processor.flv", description="FLV检查与修复工具")
+    subparsers = parser.add_subparsers(dest="command")
+
+    info_parser = subparsers.add_parser("info", help="校验文件并输出音视频流统计")
+    info_parser.add_argument("files", nargs="+", help="FLV文件")
+    info_parser.add_argument("--max-gap", type=int, default=1000, help="时间戳跳变阈值（毫秒）")
+
+    repair_parser = subparsers.add_parser("repair", help="截断不完整的末尾标签并修复时间戳跳变")
+    repair_parser.add_argument("files", nargs="+", help="FLV文件")
+    repair_parser.add_argument("--max-gap", type=int, default=1000, help="时间戳跳变阈值（毫秒）")
+    repair_parser.add_argument("--no-truncate", action="store_true", help="不截断末尾数据")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        status = 0
+        for path in args.files:
+            stats = analyze_flv(path, args.max_gap)
+            print(f"{path}: {'正常' if stats['valid'] else '异常'}")
+            for key, value in stats.items():
+                if key != "path":
+                    print(f"  {key}: {value}")
+            if not stats["valid"]:
+                status = 1
+        return status
+
+    if args.command == "repair":
+        for path in args.files:
+            try:
+                removed = 0 if args.no_truncate else truncate_flv(path)
+                result = repair_timestamps(path, max_gap=args.max_gap)
+            except (FLVError, OSError) as e:
+                print(f"{path}: 修复失败: {e}")
+                return 1
+            print(f"{path}: 截断 {removed} 字节，修复时间戳跳变 {result['discontinuities']} 处，"
+                  f"修改 {result['rewritten_tags']} 个标签")
+        return 0
+
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,602 @@
+import os
+import json
+import time
+import heapq
+import uuid
+import threading
+import logging
+from typing import Dict, Any, Optional, Callable, List
+from src.config.config import config_manager
+from src.config.schema import Field, BOOL, STR, INT, POSITIVE_INT, WATERMARK_SCHEMA
+from src.utils.metrics import JOB_DURATION
+from src.utils.tracing import tracer
+from src.processor.converter import VideoConverter
+from src.processor.watermark import WatermarkAdder
+from src.processor.profiles import select_profile
+from src.processor.parallel import parallel_job_cost, parallel_workers_for
+from src.processor.clip import extract_clip
+from src.processor.thumbnails import ThumbnailGenerator
+
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# 路径参数：由调用方解析为房间录制目录内的文件（输入文件须存在，输出文件所在目录须存在）
+INPUT_PATH = Field((str,))
+OUTPUT_PATH = Field((str,))
+RATIO = Field((int, float), minimum=0, maximum=1)
+
+# 允许通过Web接口提交的任务类型及其参数，input_file为必填参数
+API_JOB_PARAMS: Dict[str, Dict[str, Field]] = {
+    "convert": {
+        "input_file": INPUT_PATH,
+        "output_file": OUTPUT_PATH,
+        "delete_original": BOOL
+    },
+    "watermark": {
+        "input_file": INPUT_PATH,
+        "output_file": OUTPUT_PATH,
+        "watermark_text": STR,
+        "font_size": POSITIVE_INT,
+        "font_color": STR,
+        "position": WATERMARK_SCHEMA["position"],
+        "margin": INT,
+        "opacity": RATIO,
+        "box": BOOL,
+        "box_color": STR,
+        "box_opacity": RATIO,
+        "mode": WATERMARK_SCHEMA["mode"],
+        "delete_original": BOOL,
+        "profile": STR
+    },
+    "thumbnails": {
+        "input_file": INPUT_PATH,
+        "force": BOOL
+    }
+}
+PRIORITY = Field((int,), minimum=0, maximum=10)
+MAX_RETRIES = Field((int,), minimum=0, maximum=5)
+
+
+def check_job_request(job_type: Any, params: Any, priority: Any = 5, max_retries: Any = 2) -> List[str]:
+    """
+    检查通过Web接口提交的任务（类型、参数名和取值、优先级、重试次数），不检查路径是否存在
+
+    Args:
+        job_type: 任务类型
+        params: 任务参数
+        priority: 优先级
+        max_retries: 最大重试次数
+
+    Returns:
+        List[str]: 错误说明列表，有效时为空
+    """
+    schema = API_JOB_PARAMS.get(job_type) if isinstance(job_type, str) else None
+    if schema is None:
+        return [f"不支持的任务类型: {job_type!r}（支持 {'/'.join(API_JOB_PARAMS)}）"]
+    if not isinstance(params, dict):
+        return ["params应为字典"]
+
+    errors = []
+    if not params.get("input_file"):
+        errors.append("params.input_file: 缺少输入文件")
+    for key, value in params.items():
+        field = schema.get(key)
+        error = f"未知参数（支持 {'/'.join(schema)}）" if field is None else field.check(value)
+        if error:
+            errors.append(f"params.{key}: {error}")
+    for name, value, field in (("priority", priority, PRIORITY), ("max_retries", max_retries, MAX_RETRIES)):
+        error = "不能为空" if value is None else field.check(value)
+        if error:
+            errors.append(f"{name}: {error}")
+    return errors
+
+
+class JobQueue:
+    """
+    视频处理任务队列
+
+    持久化的优先级任务队列，工作线程数按CPU核心数确定，
+    同时按任务的CPU开销和正在进行的录制数量限制并发，避免CPU超额订阅。
+    """
+
+    def __init__(self):
+        """
+        初始化任务队列
+        """
+        self.logger = logging.getLogger("JobQueue")
+        self.is_running = False
+
+        self.state_file = ""
+        self.max_pending = 1000
+        self.history_limit = 200
+        self.retry_delay = 30
+        self.reserved_cores_per_recording = 1
+        self.total_cores = os.cpu_count() or 1
+
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[tuple] = []
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._seq = 0
+        self._running_cost = 0
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._recording_count: Callable[[], int] = lambda: 0
+
+    def register_handler(self, job_type: str, handler: Callable[[Dict[str, Any], Dict[str, Any]], bool], cost=1):
+        """
+        注册任务处理函数
+
+        Args:
+            job_type: 任务类型
+            handler: 处理函数，参数为(任务参数, 执行上下文)，成功返回True
+            cost: 任务占用的CPU核心数，编码类任务应大于1；可以是以任务参数计算核心数的函数，在调度时求值
+        """
+        self._handlers[job_type] = {"handler": handler, "cost": cost}
+
+    def _cost(self, job: Dict[str, Any], capacity: int) -> int:
+        """
+        计算任务占用的CPU核心数，不超过当前容量
+        """
+        cost = self._handlers[job["type"]]["cost"]
+        if callable(cost):
+            cost = cost(job["params"])
+        return min(max(1, int(cost)), capacity)
+
+    def set_recording_count_provider(self, provider: Callable[[], int]):
+        """
+        设置正在进行的录制数量查询函数，用于为录制预留CPU
+
+        Args:
+            provider: 返回当前录制数量的函数
+        """
+        self._recording_count = provider
+
+    def start(self):
+        """
+        加载持久化的任务并启动工作线程
+        """
+        with self._cond:
+            if self.is_running:
+                return
+
+            data_dir = config_manager.get("system.data_dir", "/opt/2233recorder/data")
+            self.state_file = config_manager.get("processor.queue.state_file", os.path.join(data_dir, "jobs.json"))
+            self.max_pending = config_manager.get("processor.queue.max_pending", self.max_pending)
+            self.history_limit = config_manager.get("processor.queue.history_limit", self.history_limit)
+            self.retry_delay = config_manager.get("processor.queue.retry_delay", self.retry_delay)
+            self.reserved_cores_per_recording = config_manager.get(
+                "processor.queue.reserved_cores_per_recording", self.reserved_cores_per_recording
+            )
+            workers = config_manager.get("processor.queue.workers", 0) or self.total_cores
+
+            self._load()
+            self._heap = []
+            for job_id, job in self._jobs.items():
+                if job["status"] == JOB_PENDING:
+                    self._push(job_id)
+            self.is_running = True
+
+            for i in range(workers):
+                thread = threading.Thread(target=self._worker, name=f"JobWorker-{i}", daemon=True)
+                self._workers.append(thread)
+                thread.start()
+
+        self.logger.info(f"任务队列已启动，工作线程数: {workers}")
+
+    def stop(self):
+        """
+        停止工作线程，正在执行的任务会被取消并在下次启动时重新执行
+        """
+        with self._cond:
+            if not self.is_running:
+                return
+            self.is_running = False
+            for event in self._cancel_events.values():
+                event.set()
+            self._cond.notify_all()
+
+        for thread in self._workers:
+            thread.join(timeout=15)
+        self._workers.clear()
+
+        with self._cond:
+            self._save()
+
+        self.logger.info("任务队列已停止")
+
+    def submit(self, job_type: str, params: Dict[str, Any], priority: int = 5, max_retries: int = 2) -> Optional[str]:
+        """
+        提交任务
+
+        Args:
+            job_type: 任务类型
+            params: 任务参数
+            priority: 优先级，数值越小越先执行
+            max_retries: 失败后的最大重试次数
+
+        Returns:
+            Optional[str]: 任务ID，任务类型不支持或队列已满返回None
+        """
+        if job_type not in self._handlers:
+            self.logger.error(f"不支持的任务类型: {job_type}")
+            return None
+
+        with self._cond:
+            pending = sum(1 for job in self._jobs.values() if job["status"] == JOB_PENDING)
+            if pending >= self.max_pending:
+                self.logger.error(f"任务队列已满（{pending}），拒绝任务: {job_type}")
+                return None
+
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                "id": job_id,
+                "type": job_type,
+                "params": params,
+                "priority": int(priority),
+                "status": JOB_PENDING,
+                "attempts": 0,
+                "max_retries": int(max_retries),
+                "error": None,
+                "progress": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "not_before": 0
+            }
+            self._push(job_id)
+            self._save()
+            self._cond.notify_all()
+
+        self.logger.info(f"已提交任务 {job_id}: {job_type}")
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务，正在执行的任务会终止对应的FFmpeg进程
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 取消成功返回True，任务不存在或已结束返回False
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] in FINISHED_STATES:
+                return False
+
+            if job["status"] == JOB_PENDING:
+                job["status"] = JOB_CANCELLED
+                job["finished_at"] = time.time()
+                self._save()
+            else:
+                event = self._cancel_events.get(job_id)
+                if event:
+                    event.set()
+
+        self.logger.info(f"已取消任务 {job_id}")
+        return True
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务信息
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务信息副本，不存在返回None
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取任务列表
+
+        Args:
+            status: 按状态过滤，None表示全部
+
+        Returns:
+            List[Dict[str, Any]]: 按创建时间倒序的任务列表
+        """
+        with self._cond:
+            jobs = [dict(job) for job in self._jobs.values() if status is None or job["status"] == status]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def get_queue_status(self) -> Dict[str, Any]:
+        """
+        获取队列状态
+
+        Returns:
+            Dict[str, Any]: 队列状态信息
+        """
+        with self._cond:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {
+                "is_running": self.is_running,
+                "workers": len(self._workers),
+                "capacity": self._capacity(),
+                "running_cost": self._running_cost,
+                "jobs": counts
+            }
+
+    def _capacity(self) -> int:
+        """
+        计算当前可用于处理任务的CPU核心数，为正在进行的录制预留核心
+        """
+        try:
+            recordings = int(self._recording_count())
+        except Exception:
+            recordings = 0
+        return max(1, self.total_cores - recordings * self.reserved_cores_per_recording)
+
+    def _push(self, job_id: str):
+        self._seq += 1
+        job = self._jobs[job_id]
+        heapq.heappush(self._heap, (job["priority"], self._seq, job_id))
+
+    def _next_job(self) -> Optional[str]:
+        """
+        取出下一个可以执行的任务（需持有锁）
+        """
+        capacity = self._capacity()
+        now = time.time()
+        deferred = []
+        job_id = None
+
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            job = self._jobs.get(entry[2])
+            if not job or job["status"] != JOB_PENDING:
+                continue
+            if job["not_before"] > now:
+                deferred.append(entry)
+                continue
+
+            cost = self._cost(job, capacity)
+            # 至少允许一个任务运行，否则开销大于剩余容量时不启动
+            if self._running_cost and self._running_cost + cost > capacity:
+                deferred.append(entry)
+                break
+
+            job_id = entry[2]
+            break
+
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return job_id
+
+    def _next_wait(self) -> float:
+        """
+        计算工作线程下一次检查的等待时间（需持有锁）
+        """
+        now = time.time()
+        wait = 5.0
+        for job in self._jobs.values():
+            if job["status"] == JOB_PENDING and job["not_before"] > now:
+                wait = min(wait, job["not_before"] - now)
+        return max(wait, 0.1)
+
+    def _worker(self):
+        """
+        工作线程主循环
+        """
+        while True:
+            with self._cond:
+                job_id = None
+                while self.is_running:
+                    job_id = self._next_job()
+                    if job_id:
+                        break
+                    self._cond.wait(self._next_wait())
+                if not self.is_running:
+                    return
+
+                job = self._jobs[job_id]
+                handler_info = self._handlers[job["type"]]
+                cost = self._cost(job, self._capacity())
+                cancel_event = threading.Event()
+
+                job["status"] = JOB_RUNNING
+                job["attempts"] += 1
+                job["started_at"] = time.time()
+                job["error"] = None
+                job["progress"] = None
+                self._cancel_events[job_id] = cancel_event
+                self._running_cost += cost
+                self._save()
+
+            context = {
+                "job_id": job_id,
+                "cancel_event": cancel_event,
+                "threads": cost,
+                "report_progress": lambda progress: self._report_progress(job_id, progress)
+            }
+
+            self.logger.info(f"开始执行任务 {job_id}: {job['type']}（第 {job['attempts']} 次）")
+            try:
+                with tracer.span(f"job.{job['type']}", job_id=job_id, attempt=job["attempts"]):
+                    success = bool(handler_info["handler"](job["params"], context))
+                error = None if success else "处理失败"
+            except Exception as e:
+                success = False
+                error = str(e)
+                self.logger.error(f"任务 {job_id} 执行出错: {e}")
+
+            with self._cond:
+                self._running_cost -= cost
+                self._cancel_events.pop(job_id, None)
+                job["finished_at"] = time.time()
+                JOB_DURATION.labels(job["type"], "success" if success else "failure").observe(
+                    job["finished_at"] - job["started_at"])
+
+                if success:
+                    job["status"] = JOB_DONE
+                    self.logger.info(f"任务 {job_id} 执行成功")
+                elif cancel_event.is_set():
+                    if self.is_running:
+                        job["status"] = JOB_CANCELLED
+                        self.logger.info(f"任务 {job_id} 已取消")
+                    else:
+                        # 服务停止导致的中断，下次启动时重新执行
+                        job["status"] = JOB_PENDING
+                        job["attempts"] -= 1
+                elif job["attempts"] <= job["max_retries"]:
+                    job["status"] = JOB_PENDING
+                    job["error"] = error
+                    job["not_before"] = time.time() + self.retry_delay * job["attempts"]
+                    self._push(job_id)
+                    self.logger.warning(f"任务 {job_id} 失败，将在 {self.retry_delay * job['attempts']} 秒后重试")
+                else:
+                    job["status"] = JOB_FAILED
+                    job["error"] = error
+                    self.logger.error(f"任务 {job_id} 失败，已达最大重试次数")
+
+                self._trim_history()
+                self._save()
+                self._cond.notify_all()
+
+    def _report_progress(self, job_id: str, progress: Dict[str, Any]):
+        """
+        记录正在执行任务的进度，进度更新频繁，只更新内存不单独写入状态文件
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job and job["status"] == JOB_RUNNING:
+                job["progress"] = progress
+
+    def _trim_history(self):
+        """
+        只保留最近的若干条已结束任务（需持有锁）
+        """
+        finished = [job for job in self._jobs.values() if job["status"] in FINISHED_STATES]
+        if len(finished) <= self.history_limit:
+            return
+        finished.sort(key=lambda job: job["finished_at"] or 0)
+        for job in finished[:len(finished) - self.history_limit]:
+            del self._jobs[job["id"]]
+
+    def _load(self):
+        """
+        从状态文件恢复任务，未完成的任务重新排队（需持有锁）
+        """
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                jobs = json.load(f)
+        except Exception as e:
+            self.logger.error(f"加载任务状态文件失败: {e}")
+            return
+
+        for job in jobs:
+            if job.get("type") not in self._handlers or job["id"] in self._jobs:
+                continue
+            if job["status"] == JOB_RUNNING:
+                job["status"] = JOB_PENDING
+            self._jobs[job["id"]] = job
+
+        self.logger.info(f"已恢复 {len(self._jobs)} 个任务")
+
+    def _save(self):
+        """
+        将任务状态写入状态文件（需持有锁）
+        """
+        if not self.state_file:
+            return
+
+        try:
+            state_dir = os.path.dirname(self.state_file)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(list(self._jobs.values()), f, ensure_ascii=False)
+            os.replace(temp_file, self.state_file)
+        except Exception as e:
+            self.logger.error(f"保存任务状态文件失败: {e}")
+
+
+def _convert_handler(params: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    """
+    FLV转MP4任务
+    """
+    converter = VideoConverter(config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg"))
+    return converter.convert_flv_to_mp4(
+        params["input_file"],
+        params.get("output_file"),
+        params.get("delete_original", False),
+        cancel_event=context["cancel_event"],
+        progress_callback=context.get("report_progress")
+    )
+
+
+def _watermark_handler(params: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    """
+    添加水印任务
+    """
+    watermark_adder = WatermarkAdder(config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg"))
+    options = dict(params)
+    input_file = options.pop("input_file")
+    profile_name = options.pop("profile", None)
+    return watermark_adder.add_text_watermark(
+        input_file,
+        threads=context["threads"],
+        cancel_event=context["cancel_event"],
+        encoder_profile=select_profile({"profile": profile_name}),
+        progress_callback=context.get("report_progress"),
+        parallel_workers=parallel_workers_for(context["threads"]),
+        **options
+    )
+
+
+def _clip_handler(params: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    """
+    剪辑导出任务
+    """
+    extract_clip(
+        params["input_files"],
+        params["start"],
+        params.get("end"),
+        params["output_file"],
+        cancel_event=context["cancel_event"],
+        ffmpeg_path=config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg")
+    )
+    return True
+
+
+def _thumbnails_handler(params: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    """
+    缩略图生成任务
+    """
+    generator = ThumbnailGenerator(config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg"))
+    return generator.generate(
+        params["input_file"],
+        force=params.get("force", False),
+        cancel_event=context["cancel_event"]
+    ) is not None
+
+
+# 全局任务队列实例
+job_queue = JobQueue()
+job_queue.register_handler("convert", _convert_handler, cost=1)
+job_queue.register_handler(
+    "watermark",
+    _watermark_handler,
+    cost=lambda params: parallel_job_cost(config_manager.get("processor.queue.encode_threads", 4))
+)
+job_queue.register_handler("clip", _clip_handler, cost=1)
+job_queue.register_handler("thumbnails", _thumbnails_handler, cost=1)
@@ -0,0 +1,599 @@
+import os
+import io
+import sys
+import json
+import shutil
+import struct
+import bisect
+import argparse
+from array import array
+from typing import Dict, Any, Optional, List, Tuple
+from src.processor.flv import (
+    FLVReader, FLVError, TAG_AUDIO, TAG_VIDEO, TAG_SCRIPT, TAG_HEADER_SIZE, PREVIOUS_TAG_SIZE
+)
+
+
+INDEX_MAGIC = b"KFIX"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".kfindex"
+
+
+class KeyframeIndex:
+    """
+    FLV关键帧索引
+
+    用两个紧凑数组分别保存关键帧时间戳（毫秒）和关键帧标签在文件中的偏移，
+    同时记录音视频序列头和onMetaData标签的位置，用于按时间直接定位到文件偏移，
+    供剪辑导出、缩略图定位和onMetaData关键帧表注入使用。
+    """
+
+    def __init__(self, path: str):
+        """
+        初始化空索引
+
+        Args:
+            path: FLV文件路径
+        """
+        self.path = path
+        self.times = array("q")
+        self.offsets = array("q")
+        # 建立索引时文件的大小和修改时间，用于判断索引是否过期
+        self.file_size = 0
+        self.mtime = 0.0
+        # 已扫描到的位置（最后一个完整标签的结束位置），文件增长后从这里继续扫描
+        self.scanned_end = 0
+        self.first_timestamp: Optional[int] = None
+        self.last_timestamp: Optional[int] = None
+        self.metadata_offset: Optional[int] = None
+        # onMetaData标签的结束位置，用于判断onMetaData是否被改写成不同大小
+        self.metadata_end: Optional[int] = None
+        self.video_header_offset: Optional[int] = None
+        self.audio_header_offset: Optional[int] = None
+        self.data_offset = 0
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def duration(self) -> float:
+        """
+        时长（秒）
+        """
+        if self.first_timestamp is None:
+            return 0.0
+        return (self.last_timestamp - self.first_timestamp) / 1000
+
+    def update(self) -> "KeyframeIndex":
+        """
+        从上次扫描结束的位置继续扫描（文件仍在写入时只扫描新增部分）
+
+        Returns:
+            KeyframeIndex: 索引自身
+
+        Raises:
+            FLVError: 文件不是有效的FLV文件
+        """
+        stat = os.stat(self.path)
+        with FLVReader(self.path) as reader:
+            self.data_offset = reader.header["data_offset"] + PREVIOUS_TAG_SIZE
+            start = self.scanned_end if self.scanned_end > self.data_offset else None
+
+            for tag in reader.tags(start=start):
+                tag_type = tag.tag_type
+                if tag_type == TAG_SCRIPT:
+                    if self.metadata_offset is None and not self.times:
+                        self.metadata_offset = tag.offset
+                        self.metadata_end = tag.end
+                    continue
+
+                if reader.is_sequence_header(tag):
+                    if tag_type == TAG_VIDEO and self.video_header_offset is None:
+                        self.video_header_offset = tag.offset
+                    elif tag_type == TAG_AUDIO and self.audio_header_offset is None:
+                        self.audio_header_offset = tag.offset
+                    continue
+
+                timestamp = tag.timestamp
+                if self.first_timestamp is None:
+                    self.first_timestamp = timestamp
+                if self.last_timestamp is None or timestamp > self.last_timestamp:
+                    self.last_timestamp = timestamp
+                if tag_type == TAG_VIDEO and reader.is_keyframe(tag):
+                    self.times.append(timestamp)
+                    self.offsets.append(tag.offset)
+
+            self.scanned_end = reader.valid_end
+
+        self.file_size = stat.st_size
+        self.mtime = stat.st_mtime
+        return self
+
+    def is_stale(self) -> bool:
+        """
+        判断文件在建立索引后是否发生变化
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return stat.st_size != self.file_size or stat.st_mtime != self.mtime
+
+    def is_prefix_intact(self) -> bool:
+        """
+        判断已索引的部分是否保持不变（文件只是在末尾追加了数据）
+
+        文件变大不一定是追加写入（如onMetaData放不下时重写整个文件，所有标签后移），
+        检查onMetaData标签的位置和大小，以及第一个和最后一个关键帧是否仍在原位置。
+
+        Returns:
+            bool: 已索引部分未变返回True，需要重新建立索引返回False
+        """
+        keyframes = [(self.offsets[0], self.times[0]), (self.offsets[-1], self.times[-1])] if self.times else []
+        try:
+            with FLVReader(self.path) as reader:
+                if reader.header["data_offset"] + PREVIOUS_TAG_SIZE != self.data_offset:
+                    return False
+                if self.metadata_offset is not None:
+                    tag = next(reader.tags(start=self.metadata_offset), None)
+                    if tag is None or tag.tag_type != TAG_SCRIPT or \
+                            (self.metadata_end is not None and tag.end != self.metadata_end):
+                        return False
+                for offset, timestamp in keyframes:
+                    tag = next(reader.tags(start=offset), None)
+                    if tag is None or not reader.is_keyframe(tag) or tag.timestamp != timestamp:
+                        return False
+        except (FLVError, OSError):
+            return False
+        return True
+
+    def shift(self, position: int, delta: int):
+        """
+        位置之后的内容整体移动后，相应调整索引中的偏移
+
+        Args:
+            position: 移动的起始位置（该位置及之后的偏移加上delta）
+            delta: 移动的字节数
+        """
+        self.offsets = array("q", (offset + delta if offset >= position else offset for offset in self.offsets))
+        for name in ("video_header_offset", "audio_header_offset", "metadata_offset", "metadata_end"):
+            offset = getattr(self, name)
+            if offset is not None and offset >= position:
+                setattr(self, name, offset + delta)
+        if self.scanned_end >= position:
+            self.scanned_end += delta
+
+    def find(self, seconds: float) -> int:
+        """
+        查找不晚于指定时间的最后一个关键帧
+
+        Args:
+            seconds: 相对于文件开始的时间（秒）
+
+        Returns:
+            int: 关键帧序号，没有关键帧返回-1
+        """
+        if not self.times:
+            return -1
+        target = (self.first_timestamp or 0) + int(seconds * 1000)
+        return max(bisect.bisect_right(self.times, target) - 1, 0)
+
+    def byte_range(self, start: float, end: Optional[float] = None) -> Tuple[int, int, int]:
+        """
+        计算时间范围对应的字节范围，起点对齐到之前的关键帧，终点对齐到之后的关键帧
+
+        Args:
+            start: 开始时间（秒）
+            end: 结束时间（秒），None表示到文件末尾
+
+        Returns:
+            Tuple[int, int, int]: (开始偏移, 结束偏移, 起始关键帧的时间戳毫秒)
+
+        Raises:
+            FLVError: 文件中没有关键帧
+        """
+        first = self.find(start)
+        if first < 0:
+            raise FLVError(f"文件中没有关键帧: {self.path}")
+
+        end_offset = self.scanned_end
+        if end is not None:
+            target = (self.first_timestamp or 0) + int(end * 1000)
+            last = bisect.bisect_left(self.times, target)
+            if last < len(self.offsets):
+                end_offset = self.offsets[last]
+        return self.offsets[first], end_offset, self.times[first]
+
+    def save(self, index_file: Optional[str] = None) -> str:
+        """
+        保存索引文件（默认保存在录制文件旁边，扩展名为.kfindex）
+
+        Args:
+            index_file: 索引文件路径
+
+        Returns:
+            str: 索引文件路径
+        """
+        index_file = index_file or self.path + INDEX_SUFFIX
+        meta = {
+            "file_size": self.file_size,
+            "mtime": self.mtime,
+            "scanned_end": self.scanned_end,
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+            "metadata_offset": self.metadata_offset,
+            "metadata_end": self.metadata_end,
+            "video_header_offset": self.video_header_offset,
+            "audio_header_offset": self.audio_header_offset,
+            "data_offset": self.data_offset,
+            "count": len(self.times),
+            "byteorder": sys.byteorder
+        }
+        meta_bytes = json.dumps(meta).encode()
+
+        temp_file = f"{index_file}.tmp"
+        with open(temp_file, "wb") as f:
+            f.write(INDEX_MAGIC + struct.pack(">BI", INDEX_VERSION, len(meta_bytes)))
+            f.write(meta_bytes)
+            f.write(self.times.tobytes())
+            f.write(self.offsets.tobytes())
+        os.replace(temp_file, index_file)
+        return index_file
+
+    @classmethod
+    def load(cls, path: str, index_file: Optional[str] = None) -> Optional["KeyframeIndex"]:
+        """
+        加载索引文件
+
+        Args:
+            path: FLV文件路径
+            index_file: 索引文件路径，默认为录制文件旁边的.kfindex
+
+        Returns:
+            Optional[KeyframeIndex]: 索引，文件不存在或格式不正确返回None
+        """
+        index_file = index_file or path + INDEX_SUFFIX
+        try:
+            with open(index_file, "rb") as f:
+                magic = f.read(4)
+                version, meta_size = struct.unpack(">BI", f.read(5))
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    return None
+                meta = json.loads(f.read(meta_size))
+
+                index = cls(path)
+                count = meta.pop("count")
+                index.times.fromfile(f, count)
+                index.offsets.fromfile(f, count)
+                if meta.pop("byteorder", sys.byteorder) != sys.byteorder:
+                    index.times.byteswap()
+                    index.offsets.byteswap()
+        except (OSError, ValueError, EOFError, struct.error, KeyError):
+            return None
+
+        for key, value in meta.items():
+            setattr(index, key, value)
+        return index
+
+
+def build_keyframe_index(path: str) -> KeyframeIndex:
+    """
+    扫描一遍FLV文件建立关键帧索引
+
+    Args:
+        path: FLV文件路径
+
+    Returns:
+        KeyframeIndex: 关键帧索引
+
+    Raises:
+        FLVError: 文件不是有效的FLV文件
+    """
+    return KeyframeIndex(path).update()
+
+
+def load_keyframe_index(path: str, save: bool = True) -> KeyframeIndex:
+    """
+    加载关键帧索引，索引不存在时建立，文件在末尾追加数据后只扫描新增部分
+
+    Args:
+        path: FLV文件路径
+        save: 建立或更新索引后是否保存索引文件
+
+    Returns:
+        KeyframeIndex: 关键帧索引
+
+    Raises:
+        FLVError: 文件不是有效的FLV文件
+    """
+    index = KeyframeIndex.load(path)
+    if index is not None and not index.is_stale():
+        return index
+
+    if index is None or os.path.getsize(path) <= index.file_size or not index.is_prefix_intact():
+        # 文件被截断、替换、原地修改或重写，重新建立索引
+        index = KeyframeIndex(path)
+    index.update()
+
+    if save:
+        try:
+            index.save()
+        except OSError:
+            pass
+    return index
+
+
+# AMF0数据类型
+AMF_NUMBER = 0x00
+AMF_BOOLEAN = 0x01
+AMF_STRING = 0x02
+AMF_OBJECT = 0x03
+AMF_NULL = 0x05
+AMF_UNDEFINED = 0x06
+AMF_ECMA_ARRAY = 0x08
+AMF_OBJECT_END = 0x09
+AMF_STRICT_ARRAY = 0x0A
+AMF_DATE = 0x0B
+AMF_LONG_STRING = 0x0C
+
+
+def amf_decode(data: bytes, offset: int = 0) -> Tuple[Any, int]:
+    """
+    解码一个AMF0值
+
+    Args:
+        data: AMF0数据
+        offset: 开始位置
+
+    Returns:
+        Tuple[Any, int]: (值, 结束位置)
+
+    Raises:
+        FLVError: 数据格式错误
+    """
+    try:
+        marker = data[offset]
+        offset += 1
+        if marker == AMF_NUMBER:
+            return struct.unpack_from(">d", data, offset)[0], offset + 8
+        if marker == AMF_BOOLEAN:
+            return bool(data[offset]), offset + 1
+        if marker == AMF_STRING:
+            length = struct.unpack_from(">H", data, offset)[0]
+            return bytes(data[offset + 2:offset + 2 + length]).decode("utf-8", errors="replace"), offset + 2 + length
+        if marker == AMF_LONG_STRING:
+            length = struct.unpack_from(">I", data, offset)[0]
+            return bytes(data[offset + 4:offset + 4 + length]).decode("utf-8", errors="replace"), offset + 4 + length
+        if marker in (AMF_NULL, AMF_UNDEFINED):
+            return None, offset
+        if marker in (AMF_OBJECT, AMF_ECMA_ARRAY):
+            if marker == AMF_ECMA_ARRAY:
+                offset += 4  # 元素个数仅供参考，以结束标记为准
+            result = {}
+            while offset + 3 <= len(data):
+                length = struct.unpack_from(">H", data, offset)[0]
+                if length == 0 and data[offset + 2] == AMF_OBJECT_END:
+                    return result, offset + 3
+                key = bytes(data[offset + 2:offset + 2 + length]).decode("utf-8", errors="replace")
+                result[key], offset = amf_decode(data, offset + 2 + length)
+            return result, offset
+        if marker == AMF_STRICT_ARRAY:
+            count = struct.unpack_from(">I", data, offset)[0]
+            offset += 4
+            values = []
+            for _ in range(count):
+                value, offset = amf_decode(data, offset)
+                values.append(value)
+            return values, offset
+        if marker == AMF_DATE:
+            return struct.unpack_from(">d", data, offset)[0], offset + 10
+    except (IndexError, struct.error) as e:
+        raise FLVError(f"AMF0数据不完整: {e}")
+    raise FLVError(f"不支持的AMF0类型: {marker}")
+
+
+def amf_encode(value: Any, ecma_array: bool = False) -> bytes:
+    """
+    编码一个AMF0值
+
+    Args:
+        value: 值（数字、布尔、字符串、字典、列表、None）
+        ecma_array: 字典是否编码为ECMA数组（onMetaData使用）
+
+    Returns:
+        bytes: AMF0数据
+    """
+    out = io.BytesIO()
+    _amf_write(out, value, ecma_array)
+    return out.getvalue()
+
+
+def _amf_write(out: io.BytesIO, value: Any, ecma_array: bool = False):
+    if value is None:
+        out.write(bytes((AMF_NULL,)))
+    elif isinstance(value, bool):
+        out.write(bytes((AMF_BOOLEAN, 1 if value else 0)))
+    elif isinstance(value, (int, float)):
+        out.write(struct.pack(">Bd", AMF_NUMBER, float(value)))
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        if len(encoded) > 0xFFFF:
+            out.write(struct.pack(">BI", AMF_LONG_STRING, len(encoded)) + encoded)
+        else:
+            out.write(struct.pack(">BH", AMF_STRING, len(encoded)) + encoded)
+    elif isinstance(value, dict):
+        if ecma_array:
+            out.write(struct.pack(">BI", AMF_ECMA_ARRAY, len(value)))
+        else:
+            out.write(bytes((AMF_OBJECT,)))
+        for key, item in value.items():
+            encoded = str(key).encode("utf-8")
+            out.write(struct.pack(">H", len(encoded)) + encoded)
+            _amf_write(out, item)
+        out.write(b"\x00\x00" + bytes((AMF_OBJECT_END,)))
+    elif isinstance(value, (list, tuple, array)):
+        out.write(struct.pack(">BI", AMF_STRICT_ARRAY, len(value)))
+        for item in value:
+            _amf_write(out, item)
+    else:
+        raise TypeError(f"无法编码为AMF0: {type(value)}")
+
+
+def read_metadata(path: str) -> Dict[str, Any]:
+    """
+    读取文件开头的onMetaData
+
+    Args:
+        path: FLV文件路径
+
+    Returns:
+        Dict[str, Any]: onMetaData内容，没有时返回空字典
+    """
+    with FLVReader(path) as reader:
+        for tag in reader.tags():
+            if tag.tag_type != TAG_SCRIPT:
+                return {}
+            data = bytes(reader.tag_data(tag))
+            name, offset = amf_decode(data)
+            if name == "onMetaData":
+                metadata, _ = amf_decode(data, offset)
+                return metadata if isinstance(metadata, dict) else {}
+    return {}
+
+
+def _script_tag(payload: bytes) -> bytes:
+    header = bytes((TAG_SCRIPT,)) + len(payload).to_bytes(3, "big") + b"\x00" * 7
+    return header + payload + struct.pack(">I", TAG_HEADER_SIZE + len(payload))
+
+
+def inject_keyframes(path: str, index: Optional[KeyframeIndex] = None,
+                     output_file: Optional[str] = None) -> Dict[str, Any]:
+    """
+    在onMetaData中写入关键帧表（keyframes.times / keyframes.filepositions）和时长，
+    播放器和FFmpeg可以据此直接跳转，不必从头扫描
+
+    新的onMetaData不大于原标签时原地改写（用填充字段补齐长度），
+    否则重写整个文件，关键帧位置按onMetaData增大的字节数整体后移。
+    修改原文件时同步更新传入的索引（及已保存的索引文件），使其与修改后的文件一致。
+
+    Args:
+        path: FLV文件路径
+        index: 关键帧索引，默认加载或建立
+        output_file: 输出文件路径，默认修改原文件
+
+    Returns:
+        Dict[str, Any]: 结果（in_place表示是否原地改写、keyframes关键帧数）
+
+    Raises:
+        FLVError: 文件不是有效的FLV文件
+    """
+    index = index or load_keyframe_index(path, save=False)
+    old_metadata = read_metadata(path) if index.metadata_offset is not None else {}
+    old_size = 0
+    if index.metadata_offset is not None:
+        with FLVReader(path) as reader:
+            old_tag = next(reader.tags(start=index.metadata_offset), None)
+        if old_tag is None or old_tag.tag_type != TAG_SCRIPT:
+            raise FLVError(f"onMetaData标签已损坏: {path}")
+        old_size = old_tag.end - old_tag.offset
+
+    metadata = {key: value for key, value in old_metadata.items()
+                if key not in ("keyframes", "duration", "filesize", "_padding")}
+
+    def build(shift: int, padding: Optional[int] = None) -> bytes:
+        data = dict(metadata)
+        data["duration"] = index.duration
+        data["keyframes"] = {
+            "times": [t / 1000 for t in index.times],
+            "filepositions": [float(o + shift) for o in index.offsets]
+        }
+        if padding is not None:
+            data["_padding"] = " " * padding
+        return _script_tag(amf_encode("onMetaData") + amf_encode(data, ecma_array=True))
+
+    # 数字固定为8字节，标签长度与偏移的具体数值无关
+    new_size = len(build(0))
+    padding_overhead = len(build(0, padding=0)) - new_size
+
+    # 大小正好相同时不需要填充，否则填充字段至少占padding_overhead字节
+    padding = old_size - new_size - padding_overhead
+    in_place = (output_file is None or os.path.abspath(output_file) == os.path.abspath(path)) \
+        and old_size and (old_size == new_size or 0 <= padding <= 0xFFFF)
+    if in_place:
+        tag = build(0, padding=padding if old_size != new_size else None)
+        with open(path, "r+b") as f:
+            f.seek(index.metadata_offset)
+            f.write(tag)
+        _refresh_index(index)
+        return {"in_place": True, "keyframes": len(index)}
+
+    shift = new_size - old_size
+    tag = build(shift)
+    insert_at = index.metadata_offset if index.metadata_offset is not None else index.data_offset
+    target = output_file or path
+    temp_file = f"{target}.tmp"
+    with open(path, "rb") as src, open(temp_file, "wb") as dst:
+        dst.write(src.read(insert_at))
+        dst.write(tag)
+        src.seek(insert_at + old_size)
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(temp_file, target)
+
+    if target == path:
+        # 原onMetaData之后的标签整体后移
+        index.shift(insert_at + old_size, shift)
+        index.metadata_offset = insert_at
+        index.metadata_end = insert_at + len(tag)
+        _refresh_index(index)
+    return {"in_place": False, "keyframes": len(index)}
+
+
+def _refresh_index(index: KeyframeIndex):
+    """
+    文件被修改后更新索引记录的文件大小和修改时间，并覆盖已保存的索引文件
+    """
+    stat = os.stat(index.path)
+    index.file_size = stat.st_size
+    index.mtime = stat.st_mtime
+    if os.path.exists(index.path + INDEX_SUFFIX):
+        try:
+            index.save()
+        except OSError:
+            pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    关键帧索引命令行工具
+
+    用法:
+        python -m src.processor.keyframes index record.flv
+        python -m src.processor.keyframes inject record.flv
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.processor.keyframes", description="FLV关键帧索引工具")
+    subparsers = parser.add_subparsers(dest="command")
+    index_parser = subparsers.add_parser("index", help="建立并保存关键帧索引")
+    index_parser.add_argument("files", nargs="+", help="FLV文件")
+    inject_parser = subparsers.add_parser("inject", help="在onMetaData中写入关键帧表")
+    inject_parser.add_argument("files", nargs="+", help="FLV文件")
+    args = parser.parse_args(argv)
+
+    if args.command not in ("index", "inject"):
+        parser.print_help()
+        return 1
+
+    for path in args.files:
+        try:
+            index = load_keyframe_index(path)
+            if args.command == "inject":
+                result = inject_keyframes(path, index)
+                print(f"{path}: 已写入 {result['keyframes']} 个关键帧（{'原地改写' if result['in_place'] else '重写文件'}）")
+            else:
+                print(f"{path}: {len(index)} 个关键帧，时长 {index.duration:.1f} 秒")
+        except (FLVError, OSError) as e:
+            print(f"{path}: 失败: {e}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,416 @@
+import os
+import re
+import time
+import shutil
+import threading
+import subprocess
+import logging
+from typing import Dict, Any, Optional, List
+from src.config.config import config_manager
+from src.utils.events import event_bus
+from src.processor.flv import FLVReader, FLVError, TAG_HEADER_SIZE, PREVIOUS_TAG_SIZE
+from src.processor.keyframes import load_keyframe_index
+from src.processor.live_remux import LiveRemuxer
+from src.processor.clip import CLIP_DIR
+
+
+PLAYLIST_FILE = "index.m3u8"
+
+# 分片文件名（序号按时间生成，重启预览后播放器看到的序号仍然递增）
+SEGMENT_PATTERN = re.compile(r"seg_\d+\.ts")
+
+
+def get_preview_config() -> Dict[str, Any]:
+    """
+    获取直播预览配置
+
+    Returns:
+        Dict[str, Any]: 预览配置（enabled、segment_time、list_size、idle_timeout、max_sessions、start_timeout、work_dir）
+    """
+    data_dir = config_manager.get("system.data_dir", "/opt/2233recorder/data")
+    preview_config = {
+        "enabled": True,
+        "segment_time": 2,
+        "list_size": 5,
+        "idle_timeout": 30,
+        "max_sessions": 10,
+        "start_timeout": 15,
+        "work_dir": os.path.join(data_dir, "preview")
+    }
+    preview_config.update(config_manager.get("processor.preview", {}) or {})
+    return preview_config
+
+
+def find_current_recording(output_dir: str, max_age: float = 60) -> Optional[str]:
+    """
+    查找房间录制目录中正在写入的FLV文件（最新且最近修改过，跳过剪辑目录和隐藏文件）
+
+    Args:
+        output_dir: 房间录制目录
+        max_age: 最后修改时间距今不超过该时间（秒）才视为正在写入
+
+    Returns:
+        Optional[str]: 文件路径，没有正在写入的录制文件返回None
+    """
+    newest = None
+    newest_mtime = time.time() - max_age
+    for root, dirs, files in os.walk(output_dir):
+        dirs[:] = [d for d in dirs if d != CLIP_DIR and not d.startswith(".")]
+        for name in files:
+            if not name.lower().endswith(".flv") or name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if mtime > newest_mtime:
+                newest, newest_mtime = os.path.abspath(path), mtime
+    return newest
+
+
+def _read_tag(reader: FLVReader, offset: Optional[int]) -> bytes:
+    """
+    读取一个完整标签（包括标签头和后面的PreviousTagSize）
+    """
+    if offset is None:
+        return b""
+    data_size = int.from_bytes(reader.view[offset + 1:offset + 4], "big")
+    return bytes(reader.view[offset:offset + TAG_HEADER_SIZE + data_size + PREVIOUS_TAG_SIZE])
+
+
+class LivePreview(LiveRemuxer):
+    """
+    录制中的HLS直播预览
+
+    复用实时转封装的跟随读取：先写入FLV文件头、onMetaData和音视频序列头，
+    再从接近文件末尾的关键帧开始跟随读取，由FFmpeg直接复制音视频流切成TS分片，
+    只保留最近几个分片的滑动窗口。不解码不编码，也不需要再从直播平台拉一路流。
+    """
+
+    def __init__(self, ffmpeg_path: str, input_file: str, work_dir: str,
+                 segment_time: float = 2, list_size: int = 5):
+        """
+        初始化直播预览
+
+        Args:
+            ffmpeg_path: FFmpeg可执行文件路径
+            input_file: 正在录制的FLV文件路径
+            work_dir: 播放列表和分片的输出目录
+            segment_time: 分片时长（秒）
+            list_size: 播放列表保留的分片数
+        """
+        super().__init__(ffmpeg_path, input_file, os.path.join(work_dir, PLAYLIST_FILE), poll_interval=0.2)
+        self.logger = logging.getLogger("LivePreview")
+        self.work_dir = work_dir
+        self.segment_time = segment_time
+        self.list_size = list_size
+
+    def _command(self) -> List[str]:
+        """
+        生成FFmpeg命令：复制音视频流输出滑动窗口的HLS
+        """
+        return [
+            self.ffmpeg_path,
+            "-hide_banner",
+            "-loglevel", "error",
+            "-f", "flv",
+            "-i", "pipe:0",
+            "-map", "0",
+            "-c", "copy",
+            "-f", "hls",
+            "-hls_time", str(self.segment_time),
+            "-hls_list_size", str(self.list_size),
+            "-hls_flags", "delete_segments+omit_endlist+independent_segments+temp_file",
+            "-hls_start_number_source", "epoch",
+            "-hls_segment_filename", os.path.join(self.work_dir, "seg_%d.ts"),
+            "-y",
+            self.output_file
+        ]
+
+    def prepare(self):
+        """
+        定位起始关键帧：从直播最新位置往前回退一个播放列表的时长，播放器打开后很快就能拿到完整的窗口
+
+        Raises:
+            FLVError: 录制文件格式错误或还没有关键帧
+        """
+        index = load_keyframe_index(self.input_file, save=config_manager.get("processor.keyframe_index", False))
+        if not index.times:
+            raise FLVError(f"录制文件中还没有关键帧: {self.input_file}")
+
+        backfill = self.segment_time * self.list_size
+        keyframe = index.find(max(index.duration - backfill, 0))
+        with FLVReader(self.input_file) as reader:
+            self.prefix = (bytes(reader.view[:index.data_offset])
+                           + _read_tag(reader, index.metadata_offset)
+                           + _read_tag(reader, index.video_header_offset)
+                           + _read_tag(reader, index.audio_header_offset))
+        self.start_offset = index.offsets[keyframe]
+
+    def start(self) -> bool:
+        """
+        创建输出目录，定位起始关键帧后启动FFmpeg
+
+        Returns:
+            bool: 启动成功返回True，失败返回False
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        try:
+            self.prepare()
+        except (FLVError, OSError) as e:
+            self.error = str(e)
+            self.logger.warning(f"无法启动直播预览: {e}")
+            return False
+        return super().start()
+
+    def is_alive(self) -> bool:
+        """
+        FFmpeg进程是否仍在运行
+        """
+        return self._process is not None and self._process.poll() is None
+
+    def stop(self):
+        """
+        停止预览并删除输出目录
+        """
+        self._finishing.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        if self._reader is not None:
+            self._reader.join(timeout=5)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class LivePreviewManager:
+    """
+    直播预览管理类
+
+    按房间在首次请求时启动预览，之后每次请求播放列表或分片都会刷新访问时间，
+    一段时间没有请求的预览由回收线程停止；录制切换到新的分段时预览随之切换，录制结束时停止。
+    """
+
+    def __init__(self):
+        """
+        初始化直播预览管理
+        """
+        self.logger = logging.getLogger("LivePreviewManager")
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._stop_event = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def attach(self):
+        """
+        订阅录制事件并启动回收线程
+        """
+        event_bus.subscribe("segment_opened", self._on_segment_opened)
+        event_bus.subscribe("recording_stopped", self._on_recording_stopped)
+        self._stop_event.clear()
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap_loop, name="LivePreviewReaper", daemon=True)
+            self._reaper.start()
+
+    def detach(self):
+        """
+        停止所有预览
+        """
+        event_bus.unsubscribe("segment_opened", self._on_segment_opened)
+        event_bus.unsubscribe("recording_stopped", self._on_recording_stopped)
+        self._stop_event.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+        with self._lock:
+            room_keys = list(self._sessions)
+        for room_key in room_keys:
+            self.stop(room_key)
+
+    def open(self, room_key: str, output_dir: str) -> Optional[str]:
+        """
+        获取房间预览的播放列表，预览未启动时启动并等待第一个播放列表生成
+
+        Args:
+            room_key: 房间键（平台_房间号）
+            output_dir: 房间录制目录
+
+        Returns:
+            Optional[str]: 播放列表路径，房间没有正在写入的录制或预览数已达上限时返回None
+        """
+        preview_config = get_preview_config()
+        if not preview_config["enabled"]:
+            return None
+
+        with self._lock:
+            session = self._sessions.get(room_key)
+            if session is not None and not session["starting"] and not session["preview"].is_alive():
+                self._sessions.pop(room_key, None)
+                stale, session = session, None
+            else:
+                stale = None
+        if stale is not None:
+            stale["preview"].stop()
+
+        if session is None:
+            session = self._start(room_key, output_dir, preview_config)
+            if session is None:
+                return None
+
+        session["last_access"] = time.time()
+        playlist = session["preview"].output_file
+        deadline = time.time() + preview_config["start_timeout"]
+        while not os.path.exists(playlist):
+            if (not session["starting"] and not session["preview"].is_alive()) or time.time() >= deadline:
+                return None
+            time.sleep(0.1)
+        return playlist
+
+    def segment(self, room_key: str, name: str) -> Optional[str]:
+        """
+        获取预览分片文件路径
+
+        Args:
+            room_key: 房间键
+            name: 分片文件名
+
+        Returns:
+            Optional[str]: 分片文件路径，不存在返回None
+        """
+        if not SEGMENT_PATTERN.fullmatch(name):
+            return None
+        with self._lock:
+            session = self._sessions.get(room_key)
+        if session is None:
+            return None
+        session["last_access"] = time.time()
+        path = os.path.join(session["preview"].work_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def stop(self, room_key: str) -> bool:
+        """
+        停止房间的预览
+
+        Args:
+            room_key: 房间键
+
+        Returns:
+            bool: 存在预览返回True
+        """
+        with self._lock:
+            session = self._sessions.pop(room_key, None)
+        if session is None:
+            return False
+        session["preview"].stop()
+        self.logger.info(f"已停止直播预览: {room_key}")
+        return True
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        """
+        获取正在进行的预览
+
+        Returns:
+            List[Dict[str, Any]]: 预览信息列表
+        """
+        with self._lock:
+            return [
+                {
+                    "room_key": room_key,
+                    "input_file": session["preview"].input_file,
+                    "bytes_read": session["preview"].bytes_read,
+                    "started_at": session["started_at"],
+                    "last_access": session["last_access"]
+                }
+                for room_key, session in self._sessions.items()
+            ]
+
+    def _start(self, room_key: str, output_dir: str, preview_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        input_file = find_current_recording(output_dir)
+        if input_file is None:
+            return None
+
+        with self._lock:
+            if room_key in self._sessions:
+                return self._sessions[room_key]
+            if len(self._sessions) >= preview_config["max_sessions"]:
+                self.logger.warning(f"直播预览数已达上限 {preview_config['max_sessions']}")
+                return None
+
+        # 定位关键帧可能需要扫描录制文件，不持有锁
+        preview = LivePreview(
+            config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg"),
+            input_file,
+            os.path.join(preview_config["work_dir"], room_key),
+            segment_time=preview_config["segment_time"],
+            list_size=preview_config["list_size"]
+        )
+        with self._lock:
+            if room_key in self._sessions:
+                return self._sessions[room_key]
+            # 占位，避免同一房间并发启动
+            session = self._sessions[room_key] = {
+                "preview": preview,
+                "output_dir": output_dir,
+                "started_at": time.time(),
+                "last_access": time.time(),
+                "starting": True
+            }
+
+        # 清理上次异常退出残留的分片
+        shutil.rmtree(preview.work_dir, ignore_errors=True)
+        started = preview.start()
+        session["starting"] = False
+        if not started:
+            with self._lock:
+                if self._sessions.get(room_key) is session:
+                    self._sessions.pop(room_key)
+            return None
+
+        self.logger.info(f"已启动直播预览: {room_key} ({input_file})")
+        return session
+
+    def _reap_loop(self):
+        """
+        回收线程：停止长时间没有请求或FFmpeg已退出的预览
+        """
+        while not self._stop_event.wait(5):
+            self.reap()
+
+    def reap(self) -> List[str]:
+        """
+        停止长时间没有请求或FFmpeg已退出的预览
+
+        Returns:
+            List[str]: 被停止的房间键
+        """
+        idle_timeout = get_preview_config()["idle_timeout"]
+        now = time.time()
+        with self._lock:
+            room_keys = [room_key for room_key, session in self._sessions.items()
+                         if not session["starting"] and (now - session["last_access"] > idle_timeout
+                                                         or not session["preview"].is_alive())]
+        for room_key in room_keys:
+            self.stop(room_key)
+        return room_keys
+
+    def _on_segment_opened(self, room: Dict[str, Any], path: str, **_):
+        """
+        录制切换到新的分段：停止跟随旧分段的预览，下次请求时从新分段启动
+        """
+        room_key = f"{room.get('platform', 'bilibili')}_{room.get('room_id')}"
+        with self._lock:
+            session = self._sessions.get(room_key)
+            switched = session is not None and session["preview"].input_file != os.path.abspath(path)
+        if switched:
+            self.stop(room_key)
+
+    def _on_recording_stopped(self, room: Dict[str, Any], **_):
+        self.stop(f"{room.get('platform', 'bilibili')}_{room.get('room_id')}")
+
+
+# 全局直播预览管理实例
+live_preview = LivePreviewManager()
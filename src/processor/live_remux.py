@@ -0,0 +1,300 @@
+import os
+import time
+import threading
+import subprocess
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, List
+from src.config.config import config_manager
+from src.utils.events import event_bus
+
+
+class LiveRemuxer:
+    """
+    录制中实时转封装类
+
+    跟随读取正在写入的FLV文件，通过管道交给FFmpeg直接复制音视频流，
+    输出分片MP4（fragmented MP4）。分片MP4在写入过程中即可播放和拖动，
+    录制结束时转封装也随之完成，不再需要对整个文件再读写一遍。
+    """
+
+    def __init__(self, ffmpeg_path: str, input_file: str, output_file: Optional[str] = None,
+                 chunk_size: int = 256 * 1024, poll_interval: float = 0.5):
+        """
+        初始化实时转封装
+
+        Args:
+            ffmpeg_path: FFmpeg可执行文件路径
+            input_file: 正在录制的FLV文件路径
+            output_file: 输出MP4文件路径，默认与输入文件同名
+            chunk_size: 每次读取的字节数
+            poll_interval: 读到文件末尾后等待新数据的间隔（秒）
+        """
+        self.ffmpeg_path = ffmpeg_path
+        self.input_file = input_file
+        self.output_file = output_file or os.path.splitext(input_file)[0] + ".mp4"
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger("LiveRemuxer")
+        self.bytes_read = 0
+        # 跟随读取前先写入的数据，以及开始读取的位置（默认从文件开头读取）
+        self.prefix = b""
+        self.start_offset = 0
+        self.error: Optional[str] = None
+        self._finishing = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._stderr_tail = deque(maxlen=20)
+
+    def _command(self) -> List[str]:
+        """
+        生成FFmpeg命令：从标准输入读取FLV，复制音视频流输出分片MP4
+        """
+        return [
+            self.ffmpeg_path,
+            "-hide_banner",
+            "-loglevel", "error",
+            "-f", "flv",
+            "-i", "pipe:0",
+            "-map", "0",
+            "-c", "copy",  # 复制音视频流，不重新编码
+            "-f", "mp4",
+            # 每个关键帧开始一个分片，文件头不依赖写完后回填的moov，写入过程中即可播放
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+            "-y",
+            self.output_file
+        ]
+
+    def start(self) -> bool:
+        """
+        启动FFmpeg进程和跟随读取线程
+
+        Returns:
+            bool: 启动成功返回True，失败返回False
+        """
+        cmd = self._command()
+
+        try:
+            self._process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+        except Exception as e:
+            self.error = str(e)
+            self.logger.error(f"启动实时转封装失败: {e}")
+            return False
+
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+        self._reader = threading.Thread(target=self._follow, daemon=True)
+        self._reader.start()
+        self.logger.info(f"开始实时转封装: {self.input_file} -> {self.output_file}")
+        return True
+
+    def finish(self, timeout: float = 60) -> bool:
+        """
+        录制文件写入结束，读完剩余数据后等待FFmpeg写完最后一个分片
+
+        Args:
+            timeout: 等待FFmpeg退出的超时时间（秒）
+
+        Returns:
+            bool: 转封装成功返回True，失败返回False
+        """
+        if not self._process:
+            return False
+
+        self._finishing.set()
+        if self._reader:
+            self._reader.join()
+
+        try:
+            self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+            self.error = "等待FFmpeg退出超时"
+
+        if self._process.returncode != 0 and not self.error:
+            self.error = "\n".join(self._stderr_tail) or f"返回码: {self._process.returncode}"
+
+        if self.error:
+            self.logger.error(f"实时转封装失败: {self.input_file}: {self.error}")
+            return False
+
+        self.logger.info(f"实时转封装完成: {self.input_file} -> {self.output_file}")
+        return True
+
+    def _follow(self):
+        """
+        跟随读取录制文件并写入FFmpeg标准输入，直到文件结束且不再增长
+        """
+        try:
+            with open(self.input_file, "rb") as f:
+                if self.prefix:
+                    self._process.stdin.write(self.prefix)
+                f.seek(self.start_offset)
+                while True:
+                    data = f.read(self.chunk_size)
+                    if data:
+                        self._process.stdin.write(data)
+                        self.bytes_read += len(data)
+                        continue
+
+                    # 先判断是否已结束再读一次，避免漏掉结束前最后写入的数据
+                    if self._finishing.is_set():
+                        data = f.read()
+                        if not data:
+                            break
+                        self._process.stdin.write(data)
+                        self.bytes_read += len(data)
+                        continue
+                    self._finishing.wait(self.poll_interval)
+        except BrokenPipeError:
+            self.error = "FFmpeg进程提前退出"
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            try:
+                self._process.stdin.close()
+            except Exception:
+                pass
+
+    def _drain_stderr(self):
+        for line in iter(self._process.stderr.readline, b""):
+            self._stderr_tail.append(line.decode("utf-8", errors="replace").rstrip())
+        self._process.stderr.close()
+
+
+class LiveRemuxManager:
+    """
+    实时转封装管理类
+
+    按录制文件管理正在进行的实时转封装，录制文件结束后在后台等待转封装完成，
+    并发布segment_remuxed事件（失败时output_file为None，由处理流水线按普通转换处理）。
+    """
+
+    def __init__(self):
+        """
+        初始化实时转封装管理
+        """
+        self.logger = logging.getLogger("LiveRemuxManager")
+        self._lock = threading.Lock()
+        self._active: Dict[str, Dict[str, Any]] = {}
+
+    def start(self, room: Dict[str, Any], path: str) -> bool:
+        """
+        为正在录制的文件启动实时转封装
+
+        Args:
+            room: 房间配置
+            path: 正在录制的FLV文件路径
+
+        Returns:
+            bool: 启动成功返回True，已在转封装或启动失败返回False
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._active:
+                return False
+
+            remuxer = LiveRemuxer(config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg"), path)
+            if not remuxer.start():
+                return False
+
+            self._active[path] = {
+                "room": room,
+                "room_key": f"{room.get('platform', 'bilibili')}_{room.get('room_id')}",
+                "remuxer": remuxer,
+                "started_at": time.time(),
+                "finishing": False
+            }
+        return True
+
+    def is_active(self, path: str) -> bool:
+        """
+        判断录制文件是否正在实时转封装（包括等待结束的）
+
+        Args:
+            path: 录制文件路径
+
+        Returns:
+            bool: 正在转封装返回True
+        """
+        with self._lock:
+            return os.path.abspath(path) in self._active
+
+    def finish(self, path: str) -> bool:
+        """
+        录制文件已写完，在后台结束实时转封装
+
+        Args:
+            path: 录制文件路径
+
+        Returns:
+            bool: 该文件正在转封装返回True
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._active.get(path)
+            if not entry or entry["finishing"]:
+                return entry is not None
+            entry["finishing"] = True
+
+        threading.Thread(target=self._finish, args=(path, entry), daemon=True).start()
+        return True
+
+    def finish_room(self, room_key: str) -> List[str]:
+        """
+        结束房间的所有实时转封装（整场录制结束时调用）
+
+        Args:
+            room_key: 房间键（平台_房间号）
+
+        Returns:
+            List[str]: 被结束的录制文件路径
+        """
+        with self._lock:
+            paths = [path for path, entry in self._active.items() if entry["room_key"] == room_key]
+        for path in paths:
+            self.finish(path)
+        return paths
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        """
+        获取正在进行的实时转封装
+
+        Returns:
+            List[Dict[str, Any]]: 转封装信息列表
+        """
+        with self._lock:
+            return [
+                {
+                    "path": path,
+                    "room_key": entry["room_key"],
+                    "output_file": entry["remuxer"].output_file,
+                    "bytes_read": entry["remuxer"].bytes_read,
+                    "started_at": entry["started_at"],
+                    "finishing": entry["finishing"]
+                }
+                for path, entry in self._active.items()
+            ]
+
+    def _finish(self, path: str, entry: Dict[str, Any]):
+        remuxer = entry["remuxer"]
+        output_file = remuxer.output_file if remuxer.finish() else None
+        if output_file is None and os.path.exists(remuxer.output_file):
+            try:
+                os.remove(remuxer.output_file)
+            except OSError:
+                pass
+
+        # 先发布事件再移除记录，保证处理流水线不会在转封装结束前按普通文件处理
+        event_bus.publish("segment_remuxed", room=entry["room"], path=path, output_file=output_file)
+        with self._lock:
+            self._active.pop(path, None)
+
+
+# 全局实时转封装管理实例
+live_remux = LiveRemuxManager()
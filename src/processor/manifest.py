@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+
+def partial_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    计算文件的快速部分哈希（文件大小 + 头部、中部、尾部各一块数据）
+
+    Args:
+        path: 文件路径
+        block_size: 每块读取的字节数
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+
+    with open(path, "rb") as f:
+        if size <= block_size * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, size // 2 - block_size // 2, size - block_size):
+                f.seek(offset)
+                digest.update(f.read(block_size))
+
+    return digest.hexdigest()
+
+
+class ProcessedManifest:
+    """
+    已处理文件清单
+
+    以文件路径为键记录源文件的大小、修改时间和部分哈希，
+    批量处理时跳过已完成且未变化的文件，只处理新文件和未完成的文件。
+    """
+
+    def __init__(self, manifest_file: str, base_dir: Optional[str] = None, save_interval: float = 10):
+        """
+        初始化处理清单
+
+        Args:
+            manifest_file: 清单文件路径
+            base_dir: 记录相对路径时的基准目录，None表示记录绝对路径
+            save_interval: 自动保存的最短间隔（秒）
+        """
+        self.manifest_file = manifest_file
+        self.base_dir = base_dir
+        self.save_interval = save_interval
+        self.logger = logging.getLogger("ProcessedManifest")
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._outputs = set()
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    def _key(self, path: str) -> str:
+        if self.base_dir:
+            return os.path.relpath(path, self.base_dir)
+        return os.path.abspath(path)
+
+    def is_done(self, path: str, output_file: str, params_tag: Optional[str] = None) -> bool:
+        """
+        判断文件是否已处理完成且源文件未发生变化
+
+        大小和修改时间都一致时直接视为未变化；大小一致但修改时间变化时再比较部分哈希。
+
+        Args:
+            path: 源文件路径
+            output_file: 输出文件路径
+            params_tag: 处理参数标识，参数变化（例如水印文字修改）时需要重新处理
+
+        Returns:
+            bool: 已处理完成返回True，否则返回False
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+
+        if not entry or entry.get("status") != "done":
+            return False
+        if entry.get("params") != params_tag:
+            return False
+        if entry.get("output") != self._key(output_file) or not os.path.exists(output_file):
+            return False
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+
+        if stat.st_size != entry.get("size"):
+            return False
+        if stat.st_mtime == entry.get("mtime"):
+            return True
+
+        # 仅修改时间变化（例如被touch或复制），内容未变时更新记录
+        try:
+            if partial_hash(path) != entry.get("hash"):
+                return False
+        except OSError:
+            return False
+
+        with self._lock:
+            entry["mtime"] = stat.st_mtime
+            self._dirty = True
+        return True
+
+    def mark_done(self, path: str, output_file: str, params_tag: Optional[str] = None):
+        """
+        记录文件处理完成
+
+        Args:
+            path: 源文件路径
+            output_file: 输出文件路径
+            params_tag: 处理参数标识
+        """
+        try:
+            stat = os.stat(path)
+            file_hash = partial_hash(path)
+        except OSError:
+            # 源文件已被删除（例如处理后删除原文件），只记录输出
+            stat = None
+            file_hash = None
+
+        with self._lock:
+            self._entries[self._key(path)] = {
+                "status": "done",
+                "size": stat.st_size if stat else None,
+                "mtime": stat.st_mtime if stat else None,
+                "hash": file_hash,
+                "output": self._key(output_file),
+                "params": params_tag,
+                "processed_at": time.time()
+            }
+            self._outputs.add(self._key(output_file))
+            self._dirty = True
+
+        self._maybe_save()
+
+    def mark_failed(self, path: str, error: str = ""):
+        """
+        记录文件处理失败，下次批量处理时会重新处理
+
+        Args:
+            path: 源文件路径
+            error: 错误信息
+        """
+        with self._lock:
+            self._entries[self._key(path)] = {
+                "status": "failed",
+                "error": error,
+                "processed_at": time.time()
+            }
+            self._dirty = True
+
+        self._maybe_save()
+
+    def is_output(self, path: str) -> bool:
+        """
+        判断文件是否是清单中记录的某个输出文件
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            bool: 是输出文件返回True
+        """
+        with self._lock:
+            return self._key(path) in self._outputs
+
+    def _maybe_save(self):
+        if time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """
+        将清单写入文件
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+            self._last_save = time.time()
+
+        try:
+            manifest_dir = os.path.dirname(self.manifest_file)
+            if manifest_dir:
+                os.makedirs(manifest_dir, exist_ok=True)
+            temp_file = f"{self.manifest_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(temp_file, self.manifest_file)
+        except Exception as e:
+            self.logger.error(f"保存处理清单失败: {e}")
+
+    def _load(self):
+        if not os.path.exists(self.manifest_file):
+            return
+
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+            self._outputs = {entry["output"] for entry in self._entries.values() if entry.get("output")}
+        except Exception as e:
+            self.logger.error(f"加载处理清单失败: {e}")
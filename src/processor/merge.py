@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+from src.config.config import config_manager
+from src.processor.flv import FLVReader, FLVError
+from src.processor.keyframes import load_keyframe_index
+from src.processor.clip import copy_segments
+
+
+logger = logging.getLogger("SegmentMerger")
+
+# 录制文件名中的开始时间，如 录制-123-20240101-203000-123-标题.flv
+# 前后不能紧跟数字，避免把8位房间号和日期的前6位当作日期和时间
+FILENAME_TIME_PATTERN = re.compile(r"(?<!\d)(\d{8})[-_ ]?(\d{6})(?!\d)")
+
+
+def get_merge_config() -> Dict[str, Any]:
+    """
+    获取分段合并配置
+
+    Returns:
+        Dict[str, Any]: 分段合并配置（enabled、max_gap、delete_segments）
+    """
+    merge_config = {
+        "enabled": False,
+        "max_gap": 300,
+        "delete_segments": False
+    }
+    merge_config.update(config_manager.get("processor.merge", {}) or {})
+    return merge_config
+
+
+def parse_filename_time(path: str) -> Optional[float]:
+    """
+    从录制文件名中解析开始时间
+
+    Args:
+        path: 录制文件路径
+
+    Returns:
+        Optional[float]: 开始时间的时间戳，文件名中没有时间返回None
+    """
+    # 使用第一个能解析为有效日期时间的匹配
+    for match in FILENAME_TIME_PATTERN.finditer(os.path.basename(path)):
+        try:
+            return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S").timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def segment_info(path: str) -> Dict[str, Any]:
+    """
+    获取分段的时间范围和序列头
+
+    开始时间优先取文件名中的时间，否则用修改时间减去时长估算；
+    结束时间为最后一次写入的时间。
+
+    Args:
+        path: 录制文件路径
+
+    Returns:
+        Dict[str, Any]: 分段信息（path、start、end、duration、video_header、audio_header）
+
+    Raises:
+        FLVError: 文件不是有效的FLV文件
+    """
+    index = load_keyframe_index(path)
+    mtime = os.path.getmtime(path)
+    start = parse_filename_time(path)
+    if start is None:
+        start = mtime - index.duration
+
+    headers = {}
+    with FLVReader(path) as reader:
+        for name, offset in (("video_header", index.video_header_offset), ("audio_header", index.audio_header_offset)):
+            tag = next(reader.tags(start=offset), None) if offset is not None else None
+            headers[name] = bytes(reader.tag_data(tag)) if tag is not None else None
+
+    return {
+        "path": path,
+        "start": start,
+        "end": max(mtime, start + index.duration),
+        "duration": index.duration,
+        "keyframes": len(index),
+        **headers
+    }
+
+
+def is_compatible(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+    """
+    判断两个分段的编码参数是否一致（序列头相同才能直接拼接）
+
+    Args:
+        first: 分段信息
+        second: 分段信息
+
+    Returns:
+        bool: 可以直接拼接返回True
+    """
+    return first["video_header"] == second["video_header"] and first["audio_header"] == second["audio_header"]
+
+
+def plan_merge(paths: List[str], max_gap: float = 300) -> List[List[str]]:
+    """
+    将录制文件按场次分组，同一组内的分段可以直接拼接
+
+    按开始时间排序后，与上一分段结束时间相隔超过max_gap秒的分段开始新的一场；
+    同一场内编码参数（分辨率、采样率等）变化时也从变化处分组。
+    无法解析或没有关键帧的文件单独成组。
+
+    Args:
+        paths: 录制文件路径列表
+        max_gap: 同一场直播相邻分段之间的最大间隔（秒）
+
+    Returns:
+        List[List[str]]: 按时间排序的分组，每组内按时间排序
+    """
+    segments = []
+    groups = []
+    for path in paths:
+        try:
+            info = segment_info(path)
+        except (FLVError, OSError) as e:
+            logger.warning(f"无法读取录制文件，不参与合并: {path}: {e}")
+            groups.append([path])
+            continue
+        if not info["keyframes"]:
+            groups.append([path])
+            continue
+        segments.append(info)
+
+    segments.sort(key=lambda info: (info["start"], info["path"]))
+    previous = None
+    for info in segments:
+        if (previous is None or info["start"] - previous["end"] > max_gap
+                or not is_compatible(previous, info)):
+            groups.append([])
+        groups[-1].append(info["path"])
+        previous = info
+    return groups
+
+
+def merged_file_name(paths: List[str]) -> str:
+    """
+    合并输出文件路径：第一个分段的文件名加 _merged 后缀
+    """
+    name, ext = os.path.splitext(paths[0])
+    return f"{name}_merged{ext}"
+
+
+def merge_segments(input_files: List[str], output_file: str,
+                   cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    无损合并同一场直播的多个FLV分段
+
+    一次顺序读取全部分段，直接复制音视频标签，时间戳从0开始并在分段之间保持连续，不重新编码。
+
+    Args:
+        input_files: 按时间排序的分段文件列表
+        output_file: 输出文件路径
+        cancel_event: 取消事件
+
+    Returns:
+        Dict[str, Any]: 合并结果（output_file、duration、size、segments）
+
+    Raises:
+        FLVError: 分段格式错误或编码参数不一致
+        FFmpegCancelled: 任务被取消
+    """
+    infos = [segment_info(path) for path in input_files]
+    for previous, info in zip(infos, infos[1:]):
+        if not is_compatible(previous, info):
+            raise FLVError(f"分段编码参数不一致，无法直接拼接: {previous['path']} / {info['path']}")
+
+    begin = time.time()
+    result = copy_segments(input_files, 0, None, output_file, cancel_event)
+    result["segments"] = len(input_files)
+    logger.info(f"已合并 {len(input_files)} 个分段: {output_file}（时长 {result['duration']:.1f} 秒，"
+                f"耗时 {time.time() - begin:.1f} 秒）")
+    return result
@@ -0,0 +1,288 @@
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, Optional, List, Callable
+from src.config.config import config_manager
+from src.processor.profiles import build_encoder_args
+from src.processor.runner import run_ffmpeg, FFmpegCancelled
+
+
+logger = logging.getLogger("ParallelEncoder")
+
+
+def get_parallel_config() -> Dict[str, Any]:
+    """
+    获取分块并行编码配置
+
+    Returns:
+        Dict[str, Any]: 并行编码配置（enabled、workers、chunk_threads、min_duration、chunks_per_worker）
+    """
+    parallel_config = {
+        "enabled": False,
+        "workers": 8,
+        "chunk_threads": 2,
+        "min_duration": 1800,
+        "chunks_per_worker": 2
+    }
+    parallel_config.update(config_manager.get("processor.parallel", {}) or {})
+    return parallel_config
+
+
+def parallel_job_cost(default: int) -> int:
+    """
+    计算编码任务占用的CPU核心数，启用分块并行编码时按 工作进程数 × 每块线程数 计算
+
+    Args:
+        default: 未启用分块并行编码时的核心数
+
+    Returns:
+        int: CPU核心数
+    """
+    parallel_config = get_parallel_config()
+    if not parallel_config["enabled"]:
+        return default
+    return max(int(parallel_config["workers"]) * int(parallel_config["chunk_threads"]), 1)
+
+
+def parallel_workers_for(threads: int) -> int:
+    """
+    根据任务队列分配的核心数计算分块并行编码的工作进程数
+
+    Args:
+        threads: 任务队列分配的核心数
+
+    Returns:
+        int: 工作进程数，未启用分块并行编码返回0
+    """
+    parallel_config = get_parallel_config()
+    if not parallel_config["enabled"]:
+        return 0
+    return max(threads // max(int(parallel_config["chunk_threads"]), 1), 1)
+
+
+def find_ffprobe(ffmpeg_path: str) -> str:
+    """
+    获取FFprobe可执行文件路径，优先使用配置文件，其次使用与FFmpeg同目录的ffprobe
+
+    Args:
+        ffmpeg_path: FFmpeg可执行文件路径
+
+    Returns:
+        str: FFprobe可执行文件路径
+    """
+    configured = config_manager.get("processor.ffprobe_path")
+    if configured:
+        return configured
+
+    directory, name = os.path.split(ffmpeg_path)
+    candidate = os.path.join(directory, name.replace("ffmpeg", "ffprobe"))
+    if directory and os.path.exists(candidate):
+        return candidate
+    return shutil.which("ffprobe") or "ffprobe"
+
+
+def probe_duration(ffprobe_path: str, input_file: str) -> Optional[float]:
+    """
+    获取视频时长
+
+    Args:
+        ffprobe_path: FFprobe可执行文件路径
+        input_file: 视频文件路径
+
+    Returns:
+        Optional[float]: 时长（秒），获取失败返回None
+    """
+    cmd = [ffprobe_path, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", input_file]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=60)
+        return float(result.stdout.strip())
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None
+
+
+def count_video_frames(ffprobe_path: str, input_file: str) -> Optional[int]:
+    """
+    统计视频流的帧数（只解封装计数数据包，不解码）
+
+    Args:
+        ffprobe_path: FFprobe可执行文件路径
+        input_file: 视频文件路径
+
+    Returns:
+        Optional[int]: 帧数，统计失败返回None
+    """
+    cmd = [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-count_packets",
+           "-show_entries", "stream=nb_read_packets", "-of", "csv=p=0", input_file]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=600)
+        return int(result.stdout.strip().split(",")[0])
+    except (subprocess.SubprocessError, OSError, ValueError, IndexError):
+        return None
+
+
+def plan_split_times(duration: float, chunks: int) -> List[float]:
+    """
+    计算切分时间点，分段复用器会在每个时间点之后的第一个关键帧处切分
+
+    Args:
+        duration: 视频时长（秒）
+        chunks: 分块数
+
+    Returns:
+        List[float]: 切分时间点（不含0和结尾）
+    """
+    if chunks <= 1 or duration <= 0:
+        return []
+    return [round(duration * i / chunks, 3) for i in range(1, chunks)]
+
+
+def parallel_encode(ffmpeg_path: str,
+                    input_file: str,
+                    output_file: str,
+                    video_filter: str,
+                    encoder_profile: Optional[Dict[str, Any]] = None,
+                    workers: int = 4,
+                    threads: int = 0,
+                    min_duration: float = 0,
+                    chunks_per_worker: int = 2,
+                    cancel_event: Optional[threading.Event] = None,
+                    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> bool:
+    """
+    分块并行编码：在关键帧处无损切分视频流，各分块并行应用滤镜并编码，
+    再用concat分离器无损拼接，并从原文件复制音频流
+
+    单个libx264进程在多核机器上无法线性扩展，长录像分块后每个FFmpeg进程只用少量线程，
+    多个进程同时编码可以充分利用全部核心。拼接后校验帧数与原视频一致，不一致视为失败，
+    调用方应退回单次编码。
+
+    Args:
+        ffmpeg_path: FFmpeg可执行文件路径
+        input_file: 输入视频文件路径
+        output_file: 输出文件路径
+        video_filter: 视频滤镜
+        encoder_profile: 编码档位
+        workers: 同时编码的分块数
+        threads: 全部分块共用的编码线程数，0表示每个分块由FFmpeg自动决定
+        min_duration: 低于该时长（秒）的视频不分块
+        chunks_per_worker: 每个工作进程平均分到的分块数，分块更细可以减少最后一个分块拖慢整体的情况
+        cancel_event: 取消事件
+        progress_callback: 进度回调，参数为汇总后的进度信息
+
+    Returns:
+        bool: 编码成功返回True，不适合分块或失败返回False
+
+    Raises:
+        FFmpegCancelled: 任务被取消
+    """
+    ffprobe_path = find_ffprobe(ffmpeg_path)
+    duration = probe_duration(ffprobe_path, input_file)
+    if not duration or duration < min_duration or workers <= 1:
+        logger.info(f"视频时长不足或无法获取，不进行分块编码: {input_file}")
+        return False
+
+    chunk_threads = max(threads // workers, 1) if threads else 0
+    # 档位中的线程数针对单次编码，分块编码时按分块重新分配
+    profile = dict(encoder_profile or {}, threads=None)
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(output_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix=".parallel-", dir=output_dir) as temp_dir:
+        # 1. 在关键帧处切分视频流（只复制，不重新编码）
+        split_times = plan_split_times(duration, workers * chunks_per_worker)
+        chunk_pattern = os.path.join(temp_dir, "chunk_%04d.mkv")
+        cmd = [ffmpeg_path, "-hide_banner", "-i", input_file, "-map", "0:v:0", "-c", "copy",
+               "-f", "segment", "-segment_format", "matroska", "-reset_timestamps", "1"]
+        if split_times:
+            cmd.extend(["-segment_times", ",".join(str(t) for t in split_times)])
+        cmd.extend(["-y", chunk_pattern])
+
+        returncode, stderr = run_ffmpeg(cmd, cancel_event=cancel_event)
+        if returncode != 0:
+            logger.error(f"切分视频失败: {stderr}")
+            return False
+
+        chunks = sorted(name for name in os.listdir(temp_dir) if name.startswith("chunk_"))
+        if not chunks:
+            return False
+        logger.info(f"视频已切分为 {len(chunks)} 块，使用 {workers} 个进程并行编码: {input_file}")
+
+        # 2. 并行编码各分块
+        chunk_progress: Dict[int, float] = {}
+        progress_lock = threading.Lock()
+
+        def report(index: int, progress: Dict[str, Any]):
+            if not progress_callback or progress.get("out_time") is None:
+                return
+            with progress_lock:
+                chunk_progress[index] = progress["out_time"]
+                done = sum(chunk_progress.values())
+            progress_callback({
+                "out_time": done,
+                "duration": duration,
+                "percent": min(done / duration * 100, 100.0),
+                "chunks": len(chunks)
+            })
+
+        # 任一分块失败或任务被取消时终止其余分块
+        abort = threading.Event()
+
+        def encode(index: int) -> bool:
+            if abort.is_set():
+                return False
+            chunk_file = os.path.join(temp_dir, chunks[index])
+            encoded_file = os.path.join(temp_dir, f"encoded_{index:04d}.mkv")
+            cmd = [ffmpeg_path, "-hide_banner", "-i", chunk_file, "-vf", video_filter]
+            cmd.extend(build_encoder_args(profile, chunk_threads))
+            cmd.extend(["-an", "-y", encoded_file])
+            try:
+                returncode, stderr = run_ffmpeg(cmd, cancel_event=abort,
+                                                progress_callback=lambda progress: report(index, progress))
+            except FFmpegCancelled:
+                return False
+            if returncode != 0:
+                logger.error(f"分块编码失败 {chunks[index]}: {stderr}")
+                abort.set()
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(encode, index) for index in range(len(chunks))]
+            while wait(futures, timeout=1).not_done:
+                if cancel_event is not None and cancel_event.is_set():
+                    abort.set()
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise FFmpegCancelled(input_file)
+        if not all(future.result() for future in futures):
+            return False
+
+        # 3. 无损拼接编码后的分块，并从原文件复制音频流
+        list_file = os.path.join(temp_dir, "concat.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            for index in range(len(chunks)):
+                f.write(f"file 'encoded_{index:04d}.mkv'\n")
+
+        temp_output = os.path.join(temp_dir, "output" + (os.path.splitext(output_file)[1] or ".mp4"))
+        cmd = [ffmpeg_path, "-hide_banner", "-f", "concat", "-safe", "0", "-i", list_file,
+               "-i", input_file, "-map", "0:v:0", "-map", "1:a?", "-c", "copy",
+               "-movflags", "+faststart", "-y", temp_output]
+        returncode, stderr = run_ffmpeg(cmd, cancel_event=cancel_event)
+        if returncode != 0:
+            logger.error(f"拼接分块失败: {stderr}")
+            return False
+
+        # 4. 校验帧数与原视频一致
+        source_frames = count_video_frames(ffprobe_path, input_file)
+        output_frames = count_video_frames(ffprobe_path, temp_output)
+        if source_frames is None or source_frames != output_frames:
+            logger.error(f"分块编码帧数不一致: 原视频 {source_frames}，输出 {output_frames}")
+            return False
+
+        os.replace(temp_output, output_file)
+
+    logger.info(f"分块并行编码完成: {input_file} -> {output_file}（{source_frames} 帧）")
+    return True
@@ -0,0 +1,725 @@
+import os
+import json
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, List
+from src.config.config import config_manager
+from src.processor.converter import VideoConverter
+from src.processor.watermark import WatermarkAdder
+from src.processor.jobs import job_queue
+from src.processor.live_remux import live_remux
+from src.processor.flv import FLVError, truncate_flv, repair_timestamps
+from src.processor.keyframes import load_keyframe_index, inject_keyframes
+from src.processor.parallel import parallel_job_cost, parallel_workers_for
+from src.processor.merge import get_merge_config, plan_merge, merged_file_name, merge_segments
+from src.processor.clip import CLIP_DIR
+from src.processor.thumbnails import ThumbnailGenerator, get_thumbnail_config
+from src.processor.runner import FFmpegCancelled
+from src.processor.profiles import select_profile
+from src.utils.events import event_bus
+
+
+# 文件处理状态
+FILE_PENDING = "pending"
+FILE_RUNNING = "running"
+FILE_DONE = "done"
+FILE_FAILED = "failed"
+
+# 需要重新编码视频的阶段
+ENCODE_STAGES = ("watermark", "convert_watermark")
+
+
+class PostProcessPipeline:
+    """
+    录制后期处理流水线
+
+    录制分段或整场录制结束时，按房间配置依次执行 转换 → 水印 → 收尾 各阶段，
+    转换和水印同时启用时合并为一次FFmpeg调用（convert_watermark）。
+    启用分段合并（merge）的房间在整场录制结束后先把同一场的分段无损拼接为一个文件再处理。
+    启用实时转封装（live_remux）的房间在录制过程中已生成MP4，不再执行转换阶段。
+    每个文件处理到哪个阶段都会记录到状态文件中，服务重启后从中断的阶段继续。
+    处理结束超过保留时间（processor.pipeline_retention）的记录会被删除。
+    """
+
+    def __init__(self):
+        """
+        初始化处理流水线
+        """
+        self.logger = logging.getLogger("PostProcessPipeline")
+        self.state_file = ""
+        self.retention = 7 * 86400
+        self.is_attached = False
+        self._lock = threading.RLock()
+        self._files: Dict[str, Dict[str, Any]] = {}
+        # 状态文件中的行数，超过记录数较多时重写
+        self._state_lines = 0
+
+    def attach(self):
+        """
+        加载处理状态并订阅录制事件
+        """
+        with self._lock:
+            if self.is_attached:
+                return
+
+            data_dir = config_manager.get("system.data_dir", "/opt/2233recorder/data")
+            self.state_file = config_manager.get("processor.pipeline_state_file", os.path.join(data_dir, "pipeline.json"))
+            self.retention = config_manager.get("processor.pipeline_retention", self.retention)
+            self._load()
+            self.is_attached = True
+
+        event_bus.subscribe("segment_opened", self._on_segment_opened)
+        event_bus.subscribe("segment_closed", self._on_segment_closed)
+        event_bus.subscribe("segment_remuxed", self._on_segment_remuxed)
+        event_bus.subscribe("recording_stopped", self._on_recording_stopped)
+        self.logger.info("后期处理流水线已启动")
+
+    def detach(self):
+        """
+        取消订阅录制事件
+        """
+        event_bus.unsubscribe("segment_opened", self._on_segment_opened)
+        event_bus.unsubscribe("segment_closed", self._on_segment_closed)
+        event_bus.unsubscribe("segment_remuxed", self._on_segment_remuxed)
+        event_bus.unsubscribe("recording_stopped", self._on_recording_stopped)
+        with self._lock:
+            self.is_attached = False
+
+    def get_processor_config(self, room: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        获取房间的处理配置（全局配置被房间级配置覆盖）
+
+        Args:
+            room: 房间配置
+
+        Returns:
+            Dict[str, Any]: 合并后的处理配置
+        """
+        processor_config = {
+            "enabled": config_manager.get("processor.enabled", False),
+            "format": "mp4",
+            "delete_original": config_manager.get("processor.delete_original", False),
+            "live_remux": config_manager.get("processor.live_remux", False)
+        }
+        processor_config.update(room.get("processor") or {})
+
+        # 全局关闭时房间配置无效
+        if not config_manager.get("processor.enabled", False):
+            processor_config["enabled"] = False
+        return processor_config
+
+    def get_watermark_config(self, room: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        获取房间的水印配置（全局配置被房间级配置覆盖）
+
+        Args:
+            room: 房间配置
+
+        Returns:
+            Dict[str, Any]: 合并后的水印配置
+        """
+        watermark_config = dict(config_manager.get("processor.watermark", {}) or {})
+        watermark_config.update(room.get("watermark") or {})
+
+        if not config_manager.get("processor.enabled", False):
+            watermark_config["enabled"] = False
+        return watermark_config
+
+    def is_live_remux(self, room: Dict[str, Any]) -> bool:
+        """
+        判断房间是否在录制过程中实时转封装为MP4
+
+        Args:
+            room: 房间配置
+
+        Returns:
+            bool: 启用实时转封装返回True
+        """
+        processor_config = self.get_processor_config(room)
+        return bool(processor_config.get("enabled") and processor_config.get("live_remux")
+                    and processor_config.get("format", "mp4") == "mp4")
+
+    def is_merge(self, room: Dict[str, Any]) -> bool:
+        """
+        判断房间是否在整场录制结束后合并同一场的分段
+
+        Args:
+            room: 房间配置
+
+        Returns:
+            bool: 启用分段合并返回True
+        """
+        processor_config = self.get_processor_config(room)
+        merge = processor_config.get("merge", get_merge_config()["enabled"])
+        return bool(processor_config.get("enabled") and merge and not self.is_live_remux(room))
+
+    def build_stages(self, room: Dict[str, Any], remuxed: bool = False) -> List[str]:
+        """
+        根据房间配置生成处理阶段列表
+
+        Args:
+            room: 房间配置
+            remuxed: 录制文件是否已实时转封装为MP4，是则跳过转换阶段
+
+        Returns:
+            List[str]: 处理阶段列表，无需处理返回空列表
+        """
+        processor_config = self.get_processor_config(room)
+        watermark_config = self.get_watermark_config(room)
+
+        convert = processor_config.get("enabled") and processor_config.get("format", "mp4") == "mp4"
+        watermark = watermark_config.get("enabled")
+
+        # 保留原始FLV时建立关键帧索引，供剪辑导出和缩略图快速定位
+        keep_original = not processor_config.get("delete_original")
+        index = config_manager.get("processor.keyframe_index", False) and keep_original
+        # 缩略图为保留下来的文件生成：保留原始FLV时借助关键帧索引从FLV生成，否则为最终文件生成
+        thumbnails = processor_config.get("enabled") and get_thumbnail_config()["enabled"]
+
+        if remuxed:
+            # 转换已在录制过程中完成，仍执行收尾阶段以按配置删除原文件
+            stages = (["index"] if index else []) + (["thumbnails"] if thumbnails and keep_original else [])
+            stages += (["watermark"] if watermark else []) + (["thumbnails"] if thumbnails and not keep_original else [])
+            return stages + ["finalize"]
+
+        stages = []
+        if (convert or watermark) and config_manager.get("processor.repair_flv", False):
+            # 先截断不完整的末尾标签并修复时间戳跳变，避免FFmpeg处理到一半才失败
+            stages.append("repair")
+        if (convert or watermark) and index:
+            stages.append("index")
+        if thumbnails and keep_original:
+            stages.append("thumbnails")
+        if convert and watermark and config_manager.get("processor.fused", True):
+            # 一次FFmpeg调用完成转换和水印，省去中间文件
+            stages.append("convert_watermark")
+        else:
+            if convert:
+                stages.append("convert")
+            if watermark:
+                stages.append("watermark")
+        if thumbnails and not keep_original:
+            stages.append("thumbnails")
+        if stages:
+            stages.append("finalize")
+        return stages
+
+    def submit_file(self, room: Dict[str, Any], path: str, remuxed_file: Optional[str] = None,
+                    sources: Optional[List[str]] = None) -> Optional[str]:
+        """
+        将录制文件加入处理流水线，已处理或正在处理的文件会被忽略
+
+        Args:
+            room: 房间配置
+            path: 录制文件路径
+            remuxed_file: 录制过程中实时转封装得到的MP4文件，从该文件继续处理
+            sources: 需要先合并的分段文件列表，合并结果写入path
+
+        Returns:
+            Optional[str]: 处理任务ID，无需处理返回None
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._files:
+                return None
+            self._prune()
+
+            stages = self.build_stages(room, remuxed=bool(remuxed_file))
+            if sources:
+                stages = ["merge"] + (stages or ["finalize"])
+            if not stages:
+                return None
+
+            record = {
+                "path": path,
+                "room": room,
+                "room_key": f"{room.get('platform', 'bilibili')}_{room.get('room_id')}",
+                "stages": stages,
+                "stage": stages[0],
+                "status": FILE_PENDING,
+                "current_file": remuxed_file or path,
+                "intermediates": [],
+                "sources": [os.path.abspath(source) for source in sources or []],
+                "final_file": None,
+                "job_id": None,
+                "error": None,
+                "updated_at": time.time()
+            }
+            self._files[path] = record
+            self._save(record)
+
+        job_id = job_queue.submit("pipeline", {"path": path}, priority=3)
+
+        with self._lock:
+            record["job_id"] = job_id
+            if not job_id:
+                record["status"] = FILE_FAILED
+                record["error"] = "提交处理任务失败"
+            self._save(record)
+
+        self.logger.info(f"录制文件已加入处理流水线: {path}（{' → '.join(stages)}）")
+        return job_id
+
+    def get_file(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文件处理状态
+
+        Args:
+            path: 录制文件路径
+
+        Returns:
+            Optional[Dict[str, Any]]: 处理状态，不存在返回None
+        """
+        with self._lock:
+            record = self._files.get(os.path.abspath(path))
+            return dict(record) if record else None
+
+    def list_files(self, room_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取文件处理状态列表
+
+        Args:
+            room_key: 按房间过滤（平台_房间号），None表示全部
+
+        Returns:
+            List[Dict[str, Any]]: 按更新时间倒序的处理状态列表
+        """
+        with self._lock:
+            records = [dict(r) for r in self._files.values() if room_key is None or r["room_key"] == room_key]
+        return sorted(records, key=lambda r: r["updated_at"], reverse=True)
+
+    def job_cost(self, params: Dict[str, Any]) -> int:
+        """
+        计算处理任务占用的CPU核心数，包含重新编码阶段时按编码任务计算
+        """
+        record = self._files.get(params.get("path"))
+        if record and any(stage in ENCODE_STAGES for stage in record["stages"]):
+            profile = select_profile(self.get_processor_config(record["room"]))
+            return parallel_job_cost(profile.get("threads") or config_manager.get("processor.queue.encode_threads", 4))
+        return 1
+
+    def run(self, params: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        执行处理任务（任务队列处理函数），从记录的阶段继续执行
+
+        Args:
+            params: 任务参数，包含录制文件路径
+            context: 任务执行上下文
+
+        Returns:
+            bool: 全部阶段成功返回True，否则返回False
+        """
+        with self._lock:
+            record = self._files.get(params.get("path"))
+            if not record:
+                self.logger.error(f"找不到录制文件的处理记录: {params.get('path')}")
+                return False
+            record["status"] = FILE_RUNNING
+            record["error"] = None
+            self._save(record)
+
+        stages = record["stages"]
+        start = stages.index(record["stage"]) if record["stage"] in stages else len(stages)
+
+        for stage in stages[start:]:
+            self.logger.info(f"开始处理阶段 {stage}: {record['path']}")
+            success = getattr(self, f"_stage_{stage}")(record, self._stage_context(context, stage))
+
+            with self._lock:
+                record["updated_at"] = time.time()
+                if not success:
+                    record["status"] = FILE_FAILED
+                    record["error"] = f"阶段 {stage} 处理失败"
+                    self._save(record)
+                    return False
+
+                next_index = stages.index(stage) + 1
+                record["stage"] = stages[next_index] if next_index < len(stages) else FILE_DONE
+                self._save(record)
+
+        with self._lock:
+            record["status"] = FILE_DONE
+            record["updated_at"] = time.time()
+            self._save(record)
+
+        self.logger.info(f"录制文件处理完成: {record['path']} -> {record['final_file']}")
+        return True
+
+    def _stage_context(self, context: Dict[str, Any], stage: str) -> Dict[str, Any]:
+        """
+        为阶段生成执行上下文，上报的进度附带当前阶段名称
+        """
+        report_progress = context.get("report_progress")
+        if not report_progress:
+            return context
+        return dict(context, report_progress=lambda progress: report_progress(dict(progress, stage=stage)))
+
+    def _ffmpeg_path(self) -> str:
+        return config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg")
+
+    def _stage_merge(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        合并阶段：将同一场直播的多个分段无损拼接为一个FLV
+        """
+        try:
+            merge_segments(record["sources"], record["path"], cancel_event=context["cancel_event"])
+        except FFmpegCancelled:
+            return False
+        except (FLVError, OSError) as e:
+            self.logger.error(f"合并录制分段失败: {record['path']}: {e}")
+            return False
+        return True
+
+    def _stage_repair(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        修复阶段：截断FLV末尾不完整的标签，修复时间戳跳变（原地修改）
+        """
+        path = record["current_file"]
+        if not path.lower().endswith(".flv"):
+            return True
+
+        try:
+            removed = truncate_flv(path)
+            result = repair_timestamps(path, max_gap=config_manager.get("processor.repair_max_gap", 1000))
+        except (FLVError, OSError) as e:
+            # 无法解析的文件交给FFmpeg尝试处理
+            self.logger.warning(f"修复录制文件失败，跳过修复: {path}: {e}")
+            return True
+
+        if removed or result["discontinuities"]:
+            self.logger.info(f"已修复录制文件: {path}（截断 {removed} 字节，"
+                             f"修复时间戳跳变 {result['discontinuities']} 处）")
+        return True
+
+    def _stage_index(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        索引阶段：为原始FLV建立关键帧索引，按配置在onMetaData中写入关键帧表
+        """
+        path = record["path"]
+        if not path.lower().endswith(".flv"):
+            return True
+
+        try:
+            index = load_keyframe_index(path)
+            if config_manager.get("processor.inject_keyframes", False):
+                # 注入时同步更新已保存的索引
+                inject_keyframes(path, index)
+        except (FLVError, OSError) as e:
+            # 索引只用于加速定位，失败不影响后续处理
+            self.logger.warning(f"建立关键帧索引失败: {path}: {e}")
+        return True
+
+    def _stage_thumbnails(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        缩略图阶段：生成雪碧图、WebVTT和封面，以最低优先级运行，失败不影响后续处理
+        """
+        processor_config = self.get_processor_config(record["room"])
+        path = record["current_file"] if processor_config.get("delete_original") else record["path"]
+
+        generator = ThumbnailGenerator(self._ffmpeg_path())
+        try:
+            if generator.generate(path, cancel_event=context["cancel_event"]) is None:
+                self.logger.warning(f"生成缩略图失败，跳过: {path}")
+        except FFmpegCancelled:
+            return False
+        return True
+
+    def _stage_convert(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        转换阶段：FLV转MP4
+        """
+        input_file = record["current_file"]
+        output_file = os.path.splitext(input_file)[0] + ".mp4"
+
+        converter = VideoConverter(self._ffmpeg_path())
+        if not converter.convert_flv_to_mp4(input_file, output_file, cancel_event=context["cancel_event"],
+                                            progress_callback=context.get("report_progress")):
+            return False
+
+        record["current_file"] = output_file
+        return True
+
+    def _stage_watermark(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        水印阶段：为当前文件添加文字水印
+        """
+        input_file = record["current_file"]
+        name, ext = os.path.splitext(input_file)
+        output_file = f"{name}_watermark{ext}"
+        watermark_config = self.get_watermark_config(record["room"])
+
+        watermark_adder = WatermarkAdder(self._ffmpeg_path())
+        if not watermark_adder.add_text_watermark(
+            input_file,
+            output_file,
+            **self._watermark_options(watermark_config),
+            threads=context["threads"],
+            cancel_event=context["cancel_event"],
+            encoder_profile=select_profile(self.get_processor_config(record["room"])),
+            progress_callback=context.get("report_progress"),
+            parallel_workers=parallel_workers_for(context["threads"])
+        ):
+            return False
+
+        if input_file != record["path"]:
+            record["intermediates"].append(input_file)
+        record["current_file"] = output_file
+        return True
+
+    def _stage_convert_watermark(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        转换+水印阶段：一次FFmpeg调用直接从FLV生成带水印的MP4
+        """
+        input_file = record["current_file"]
+        output_file = os.path.splitext(input_file)[0] + "_watermark.mp4"
+        watermark_config = self.get_watermark_config(record["room"])
+
+        watermark_adder = WatermarkAdder(self._ffmpeg_path())
+        video_filter = watermark_adder.build_watermark_filter(**self._watermark_options(watermark_config))
+
+        converter = VideoConverter(self._ffmpeg_path())
+        if not converter.convert_flv_to_mp4(
+            input_file,
+            output_file,
+            cancel_event=context["cancel_event"],
+            video_filter=video_filter,
+            threads=context["threads"],
+            encoder_profile=select_profile(self.get_processor_config(record["room"])),
+            progress_callback=context.get("report_progress"),
+            parallel_workers=parallel_workers_for(context["threads"])
+        ):
+            return False
+
+        record["current_file"] = output_file
+        return True
+
+    def _stage_finalize(self, record: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """
+        收尾阶段：清理中间文件，按配置删除原始录制文件
+        """
+        for path in record["intermediates"]:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                self.logger.error(f"删除中间文件失败: {path}: {e}")
+        record["intermediates"] = []
+
+        processor_config = self.get_processor_config(record["room"])
+        if processor_config.get("delete_original") and record["current_file"] != record["path"]:
+            try:
+                os.remove(record["path"])
+                self.logger.info(f"已删除原文件: {record['path']}")
+            except OSError as e:
+                self.logger.error(f"删除原文件失败: {e}")
+
+        if record.get("sources") and get_merge_config()["delete_segments"]:
+            for path in record["sources"]:
+                for file in (path, path + ".kfindex"):
+                    try:
+                        if os.path.exists(file):
+                            os.remove(file)
+                    except OSError as e:
+                        self.logger.error(f"删除已合并的分段失败: {file}: {e}")
+
+        record["final_file"] = record["current_file"]
+        return True
+
+    def _watermark_options(self, watermark_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        将配置文件中的水印字段转换为WatermarkAdder参数
+        """
+        mapping = {
+            "text": "watermark_text",
+            "font": "font",
+            "font_size": "font_size",
+            "color": "font_color",
+            "position": "position",
+            "margin": "margin",
+            "opacity": "opacity",
+            "box": "box",
+            "box_color": "box_color",
+            "box_opacity": "box_opacity",
+            "mode": "mode"
+        }
+        return {arg: watermark_config[key] for key, arg in mapping.items() if key in watermark_config}
+
+    def _on_segment_opened(self, room: Dict[str, Any], path: str):
+        """
+        录制分段开始事件：按配置启动实时转封装
+        """
+        if path.lower().endswith(".flv") and self.is_live_remux(room):
+            live_remux.start(room, path)
+
+    def _on_segment_closed(self, room: Dict[str, Any], path: str):
+        """
+        录制分段结束事件
+        """
+        if not path.lower().endswith(".flv"):
+            return
+        # 正在实时转封装的文件等转封装结束（segment_remuxed事件）后再处理
+        if live_remux.finish(path):
+            return
+        # 合并分段的房间等整场录制结束后再分组处理
+        if self.is_merge(room):
+            return
+        self.submit_file(room, path)
+
+    def _on_segment_remuxed(self, room: Dict[str, Any], path: str, output_file: Optional[str]):
+        """
+        实时转封装结束事件，转封装失败时按普通录制文件处理
+        """
+        self.submit_file(room, path, remuxed_file=output_file)
+
+    def _on_recording_stopped(self, room: Dict[str, Any], output_dir: str):
+        """
+        整场录制结束事件：处理输出目录中尚未处理的录制文件
+        """
+        live_remux.finish_room(f"{room.get('platform', 'bilibili')}_{room.get('room_id')}")
+
+        if not output_dir or not os.path.isdir(output_dir):
+            return
+
+        with self._lock:
+            known = set(self._files)
+            known.update(source for record in self._files.values() for source in record.get("sources") or [])
+        # 早于保留时间的文件可能已处理过且记录已被删除，不再处理
+        cutoff = time.time() - self.retention
+
+        pending = []
+        for root, dirs, files in os.walk(output_dir):
+            # 跳过剪辑输出目录和临时目录
+            dirs[:] = [d for d in dirs if d != CLIP_DIR and not d.startswith(".")]
+            for file in sorted(files):
+                path = os.path.abspath(os.path.join(root, file))
+                if (file.lower().endswith(".flv") and not file.startswith(".") and path not in known
+                        and not live_remux.is_active(path) and self._modified_after(path, cutoff)):
+                    pending.append(path)
+
+        if not pending:
+            return
+        if self.is_merge(room):
+            # 分组需要扫描分段，在后台线程中进行，避免阻塞事件发布者
+            threading.Thread(target=self._submit_session, args=(room, pending), daemon=True).start()
+            return
+        for path in pending:
+            self.submit_file(room, path)
+
+    def _submit_session(self, room: Dict[str, Any], paths: List[str]):
+        """
+        将整场录制的分段按场次分组，多个分段的组先合并再处理
+        """
+        for group in plan_merge(paths, get_merge_config()["max_gap"]):
+            if len(group) == 1:
+                self.submit_file(room, group[0])
+            else:
+                self.submit_file(room, merged_file_name(group), sources=group)
+
+    @staticmethod
+    def _modified_after(path: str, cutoff: float) -> bool:
+        """
+        判断文件是否在指定时间之后修改过
+        """
+        try:
+            return os.path.getmtime(path) >= cutoff
+        except OSError:
+            return False
+
+    def _prune(self):
+        """
+        删除处理结束超过保留时间的记录（需持有锁）
+        """
+        cutoff = time.time() - self.retention
+        expired = [path for path, record in self._files.items()
+                   if record["status"] in (FILE_DONE, FILE_FAILED) and record["updated_at"] < cutoff]
+        for path in expired:
+            self._files.pop(path, None)
+            self._save({"path": path, "removed": True})
+
+    def _load(self):
+        """
+        从状态文件恢复处理记录（需持有锁）
+        """
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                content = f.read()
+        except Exception as e:
+            self.logger.error(f"加载处理状态文件失败: {e}")
+            return
+
+        legacy = content.lstrip().startswith("[")
+        if legacy:
+            # 旧版本的状态文件是整个记录列表
+            try:
+                lines = [json.dumps(record) for record in json.loads(content)]
+            except Exception as e:
+                self.logger.error(f"加载处理状态文件失败: {e}")
+                return
+        else:
+            lines = content.splitlines()
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 写入中断留下的不完整行
+                continue
+            if record.get("removed"):
+                self._files.pop(record["path"], None)
+            else:
+                self._files[record["path"]] = record
+        self._state_lines = len(lines)
+
+        self._prune()
+        if legacy or self._state_lines > len(self._files):
+            self._rewrite()
+
+    def _save(self, record: Dict[str, Any]):
+        """
+        将一条变化的处理记录追加到状态文件（需持有锁）
+
+        状态文件每行一条记录，加载时同一路径以最后一行为准；
+        行数超过记录数较多时重写为当前记录，每次状态变化只写入变化的记录。
+        """
+        if not self.state_file:
+            return
+
+        if self._state_lines >= 2 * len(self._files) + 100:
+            self._rewrite()
+            return
+
+        try:
+            state_dir = os.path.dirname(self.state_file)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            with open(self.state_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._state_lines += 1
+        except Exception as e:
+            self.logger.error(f"保存处理状态文件失败: {e}")
+
+    def _rewrite(self):
+        """
+        将全部处理记录重写到状态文件（需持有锁）
+        """
+        try:
+            state_dir = os.path.dirname(self.state_file)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                for record in self._files.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(temp_file, self.state_file)
+            self._state_lines = len(self._files)
+        except Exception as e:
+            self.logger.error(f"保存处理状态文件失败: {e}")
+
+
+# 全局处理流水线实例
+pipeline = PostProcessPipeline()
+job_queue.register_handler("pipeline", pipeline.run, cost=pipeline.job_cost)
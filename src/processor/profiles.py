@@ -0,0 +1,198 @@
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, Any, Optional, List
+from src.config.config import config_manager
+
+
+# 内置编码档位，可在配置文件processor.profiles中覆盖或新增
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "high": {"codec": "libx264", "preset": "medium", "crf": 20},
+    "medium": {"codec": "libx264", "preset": "veryfast", "crf": 23},
+    "low": {"codec": "libx264", "preset": "ultrafast", "crf": 28},
+    "high_compress": {"codec": "libx264", "preset": "slow", "crf": 23},
+    "medium_compress": {"codec": "libx264", "preset": "slow", "crf": 26},
+    "low_compress": {"codec": "libx264", "preset": "medium", "crf": 30}
+}
+
+
+def get_profiles() -> Dict[str, Dict[str, Any]]:
+    """
+    获取所有编码档位（内置档位被配置文件中的同名档位覆盖）
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 档位名称到档位参数的映射
+    """
+    profiles = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+    for name, profile in (config_manager.get("processor.profiles", {}) or {}).items():
+        merged = dict(profiles.get(name, {"codec": "libx264"}))
+        merged.update(profile or {})
+        profiles[name] = merged
+    return profiles
+
+
+def select_profile(processor_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    根据房间处理配置选择编码档位
+
+    优先使用processor.profile指定的档位名称，否则按quality选择，
+    compress为true时选择对应的压缩档位（更慢的预设换取更小的文件）。
+
+    Args:
+        processor_config: 房间处理配置
+
+    Returns:
+        Dict[str, Any]: 编码档位参数，包含name字段
+    """
+    profiles = get_profiles()
+
+    name = processor_config.get("profile")
+    if not name:
+        name = processor_config.get("quality") or config_manager.get("processor.default_profile", "medium")
+        if processor_config.get("compress") and f"{name}_compress" in profiles:
+            name = f"{name}_compress"
+
+    profile = profiles.get(name)
+    if profile is None:
+        name = "medium"
+        profile = profiles[name]
+
+    return dict(profile, name=name)
+
+
+def build_encoder_args(profile: Optional[Dict[str, Any]] = None, threads: int = 0) -> List[str]:
+    """
+    根据编码档位生成FFmpeg视频编码参数
+
+    Args:
+        profile: 编码档位，None表示使用FFmpeg默认参数
+        threads: 档位未指定线程数时使用的编码线程数，0表示由FFmpeg自动决定
+
+    Returns:
+        List[str]: FFmpeg参数列表
+    """
+    profile = profile or {}
+    args = ["-c:v", profile.get("codec", "libx264")]
+
+    if profile.get("preset"):
+        args.extend(["-preset", str(profile["preset"])])
+
+    # 指定码率时使用码率控制，否则使用CRF
+    if profile.get("bitrate"):
+        args.extend(["-b:v", str(profile["bitrate"])])
+        if profile.get("maxrate"):
+            args.extend(["-maxrate", str(profile["maxrate"]), "-bufsize", str(profile.get("bufsize", profile["maxrate"]))])
+    elif profile.get("crf") is not None:
+        args.extend(["-crf", str(profile["crf"])])
+
+    if profile.get("tune"):
+        args.extend(["-tune", str(profile["tune"])])
+
+    threads = profile.get("threads") or threads
+    if threads:
+        args.extend(["-threads", str(threads)])
+
+    return args
+
+
+def benchmark_profile(ffmpeg_path: str, sample_file: str, profile: Dict[str, Any], duration: int = 60,
+                      threads: int = 0) -> Dict[str, Any]:
+    """
+    用样例文件测试编码档位的速度和输出大小
+
+    Args:
+        ffmpeg_path: FFmpeg可执行文件路径
+        sample_file: 样例视频文件
+        profile: 编码档位
+        duration: 测试编码的时长（秒）
+        threads: 编码线程数
+
+    Returns:
+        Dict[str, Any]: 测试结果（帧数、耗时、编码帧率、输出大小），失败时包含error字段
+    """
+    with tempfile.TemporaryDirectory(prefix="2233recorder-bench-") as temp_dir:
+        output_file = os.path.join(temp_dir, "output.mp4")
+        cmd = [ffmpeg_path, "-hide_banner", "-i", sample_file, "-t", str(duration)]
+        cmd.extend(build_encoder_args(profile, threads))
+        cmd.extend(["-an", "-y", output_file])
+
+        start = time.time()
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.time() - start
+
+        if result.returncode != 0:
+            return {"name": profile.get("name"), "error": result.stderr.strip().splitlines()[-1:]}
+
+        frames = re.findall(r"frame=\s*(\d+)", result.stderr)
+        frame_count = int(frames[-1]) if frames else 0
+        size = os.path.getsize(output_file)
+
+    return {
+        "name": profile.get("name"),
+        "frames": frame_count,
+        "elapsed": elapsed,
+        "fps": frame_count / elapsed if elapsed > 0 else 0,
+        "size": size,
+        "bitrate_kbps": size * 8 / 1000 / duration if duration > 0 else 0
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    编码档位命令行工具
+
+    用法:
+        python -m src.processor.profiles list
+        python -m src.processor.profiles benchmark sample.flv --profiles high,medium --duration 60
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.processor.profiles", description="编码档位工具")
+    parser.add_argument("--config-dir", default="config", help="配置文件目录")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("list", help="列出所有编码档位")
+
+    bench_parser = subparsers.add_parser("benchmark", help="测试编码档位的速度和输出大小")
+    bench_parser.add_argument("sample", help="样例视频文件")
+    bench_parser.add_argument("--profiles", default="", help="要测试的档位，逗号分隔，默认全部")
+    bench_parser.add_argument("--duration", type=int, default=60, help="测试编码的时长（秒）")
+    bench_parser.add_argument("--threads", type=int, default=0, help="编码线程数，0表示由FFmpeg自动决定")
+
+    args = parser.parse_args(argv)
+
+    config_manager.config_dir = args.config_dir
+    config_manager.load_config()
+    profiles = get_profiles()
+
+    if args.command == "list":
+        for name, profile in profiles.items():
+            print(f"{name:<18} {' '.join(build_encoder_args(profile))}")
+        return 0
+
+    if args.command == "benchmark":
+        names = [name.strip() for name in args.profiles.split(",") if name.strip()] or list(profiles.keys())
+        ffmpeg_path = config_manager.get("processor.ffmpeg_path", "/usr/bin/ffmpeg")
+
+        print(f"{'档位':<18}{'帧数':>8}{'耗时(s)':>10}{'编码fps':>10}{'大小(MB)':>10}{'码率(kbps)':>12}")
+        for name in names:
+            if name not in profiles:
+                print(f"{name:<18} 未知档位")
+                continue
+            result = benchmark_profile(ffmpeg_path, args.sample, dict(profiles[name], name=name),
+                                       args.duration, args.threads)
+            if "error" in result:
+                print(f"{name:<18} 编码失败: {result['error']}")
+                continue
+            print(f"{name:<18}{result['frames']:>8}{result['elapsed']:>10.1f}{result['fps']:>10.1f}"
+                  f"{result['size'] / 1024 / 1024:>10.1f}{result['bitrate_kbps']:>12.0f}")
+        return 0
+
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
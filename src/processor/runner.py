@@ -0,0 +1,241 @@
+import re
+import time
+import shutil
+import subprocess
+import threading
+from collections import deque
+from typing import List, Optional, Tuple, Dict, Any, Callable
+
+
+# 每行最多读取的字符数，避免异常输出占用过多内存
+MAX_LINE_LENGTH = 4096
+
+DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+# 默认的卡死判定时间（秒）：超过该时间帧数和输出时间都没有前进时终止FFmpeg
+DEFAULT_STALL_TIMEOUT = 300
+
+
+class FFmpegCancelled(Exception):
+    """
+    FFmpeg任务被取消
+    """
+
+
+class ProgressParser:
+    """
+    FFmpeg -progress 输出解析类
+
+    逐行解析key=value格式的进度输出，每遇到一行progress=即得到一次完整的进度。
+    """
+
+    def __init__(self, duration: Optional[float] = None):
+        """
+        初始化进度解析器
+
+        Args:
+            duration: 输入文件时长（秒），用于计算百分比和剩余时间
+        """
+        self.duration = duration
+        self._block: Dict[str, str] = {}
+
+    def feed_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """
+        解析一行进度输出
+
+        Args:
+            line: 一行输出
+
+        Returns:
+            Optional[Dict[str, Any]]: 一组进度输出结束时返回进度信息，否则返回None
+        """
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+
+        self._block[key] = value.strip()
+        if key != "progress":
+            return None
+
+        block, self._block = self._block, {}
+        return self._build(block)
+
+    def _build(self, block: Dict[str, str]) -> Dict[str, Any]:
+        out_time = None
+        if block.get("out_time_us", "").lstrip("-").isdigit():
+            out_time = max(int(block["out_time_us"]), 0) / 1000000
+        elif block.get("out_time_ms", "").lstrip("-").isdigit():
+            # 旧版本FFmpeg的out_time_ms实际单位也是微秒
+            out_time = max(int(block["out_time_ms"]), 0) / 1000000
+
+        speed = _to_float(block.get("speed", "").rstrip("x"))
+        progress = {
+            "frame": _to_int(block.get("frame")),
+            "fps": _to_float(block.get("fps")),
+            "speed": speed,
+            "out_time": out_time,
+            "total_size": _to_int(block.get("total_size")),
+            "duration": self.duration,
+            "percent": None,
+            "eta": None,
+            "finished": block.get("progress") == "end",
+            "updated_at": time.time()
+        }
+
+        if self.duration and out_time is not None:
+            progress["percent"] = min(out_time / self.duration * 100, 100.0)
+            if speed:
+                progress["eta"] = max(self.duration - out_time, 0) / speed
+
+        return progress
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_ffmpeg(cmd: List[str],
+               timeout: Optional[float] = None,
+               cancel_event: Optional[threading.Event] = None,
+               progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+               stderr_tail_lines: int = 50,
+               low_priority: bool = False,
+               stall_timeout: Optional[float] = DEFAULT_STALL_TIMEOUT) -> Tuple[int, str]:
+    """
+    执行FFmpeg命令，支持超时、卡死检测、取消和实时进度
+
+    通过 -progress pipe:1 读取机器可读的进度输出并逐行解析，
+    错误输出只保留最后若干行，长时间任务不会在内存中累积全部输出。
+    进度（帧数或输出时间）长时间不前进时判定为卡死，编码时长与录像时长成正比，
+    长时间的重新编码不设总时长上限，只依靠卡死检测和取消事件结束。
+
+    Args:
+        cmd: 完整的FFmpeg命令，第一个元素为FFmpeg可执行文件路径
+        timeout: 总超时时间（秒），None表示不限制
+        cancel_event: 取消事件，被设置后终止FFmpeg进程
+        progress_callback: 进度回调，参数为进度信息（帧数、fps、速度、百分比、剩余时间等）
+        stderr_tail_lines: 保留的错误输出行数
+        low_priority: 以最低CPU和磁盘IO优先级运行（nice/ionice），避免影响正在进行的录制
+        stall_timeout: 进度不前进超过该时间（秒）时终止，None或0表示不检测
+
+    Returns:
+        Tuple[int, str]: (返回码, 最后若干行错误输出)
+
+    Raises:
+        subprocess.TimeoutExpired: 执行超时或卡死
+        FFmpegCancelled: 任务被取消
+    """
+    full_cmd = [cmd[0], "-nostats", "-progress", "pipe:1"] + list(cmd[1:])
+    if low_priority:
+        full_cmd = low_priority_prefix() + full_cmd
+    process = subprocess.Popen(
+        full_cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace"
+    )
+
+    parser = ProgressParser()
+    stderr_tail = deque(maxlen=stderr_tail_lines)
+    # 最近一次进度前进的时间和当时的 (帧数, 输出时间)
+    last_advance = [time.time(), None]
+
+    def read_stderr():
+        for line in iter(lambda: process.stderr.readline(MAX_LINE_LENGTH), ""):
+            if parser.duration is None:
+                match = DURATION_PATTERN.search(line)
+                if match:
+                    hours, minutes, seconds = match.groups()
+                    parser.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            stderr_tail.append(line.rstrip("\n"))
+
+    def read_progress():
+        for line in iter(lambda: process.stdout.readline(MAX_LINE_LENGTH), ""):
+            progress = parser.feed_line(line)
+            if progress:
+                position = (progress["frame"], progress["out_time"])
+                if position != last_advance[1]:
+                    last_advance[:] = [time.time(), position]
+            if progress and progress_callback:
+                try:
+                    progress_callback(progress)
+                except Exception:
+                    pass
+
+    readers = [
+        threading.Thread(target=read_stderr, daemon=True),
+        threading.Thread(target=read_progress, daemon=True)
+    ]
+    for reader in readers:
+        reader.start()
+
+    start = time.time()
+    try:
+        while True:
+            try:
+                process.wait(timeout=1)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            if cancel_event is not None and cancel_event.is_set():
+                _terminate(process)
+                raise FFmpegCancelled(" ".join(cmd))
+
+            now = time.time()
+            if timeout is not None and now - start >= timeout:
+                _terminate(process)
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+            if stall_timeout and now - last_advance[0] >= stall_timeout:
+                _terminate(process)
+                raise subprocess.TimeoutExpired(cmd, stall_timeout)
+    finally:
+        for reader in readers:
+            reader.join(timeout=5)
+        process.stdout.close()
+        process.stderr.close()
+
+    return process.returncode, "\n".join(stderr_tail)
+
+
+def low_priority_prefix() -> List[str]:
+    """
+    生成以最低优先级运行命令的前缀，系统中没有nice/ionice时省略对应部分
+
+    Returns:
+        List[str]: 命令前缀
+    """
+    prefix = []
+    ionice = shutil.which("ionice")
+    if ionice:
+        # 空闲IO调度：只在磁盘没有其他请求时读写，不与录制写入竞争
+        prefix += [ionice, "-c", "3", "-t"]
+    nice = shutil.which("nice")
+    if nice:
+        prefix += [nice, "-n", "19"]
+    return prefix
+
+
+def _terminate(process: subprocess.Popen):
+    """
+    终止FFmpeg进程，超时未退出则强制结束
+    """
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
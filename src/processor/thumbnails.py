@@ -0,0 +1,356 @@
+import os
+import math
+import json
+import time
+import struct
+import hashlib
+import threading
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+from src.config.config import config_manager
+from src.processor.flv import FLVReader, FLVError, TAG_VIDEO, TAG_HEADER_SIZE
+from src.processor.keyframes import load_keyframe_index
+from src.processor.runner import run_ffmpeg
+from src.processor.parallel import find_ffprobe, probe_duration
+
+
+logger = logging.getLogger("ThumbnailGenerator")
+
+# 缓存目录中的文件名
+META_FILE = "meta.json"
+VTT_FILE = "thumbnails.vtt"
+COVER_FILE = "cover.jpg"
+SPRITE_PATTERN = "sprite_%03d.jpg"
+
+
+def get_thumbnail_config() -> Dict[str, Any]:
+    """
+    获取缩略图配置
+
+    Returns:
+        Dict[str, Any]: 缩略图配置（enabled、interval、width、height、columns、rows、
+        cover_width、cover_position、quality、cache_dir）
+    """
+    data_dir = config_manager.get("system.data_dir", "/opt/2233recorder/data")
+    thumbnail_config = {
+        "enabled": False,
+        "interval": 60,
+        "width": 160,
+        "height": 90,
+        "columns": 10,
+        "rows": 10,
+        "cover_width": 640,
+        "cover_position": 0.1,
+        "quality": 5,
+        "cache_dir": os.path.join(data_dir, "thumbnails")
+    }
+    thumbnail_config.update(config_manager.get("processor.thumbnails", {}) or {})
+    return thumbnail_config
+
+
+def thumbnail_key(path: str, thumbnail_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    计算缓存键：文件路径、大小、修改时间和缩略图参数，文件变化或参数变化后重新生成
+
+    Args:
+        path: 录制文件路径
+        thumbnail_config: 缩略图配置，默认读取配置文件
+
+    Returns:
+        str: 缓存键
+
+    Raises:
+        OSError: 文件不存在
+    """
+    thumbnail_config = thumbnail_config or get_thumbnail_config()
+    stat = os.stat(path)
+    identity = "|".join(str(value) for value in (
+        os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+        thumbnail_config["interval"], thumbnail_config["width"], thumbnail_config["height"],
+        thumbnail_config["columns"], thumbnail_config["rows"], thumbnail_config["cover_width"]
+    ))
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16]
+
+
+def thumbnail_dir(path: str, thumbnail_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    获取录制文件的缩略图缓存目录
+    """
+    thumbnail_config = thumbnail_config or get_thumbnail_config()
+    return os.path.join(thumbnail_config["cache_dir"], thumbnail_key(path, thumbnail_config))
+
+
+def load_thumbnails(path: str) -> Optional[Dict[str, Any]]:
+    """
+    读取已生成的缩略图信息，不打开录制文件本身
+
+    Args:
+        path: 录制文件路径
+
+    Returns:
+        Optional[Dict[str, Any]]: 缩略图信息（含缓存目录dir），未生成或文件已变化返回None
+    """
+    try:
+        cache_dir = thumbnail_dir(path)
+        with open(os.path.join(cache_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    meta["dir"] = cache_dir
+    return meta
+
+
+def select_keyframes(times: List[int], interval: float) -> List[int]:
+    """
+    按间隔挑选关键帧：从第一个关键帧开始，每次选择距上一个选中关键帧不少于interval秒的关键帧
+
+    Args:
+        times: 关键帧时间（毫秒，升序）
+        interval: 间隔（秒）
+
+    Returns:
+        List[int]: 选中的关键帧序号
+    """
+    selected = []
+    next_time = None
+    for i, timestamp in enumerate(times):
+        if next_time is None or timestamp >= next_time:
+            selected.append(i)
+            next_time = timestamp + int(interval * 1000)
+    return selected
+
+
+def build_vtt(cue_times: List[Tuple[float, float]], thumbnail_config: Dict[str, Any]) -> str:
+    """
+    生成WebVTT缩略图轨道，每条cue指向雪碧图中的一个区域
+
+    Args:
+        cue_times: 每张缩略图对应的(开始, 结束)时间（秒）
+        thumbnail_config: 缩略图配置
+
+    Returns:
+        str: WebVTT内容
+    """
+    width = thumbnail_config["width"]
+    height = thumbnail_config["height"]
+    columns = thumbnail_config["columns"]
+    per_sheet = columns * thumbnail_config["rows"]
+
+    lines = ["WEBVTT", ""]
+    for i, (start, end) in enumerate(cue_times):
+        sheet, position = divmod(i, per_sheet)
+        row, column = divmod(position, columns)
+        lines.append(f"{_vtt_time(start)} --> {_vtt_time(end)}")
+        lines.append(f"{SPRITE_PATTERN % sheet}#xywh={column * width},{row * height},{width},{height}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _vtt_time(seconds: float) -> str:
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def _write_keyframes(path: str, offsets: List[int], output_file: str, video_header_offset: Optional[int]):
+    """
+    把选中的关键帧写成一个只有视频的小FLV，每帧间隔1秒
+    """
+    with FLVReader(path) as reader, open(output_file, "wb") as out:
+        out.write(b"FLV" + bytes((1, 0x01)) + struct.pack(">I", 9) + struct.pack(">I", 0))
+        tags = []
+        if video_header_offset is not None:
+            tags.append((next(reader.tags(start=video_header_offset)), 0))
+        for i, offset in enumerate(offsets):
+            tags.append((next(reader.tags(start=offset)), i * 1000))
+
+        for tag, timestamp in tags:
+            header = bytes((TAG_VIDEO,)) + tag.data_size.to_bytes(3, "big")
+            header += (timestamp & 0xFFFFFF).to_bytes(3, "big") + bytes(((timestamp >> 24) & 0xFF,)) + b"\x00\x00\x00"
+            out.write(header)
+            out.write(reader.tag_data(tag))
+            out.write(struct.pack(">I", TAG_HEADER_SIZE + tag.data_size))
+
+
+class ThumbnailGenerator:
+    """
+    缩略图生成类
+
+    为录制文件生成按固定间隔截取的雪碧图（配合WebVTT在播放器进度条上预览）和封面图。
+    只解码关键帧：FLV文件借助关键帧索引只读取选中的关键帧，其他格式使用 -skip_frame nokey。
+    FFmpeg以最低CPU和IO优先级运行，结果按文件路径、大小和修改时间缓存。
+    """
+
+    def __init__(self, ffmpeg_path: str = "/usr/bin/ffmpeg", thumbnail_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化缩略图生成器
+
+        Args:
+            ffmpeg_path: FFmpeg可执行文件路径
+            thumbnail_config: 缩略图配置，默认读取配置文件
+        """
+        self.ffmpeg_path = ffmpeg_path
+        self.thumbnail_config = thumbnail_config or get_thumbnail_config()
+
+    def generate(self, input_file: str, force: bool = False,
+                 cancel_event: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+        """
+        生成缩略图，缓存有效时直接返回
+
+        Args:
+            input_file: 录制文件路径
+            force: 是否忽略缓存重新生成
+            cancel_event: 取消事件
+
+        Returns:
+            Optional[Dict[str, Any]]: 缩略图信息（sheets、vtt、cover、count等），失败返回None
+        """
+        config = self.thumbnail_config
+        try:
+            cache_dir = thumbnail_dir(input_file, config)
+        except OSError as e:
+            logger.error(f"录制文件不存在: {input_file}: {e}")
+            return None
+
+        meta_file = os.path.join(cache_dir, META_FILE)
+        if not force and os.path.exists(meta_file):
+            try:
+                with open(meta_file, "r", encoding="utf-8") as f:
+                    return dict(json.load(f), dir=cache_dir)
+            except (OSError, ValueError):
+                pass
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
+
+        begin = time.time()
+        try:
+            if input_file.lower().endswith(".flv"):
+                cue_times = self._generate_from_index(input_file, cache_dir, cancel_event)
+            else:
+                cue_times = self._generate_from_stream(input_file, cache_dir, cancel_event)
+        except (FLVError, OSError) as e:
+            logger.error(f"生成缩略图失败: {input_file}: {e}")
+            return None
+        if not cue_times:
+            return None
+
+        sheets = sorted(name for name in os.listdir(cache_dir) if name.startswith("sprite_"))
+        with open(os.path.join(cache_dir, VTT_FILE), "w", encoding="utf-8") as f:
+            f.write(build_vtt(cue_times, config))
+
+        meta = {
+            "source": os.path.abspath(input_file),
+            "count": len(cue_times),
+            "duration": cue_times[-1][1],
+            "interval": config["interval"],
+            "width": config["width"],
+            "height": config["height"],
+            "columns": config["columns"],
+            "rows": config["rows"],
+            "sheets": sheets,
+            "vtt": VTT_FILE,
+            "cover": COVER_FILE if os.path.exists(os.path.join(cache_dir, COVER_FILE)) else None,
+            "created_at": time.time()
+        }
+        temp_file = f"{meta_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_file, meta_file)
+
+        logger.info(f"已生成缩略图: {input_file}（{len(cue_times)} 张，{len(sheets)} 张雪碧图，"
+                    f"耗时 {time.time() - begin:.1f} 秒）")
+        return dict(meta, dir=cache_dir)
+
+    def _tile_filter(self, select: Optional[str] = None) -> str:
+        config = self.thumbnail_config
+        width, height = config["width"], config["height"]
+        filters = [select] if select else []
+        filters += [
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+            f"tile={config['columns']}x{config['rows']}"
+        ]
+        return ",".join(filters)
+
+    def _run(self, cmd: List[str], cancel_event: Optional[threading.Event]) -> bool:
+        returncode, stderr = run_ffmpeg(cmd, timeout=1800, cancel_event=cancel_event, low_priority=True)
+        if returncode != 0:
+            logger.error(f"FFmpeg生成缩略图失败: {stderr}")
+            return False
+        return True
+
+    def _generate_from_index(self, input_file: str, cache_dir: str,
+                             cancel_event: Optional[threading.Event]) -> List[Tuple[float, float]]:
+        """
+        借助关键帧索引只读取选中的关键帧，写成一个小FLV后交给FFmpeg解码
+        """
+        config = self.thumbnail_config
+        index = load_keyframe_index(input_file)
+        if not len(index):
+            raise FLVError(f"文件中没有关键帧: {input_file}")
+
+        first = index.first_timestamp or 0
+        times = [timestamp - first for timestamp in index.times]
+        selected = select_keyframes(times, config["interval"])
+        starts = [times[i] / 1000 for i in selected]
+        cue_times = list(zip(starts, starts[1:] + [max(index.duration, starts[-1])]))
+
+        # 封面取指定位置附近的关键帧（避开开头的黑屏或等待画面）
+        cover = min(range(len(selected)), key=lambda i: abs(starts[i] - index.duration * config["cover_position"]))
+
+        keyframes_file = os.path.join(cache_dir, ".keyframes.flv")
+        _write_keyframes(input_file, [index.offsets[i] for i in selected], keyframes_file, index.video_header_offset)
+        try:
+            cmd = [self.ffmpeg_path, "-hide_banner", "-y", "-i", keyframes_file, "-an",
+                   "-filter_complex",
+                   f"[0:v]split=2[sprite][cover];[sprite]{self._tile_filter()}[tiles];"
+                   f"[cover]select='eq(n\\,{cover})',scale={config['cover_width']}:-2[poster]",
+                   "-map", "[tiles]", "-q:v", str(config["quality"]), "-start_number", "0",
+                   os.path.join(cache_dir, SPRITE_PATTERN),
+                   "-map", "[poster]", "-frames:v", "1", "-q:v", "3", os.path.join(cache_dir, COVER_FILE)]
+            if not self._run(cmd, cancel_event):
+                return []
+        finally:
+            os.remove(keyframes_file)
+        return cue_times
+
+    def _generate_from_stream(self, input_file: str, cache_dir: str,
+                              cancel_event: Optional[threading.Event]) -> List[Tuple[float, float]]:
+        """
+        没有关键帧索引的文件：解码器跳过非关键帧，由select滤镜按间隔挑选
+
+        缩略图的实际时间取决于关键帧位置，WebVTT按配置间隔近似标注。
+        """
+        config = self.thumbnail_config
+        interval = config["interval"]
+        select = f"select='isnan(prev_selected_t)+gte(t-prev_selected_t\\,{interval})'"
+        cmd = [self.ffmpeg_path, "-hide_banner", "-y", "-skip_frame", "nokey", "-i", input_file, "-an", "-sn", "-dn",
+               "-vf", self._tile_filter(select), "-vsync", "vfr", "-q:v", str(config["quality"]),
+               "-start_number", "0", os.path.join(cache_dir, SPRITE_PATTERN)]
+        if not self._run(cmd, cancel_event):
+            return []
+
+        sheets = [name for name in os.listdir(cache_dir) if name.startswith("sprite_")]
+        if not sheets:
+            return []
+
+        capacity = len(sheets) * config["columns"] * config["rows"]
+        duration = probe_duration(find_ffprobe(self.ffmpeg_path), input_file)
+        if duration:
+            count = min(max(math.ceil(duration / interval), 1), capacity)
+        else:
+            # 无法获取时长时按雪碧图数量估算（最后一张雪碧图按满格计算）
+            count = capacity
+            duration = count * interval
+        cue_times = [(i * interval, min((i + 1) * interval, duration)) for i in range(count)]
+
+        cmd = [self.ffmpeg_path, "-hide_banner", "-y", "-skip_frame", "nokey",
+               "-ss", str(duration * config["cover_position"]), "-i", input_file, "-an",
+               "-vf", f"scale={config['cover_width']}:-2", "-frames:v", "1", "-q:v", "3",
+               os.path.join(cache_dir, COVER_FILE)]
+        self._run(cmd, cancel_event)
+        return cue_times
@@ -1,7 +1,17 @@
 import os
+import re
+import json
+import hashlib
 import subprocess
-from typing import Optional, Dict, Any
+import threading
+from functools import lru_cache
+from typing import Optional, Dict, Any, Callable
 import logging
+from src.config.config import config_manager
+from src.processor.runner import run_ffmpeg, FFmpegCancelled, DEFAULT_STALL_TIMEOUT
+from src.processor.parallel import parallel_encode, get_parallel_config
+from src.processor.profiles import build_encoder_args
+from src.processor.manifest import ProcessedManifest
 
 
 class WatermarkAdder:
@@ -9,14 +19,19 @@ class WatermarkAdder:
     水印添加类
     """
     
-    def __init__(self, ffmpeg_path: str = "/usr/bin/ffmpeg"):
+    def __init__(self, ffmpeg_path: str = "/usr/bin/ffmpeg", cache_dir: Optional[str] = None):
         """
         初始化水印添加器
         
         Args:
             ffmpeg_path: FFmpeg可执行文件路径
+            cache_dir: 预渲染水印图片的缓存目录，默认为数据目录下的watermarks
         """
         self.ffmpeg_path = ffmpeg_path
+        if not cache_dir:
+            data_dir = config_manager.get("system.data_dir", "/opt/2233recorder/data")
+            cache_dir = config_manager.get("processor.watermark.cache_dir", os.path.join(data_dir, "watermarks"))
+        self.cache_dir = cache_dir
         self.logger = logging.getLogger("WatermarkAdder")
     
     def add_text_watermark(self, 
@@ -32,7 +47,13 @@ class WatermarkAdder:
                          box: bool = True,
                          box_color: str = "black",
                          box_opacity: float = 0.5,
-                         delete_original: bool = False) -> bool:
+                         delete_original: bool = False,
+                         threads: int = 0,
+                         cancel_event: Optional[threading.Event] = None,
+                         encoder_profile: Optional[Dict[str, Any]] = None,
+                         progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         parallel_workers: int = 0,
+                         mode: str = "overlay") -> bool:
         """
         为视频添加文字水印
         
@@ -50,6 +71,12 @@ class WatermarkAdder:
             box_color: 背景框颜色
             box_opacity: 背景框透明度（0-1）
             delete_original: 处理完成后是否删除原文件
+            threads: 编码线程数，0表示由FFmpeg自动决定
+            cancel_event: 取消事件，被设置后终止处理
+            encoder_profile: 编码档位（预设、CRF/码率、线程数、tune），None表示使用FFmpeg默认参数
+            progress_callback: 进度回调，参数为FFmpeg进度信息
+            parallel_workers: 分块并行编码的进程数，大于1时启用，失败时退回单次编码
+            mode: 水印方式，overlay为叠加预渲染的水印图片，drawtext为逐帧绘制文字
             
         Returns:
             bool: 添加水印成功返回True，失败返回False
@@ -70,27 +97,19 @@ class WatermarkAdder:
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
         
-        # 计算水印位置
-        x, y = self._calculate_position(position, margin)
-        
-        # 构建drawtext滤镜参数
-        drawtext_params = []
-        
-        # 文字基本参数
-        drawtext_params.append(f"text='{watermark_text}'")
-        drawtext_params.append(f"fontfile={font}")
-        drawtext_params.append(f"fontsize={font_size}")
-        drawtext_params.append(f"fontcolor={font_color}@{opacity}")
-        drawtext_params.append(f"x={x}")
-        drawtext_params.append(f"y={y}")
-        
-        # 背景框参数
-        if box:
-            drawtext_params.append(f"box=1")
-            drawtext_params.append(f"boxcolor={box_color}@{box_opacity}")
-            drawtext_params.append(f"boxborderw=5")
-        
-        drawtext_filter = f"drawtext={':'.join(drawtext_params)}"
+        drawtext_filter = self.build_watermark_filter(
+            mode=mode,
+            watermark_text=watermark_text,
+            font=font,
+            font_size=font_size,
+            font_color=font_color,
+            position=position,
+            margin=margin,
+            opacity=opacity,
+            box=box,
+            box_color=box_color,
+            box_opacity=box_opacity
+        )
         
         try:
             # 构建FFmpeg命令
@@ -99,24 +118,42 @@ class WatermarkAdder:
                 "-i", input_file,
                 "-vf", drawtext_filter,
                 "-c:a", "copy",  # 复制音频流，不重新编码
+            ]
+            
+            # 编码参数，线程数限制避免与其他任务争抢CPU
+            cmd.extend(build_encoder_args(encoder_profile, threads))
+            
+            cmd.extend([
                 "-y",  # 覆盖输出文件
                 output_file
-            ]
+            ])
             
             self.logger.info(f"开始添加水印: {input_file} -> {output_file}")
             self.logger.info(f"水印参数: {drawtext_filter}")
             
-            # 执行命令
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=3600  # 1小时超时
-            )
+            parallel_config = get_parallel_config()
+            if parallel_workers > 1 and parallel_encode(
+                    self.ffmpeg_path,
+                    input_file,
+                    output_file,
+                    drawtext_filter,
+                    encoder_profile=encoder_profile,
+                    workers=parallel_workers,
+                    threads=threads,
+                    min_duration=parallel_config["min_duration"],
+                    chunks_per_worker=parallel_config["chunks_per_worker"],
+                    cancel_event=cancel_event,
+                    progress_callback=progress_callback):
+                returncode, stderr = 0, ""
+            else:
+                # 执行命令
+                # 编码时长随录像时长增长，不限制总时长，只在进度长时间不前进时终止
+                returncode, stderr = run_ffmpeg(cmd, cancel_event=cancel_event,
+                                                progress_callback=progress_callback,
+                                                stall_timeout=config_manager.get("processor.stall_timeout", DEFAULT_STALL_TIMEOUT))
             
             # 检查结果
-            if result.returncode == 0:
+            if returncode == 0:
                 self.logger.info(f"添加水印成功: {input_file} -> {output_file}")
                 
                 # 删除原文件
@@ -129,18 +166,190 @@ class WatermarkAdder:
                 
                 return True
             else:
-                self.logger.error(f"添加水印失败，返回码: {result.returncode}")
-                self.logger.error(f"错误输出: {result.stderr}")
+                self.logger.error(f"添加水印失败，返回码: {returncode}")
+                self.logger.error(f"错误输出: {stderr}")
                 return False
         
         except subprocess.TimeoutExpired:
-            self.logger.error(f"添加水印超时: {input_file}")
+            self.logger.error(f"添加水印超时（进度长时间未前进）: {input_file}")
+            return False
+        
+        except FFmpegCancelled:
+            self.logger.warning(f"添加水印已取消: {input_file}")
             return False
         
         except Exception as e:
             self.logger.error(f"添加水印过程中发生错误: {e}")
             return False
     
+    def build_watermark_filter(self, mode: str = "overlay", **options) -> str:
+        """
+        构建水印滤镜
+        
+        overlay方式把水印文字预先渲染成透明PNG图片（按参数缓存），编码时只需逐帧叠加图片，
+        不再逐帧排版和光栅化文字；图片渲染失败时退回drawtext方式。
+        
+        Args:
+            mode: 水印方式，overlay或drawtext
+            **options: 水印参数，含义同add_text_watermark
+            
+        Returns:
+            str: 视频滤镜字符串
+        """
+        if mode == "overlay":
+            image_file = self.render_watermark_image(**{k: v for k, v in options.items()
+                                                        if k not in ("position", "margin")})
+            if image_file:
+                x, y = self._calculate_overlay_position(options.get("position", "bottom-right"),
+                                                        options.get("margin", 10))
+                return f"movie='{_escape_filter_path(image_file)}'[watermark];[in][watermark]overlay=x={x}:y={y}[out]"
+            self.logger.warning("水印图片渲染失败，使用drawtext方式")
+        
+        return self.build_drawtext_filter(**options)
+    
+    def render_watermark_image(self,
+                               watermark_text: str = "2233recorder录制",
+                               font: str = "wqy-microhei",
+                               font_size: int = 24,
+                               font_color: str = "white",
+                               opacity: float = 0.8,
+                               box: bool = True,
+                               box_color: str = "black",
+                               box_opacity: float = 0.5) -> Optional[str]:
+        """
+        将水印文字渲染为透明PNG图片，相同参数只渲染一次
+        
+        先在足够大的透明画布上绘制文字，再用bbox滤镜找出不透明区域并裁剪，
+        得到与文字（含背景框）大小一致的图片，保证叠加位置与drawtext方式相同。
+        
+        Returns:
+            Optional[str]: 水印图片路径，渲染失败返回None
+        """
+        font_file = resolve_font_file(font)
+        params = {
+            "text": watermark_text,
+            "font": font_file or font,
+            "font_size": font_size,
+            "font_color": font_color,
+            "opacity": opacity,
+            "box": box,
+            "box_color": box_color,
+            "box_opacity": box_opacity
+        }
+        key = hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+        image_file = os.path.join(self.cache_dir, f"watermark_{key}.png")
+        if os.path.exists(image_file):
+            return image_file
+        
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            self.logger.error(f"创建水印图片缓存目录失败: {e}")
+            return None
+        
+        border = 5 if box else 0
+        # 画布按每个字符占一个字号宽度估算，足够容纳中文和英文
+        width = int(len(watermark_text) * font_size * 1.2 + border * 2 + 16)
+        height = int(font_size * 2 + border * 2 + 16)
+        drawtext_filter = self.build_drawtext_filter(
+            watermark_text=watermark_text,
+            font=font,
+            font_size=font_size,
+            font_color=font_color,
+            position="top-left",
+            margin=border + 8,
+            opacity=opacity,
+            box=box,
+            box_color=box_color,
+            box_opacity=box_opacity
+        )
+        
+        canvas_file = os.path.join(self.cache_dir, f".canvas_{key}_{os.getpid()}_{threading.get_ident()}.png")
+        temp_file = os.path.join(self.cache_dir, f".watermark_{key}_{os.getpid()}_{threading.get_ident()}.png")
+        try:
+            # 1. 在透明画布上绘制文字
+            cmd = [self.ffmpeg_path, "-hide_banner", "-f", "lavfi",
+                   "-i", f"color=c=black@0.0:s={width}x{height}:d=1,format=rgba",
+                   "-vf", drawtext_filter, "-frames:v", "1", "-y", canvas_file]
+            returncode, stderr = run_ffmpeg(cmd, timeout=60)
+            if returncode != 0:
+                self.logger.error(f"渲染水印图片失败: {stderr}")
+                return None
+            
+            # 2. 找出不透明区域
+            cmd = [self.ffmpeg_path, "-hide_banner", "-i", canvas_file, "-vf", "alphaextract,bbox",
+                   "-f", "null", "-"]
+            returncode, stderr = run_ffmpeg(cmd, timeout=60)
+            match = re.search(r"crop=(\d+):(\d+):(\d+):(\d+)", stderr)
+            if returncode != 0 or not match:
+                self.logger.error(f"计算水印图片区域失败: {stderr}")
+                return None
+            
+            # 3. 裁剪为文字大小
+            cmd = [self.ffmpeg_path, "-hide_banner", "-i", canvas_file,
+                   "-vf", f"crop={':'.join(match.groups())}", "-frames:v", "1", "-y", temp_file]
+            returncode, stderr = run_ffmpeg(cmd, timeout=60)
+            if returncode != 0:
+                self.logger.error(f"裁剪水印图片失败: {stderr}")
+                return None
+            
+            os.replace(temp_file, image_file)
+            self.logger.info(f"已生成水印图片: {image_file}")
+            return image_file
+        
+        except Exception as e:
+            self.logger.error(f"渲染水印图片过程中发生错误: {e}")
+            return None
+        
+        finally:
+            for path in (canvas_file, temp_file):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def build_drawtext_filter(self,
+                              watermark_text: str = "2233recorder录制",
+                              font: str = "wqy-microhei",
+                              font_size: int = 24,
+                              font_color: str = "white",
+                              position: str = "bottom-right",
+                              margin: int = 10,
+                              opacity: float = 0.8,
+                              box: bool = True,
+                              box_color: str = "black",
+                              box_opacity: float = 0.5) -> str:
+        """
+        构建文字水印的drawtext滤镜，参数含义同add_text_watermark
+        
+        Returns:
+            str: drawtext滤镜字符串
+        """
+        # 计算水印位置
+        x, y = self._calculate_position(position, margin)
+        
+        # 构建drawtext滤镜参数
+        drawtext_params = []
+        
+        # 文字基本参数
+        drawtext_params.append(f"text='{_escape_drawtext(watermark_text)}'")
+        font_file = resolve_font_file(font)
+        if font_file:
+            drawtext_params.append(f"fontfile='{_escape_filter_path(font_file)}'")
+        else:
+            # 无法解析为字体文件时交给FFmpeg按字体名称查找（需要fontconfig支持）
+            drawtext_params.append(f"font='{font}'")
+        drawtext_params.append(f"fontsize={font_size}")
+        drawtext_params.append(f"fontcolor={font_color}@{opacity}")
+        drawtext_params.append(f"x={x}")
+        drawtext_params.append(f"y={y}")
+        
+        # 背景框参数
+        if box:
+            drawtext_params.append(f"box=1")
+            drawtext_params.append(f"boxcolor={box_color}@{box_opacity}")
+            drawtext_params.append(f"boxborderw=5")
+        
+        return f"drawtext={':'.join(drawtext_params)}"
+    
     def _calculate_position(self, position: str, margin: int) -> tuple:
         """
         计算水印位置
@@ -163,19 +372,41 @@ class WatermarkAdder:
         
         return position_mapping.get(position, (f"{margin}", f"main_h - text_h - {margin}"))
     
+    def _calculate_overlay_position(self, position: str, margin: int) -> tuple:
+        """
+        计算水印图片的叠加位置，位置含义与_calculate_position相同
+        
+        Returns:
+            tuple: (x坐标表达式, y坐标表达式)
+        """
+        position_mapping = {
+            "top-left": (f"{margin}", f"{margin}"),
+            "top-right": (f"main_w-overlay_w-{margin}", f"{margin}"),
+            "bottom-left": (f"{margin}", f"main_h-overlay_h-{margin}"),
+            "bottom-right": (f"main_w-overlay_w-{margin}", f"main_h-overlay_h-{margin}"),
+            "center": ("(main_w-overlay_w)/2", "(main_h-overlay_h)/2")
+        }
+        
+        return position_mapping.get(position, (f"{margin}", f"main_h-overlay_h-{margin}"))
+    
     def batch_add_watermark(self, 
                           input_dir: str, 
                           output_dir: Optional[str] = None, 
                           watermark_config: Optional[Dict[str, Any]] = None,
-                          delete_original: bool = False) -> int:
+                          delete_original: bool = False,
+                          use_manifest: bool = True) -> int:
         """
         批量为目录中的视频添加水印
         
+        水印输出文件（_watermark后缀）不会被再次处理；使用处理清单时，
+        已用相同水印配置处理过且源文件未变化的文件会被跳过。
+        
         Args:
             input_dir: 输入目录
             output_dir: 输出目录，默认与输入目录相同
             watermark_config: 水印配置
             delete_original: 处理完成后是否删除原文件
+            use_manifest: 是否使用处理清单跳过已完成的文件
             
         Returns:
             int: 成功添加水印的文件数量
@@ -212,7 +443,14 @@ class WatermarkAdder:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
+        manifest = None
+        params_tag = None
+        if use_manifest:
+            manifest = ProcessedManifest(os.path.join(output_dir, ".watermark_manifest.json"), base_dir=input_dir)
+            params_tag = hashlib.sha1(json.dumps(default_config, sort_keys=True).encode()).hexdigest()
+        
         success_count = 0
+        skipped_count = 0
         
         # 支持的视频格式
         supported_formats = [".mp4", ".flv", ".avi", ".mkv", ".mov"]
@@ -221,10 +459,16 @@ class WatermarkAdder:
         for root, dirs, files in os.walk(input_dir):
             for file in files:
                 # 检查文件格式是否支持
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in supported_formats:
+                file_stem, file_ext = os.path.splitext(file)
+                if file_ext.lower() in supported_formats:
                     input_file = os.path.join(root, file)
                     
+                    # 跳过水印输出文件和未完成的临时文件
+                    if file_stem.endswith("_watermark") or file_stem.endswith(".part"):
+                        continue
+                    if manifest and manifest.is_output(input_file):
+                        continue
+                    
                     # 构建输出文件路径
                     if output_dir == input_dir:
                         # 添加_watermark后缀
@@ -239,14 +483,80 @@ class WatermarkAdder:
                         name, ext = os.path.splitext(file)
                         output_file = os.path.join(output_subdir, f"{name}_watermark{ext}")
                     
-                    # 执行添加水印
-                    if self.add_text_watermark(
+                    # 已处理且源文件未变化则跳过
+                    if manifest and manifest.is_done(input_file, output_file, params_tag):
+                        skipped_count += 1
+                        continue
+                    
+                    # 先写入临时文件，成功后再重命名
+                    name, ext = os.path.splitext(output_file)
+                    temp_file = f"{name}.part{ext}"
+                    if not self.add_text_watermark(
                         input_file=input_file,
-                        output_file=output_file,
-                        delete_original=delete_original,
+                        output_file=temp_file,
                         **default_config
                     ):
-                        success_count += 1
+                        if os.path.exists(temp_file):
+                            os.remove(temp_file)
+                        if manifest:
+                            manifest.mark_failed(input_file, "添加水印失败")
+                        continue
+                    
+                    os.replace(temp_file, output_file)
+                    if manifest:
+                        manifest.mark_done(input_file, output_file, params_tag)
+                    success_count += 1
+                    
+                    # 删除原文件
+                    if delete_original:
+                        try:
+                            os.remove(input_file)
+                            self.logger.info(f"已删除原文件: {input_file}")
+                        except Exception as e:
+                            self.logger.error(f"删除原文件失败: {e}")
+        
+        if manifest:
+            manifest.save()
         
-        self.logger.info(f"批量添加水印完成，成功处理 {success_count} 个文件")
-        return success_count
\ No newline at end of file
+        self.logger.info(f"批量添加水印完成，成功处理 {success_count} 个文件，跳过 {skipped_count} 个已处理文件")
+        return success_count
+
+
+@lru_cache(maxsize=64)
+def resolve_font_file(font: str) -> Optional[str]:
+    """
+    将字体名称解析为字体文件路径（通过fc-match），已是文件路径时直接返回
+
+    Args:
+        font: 字体名称或字体文件路径
+
+    Returns:
+        Optional[str]: 字体文件路径，无法解析返回None
+    """
+    if not font:
+        return None
+    if os.path.isfile(font):
+        return font
+
+    try:
+        result = subprocess.run(["fc-match", "-f", "%{file}", font], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True, timeout=10)
+    except (subprocess.SubprocessError, OSError):
+        return None
+
+    path = result.stdout.strip()
+    return path if result.returncode == 0 and path and os.path.isfile(path) else None
+
+
+def _escape_drawtext(text: str) -> str:
+    """
+    转义drawtext的text参数（单引号内）中的特殊字符
+    """
+    return text.replace("\\", "\\\\").replace("'", "'\\''").replace("%", "\\%").replace(":", "\\:")
+
+
+def _escape_filter_path(path: str) -> str:
+    """
+    转义滤镜参数（单引号内）中的文件路径
+    """
+    return path.replace("'", "'\\''")
@@ -2,8 +2,13 @@ import os
 import subprocess
 import time
 import json
+import logging
 from typing import Dict, Any, Optional
+from src.api.bilibili_api import BilibiliAPI
 from src.recorder.updater import RecorderUpdater
+from src.recorder.supervisor import RecordSupervisor
+from src.utils.events import event_bus
+from src.utils.tracing import tracer
 
 
 class Recorder:
@@ -15,8 +20,11 @@ class Recorder:
         """
         初始化录制核心
         """
+        self.logger = logging.getLogger("Recorder")
         self.updater = RecorderUpdater()
+        self.bilibili_api = BilibiliAPI()
         self.record_processes = {}  # 存储正在运行的录制进程
+        self.supervisor = RecordSupervisor(self, live_checker=self._is_room_live)
     
     def start_recording(self, room: Dict[str, Any], title: str, anchor_name: str) -> Optional[subprocess.Popen]:
         """
@@ -36,7 +44,7 @@ class Recorder:
         
         # 检查录播姬是否已安装，如未安装则自动下载
         if not self._check_recorder(platform):
-            print(f"录播姬未安装或无法更新，无法录制 {platform} 房间 {room_id}")
+            self.logger.warning(f"录播姬未安装或无法更新，无法录制 {platform} 房间 {room_id}", extra={"room": room_key})
             return None
         
         # 创建录制配置
@@ -44,6 +52,36 @@ class Recorder:
         if not record_config:
             return None
         
+        return self._spawn_process(room, record_config)
+    
+    def restart_recording(self, room: Dict[str, Any], record_config: Dict[str, Any]) -> Optional[subprocess.Popen]:
+        """
+        使用已有的录制配置重新启动录制进程（供守护器自动重启使用，不再检查更新）
+        
+        Args:
+            room: 房间配置
+            record_config: 录制配置
+            
+        Returns:
+            Optional[subprocess.Popen]: 录制进程实例，失败返回None
+        """
+        return self._spawn_process(room, record_config)
+    
+    def _spawn_process(self, room: Dict[str, Any], record_config: Dict[str, Any]) -> Optional[subprocess.Popen]:
+        """
+        启动录制进程并交由守护器监视
+        
+        Args:
+            room: 房间配置
+            record_config: 录制配置
+            
+        Returns:
+            Optional[subprocess.Popen]: 录制进程实例，失败返回None
+        """
+        room_id = room.get("room_id")
+        platform = room.get("platform", "bilibili")
+        room_key = f"{platform}_{room_id}"
+        
         # 获取录播姬可执行文件路径
         recorder_path = self.updater.get_executable_path("bililive_recorder")
         if not recorder_path:
@@ -51,13 +89,14 @@ class Recorder:
         
         try:
             # 启动录制进程
-            process = subprocess.Popen(
-                [recorder_path, "run", record_config["work_dir"]],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=os.path.dirname(recorder_path)
-            )
+            with tracer.span("recorder.spawn", room=room_key):
+                process = subprocess.Popen(
+                    [recorder_path, "run", record_config["work_dir"]],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    cwd=os.path.dirname(recorder_path)
+                )
             
             # 保存进程信息
             self.record_processes[room_key] = {
@@ -66,11 +105,15 @@ class Recorder:
                 "start_time": time.time()
             }
             
-            print(f"已启动录制进程，PID: {process.pid}")
+            # 交由守护器监视进程退出和输出卡死
+            self.supervisor.watch(room_key, room, process, record_config)
+            
+            self.logger.info(f"已启动录制进程，PID: {process.pid}", extra={"room": room_key})
+            event_bus.publish("recording_started", room=room, record_config=record_config)
             return process
         
         except Exception as e:
-            print(f"启动录制进程失败: {e}")
+            self.logger.error(f"启动录制进程失败: {e}", extra={"room": room_key})
             return None
     
     def stop_recording(self, room: Dict[str, Any]) -> bool:
@@ -87,38 +130,63 @@ class Recorder:
         platform = room.get("platform", "bilibili")
         room_key = f"{platform}_{room_id}"
         
+        # 先取消守护，避免主动停止被当作崩溃而重启
+        restart_pending = self.supervisor.unwatch(room_key)
+        
         if room_key not in self.record_processes:
-            print(f"没有找到 {platform} 房间 {room_id} 的录制进程")
+            if restart_pending:
+                self.logger.info(f"已取消 {platform} 房间 {room_id} 的自动重启", extra={"room": room_key})
+                event_bus.publish("recording_stopped", room=room, output_dir=self.get_output_dir(room))
+                return True
+            self.logger.warning(f"没有找到 {platform} 房间 {room_id} 的录制进程", extra={"room": room_key})
             return False
         
         try:
             process_info = self.record_processes[room_key]
             process = process_info["process"]
             
-            # 终止进程
-            process.terminate()
-            
-            # 等待进程结束
-            process.wait(timeout=10)
+            with tracer.span("recorder.stop", room=room_key):
+                # 终止进程
+                process.terminate()
+                
+                # 等待进程结束
+                process.wait(timeout=10)
             
             # 清理资源
-            del self.record_processes[room_key]
+            self.record_processes.pop(room_key, None)
             
-            print(f"已停止录制进程，PID: {process.pid}")
+            self.logger.info(f"已停止录制进程，PID: {process.pid}", extra={"room": room_key})
+            event_bus.publish("recording_stopped", room=room, output_dir=process_info["config"]["output_dir"])
             return True
         
         except subprocess.TimeoutExpired:
             # 超时未结束，强制终止
             process.kill()
             process.wait(timeout=5)
-            del self.record_processes[room_key]
-            print(f"已强制终止录制进程，PID: {process.pid}")
+            self.record_processes.pop(room_key, None)
+            self.logger.info(f"已强制终止录制进程，PID: {process.pid}", extra={"room": room_key})
+            event_bus.publish("recording_stopped", room=room, output_dir=process_info["config"]["output_dir"])
             return True
         
         except Exception as e:
-            print(f"停止录制进程失败: {e}")
+            self.logger.error(f"停止录制进程失败: {e}", extra={"room": room_key})
             return False
     
+    def _is_room_live(self, room: Dict[str, Any]) -> bool:
+        """
+        查询房间是否仍在直播，供守护器决定是否重启
+        
+        Args:
+            room: 房间配置
+            
+        Returns:
+            bool: 直播中返回True，否则返回False
+        """
+        if room.get("platform", "bilibili") != "bilibili":
+            return False
+        
+        return self.bilibili_api.is_living(room.get("room_id"))
+    
     def _check_recorder(self, platform: str) -> bool:
         """
         检查录播姬是否已安装，如未安装则自动下载
@@ -133,7 +201,7 @@ class Recorder:
         if platform == "bilibili":
             return self.updater.check_and_update("bililive_recorder")
         else:
-            print(f"暂不支持 {platform} 平台的自动安装录播姬")
+            self.logger.warning(f"暂不支持 {platform} 平台的自动安装录播姬")
             return False
     
     def _create_record_config(self, room: Dict[str, Any], title: str, anchor_name: str) -> Optional[Dict[str, Any]]:
@@ -149,13 +217,10 @@ class Recorder:
             Optional[Dict[str, Any]]: 录制配置字典，失败返回None
         """
         room_id = room.get("room_id")
-        platform = room.get("platform", "bilibili")
         room_name = room.get("name", f"房间{room_id}")
         
         # 录制输出目录
-        output_dir = room.get("output_dir")
-        if not output_dir:
-            output_dir = os.path.join("/opt/2233recorder/recordings", platform, room_id)
+        output_dir = self.get_output_dir(room)
         
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
@@ -198,9 +263,24 @@ class Recorder:
             }
         
         except Exception as e:
-            print(f"创建录制配置失败: {e}")
+            self.logger.error(f"创建录制配置失败: {e}")
             return None
     
+    def get_output_dir(self, room: Dict[str, Any]) -> str:
+        """
+        获取房间的录制输出目录
+        
+        Args:
+            room: 房间配置
+            
+        Returns:
+            str: 录制输出目录
+        """
+        output_dir = room.get("output_dir")
+        if not output_dir:
+            output_dir = os.path.join("/opt/2233recorder/recordings", room.get("platform", "bilibili"), room.get("room_id"))
+        return output_dir
+    
     def get_recording_status(self, room: Dict[str, Any]) -> Dict[str, Any]:
         """
         获取录制状态
@@ -215,20 +295,32 @@ class Recorder:
         platform = room.get("platform", "bilibili")
         room_key = f"{platform}_{room_id}"
         
-        if room_key not in self.record_processes:
+        process_info = self.record_processes.get(room_key)
+        if not process_info:
+            supervisor_state = self.supervisor.get_state(room_key)
+            if supervisor_state and supervisor_state["state"] in ("restarting", "checking"):
+                return {
+                    "is_recording": False,
+                    "status": f"异常退出，等待重启（已重启 {supervisor_state['restarts']} 次）",
+                    "restarts": supervisor_state["restarts"],
+                    "restart_at": supervisor_state["restart_at"]
+                }
+            if supervisor_state and supervisor_state["state"] == "failed":
+                return {
+                    "is_recording": False,
+                    "status": f"已结束，返回码: {supervisor_state['last_exit_code']}，重启次数已达上限",
+                    "restarts": supervisor_state["restarts"]
+                }
             return {
                 "is_recording": False,
                 "status": "未录制"
             }
         
-        process_info = self.record_processes[room_key]
         process = process_info["process"]
         
-        # 检查进程是否还在运行
+        # 检查进程是否还在运行（退出事件由守护器处理）
         return_code = process.poll()
         if return_code is not None:
-            # 进程已结束，清理资源
-            del self.record_processes[room_key]
             return {
                 "is_recording": False,
                 "status": f"已结束，返回码: {return_code}"
@@ -0,0 +1,592 @@
+import os
+import time
+import queue
+import selectors
+import threading
+import subprocess
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Tuple
+from src.config.config import config_manager
+from src.utils.events import event_bus
+from src.utils.metrics import RECORDER_RESTARTS, BYTES_WRITTEN
+
+
+class RecordSupervisor:
+    """
+    录制进程守护类
+
+    基于pidfd（不支持时退化为每进程一个等待线程）的事件循环监视所有录制子进程，
+    进程异常退出时在直播仍在进行的情况下按指数退避自动重启，
+    并检测输出文件长时间不增长的卡死情况。
+    """
+
+    def __init__(self, recorder, live_checker: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        """
+        初始化录制守护器
+
+        Args:
+            recorder: 录制核心实例，需提供record_processes和restart_recording
+            live_checker: 判断房间是否仍在直播的回调，参数为房间配置
+        """
+        self.logger = logging.getLogger("RecordSupervisor")
+        self.recorder = recorder
+        self.live_checker = live_checker
+        self.is_running = False
+
+        self.stall_timeout = 120
+        self.check_interval = 10
+        self.backoff_base = 5
+        self.backoff_max = 300
+        self.max_restarts = 10
+        self.output_tail_lines = 50
+
+        self._lock = threading.RLock()
+        self._watched: Dict[str, Dict[str, Any]] = {}
+        self._exited = queue.Queue()
+        self._commands = queue.Queue()
+        self._selector = None
+        self._wakeup_r = None
+        self._wakeup_w = None
+        self._thread = None
+
+    def _load_settings(self):
+        """
+        从配置文件读取守护参数
+        """
+        self.stall_timeout = config_manager.get("recorder.supervisor.stall_timeout", self.stall_timeout)
+        self.check_interval = config_manager.get("recorder.supervisor.check_interval", self.check_interval)
+        self.backoff_base = config_manager.get("recorder.supervisor.backoff_base", self.backoff_base)
+        self.backoff_max = config_manager.get("recorder.supervisor.backoff_max", self.backoff_max)
+        self.max_restarts = config_manager.get("recorder.supervisor.max_restarts", self.max_restarts)
+
+    def start(self):
+        """
+        启动守护事件循环
+        """
+        with self._lock:
+            if self.is_running:
+                return
+
+            self._load_settings()
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_r, self._wakeup_w = os.pipe()
+            os.set_blocking(self._wakeup_r, False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, ("wakeup", None))
+            self.is_running = True
+
+            self._thread = threading.Thread(target=self._run, name="RecordSupervisor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        停止守护事件循环
+        """
+        with self._lock:
+            if not self.is_running:
+                return
+            self.is_running = False
+
+        self._wakeup()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+        with self._lock:
+            while True:
+                try:
+                    self._commands.get_nowait()
+                except queue.Empty:
+                    break
+            for entry in self._watched.values():
+                self._release(entry)
+            self._watched.clear()
+            self._selector.close()
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+
+    def watch(self, room_key: str, room: Dict[str, Any], process: subprocess.Popen, record_config: Dict[str, Any]):
+        """
+        开始守护一个录制进程
+
+        Args:
+            room_key: 房间键（平台_房间号）
+            room: 房间配置
+            process: 录制进程实例
+            record_config: 录制配置（包含output_dir）
+        """
+        self.start()
+
+        with self._lock:
+            previous = self._watched.pop(room_key, None)
+            restarts = previous["restarts"] if previous else 0
+
+            now = time.time()
+            # 只有进程启动后修改过的文件才是本次录制的分段，目录中之前场次留下的文件不会被当作当前分段
+            since_ns = time.time_ns()
+            dir_cache = previous["dir_cache"] if previous else {}
+            newest_file = self._scan_output(record_config.get("output_dir"), None, dir_cache, since_ns)
+            entry = {
+                "room": room,
+                "process": process,
+                "record_config": record_config,
+                "state": "running",
+                "restarts": restarts,
+                "spawn_time": now,
+                "since_ns": since_ns,
+                "restart_at": None,
+                "last_size": self._file_size(newest_file),
+                "current_file": newest_file,
+                "dir_cache": dir_cache,
+                "last_growth": now,
+                "last_check": now,
+                "stall_checking": False,
+                "pidfd": None,
+                "pipes": [],
+                "output_tail": deque(maxlen=self.output_tail_lines),
+                "last_exit_code": previous["last_exit_code"] if previous else None
+            }
+            self._watched[room_key] = entry
+
+        # 选择器只在事件循环线程中修改
+        if previous:
+            self._call_soon(self._release, previous)
+        self._call_soon(self._register, room_key, entry)
+
+    def unwatch(self, room_key: str) -> bool:
+        """
+        停止守护一个录制进程（主动停止录制时调用，不会触发重启）
+
+        Args:
+            room_key: 房间键
+
+        Returns:
+            bool: 存在守护条目返回True，否则返回False
+        """
+        with self._lock:
+            entry = self._watched.pop(room_key, None)
+
+        if not entry:
+            return False
+
+        self._call_soon(self._release, entry)
+        return True
+
+    def get_state(self, room_key: str) -> Optional[Dict[str, Any]]:
+        """
+        获取守护状态
+
+        Args:
+            room_key: 房间键
+
+        Returns:
+            Optional[Dict[str, Any]]: 守护状态信息，未守护返回None
+        """
+        with self._lock:
+            entry = self._watched.get(room_key)
+            if not entry:
+                return None
+            return {
+                "state": entry["state"],
+                "restarts": entry["restarts"],
+                "restart_at": entry["restart_at"],
+                "last_growth": entry["last_growth"],
+                "last_exit_code": entry["last_exit_code"],
+                "output_tail": list(entry["output_tail"])
+            }
+
+    def _register(self, room_key: str, entry: Dict[str, Any]):
+        """
+        注册守护条目关联的文件描述符（在事件循环线程中执行）
+        """
+        with self._lock:
+            if self._watched.get(room_key) is not entry:
+                return
+        process = entry["process"]
+
+        # 优先使用pidfd，在事件循环中直接等待进程退出
+        pidfd = None
+        if hasattr(os, "pidfd_open"):
+            try:
+                pidfd = os.pidfd_open(process.pid)
+            except OSError:
+                pidfd = None
+
+        if pidfd is not None:
+            entry["pidfd"] = pidfd
+            self._selector.register(pidfd, selectors.EVENT_READ, ("exit", (room_key, process)))
+        else:
+            waiter = threading.Thread(
+                target=self._wait_process,
+                args=(room_key, process),
+                daemon=True
+            )
+            waiter.start()
+
+        # 读取录制进程输出，避免管道写满导致录制进程阻塞
+        for stream in (process.stdout, process.stderr):
+            if stream is None or stream.closed:
+                continue
+            fd = stream.fileno()
+            os.set_blocking(fd, False)
+            self._selector.register(fd, selectors.EVENT_READ, ("output", (room_key, process)))
+            entry["pipes"].append(fd)
+
+    def _release(self, entry: Dict[str, Any]):
+        """
+        注销守护条目关联的文件描述符（在事件循环线程中执行）
+        """
+        if entry["pidfd"] is not None:
+            self._unregister(entry["pidfd"])
+            os.close(entry["pidfd"])
+            entry["pidfd"] = None
+
+        for fd in entry["pipes"]:
+            self._unregister(fd)
+        entry["pipes"] = []
+
+    def _call_soon(self, func: Callable, *args):
+        """
+        将操作交给事件循环线程执行
+        """
+        self._commands.put((func, args))
+        self._wakeup()
+
+    def _unregister(self, fd: int):
+        try:
+            self._selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+
+    def _wakeup(self):
+        """
+        唤醒事件循环，使其重新计算超时
+        """
+        if self.is_running and self._wakeup_w is not None:
+            try:
+                os.write(self._wakeup_w, b"\0")
+            except OSError:
+                pass
+
+    def _wait_process(self, room_key: str, process: subprocess.Popen):
+        """
+        不支持pidfd时的退化方案：在独立线程中等待进程退出
+        """
+        process.wait()
+        self._exited.put((room_key, process))
+        self._wakeup()
+
+    def _run(self):
+        """
+        守护事件循环
+        """
+        while self.is_running:
+            events = self._selector.select(self._next_timeout())
+
+            for key, _ in events:
+                kind, data = key.data
+                if kind == "wakeup":
+                    try:
+                        while os.read(self._wakeup_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif kind == "exit":
+                    self._on_exit(*data)
+                elif kind == "output":
+                    self._on_output(key.fd, *data)
+
+            while True:
+                try:
+                    func, args = self._commands.get_nowait()
+                except queue.Empty:
+                    break
+                func(*args)
+
+            while True:
+                try:
+                    self._on_exit(*self._exited.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._run_timers()
+
+    def _next_timeout(self) -> float:
+        """
+        计算事件循环下一次需要醒来的时间
+        """
+        now = time.time()
+        timeout = self.check_interval
+        with self._lock:
+            for entry in self._watched.values():
+                if entry["restart_at"] is not None:
+                    timeout = min(timeout, entry["restart_at"] - now)
+        return max(timeout, 0)
+
+    def _on_output(self, fd: int, room_key: str, process: subprocess.Popen):
+        """
+        读取录制进程输出，仅保留最后若干行用于排查问题
+        """
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        with self._lock:
+            entry = self._watched.get(room_key)
+            if not data:
+                self._unregister(fd)
+                if entry and fd in entry["pipes"]:
+                    entry["pipes"].remove(fd)
+                return
+            if entry and entry["process"] is process:
+                for line in data.decode("utf-8", errors="replace").splitlines():
+                    if line.strip():
+                        entry["output_tail"].append(line)
+
+    def _on_exit(self, room_key: str, process: subprocess.Popen):
+        """
+        录制进程退出时的处理
+        """
+        return_code = process.poll()
+        closed_file = None
+
+        with self._lock:
+            entry = self._watched.get(room_key)
+            if not entry or entry["process"] is not process:
+                # 已被主动停止或已被新进程替换
+                return
+
+            self._release(entry)
+
+            process_info = self.recorder.record_processes.get(room_key)
+            if process_info and process_info["process"] is process:
+                self.recorder.record_processes.pop(room_key, None)
+
+            entry["last_exit_code"] = return_code
+
+            # 进程退出后正在写入的分段文件随之结束
+            closed_file = entry["current_file"]
+            entry["current_file"] = None
+
+            # 稳定运行足够久之后再退出，视为新的故障，重置退避计数
+            if time.time() - entry["spawn_time"] > self.backoff_max:
+                entry["restarts"] = 0
+
+            room = entry["room"]
+            if self.max_restarts and entry["restarts"] >= self.max_restarts:
+                entry["state"] = "failed"
+                self.logger.warning(f"录制进程 {room_key} 已退出（返回码: {return_code}），重启次数已达上限 {self.max_restarts}", extra={"room": room_key})
+            else:
+                delay = min(self.backoff_base * (2 ** entry["restarts"]), self.backoff_max)
+                entry["state"] = "restarting"
+                entry["restart_at"] = time.time() + delay
+                self.logger.warning(f"录制进程 {room_key} 异常退出（返回码: {return_code}），{delay}秒后尝试重启", extra={"room": room_key})
+
+        event_bus.publish("recording_state_changed", room=room)
+        if closed_file:
+            event_bus.publish("segment_closed", room=room, path=closed_file)
+
+    def _run_timers(self):
+        """
+        处理到期的重启任务和卡死检测
+        """
+        now = time.time()
+        due_restarts = []
+        due_stall_checks = []
+        closed_segments = []
+        opened_segments = []
+
+        with self._lock:
+            for room_key, entry in self._watched.items():
+                if entry["state"] == "restarting" and entry["restart_at"] is not None and entry["restart_at"] <= now:
+                    entry["restart_at"] = None
+                    entry["state"] = "checking"
+                    due_restarts.append(room_key)
+                elif entry["state"] == "running" and now - entry["last_check"] >= self.check_interval:
+                    entry["last_check"] = now
+                    newest_file = self._scan_output(entry["record_config"].get("output_dir"),
+                                                    entry["current_file"], entry["dir_cache"], entry["since_ns"])
+                    # 出现新的分段文件，说明上一个分段已经写完
+                    if newest_file != entry["current_file"]:
+                        if entry["current_file"]:
+                            closed_size = self._file_size(entry["current_file"])
+                            if closed_size > entry["last_size"]:
+                                BYTES_WRITTEN.labels(room_key).inc(closed_size - entry["last_size"])
+                            closed_segments.append((entry["room"], entry["current_file"]))
+                        if newest_file:
+                            opened_segments.append((entry["room"], newest_file))
+                        entry["current_file"] = newest_file
+                        entry["last_size"] = 0
+                    # 只有正在写入的分段增长才算录制进度
+                    size = self._file_size(entry["current_file"])
+                    if size != entry["last_size"]:
+                        if size > entry["last_size"]:
+                            BYTES_WRITTEN.labels(room_key).inc(size - entry["last_size"])
+                        entry["last_size"] = size
+                        entry["last_growth"] = now
+                    elif (self.stall_timeout and now - entry["last_growth"] >= self.stall_timeout
+                          and not entry["stall_checking"]):
+                        entry["stall_checking"] = True
+                        due_stall_checks.append(room_key)
+
+        # 直播状态查询和重启可能较慢，放到独立线程中执行，避免阻塞事件循环
+        for room_key in due_restarts:
+            threading.Thread(target=self._restart, args=(room_key,), daemon=True).start()
+        for room_key in due_stall_checks:
+            threading.Thread(target=self._check_stall, args=(room_key,), daemon=True).start()
+        for room, path in closed_segments:
+            event_bus.publish("segment_closed", room=room, path=path)
+        for room, path in opened_segments:
+            event_bus.publish("segment_opened", room=room, path=path)
+
+    def _is_live(self, room: Dict[str, Any]) -> bool:
+        """
+        判断房间是否仍在直播，查询失败时按仍在直播处理
+        """
+        if not self.live_checker:
+            return True
+        try:
+            return bool(self.live_checker(room))
+        except Exception as e:
+            self.logger.error(f"查询房间 {room.get('room_id')} 直播状态失败: {e}")
+            return True
+
+    def _restart(self, room_key: str):
+        """
+        重启录制进程
+        """
+        with self._lock:
+            entry = self._watched.get(room_key)
+            if not entry or entry["state"] != "checking":
+                return
+            room = entry["room"]
+            record_config = entry["record_config"]
+
+        if not self._is_live(room):
+            self.logger.info(f"房间 {room_key} 已下播，不再重启录制进程", extra={"room": room_key})
+            self.unwatch(room_key)
+            event_bus.publish("recording_state_changed", room=room)
+            # 录制进程已退出，这里是本次录制的结束
+            event_bus.publish("recording_stopped", room=room, output_dir=record_config.get("output_dir"))
+            return
+
+        with self._lock:
+            entry = self._watched.get(room_key)
+            if not entry or entry["state"] != "checking":
+                return
+            entry["restarts"] += 1
+            restarts = entry["restarts"]
+        RECORDER_RESTARTS.labels(room_key).inc()
+
+        self.logger.info(f"正在重启录制进程 {room_key}（第 {restarts} 次）", extra={"room": room_key})
+        process = self.recorder.restart_recording(room, record_config)
+
+        if not process:
+            with self._lock:
+                entry = self._watched.get(room_key)
+                if entry and entry["state"] == "checking":
+                    delay = min(self.backoff_base * (2 ** entry["restarts"]), self.backoff_max)
+                    entry["state"] = "restarting"
+                    entry["restart_at"] = time.time() + delay
+            self._wakeup()
+
+    def _check_stall(self, room_key: str):
+        """
+        输出文件长时间未增长时检查是否卡死，直播仍在进行则终止进程交由重启逻辑处理
+        """
+        with self._lock:
+            entry = self._watched.get(room_key)
+            if not entry:
+                return
+            room = entry["room"]
+            process = entry["process"]
+
+        live = self._is_live(room)
+
+        with self._lock:
+            entry = self._watched.get(room_key)
+            if not entry or entry["process"] is not process:
+                return
+            entry["stall_checking"] = False
+            if not live:
+                # 未开播时输出不增长属于正常情况
+                entry["last_growth"] = time.time()
+                return
+
+        self.logger.warning(f"录制进程 {room_key} 输出已 {self.stall_timeout} 秒未增长，判定为卡死，终止进程", extra={"room": room_key})
+        try:
+            process.terminate()
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        except Exception as e:
+            self.logger.error(f"终止卡死的录制进程 {room_key} 失败: {e}", extra={"room": room_key})
+
+    @staticmethod
+    def _file_size(path: Optional[str]) -> int:
+        """
+        获取文件大小，文件不存在时返回0
+        """
+        if not path:
+            return 0
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    def _scan_output(self, output_dir: Optional[str], current_file: Optional[str],
+                     dir_cache: Dict[str, Tuple[Optional[int], list]], since_ns: int = -1) -> Optional[str]:
+        """
+        查找输出目录下最新的FLV文件
+
+        新建、删除或重命名文件才会改变所在目录的修改时间，修改时间未变的目录沿用缓存的子目录列表，
+        不再列出其中的文件，每次检查的开销只与目录数有关，不随已录制的文件数增长。
+
+        Args:
+            output_dir: 输出目录
+            current_file: 当前正在写入的分段文件
+            dir_cache: 目录缓存 {目录: (修改时间, 子目录列表)}，在调用之间保留
+            since_ns: 只考虑修改时间（纳秒）不早于该值的文件，-1表示不限制
+
+        Returns:
+            Optional[str]: 最新的FLV文件路径，没有更新的文件时返回current_file
+        """
+        if not output_dir:
+            return current_file
+
+        newest_file = current_file
+        try:
+            newest_mtime = os.stat(current_file).st_mtime_ns if current_file else since_ns
+        except OSError:
+            newest_mtime = since_ns
+
+        stack = [output_dir]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                cached = dir_cache.get(path)
+                if cached and cached[0] == mtime:
+                    stack.extend(cached[1])
+                    continue
+
+                subdirs = []
+                with os.scandir(path) as it:
+                    for item in it:
+                        if item.is_dir(follow_symlinks=False):
+                            subdirs.append(item.path)
+                        elif item.name.lower().endswith(".flv") and item.is_file(follow_symlinks=False):
+                            item_mtime = item.stat(follow_symlinks=False).st_mtime_ns
+                            if item_mtime >= newest_mtime:
+                                newest_mtime = item_mtime
+                                newest_file = item.path
+                # 文件系统时间戳精度有限，刚修改过的目录可能在同一时间粒度内再次变化，下次检查时重新列出
+                dir_cache[path] = (mtime if time.time_ns() - mtime > 2_000_000_000 else None, subdirs)
+                stack.extend(subdirs)
+            except OSError:
+                dir_cache.pop(path, None)
+                continue
+        return newest_file
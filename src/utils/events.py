@@ -0,0 +1,65 @@
+import threading
+import logging
+from typing import Dict, Any, Callable, List
+
+
+class EventBus:
+    """
+    进程内事件总线
+
+    模块之间通过事件解耦，例如录制模块在录制分段结束时发布事件，
+    由处理流水线订阅后自动开始后期处理。
+    """
+
+    def __init__(self):
+        """
+        初始化事件总线
+        """
+        self.logger = logging.getLogger("EventBus")
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable[..., None]]] = {}
+
+    def subscribe(self, event_type: str, callback: Callable[..., None]):
+        """
+        订阅事件
+
+        Args:
+            event_type: 事件类型
+            callback: 回调函数，以关键字参数接收事件数据
+        """
+        with self._lock:
+            callbacks = list(self._subscribers.get(event_type, []))
+            if callback not in callbacks:
+                callbacks.append(callback)
+            self._subscribers[event_type] = callbacks
+
+    def unsubscribe(self, event_type: str, callback: Callable[..., None]):
+        """
+        取消订阅事件
+
+        Args:
+            event_type: 事件类型
+            callback: 回调函数
+        """
+        with self._lock:
+            callbacks = [c for c in self._subscribers.get(event_type, []) if c != callback]
+            self._subscribers[event_type] = callbacks
+
+    def publish(self, event_type: str, **data: Any):
+        """
+        发布事件，回调在发布者线程中同步执行，单个回调出错不影响其他回调
+
+        Args:
+            event_type: 事件类型
+            **data: 事件数据
+        """
+        callbacks = self._subscribers.get(event_type, [])
+        for callback in callbacks:
+            try:
+                callback(**data)
+            except Exception as e:
+                self.logger.error(f"处理事件 {event_type} 时发生错误: {e}")
+
+
+# 全局事件总线实例
+event_bus = EventBus()
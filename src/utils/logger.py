@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import queue
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Any, Optional, Tuple
+from src.config.config import config_manager
+from src.utils.metrics import metrics
+
+
+LOG_FILE = "2233recorder.log"
+
+# 当前线程（或协程）正在处理的房间，由room_context设置，日志记录自动带上
+_current_room: contextvars.ContextVar = contextvars.ContextVar("room", default=None)
+
+# LogRecord的标准属性，其余属性（extra传入的字段）写入JSON日志
+_STANDARD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+LOG_DROPPED = metrics.counter("recorder_log_dropped_total", "日志队列已满时丢弃的日志数")
+LOG_SUPPRESSED = metrics.counter("recorder_log_suppressed_total", "被限流跳过的重复日志数")
+
+
+def get_logging_config() -> Dict[str, Any]:
+    """
+    获取日志配置
+
+    Returns:
+        Dict[str, Any]: 日志配置（level、console、file、log_dir、max_bytes、backup_count、queue_size、rate_limit_interval）
+    """
+    logging_config = {
+        "level": config_manager.get("system.log_level", "info"),
+        "console": True,
+        "file": True,
+        "log_dir": config_manager.get("system.log_dir", "/opt/2233recorder/logs"),
+        "max_bytes": 10 * 1024 * 1024,
+        "backup_count": 5,
+        "queue_size": 10000,
+        "rate_limit_interval": 60
+    }
+    logging_config.update(config_manager.get("system.logging", {}) or {})
+    return logging_config
+
+
+@contextmanager
+def room_context(room_key: str):
+    """
+    在代码块内产生的日志都带上房间键
+
+    Args:
+        room_key: 房间键（平台_房间号）
+    """
+    token = _current_room.set(room_key)
+    try:
+        yield
+    finally:
+        _current_room.reset(token)
+
+
+class RoomContextFilter(logging.Filter):
+    """
+    为日志记录加上当前房间（extra中已指定room时保留）
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "room", None) is None:
+            record.room = _current_room.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    重复日志限流
+
+    带有rate_key的日志（如每轮监控的"未开播"）按 (rate_key, 房间) 在每个时间窗口内只输出一条，
+    下一条输出的日志带上suppressed字段记录期间跳过的条数。没有rate_key的日志不受影响。
+    """
+
+    def __init__(self, interval: float = 60):
+        super().__init__()
+        self.interval = interval
+        self._lock = threading.Lock()
+        # (rate_key, 房间) -> [上次输出时间, 跳过条数]
+        self._windows: Dict[Tuple[str, Optional[str]], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate_key = getattr(record, "rate_key", None)
+        if rate_key is None or self.interval <= 0:
+            return True
+        key = (rate_key, getattr(record, "room", None))
+        now = record.created
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window[0] < self.interval:
+                window[1] += 1
+                suppressed = None
+            else:
+                suppressed = window[1] if window else 0
+                self._windows[key] = [now, 0]
+        if suppressed is None:
+            LOG_SUPPRESSED.inc()
+            return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    把日志记录放入有界队列，由后台线程写入控制台和文件
+
+    记录线程只做消息格式化和一次入队，队列满时直接丢弃并计数，不会因为磁盘或终端变慢而阻塞。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # 异常对象不能跨线程保留，先格式化为文本
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    控制台日志格式：时间 级别 [模块] (房间) 消息
+    """
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        room = getattr(record, "room", None)
+        if room:
+            line = line.replace(f"[{record.name}] ", f"[{record.name}] ({room}) ", 1)
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            line += f"（已省略 {suppressed} 条重复日志）"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    JSON日志格式：每行一条记录，extra传入的字段原样写入
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and value is not None:
+                entry[key] = value if isinstance(value, (str, int, float, bool)) else str(value)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LogManager:
+    """
+    日志管理类
+
+    根日志记录器只挂一个队列处理器，控制台输出和按大小轮转的JSON文件由后台线程写入；
+    房间上下文和重复日志限流在入队前完成，代价固定。
+    """
+
+    def __init__(self):
+        """
+        初始化日志管理器
+        """
+        self._lock = threading.Lock()
+        self._handler: Optional[NonBlockingQueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+
+    def setup(self) -> bool:
+        """
+        按配置安装日志处理器（重复调用无效）
+
+        Returns:
+            bool: 本次安装返回True，已安装返回False
+        """
+        with self._lock:
+            if self._listener is not None:
+                return False
+
+            logging_config = get_logging_config()
+            handlers = []
+            file_error = None
+            if logging_config["console"]:
+                console = logging.StreamHandler(sys.stdout)
+                console.setFormatter(ConsoleFormatter())
+                handlers.append(console)
+            if logging_config["file"]:
+                try:
+                    os.makedirs(logging_config["log_dir"], exist_ok=True)
+                    file_handler = RotatingFileHandler(
+                        os.path.join(logging_config["log_dir"], LOG_FILE),
+                        maxBytes=logging_config["max_bytes"],
+                        backupCount=logging_config["backup_count"],
+                        encoding="utf-8"
+                    )
+                    file_handler.setFormatter(JsonFormatter())
+                    handlers.append(file_handler)
+                except OSError as e:
+                    file_error = e
+
+            handler = NonBlockingQueueHandler(queue.Queue(maxsize=logging_config["queue_size"]))
+            handler.addFilter(RoomContextFilter())
+            handler.addFilter(RateLimitFilter(logging_config["rate_limit_interval"]))
+
+            root = logging.getLogger()
+            root.setLevel(str(logging_config["level"]).upper())
+            root.addHandler(handler)
+            self._handler = handler
+            self._listener = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+            self._listener.start()
+
+        if file_error is not None:
+            logging.getLogger("LogManager").warning(f"无法写入日志目录 {logging_config['log_dir']}，只输出到控制台: {file_error}")
+        return True
+
+    def shutdown(self):
+        """
+        写完队列中剩余的日志后移除处理器
+        """
+        with self._lock:
+            if self._listener is None:
+                return
+            logging.getLogger().removeHandler(self._handler)
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+            self._handler = None
+
+
+# 全局日志管理器实例
+log_manager = LogManager()
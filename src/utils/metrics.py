@@ -0,0 +1,336 @@
+import math
+import bisect
+import threading
+import logging
+from typing import Dict, Any, Optional, Callable, List, Tuple, Sequence
+
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 监控轮询、检测和处理任务等较慢操作的分桶（秒）
+SLOW_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Child:
+    """
+    某一组标签值对应的时间序列
+
+    每个序列只用自己的锁保护，不同房间、不同接口之间互不竞争；
+    热点路径可以先保存labels()返回的序列，之后直接更新，省去字典查找。
+    """
+
+    __slots__ = ("_lock", "_value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def get(self) -> float:
+        return self._value
+
+
+class _HistogramChild:
+    """
+    直方图的一个时间序列，分桶计数在observe时只递增一个桶，导出时再累加
+    """
+
+    __slots__ = ("_lock", "_upper_bounds", "_counts", "_sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._upper_bounds = upper_bounds
+        self._counts = [0] * (len(upper_bounds) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def get(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _Metric:
+    """
+    指标基类：按标签值管理时间序列
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        return _Child()
+
+    def labels(self, *values: Any):
+        """
+        获取标签值对应的时间序列（不存在时创建）
+
+        Args:
+            *values: 按labelnames顺序的标签值
+
+        Returns:
+            时间序列，可直接调用inc/set/observe
+
+        Raises:
+            ValueError: 标签值数量与标签名不一致
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {key}")
+        with self._lock:
+            return self._children.setdefault(key, self._new_child())
+
+    def remove(self, *values: Any):
+        """
+        删除标签值对应的时间序列（如房间被删除）
+        """
+        with self._lock:
+            self._children.pop(tuple(str(value) for value in values), None)
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [("", _format_labels(self.labelnames, key), child.get()) for key, child in children]
+
+    def render(self) -> List[str]:
+        """
+        按Prometheus文本格式导出
+        """
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """
+    只增不减的计数器
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    """
+    可增可减的当前值，也可以在导出时通过函数读取（如队列长度、正在进行的录制数）
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], Any]] = None
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._children[()].dec(amount)
+
+    def set_function(self, function: Callable[[], Any]):
+        """
+        导出时调用函数获取当前值
+
+        Args:
+            function: 没有标签时返回数值；有标签时返回 {标签值元组: 数值}
+        """
+        self._function = function
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        if self._function is None:
+            return super()._samples()
+        value = self._function()
+        if not self.labelnames:
+            return [("", "", float(value))]
+        return [("", _format_labels(self.labelnames, [str(v) for v in key]), float(v))
+                for key, v in value.items()]
+
+
+class Histogram(_Metric):
+    """
+    分桶直方图（耗时、延迟等）
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            children = list(self._children.items())
+        samples = []
+        for key, child in children:
+            counts, total = child.get()
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                samples.append(("_bucket", _format_labels(self.labelnames, key, le), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    各模块在导入时注册指标，/metrics接口导出全部指标。
+    同名指标重复注册时返回已有的指标，模块重新导入不会报错。
+    """
+
+    def __init__(self):
+        """
+        初始化指标注册表
+        """
+        self.logger = logging.getLogger("MetricsRegistry")
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已注册为不同的类型或标签")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """
+        注册计数器
+        """
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """
+        注册当前值指标
+        """
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        注册直方图
+        """
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """
+        按名称获取指标
+        """
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        按Prometheus文本格式导出全部指标，单个指标读取失败不影响其他指标
+
+        Returns:
+            str: 导出内容
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                self.logger.error(f"导出指标 {metric.name} 时发生错误: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表实例
+metrics = MetricsRegistry()
+
+# Web接口
+HTTP_REQUESTS = metrics.counter(
+    "recorder_http_requests_total", "API请求数（按路由和状态码）", ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram(
+    "recorder_http_request_duration_seconds", "API请求耗时（到响应头发出为止）", ("method", "route"))
+
+# 监控
+POLL_LAG = metrics.histogram(
+    "recorder_monitor_poll_lag_seconds", "房间实际查询时间晚于计划时间的秒数", ("room",), buckets=SLOW_BUCKETS)
+POLL_DURATION = metrics.histogram(
+    "recorder_monitor_poll_duration_seconds", "单次查询直播状态的耗时", ("room",))
+POLL_ERRORS = metrics.counter(
+    "recorder_monitor_poll_errors_total", "查询直播状态出错次数", ("room",))
+DETECTION_LATENCY = metrics.histogram(
+    "recorder_detection_latency_seconds", "查询到开播后到录制进程启动的耗时", ("room",), buckets=SLOW_BUCKETS)
+
+# 录制
+ACTIVE_RECORDINGS = metrics.gauge("recorder_active_recordings", "正在进行的录制数")
+RECORDER_RESTARTS = metrics.counter(
+    "recorder_restarts_total", "录制进程被守护器自动重启的次数", ("room",))
+BYTES_WRITTEN = metrics.counter(
+    "recorder_bytes_written_total", "录制输出目录增长的字节数", ("room",))
+
+# 处理任务
+QUEUE_DEPTH = metrics.gauge("recorder_processor_jobs", "处理任务数（按状态）", ("status",))
+JOB_DURATION = metrics.histogram(
+    "recorder_processor_job_duration_seconds", "处理任务单次执行耗时", ("type", "result"), buckets=SLOW_BUCKETS)
@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+import threading
+from collections import deque, Counter
+from typing import Dict, Any, Optional, List, Tuple
+from src.config.config import config_manager
+
+
+class _NoopSpan:
+    """
+    追踪关闭时使用的空区间，所有调用共享同一个实例
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """
+    一次计时区间，结束时写入追踪器的环形缓冲区
+    """
+
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args: Any):
+        """
+        补充区间参数（如查询结果）
+        """
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    区间追踪类
+
+    在监控查询、API请求、录制触发、录制进程启停和处理任务等位置记录耗时区间，
+    保存在固定大小的环形缓冲区中，可导出为Chrome追踪格式（chrome://tracing、Perfetto）。
+    默认关闭，关闭时span()只做一次判断并返回共享的空区间。
+    """
+
+    def __init__(self, buffer_size: int = 20000):
+        """
+        初始化追踪器
+
+        Args:
+            buffer_size: 环形缓冲区保留的区间数
+        """
+        self.enabled = False
+        self._events: deque = deque(maxlen=buffer_size)
+        self._thread_names: Dict[int, str] = {}
+        self._pid = os.getpid()
+
+    def configure(self):
+        """
+        从配置文件读取是否启用和缓冲区大小
+        """
+        buffer_size = config_manager.get("system.tracing.buffer_size", self._events.maxlen)
+        if buffer_size != self._events.maxlen:
+            self._events = deque(self._events, maxlen=buffer_size)
+        self.enabled = bool(config_manager.get("system.tracing.enabled", False))
+
+    def set_enabled(self, enabled: bool):
+        """
+        运行时开启或关闭追踪
+        """
+        self.enabled = bool(enabled)
+
+    def span(self, name: str, **args: Any):
+        """
+        记录一个耗时区间
+
+        用法: with tracer.span("monitor.poll", room=room_key): ...
+
+        Args:
+            name: 区间名称，点号前的部分作为分类
+            **args: 区间参数
+
+        Returns:
+            上下文管理器
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, args)
+
+    def _record(self, name: str, start: int, end: int, args: Dict[str, Any]):
+        thread = threading.current_thread()
+        self._thread_names[thread.ident] = thread.name
+        # deque.append是原子操作，写入不需要加锁
+        self._events.append((name, start, end - start, thread.ident, args))
+
+    def clear(self):
+        """
+        清空缓冲区
+        """
+        self._events.clear()
+
+    def dump(self) -> Dict[str, Any]:
+        """
+        导出为Chrome追踪格式
+
+        Returns:
+            Dict[str, Any]: {"traceEvents": [...]}，可直接保存为JSON文件加载
+        """
+        events = list(self._events)
+        trace_events = [
+            {
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": self._pid,
+                "tid": tid,
+                "args": {key: value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+                         for key, value in args.items()}
+            }
+            for name, start, duration, tid, args in events
+        ]
+        for tid in {event[3] for event in events}:
+            trace_events.append({
+                "name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                "args": {"name": self._thread_names.get(tid, str(tid))}
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+class SamplingProfiler:
+    """
+    按需采样分析器
+
+    在指定时长内定时采集所有线程的调用栈，按调用栈统计采样次数，
+    输出折叠格式（flamegraph.pl、speedscope可直接加载）。只在调用期间运行，平时没有开销。
+    """
+
+    def __init__(self):
+        """
+        初始化采样分析器
+        """
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float = 5, interval: float = 0.01) -> Optional[Dict[str, Any]]:
+        """
+        采样分析（阻塞，直到采样结束）
+
+        Args:
+            seconds: 采样时长（秒）
+            interval: 采样间隔（秒）
+
+        Returns:
+            Optional[Dict[str, Any]]: 采样结果（samples、duration、stacks），已有采样在进行时返回None
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float) -> Dict[str, Any]:
+        own_ident = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stacks[(names.get(ident, str(ident)),) + self._stack(frame)] += 1
+            samples += 1
+            time.sleep(interval)
+
+        return {
+            "samples": samples,
+            "interval": interval,
+            "duration": time.perf_counter() - started,
+            "stacks": [{"stack": list(stack), "count": count} for stack, count in stacks.most_common()]
+        }
+
+    @staticmethod
+    def _stack(frame) -> Tuple[str, ...]:
+        """
+        从最外层到当前帧的调用栈
+        """
+        names: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        names.reverse()
+        return tuple(names)
+
+
+def format_folded(result: Dict[str, Any]) -> str:
+    """
+    把采样结果转换为折叠格式：每行 "线程;外层函数;...;内层函数 次数"
+    """
+    return "".join(f"{';'.join(entry['stack'])} {entry['count']}\n" for entry in result["stacks"])
+
+
+# 全局追踪器和采样分析器实例
+tracer = Tracer()
+profiler = SamplingProfiler()
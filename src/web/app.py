@@ -1,17 +1,40 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Body, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, Response
 import uvicorn
 import os
+import re
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import quote
+from typing import Dict, Any, Optional, List
 from src.config.config import config_manager
 from src.monitor.monitor import monitor
 from src.recorder.core import Recorder
 from src.processor.converter import VideoConverter
 from src.processor.watermark import WatermarkAdder
+from src.processor.jobs import job_queue, check_job_request, API_JOB_PARAMS, INPUT_PATH, OUTPUT_PATH
+from src.processor.pipeline import pipeline
+from src.processor.clip import CLIP_DIR
+from src.processor.thumbnails import load_thumbnails, get_thumbnail_config
+from src.processor.live_preview import live_preview
+from src.library.library import library
+from src.web.events import StatusBroadcaster
+from src.web.status import StatusStore, negotiate
+from src.web.tasks import task_manager
+from src.web.streaming import FileSender, list_directory
+from src.utils.logger import log_manager
+from src.utils.tracing import tracer, profiler, format_folded
+from src.utils.metrics import metrics, CONTENT_TYPE, HTTP_REQUESTS, HTTP_LATENCY, ACTIVE_RECORDINGS, QUEUE_DEPTH
 
 # 初始化配置
 config_manager.load_config()
 config_manager.load_rooms()
+log_manager.setup()
+tracer.configure()
+logger = logging.getLogger("WebApp")
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -25,12 +48,99 @@ recorder = Recorder()
 converter = VideoConverter()
 watermark_adder = WatermarkAdder()
 
+def _active_recordings() -> int:
+    """
+    正在进行的录制数（手动开始的录制和监控触发的录制）
+    """
+    return len(recorder.record_processes) + len(monitor.trigger.recorder.record_processes)
+
+# 处理任务为正在进行的录制预留CPU
+job_queue.set_recording_count_provider(_active_recordings)
+
+# 指标：正在进行的录制数和处理任务数在导出时读取
+ACTIVE_RECORDINGS.set_function(_active_recordings)
+QUEUE_DEPTH.set_function(
+    lambda: {(status,): count for status, count in job_queue.get_queue_status()["jobs"].items()}
+)
+
+class RequestMetricsMiddleware:
+    """
+    记录API请求耗时和状态码（按路由模板统计，避免房间号、文件名等导致序列过多）
+
+    直接包装ASGI调用，不缓冲响应体，推送和文件的流式响应（包括零拷贝发送）不受影响。
+    """
+    
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.asgi_app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        observed = []
+        
+        def observe(status):
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_LATENCY.labels(scope["method"], route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope["method"], route, status).inc()
+            observed.append(status)
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not observed:
+                observe(message["status"])
+            await send(message)
+        
+        try:
+            with tracer.span("http.request", method=scope["method"], path=scope["path"]):
+                await self.asgi_app(scope, receive, send_wrapper)
+        finally:
+            if not observed:
+                observe(500)
+
+app.add_middleware(RequestMetricsMiddleware)
+
 # 挂载静态文件目录
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if not os.path.exists(static_dir):
     os.makedirs(static_dir)
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+# 状态快照：只在状态变化时重建，所有请求共享同一版本的编码结果
+status_store = StatusStore(
+    recorder.get_recording_status,
+    monitor.get_monitor_status,
+    lambda: {"record_processes_count": len(recorder.record_processes)}
+)
+
+# 状态推送：连接时发送快照，之后只推送变化的房间
+broadcaster = StatusBroadcaster(
+    lambda: status_store.snapshot().data, recorder.get_recording_status, monitor.get_monitor_status
+)
+
+@app.on_event("startup")
+async def on_startup():
+    # 先恢复流水线状态，再启动任务队列，保证中断的处理任务能找到对应记录
+    pipeline.attach()
+    job_queue.start()
+    library.attach(recorder.get_output_dir)
+    live_preview.attach()
+    task_manager.start()
+    status_store.attach()
+    broadcaster.attach()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    task_manager.stop()
+    job_queue.stop()
+    pipeline.detach()
+    library.detach()
+    live_preview.detach()
+    status_store.detach()
+    broadcaster.detach()
+    log_manager.shutdown()
+
 # 根路径返回HTML页面
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -169,6 +279,11 @@ async def root():
                     intervalSpan.textContent = data.monitor.interval;
                 }
                 
+                // 房间键（与推送增量中的键一致）
+                function roomKey(room) {
+                    return `${room.platform || 'bilibili'}_${room.room_id}`;
+                }
+                
                 // 更新直播间列表
                 function updateRoomsList(data) {
                     const roomsList = document.getElementById('rooms-list');
@@ -181,10 +296,10 @@ async def root():
                     let html = '';
                     data.rooms.forEach(room => {
                         html += `
-                        <div class="room-item">
+                        <div class="room-item" id="room-${roomKey(room)}">
                             <strong>${room.name || '未知主播'}</strong> (${room.platform} - ${room.room_id})
                             <br>
-                            状态: ${room.status}
+                            状态: <span class="room-status">${room.status}</span>
                             <br>
                             <button onclick="startRecording('${room.platform}', '${room.room_id}')" class="btn">开始录制</button>
                             <button onclick="stopRecording('${room.platform}', '${room.room_id}')" class="btn btn-danger">停止录制</button>
@@ -204,55 +319,105 @@ async def root():
                     }
                 }
                 
+                // 按推送的增量更新变化的房间和监控状态
+                function applyDelta(delta) {
+                    if (delta.monitor) {
+                        updateMonitorStatus(delta);
+                    }
+                    Object.entries(delta.rooms || {}).forEach(([key, status]) => {
+                        const item = document.getElementById(`room-${key}`);
+                        if (item) {
+                            item.querySelector('.room-status').textContent = status.status;
+                        }
+                    });
+                }
+                
+                // 订阅状态推送，不支持时退回定时轮询
+                let eventSource = null;
+                function subscribe() {
+                    if (!window.EventSource) {
+                        updateData();
+                        setInterval(updateData, 5000);
+                        return;
+                    }
+                    eventSource = new EventSource('/api/events');
+                    eventSource.addEventListener('snapshot', event => {
+                        const data = JSON.parse(event.data);
+                        updateMonitorStatus(data);
+                        updateRoomsList(data);
+                    });
+                    eventSource.addEventListener('delta', event => applyDelta(JSON.parse(event.data)));
+                }
+                
+                // 操作完成后刷新（推送连接正常时由推送更新）
+                function refresh() {
+                    if (!eventSource || eventSource.readyState !== EventSource.OPEN) {
+                        updateData();
+                    }
+                }
+                
+                // 等待后台操作结束，失败时抛出错误
+                async function waitTask(response) {
+                    let task = await response.json();
+                    if (!response.ok) {
+                        throw new Error(task.detail || response.statusText);
+                    }
+                    while (task.status === 'pending' || task.status === 'running') {
+                        await new Promise(resolve => setTimeout(resolve, 500));
+                        task = await (await fetch(`/api/tasks/${task.task_id}`)).json();
+                    }
+                    if (task.status === 'failed') {
+                        throw new Error(task.error);
+                    }
+                    return task;
+                }
+                
                 // 启动监控
                 async function startMonitor() {
                     try {
-                        await fetch('/api/start_monitor');
-                        updateData();
+                        await waitTask(await fetch('/api/start_monitor'));
+                        refresh();
                     } catch (error) {
                         console.error('启动监控失败:', error);
-                        alert('启动监控失败');
+                        alert(`启动监控失败: ${error.message}`);
                     }
                 }
                 
                 // 停止监控
                 async function stopMonitor() {
                     try {
-                        await fetch('/api/stop_monitor');
-                        updateData();
+                        await waitTask(await fetch('/api/stop_monitor'));
+                        refresh();
                     } catch (error) {
                         console.error('停止监控失败:', error);
-                        alert('停止监控失败');
+                        alert(`停止监控失败: ${error.message}`);
                     }
                 }
                 
                 // 开始录制
                 async function startRecording(platform, roomId) {
                     try {
-                        await fetch(`/api/start_recording/${platform}/${roomId}`);
-                        updateData();
+                        await waitTask(await fetch(`/api/start_recording/${platform}/${roomId}`));
+                        refresh();
                     } catch (error) {
                         console.error('开始录制失败:', error);
-                        alert('开始录制失败');
+                        alert(`开始录制失败: ${error.message}`);
                     }
                 }
                 
                 // 停止录制
                 async function stopRecording(platform, roomId) {
                     try {
-                        await fetch(`/api/stop_recording/${platform}/${roomId}`);
-                        updateData();
+                        await waitTask(await fetch(`/api/stop_recording/${platform}/${roomId}`));
+                        refresh();
                     } catch (error) {
                         console.error('停止录制失败:', error);
-                        alert('停止录制失败');
+                        alert(`停止录制失败: ${error.message}`);
                     }
                 }
                 
                 // 初始化页面
-                updateData();
-                
-                // 每5秒自动更新数据
-                setInterval(updateData, 5000);
+                subscribe();
             </script>
         </body>
     </html>
@@ -260,127 +425,531 @@ async def root():
 
 # API端点
 
+def _snapshot_response(request: Request, view: Optional[str], fields: Optional[str]) -> Response:
+    """
+    返回状态快照：支持If-None-Match（未变化返回304）、gzip压缩和字段选择
+    """
+    status_code, body, headers = negotiate(
+        status_store.snapshot(),
+        view,
+        fields,
+        request.headers.get("if-none-match"),
+        request.headers.get("accept-encoding")
+    )
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
 @app.get("/api/status")
-async def get_status():
+async def get_status(request: Request, fields: Optional[str] = None):
     """
     获取系统状态
+    
+    fields为逗号分隔的字段选择，如 "monitor,rooms.room_id,rooms.status"
     """
-    monitor_status = monitor.get_monitor_status()
-    rooms = config_manager.get_rooms()
+    return _snapshot_response(request, None, fields)
+
+@app.get("/api/events")
+async def status_events(request: Request):
+    """
+    状态推送（Server-Sent Events）：连接时发送snapshot事件（与/api/status相同），
+    之后房间录制状态或监控状态变化时发送delta事件，只包含变化的部分：
+    {"rooms": {"平台_房间号": 录制状态}, "monitor": 监控状态}
+    """
+    client = broadcaster.connect()
+    if client is None:
+        raise HTTPException(status_code=503, detail="推送连接数已达上限")
     
-    # 获取每个房间的录制状态
-    for room in rooms:
-        recording_status = recorder.get_recording_status(room)
-        room["status"] = recording_status["status"]
+    return StreamingResponse(
+        broadcaster.stream(client, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus格式的运行指标
+    """
+    if not config_manager.get("web.metrics.enabled", True):
+        raise HTTPException(status_code=404, detail="指标接口未启用")
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+# 采样分析的时长上限（秒），配置中的max_profile_seconds不能超过该值
+MAX_PROFILE_SECONDS = 300
+
+async def dump_trace(clear: bool = False):
+    """
+    导出追踪缓冲区（Chrome追踪格式，可在chrome://tracing或Perfetto中打开）
+    """
+    trace = tracer.dump()
+    if clear:
+        tracer.clear()
+    return Response(
+        content=json.dumps(trace, ensure_ascii=False),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="2233recorder-trace.json"'}
+    )
+
+async def set_tracing(enabled: bool = True):
+    """
+    运行时开启或关闭追踪
+    """
+    tracer.set_enabled(enabled)
+    return {"enabled": tracer.enabled}
+
+async def run_profiler(seconds: float = 5, interval: float = 0.01, format: str = "folded"):
+    """
+    采样分析所有线程的调用栈（阻塞seconds秒后返回）
+
+    format为folded时返回折叠格式（flamegraph.pl、speedscope），为json时返回按次数排序的调用栈
+    """
+    max_seconds = min(config_manager.get("system.tracing.max_profile_seconds", 60), MAX_PROFILE_SECONDS)
+    if not 0 < seconds <= max_seconds or not 0.001 <= interval <= 1:
+        raise HTTPException(status_code=400, detail=f"采样时长须在0到{max_seconds}秒之间，间隔须在0.001到1秒之间")
     
-    return {
-        "system": {
-            "name": config_manager.get("system.name"),
-            "version": config_manager.get("system.version"),
-            "log_level": config_manager.get("system.log_level")
-        },
-        "monitor": monitor_status,
-        "rooms": rooms,
-        "recorder": {
-            "record_processes_count": len(recorder.record_processes)
-        }
-    }
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, profiler.profile, seconds, interval)
+    if result is None:
+        raise HTTPException(status_code=409, detail="已有采样分析正在进行")
+    if format == "json":
+        return result
+    return Response(content=format_folded(result), media_type="text/plain; charset=utf-8")
+
+# 调试接口会暴露运行数据并占用CPU，只在配置中启用时注册
+if config_manager.get("web.debug.enabled", False):
+    app.add_api_route("/api/debug/trace", dump_trace, methods=["GET"])
+    app.add_api_route("/api/debug/trace", set_tracing, methods=["POST"])
+    app.add_api_route("/api/debug/profile", run_profiler, methods=["GET"])
 
-@app.get("/api/start_monitor")
+# 以下操作可能阻塞数秒，提交到后台执行后立即返回任务，通过 /api/tasks/{task_id} 查询结果
+
+@app.get("/api/start_monitor", status_code=202)
 async def start_monitor():
     """
     启动监控
     """
-    monitor.start()
-    return {"message": "监控已启动"}
+    task = task_manager.submit("start_monitor", monitor.start, key="monitor")
+    return dict(task, message="正在启动监控")
 
-@app.get("/api/stop_monitor")
+@app.get("/api/stop_monitor", status_code=202)
 async def stop_monitor():
     """
     停止监控
     """
-    monitor.stop()
-    return {"message": "监控已停止"}
+    task = task_manager.submit("stop_monitor", monitor.stop, key="monitor")
+    return dict(task, message="正在停止监控")
 
-@app.get("/api/start_recording/{platform}/{room_id}")
+@app.get("/api/start_recording/{platform}/{room_id}", status_code=202)
 async def start_recording(platform: str, room_id: str):
     """
     开始录制指定房间
     """
-    room = None
-    for r in config_manager.get_rooms():
-        if r.get("platform") == platform and r.get("room_id") == room_id:
-            room = r
-            break
+    room = _find_room(platform, room_id)
     
-    if not room:
-        raise HTTPException(status_code=404, detail="直播间未找到")
-    
-    # 调用录制核心开始录制
-    result = recorder.start_recording(room, "", room.get("name"))
-    if result:
-        return {"message": f"已开始录制 {platform} 房间 {room_id}"}
-    else:
-        raise HTTPException(status_code=500, detail=f"录制 {platform} 房间 {room_id} 失败")
+    # 调用录制核心开始录制（可能需要下载录播姬）
+    task = task_manager.submit(
+        "start_recording",
+        recorder.start_recording, room, "", room.get("name"),
+        key=f"{platform}_{room_id}",
+        failure_message=f"录制 {platform} 房间 {room_id} 失败"
+    )
+    return dict(task, message=f"正在开始录制 {platform} 房间 {room_id}")
 
-@app.get("/api/stop_recording/{platform}/{room_id}")
+@app.get("/api/stop_recording/{platform}/{room_id}", status_code=202)
 async def stop_recording(platform: str, room_id: str):
     """
     停止录制指定房间
     """
-    room = None
-    for r in config_manager.get_rooms():
-        if r.get("platform") == platform and r.get("room_id") == room_id:
-            room = r
-            break
+    room = _find_room(platform, room_id)
     
-    if not room:
-        raise HTTPException(status_code=404, detail="直播间未找到")
+    # 调用录制核心停止录制（等待进程退出）
+    task = task_manager.submit(
+        "stop_recording",
+        recorder.stop_recording, room,
+        key=f"{platform}_{room_id}",
+        failure_message=f"停止录制 {platform} 房间 {room_id} 失败"
+    )
+    return dict(task, message=f"正在停止录制 {platform} 房间 {room_id}")
+
+@app.get("/api/tasks")
+async def list_tasks(status: Optional[str] = None):
+    """
+    获取后台操作列表
+    """
+    return {"tasks": task_manager.list_tasks(status)}
+
+@app.get("/api/tasks/{task_id}")
+async def get_task(task_id: str):
+    """
+    获取后台操作状态（pending、running、done、failed），失败时包含错误信息
+    """
+    task = task_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务未找到")
     
-    # 调用录制核心停止录制
-    result = recorder.stop_recording(room)
-    if result:
-        return {"message": f"已停止录制 {platform} 房间 {room_id}"}
-    else:
-        raise HTTPException(status_code=500, detail=f"停止录制 {platform} 房间 {room_id} 失败")
+    return task
 
 @app.get("/api/rooms")
-async def get_rooms():
+async def get_rooms(request: Request, fields: Optional[str] = None):
     """
     获取所有直播间配置
-    """
-    rooms = config_manager.get_rooms()
-    
-    # 获取每个房间的录制状态
-    for room in rooms:
-        recording_status = recorder.get_recording_status(room)
-        room["status"] = recording_status["status"]
     
-    return {"rooms": rooms}
+    fields为逗号分隔的字段选择，如 "rooms.room_id,rooms.status"
+    """
+    return _snapshot_response(request, "rooms", fields)
 
 @app.get("/api/room/{room_id}")
 async def get_room(room_id: str):
     """
     获取指定直播间配置
     """
-    room = config_manager.get_room(room_id)
+    room = status_store.snapshot().rooms_by_id.get(room_id)
     if not room:
         raise HTTPException(status_code=404, detail="直播间未找到")
     
-    # 获取录制状态
-    recording_status = recorder.get_recording_status(room)
-    room["status"] = recording_status["status"]
+    return room
+
+@app.post("/api/jobs")
+async def submit_job(job: Dict[str, Any] = Body(...)):
+    """
+    提交视频处理任务（convert、watermark、thumbnails）
+    
+    请求体示例: {"type": "convert", "platform": "bilibili", "room_id": "123",
+                 "params": {"input_file": "part1.flv"}, "priority": 5, "max_retries": 2}
+    文件路径为相对于房间录制目录的路径，不能指向录制目录以外的文件
+    """
+    job_type = job.get("type")
+    params = job.get("params") or {}
+    priority = job.get("priority", 5)
+    max_retries = job.get("max_retries", 2)
+    errors = check_job_request(job_type, params, priority, max_retries)
+    if not job.get("platform") or not job.get("room_id"):
+        errors.append("缺少platform或room_id")
+    if errors:
+        raise HTTPException(status_code=400, detail="；".join(errors))
+    
+    room = _find_room(job.get("platform"), job.get("room_id"))
+    schema = API_JOB_PARAMS[job_type]
+    params = dict(params)
+    for key, value in params.items():
+        if schema[key] is INPUT_PATH:
+            params[key] = _resolve_recording_path(room, value)
+        elif schema[key] is OUTPUT_PATH:
+            params[key] = _resolve_output_path(room, value)
+    
+    job_id = job_queue.submit(job_type, params, priority=priority, max_retries=max_retries)
+    if not job_id:
+        raise HTTPException(status_code=503, detail="任务队列已满")
+    
+    return {"job_id": job_id}
+
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None):
+    """
+    获取处理任务列表和队列状态
+    """
+    return {
+        "queue": job_queue.get_queue_status(),
+        "jobs": job_queue.list_jobs(status)
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    获取指定处理任务，执行中的任务包含实时进度（帧数、速度、完成百分比、预计剩余时间）
+    """
+    job = job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务未找到")
     
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    取消指定处理任务
+    """
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=404, detail="任务未找到或已结束")
+    
+    return {"message": f"已取消任务 {job_id}"}
+
+@app.get("/api/pipeline")
+async def list_pipeline_files(platform: Optional[str] = None, room_id: Optional[str] = None):
+    """
+    获取录制文件的后期处理进度
+    """
+    room_key = f"{platform}_{room_id}" if platform and room_id else None
+    return {"files": pipeline.list_files(room_key)}
+
+def _resolve_recording_path(room: Dict[str, Any], name: str, directory: bool = False) -> str:
+    """
+    将相对于房间录制目录的路径解析为绝对路径（解析符号链接后），拒绝录制目录以外的路径
+    """
+    if "\0" in name:
+        raise HTTPException(status_code=404, detail="录制文件未找到")
+    output_dir = os.path.realpath(recorder.get_output_dir(room))
+    path = os.path.realpath(os.path.join(output_dir, name))
+    if directory and path == output_dir and os.path.isdir(path):
+        return path
+    exists = os.path.isdir(path) if directory else os.path.isfile(path)
+    if not path.startswith(output_dir + os.sep) or not exists:
+        raise HTTPException(status_code=404, detail=f"录制文件未找到: {name}")
+    return path
+
+def _resolve_output_path(room: Dict[str, Any], name: str) -> str:
+    """
+    将相对于房间录制目录的输出文件名解析为绝对路径，所在目录须存在且位于录制目录内
+    """
+    if "\0" in name:
+        raise HTTPException(status_code=400, detail="输出文件路径无效")
+    output_dir = os.path.realpath(recorder.get_output_dir(room))
+    path = os.path.realpath(os.path.join(output_dir, name))
+    if not path.startswith(output_dir + os.sep) or os.path.isdir(path) or not os.path.isdir(os.path.dirname(path)):
+        raise HTTPException(status_code=400, detail=f"输出文件路径无效: {name}")
+    return path
+
+class ASGIResponse(Response):
+    """
+    把ASGI应用包装为响应（用于自行处理Range和零拷贝发送的文件响应）
+    """
+    
+    def __init__(self, asgi_app):
+        # 初始化Response的headers、background等属性，响应内容由asgi_app自行发送
+        super().__init__()
+        self.asgi_app = asgi_app
+    
+    async def __call__(self, scope, receive, send):
+        await self.asgi_app(scope, receive, send)
+
+def _find_room(platform: str, room_id: str) -> Dict[str, Any]:
+    """
+    按平台和房间号查找直播间配置
+    """
+    room = config_manager.find_room(platform, room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="直播间未找到")
     return room
 
+def _clip_input_files(room: Dict[str, Any], output_dir: str, names: Optional[List[Any]]) -> List[str]:
+    """
+    解析剪辑的输入文件，未指定时使用录制目录下最新的FLV文件（不包括已导出的剪辑）
+    """
+    if names:
+        return [_resolve_recording_path(room, str(name)) for name in names]
+    
+    flv_files = []
+    for root, dirs, files in os.walk(output_dir):
+        dirs[:] = [d for d in dirs if d != CLIP_DIR]
+        flv_files += [os.path.join(root, f) for f in files if f.endswith(".flv") and not f.startswith(".")]
+    if not flv_files:
+        raise HTTPException(status_code=404, detail="没有录制文件")
+    return [max(flv_files, key=os.path.getmtime)]
+
+@app.post("/api/clips")
+async def create_clip(clip: Dict[str, Any] = Body(...)):
+    """
+    按时间范围导出剪辑（基于关键帧索引直接复制，不重新编码）
+    
+    请求体示例: {"platform": "bilibili", "room_id": "123", "start": 3600, "end": 3660,
+                 "files": ["part1.flv", "part2.flv"], "format": "mp4"}
+    files为录制目录下按时间顺序排列的分段文件名，省略时使用最新的录制文件（可以是正在录制的文件）
+    """
+    room = _find_room(clip.get("platform"), clip.get("room_id"))
+    
+    try:
+        start = float(clip.get("start", 0))
+        end = float(clip["end"]) if clip.get("end") is not None else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="时间范围无效")
+    if start < 0 or (end is not None and end <= start):
+        raise HTTPException(status_code=400, detail="时间范围无效")
+    
+    output_format = clip.get("format", "flv")
+    if output_format not in ("flv", "mp4"):
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {output_format}")
+    
+    output_dir = os.path.realpath(recorder.get_output_dir(room))
+    # 解析文件和查找最新录制文件需要遍历录制目录，放到线程池中执行
+    input_files = await asyncio.get_running_loop().run_in_executor(
+        None, _clip_input_files, room, output_dir, clip.get("files")
+    )
+    
+    stem = os.path.splitext(os.path.basename(input_files[0]))[0]
+    end_label = f"{end:g}" if end is not None else "end"
+    output_file = os.path.join(output_dir, CLIP_DIR, f"{stem}_{start:g}-{end_label}.{output_format}")
+    
+    job_id = job_queue.submit(
+        "clip",
+        {"input_files": input_files, "start": start, "end": end, "output_file": output_file},
+        priority=clip.get("priority", 2),
+        max_retries=0
+    )
+    if not job_id:
+        raise HTTPException(status_code=503, detail="任务队列已满")
+    
+    return {"job_id": job_id, "output_file": output_file}
+
+@app.get("/api/recordings/{platform}/{room_id}")
+async def list_recordings_dir(platform: str, room_id: str, path: str = ""):
+    """
+    浏览房间录制目录（path为相对于录制目录的子目录），文件包含大小、修改时间和是否仍在写入
+    """
+    room = _find_room(platform, room_id)
+    output_dir = os.path.realpath(recorder.get_output_dir(room))
+    if not os.path.isdir(output_dir):
+        return {"path": "", "entries": []}
+    
+    directory = _resolve_recording_path(room, path or ".", directory=True)
+    entries = await asyncio.get_running_loop().run_in_executor(None, list_directory, directory, output_dir)
+    for entry in entries:
+        if entry["type"] == "file":
+            entry["url"] = f"/api/recordings/{platform}/{room_id}/files/{quote(entry['path'])}"
+    return {"path": os.path.relpath(directory, output_dir), "entries": entries}
+
+@app.api_route("/api/recordings/{platform}/{room_id}/files/{file_path:path}", methods=["GET", "HEAD"])
+async def stream_recording(platform: str, room_id: str, file_path: str, download: bool = False):
+    """
+    播放或下载录制文件：支持Range（拖动播放、断点续传）、ETag/Last-Modified条件请求，
+    服务器支持时通过sendfile零拷贝发送。正在写入的文件按请求时的大小返回。
+    """
+    path = _resolve_recording_path(_find_room(platform, room_id), file_path)
+    return ASGIResponse(FileSender(path, download=download))
+
+@app.get("/api/preview")
+async def list_previews():
+    """
+    获取正在进行的直播预览
+    """
+    return {"sessions": live_preview.list_sessions()}
+
+@app.get("/api/preview/{platform}/{room_id}/index.m3u8")
+async def get_preview_playlist(platform: str, room_id: str):
+    """
+    获取正在录制的房间的HLS直播预览播放列表（首次请求时启动预览，一段时间没有请求后自动停止）
+    """
+    room = _find_room(platform, room_id)
+    playlist = await asyncio.get_running_loop().run_in_executor(
+        None, live_preview.open, f"{platform}_{room_id}", recorder.get_output_dir(room)
+    )
+    if not playlist:
+        raise HTTPException(status_code=503, detail="房间没有正在进行的录制或预览数已达上限")
+    
+    return FileResponse(playlist, media_type="application/vnd.apple.mpegurl",
+                        headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/preview/{platform}/{room_id}/{segment}")
+async def get_preview_segment(platform: str, room_id: str, segment: str):
+    """
+    获取直播预览分片（播放列表中的相对地址）
+    """
+    path = live_preview.segment(f"{platform}_{room_id}", segment)
+    if not path:
+        raise HTTPException(status_code=404, detail="预览分片未找到")
+    
+    return FileResponse(path, media_type="video/mp2t", headers={"Cache-Control": "public, max-age=60"})
+
+@app.delete("/api/preview/{platform}/{room_id}")
+async def stop_preview(platform: str, room_id: str):
+    """
+    停止房间的直播预览
+    """
+    if not live_preview.stop(f"{platform}_{room_id}"):
+        raise HTTPException(status_code=404, detail="预览未启动")
+    
+    return {"message": f"已停止 {platform} 房间 {room_id} 的直播预览"}
+
+@app.get("/api/thumbnails/assets/{key}/{asset}")
+async def get_thumbnail_asset(key: str, asset: str):
+    """
+    获取缩略图缓存中的雪碧图、WebVTT或封面文件（WebVTT中的雪碧图地址相对于该路径）
+    """
+    thumbnail_config = get_thumbnail_config()
+    if not re.fullmatch(r"[0-9a-f]{16}", key) or not re.fullmatch(r"[\w.]+\.(jpg|vtt)", asset):
+        raise HTTPException(status_code=404, detail="缩略图文件未找到")
+    path = os.path.join(thumbnail_config["cache_dir"], key, asset)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="缩略图文件未找到")
+    
+    media_type = "text/vtt" if asset.endswith(".vtt") else "image/jpeg"
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": "public, max-age=86400"})
+
+@app.get("/api/thumbnails/{platform}/{room_id}/{file_path:path}")
+async def get_thumbnails(platform: str, room_id: str, file_path: str):
+    """
+    获取录制文件的缩略图信息（雪碧图、WebVTT、封面地址），只读取缓存，不打开录制文件
+    """
+    path = _resolve_recording_path(_find_room(platform, room_id), file_path)
+    meta = await asyncio.get_running_loop().run_in_executor(None, load_thumbnails, path)
+    if not meta:
+        raise HTTPException(status_code=404, detail="缩略图尚未生成")
+    
+    base_url = f"/api/thumbnails/assets/{os.path.basename(meta['dir'])}"
+    result = {key: value for key, value in meta.items() if key not in ("dir", "source")}
+    result["vtt_url"] = f"{base_url}/{meta['vtt']}"
+    result["cover_url"] = f"{base_url}/{meta['cover']}" if meta["cover"] else None
+    result["sheet_urls"] = [f"{base_url}/{sheet}" for sheet in meta["sheets"]]
+    return result
+
+@app.post("/api/thumbnails/{platform}/{room_id}/{file_path:path}")
+async def create_thumbnails(platform: str, room_id: str, file_path: str, force: bool = False):
+    """
+    提交缩略图生成任务（低优先级执行）
+    """
+    path = _resolve_recording_path(_find_room(platform, room_id), file_path)
+    job_id = job_queue.submit("thumbnails", {"input_file": path, "force": force}, priority=8, max_retries=0)
+    if not job_id:
+        raise HTTPException(status_code=503, detail="任务队列已满")
+    
+    return {"job_id": job_id}
+
+@app.get("/api/library")
+async def list_recordings(platform: Optional[str] = None, room_id: Optional[str] = None,
+                          session: Optional[str] = None, ext: Optional[str] = None,
+                          since: Optional[float] = None, until: Optional[float] = None,
+                          q: Optional[str] = None, sort: str = "started_at", order: str = "desc",
+                          page: int = 1, page_size: int = 50):
+    """
+    分页查询录制文件库（房间、场次、格式、开始时间范围、文件名过滤）
+    """
+    if page < 1 or not 1 <= page_size <= 1000:
+        raise HTTPException(status_code=400, detail="分页参数无效")
+    
+    room_key = f"{platform}_{room_id}" if platform and room_id else None
+    result = library.query(
+        room_key=room_key,
+        session=session,
+        ext=ext,
+        since=since,
+        until=until,
+        search=q,
+        sort=sort,
+        descending=order != "asc",
+        offset=(page - 1) * page_size,
+        limit=page_size
+    )
+    result["page"] = page
+    result["page_size"] = page_size
+    return result
+
+@app.post("/api/library/scan")
+async def scan_library():
+    """
+    在后台重新扫描所有录制目录
+    """
+    if not library.is_attached:
+        raise HTTPException(status_code=503, detail="录制文件库未启用")
+    
+    task = task_manager.submit("scan_library", library.scan, key="library")
+    return dict(task, message="已开始扫描录制文件库")
+
 # 主函数
 if __name__ == "__main__":
     host = config_manager.get("web.host", "0.0.0.0")
     port = config_manager.get("web.port", 8080)
     
-    print(f"Starting 2233recorder API server on http://{host}:{port}")
-    print(f"API documentation available at http://{host}:{port}/docs")
-    print(f"Web interface available at http://{host}:{port}")
+    logger.info(f"Starting 2233recorder API server on http://{host}:{port}")
+    logger.info(f"API documentation available at http://{host}:{port}/docs")
+    logger.info(f"Web interface available at http://{host}:{port}")
     
     uvicorn.run(
         "src.web.app:app",
@@ -0,0 +1,267 @@
+import json
+import time
+import asyncio
+import threading
+import logging
+from typing import Dict, Any, Optional, Callable, AsyncIterator, Set
+from src.config.config import config_manager
+from src.utils.events import event_bus
+
+
+# 影响房间录制状态的事件
+ROOM_EVENTS = ("recording_started", "recording_stopped", "recording_state_changed",
+               "segment_opened", "segment_closed")
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """
+    按Server-Sent Events格式编码一条消息
+
+    Args:
+        event: 事件名称
+        data: 事件数据（序列化为JSON）
+        event_id: 消息ID（客户端重连时通过Last-Event-ID带回）
+
+    Returns:
+        bytes: 编码后的消息
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class StatusClient:
+    """
+    一个订阅状态推送的客户端
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # 客户端处理过慢导致消息被丢弃，下次发送完整快照
+        self.resync = True
+        self.connected_at = time.time()
+
+
+class StatusBroadcaster:
+    """
+    状态推送广播器（Server-Sent Events）
+
+    客户端连接时发送一次完整快照，之后只推送状态变化：
+    录制、守护和监控模块通过事件总线通知变化的房间，广播器在合并窗口内汇总，
+    每个变化的房间只查询一次状态，编码一次后分发给所有客户端。
+    每个客户端的发送队列有上限，处理过慢的客户端丢弃积压的增量，改为重新发送快照，
+    不会占用无限内存，也不会拖慢其他客户端。
+    """
+
+    def __init__(self,
+                 snapshot_provider: Callable[[], Dict[str, Any]],
+                 room_status_provider: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 monitor_status_provider: Callable[[], Dict[str, Any]]):
+        """
+        初始化广播器
+
+        Args:
+            snapshot_provider: 生成完整状态快照的函数
+            room_status_provider: 查询单个房间状态的函数，参数为房间配置
+            monitor_status_provider: 查询监控状态的函数
+        """
+        self.snapshot_provider = snapshot_provider
+        self.room_status_provider = room_status_provider
+        self.monitor_status_provider = monitor_status_provider
+        self.logger = logging.getLogger("StatusBroadcaster")
+
+        self.coalesce_interval = 0.5
+        self.heartbeat_interval = 15
+        self.queue_size = 64
+        self.max_clients = 100
+
+        self.version = 0
+        self._lock = threading.Lock()
+        self._dirty_rooms: Dict[str, Dict[str, Any]] = {}
+        self._monitor_dirty = False
+        self._clients: Set[StatusClient] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    def _load_settings(self):
+        """
+        从配置文件读取推送参数
+        """
+        self.coalesce_interval = config_manager.get("web.events.coalesce_interval", self.coalesce_interval)
+        self.heartbeat_interval = config_manager.get("web.events.heartbeat_interval", self.heartbeat_interval)
+        self.queue_size = config_manager.get("web.events.queue_size", self.queue_size)
+        self.max_clients = config_manager.get("web.events.max_clients", self.max_clients)
+
+    def attach(self):
+        """
+        订阅状态变化事件
+        """
+        self._load_settings()
+        for event_type in ROOM_EVENTS:
+            event_bus.subscribe(event_type, self._on_room_event)
+        event_bus.subscribe("monitor_state_changed", self._on_monitor_event)
+
+    def detach(self):
+        """
+        取消订阅并停止分发任务
+        """
+        for event_type in ROOM_EVENTS:
+            event_bus.unsubscribe(event_type, self._on_room_event)
+        event_bus.unsubscribe("monitor_state_changed", self._on_monitor_event)
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    @property
+    def client_count(self) -> int:
+        """
+        当前连接的客户端数
+        """
+        return len(self._clients)
+
+    def mark_room(self, room: Dict[str, Any]):
+        """
+        标记房间状态已变化（可在任意线程调用）
+
+        Args:
+            room: 房间配置
+        """
+        room_key = f"{room.get('platform', 'bilibili')}_{room.get('room_id')}"
+        with self._lock:
+            self._dirty_rooms[room_key] = room
+        self._wake()
+
+    def mark_monitor(self):
+        """
+        标记监控状态已变化（可在任意线程调用）
+        """
+        with self._lock:
+            self._monitor_dirty = True
+        self._wake()
+
+    def _on_room_event(self, room: Dict[str, Any], **_):
+        self.mark_room(room)
+
+    def _on_monitor_event(self, **_):
+        self.mark_monitor()
+
+    def _wake(self):
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or not self._clients:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def connect(self) -> Optional[StatusClient]:
+        """
+        注册一个客户端（在事件循环中调用），首次连接时启动分发任务
+
+        Returns:
+            Optional[StatusClient]: 客户端，连接数已达上限返回None
+        """
+        if len(self._clients) >= self.max_clients:
+            return None
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._flusher is None or self._flusher.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._flusher = loop.create_task(self._flush_loop())
+
+        client = StatusClient(self.queue_size)
+        self._clients.add(client)
+        return client
+
+    def disconnect(self, client: StatusClient):
+        """
+        注销客户端
+
+        Args:
+            client: 客户端
+        """
+        self._clients.discard(client)
+
+    async def stream(self, client: StatusClient,
+                     is_disconnected: Optional[Callable[[], Any]] = None) -> AsyncIterator[bytes]:
+        """
+        生成发送给客户端的消息流：快照、增量和心跳
+
+        Args:
+            client: 客户端
+            is_disconnected: 检查客户端是否已断开的协程函数
+
+        Yields:
+            bytes: Server-Sent Events消息
+        """
+        try:
+            yield f"retry: {int(self.heartbeat_interval * 1000)}\n\n".encode("utf-8")
+            while True:
+                if client.resync:
+                    client.resync = False
+                    yield format_sse("snapshot", self.snapshot_provider(), self.version)
+                    continue
+                try:
+                    message = await asyncio.wait_for(client.queue.get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield b": ping\n\n"
+                    continue
+                if message is not None:
+                    yield message
+        finally:
+            self.disconnect(client)
+
+    async def _flush_loop(self):
+        """
+        分发任务：等待状态变化，合并窗口结束后生成一次增量并放入所有客户端的队列
+        """
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.coalesce_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> Optional[bytes]:
+        """
+        生成当前累计的增量消息并分发（在事件循环中调用）
+
+        Returns:
+            Optional[bytes]: 分发的消息，没有变化返回None
+        """
+        with self._lock:
+            dirty_rooms, self._dirty_rooms = self._dirty_rooms, {}
+            monitor_dirty, self._monitor_dirty = self._monitor_dirty, False
+        if not dirty_rooms and not monitor_dirty:
+            return None
+
+        delta: Dict[str, Any] = {"rooms": {}}
+        for room_key, room in dirty_rooms.items():
+            try:
+                delta["rooms"][room_key] = self.room_status_provider(room)
+            except Exception as e:
+                self.logger.error(f"获取房间 {room_key} 状态失败: {e}")
+        if monitor_dirty:
+            delta["monitor"] = self.monitor_status_provider()
+
+        self.version += 1
+        message = format_sse("delta", delta, self.version)
+        for client in list(self._clients):
+            if client.resync:
+                continue
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 丢弃积压的增量，改为发送快照
+                while not client.queue.empty():
+                    client.queue.get_nowait()
+                client.resync = True
+                client.queue.put_nowait(None)
+        return message
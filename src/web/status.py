@@ -0,0 +1,294 @@
+import gzip
+import json
+import time
+import uuid
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Callable, List, Tuple
+from src.config.config import config_manager
+from src.utils.events import event_bus
+from src.web.events import ROOM_EVENTS
+
+
+# 响应体超过该大小才压缩
+GZIP_MIN_SIZE = 1024
+
+
+def room_key_of(room: Dict[str, Any]) -> str:
+    """
+    房间键：平台_房间号
+    """
+    return f"{room.get('platform', 'bilibili')}_{room.get('room_id')}"
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    解析字段选择参数，如 "monitor,rooms.room_id,rooms.status"
+
+    Args:
+        fields: 逗号分隔的字段列表，"rooms.xxx" 表示只返回每个房间的xxx字段
+
+    Returns:
+        Optional[Tuple[str, ...]]: 排序去重后的字段列表，未指定返回None
+    """
+    if not fields:
+        return None
+    selected = tuple(sorted({field.strip() for field in fields.split(",") if field.strip()}))
+    return selected or None
+
+
+def select_fields(data: Dict[str, Any], fields: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    """
+    按字段选择裁剪数据（不修改原数据）
+
+    Args:
+        data: 状态数据
+        fields: parse_fields的结果
+
+    Returns:
+        Dict[str, Any]: 裁剪后的数据
+    """
+    if not fields:
+        return data
+
+    top_level = set()
+    nested: Dict[str, List[str]] = {}
+    for field in fields:
+        parent, _, child = field.partition(".")
+        if child:
+            nested.setdefault(parent, []).append(child)
+        else:
+            top_level.add(parent)
+
+    result = {}
+    for key, value in data.items():
+        if key in top_level:
+            result[key] = value
+        elif key in nested:
+            children = nested[key]
+            if isinstance(value, list):
+                result[key] = [{k: item[k] for k in children if k in item} for item in value]
+            elif isinstance(value, dict):
+                result[key] = {k: value[k] for k in children if k in value}
+    return result
+
+
+class StatusSnapshot:
+    """
+    某一版本的状态快照（构建后不再修改，多个请求可以安全共享）
+    """
+
+    __slots__ = ("version", "data", "rooms_by_id", "built_at", "boot", "_rendered", "_lock")
+
+    def __init__(self, version: int, data: Dict[str, Any], rooms_by_id: Dict[str, Dict[str, Any]],
+                 boot: str = ""):
+        self.version = version
+        self.boot = boot
+        self.data = data
+        self.rooms_by_id = rooms_by_id
+        self.built_at = time.time()
+        self._rendered: Dict[Tuple, Dict[str, Optional[bytes]]] = {}
+        self._lock = threading.Lock()
+
+    def render(self, view: Optional[str] = None, fields: Optional[Tuple[str, ...]] = None,
+               compress: bool = False) -> Tuple[bytes, str]:
+        """
+        编码快照（同一版本、视图和字段选择只编码、压缩一次）
+
+        Args:
+            view: 只返回快照中的一个顶层字段（如 "rooms"），None表示完整快照
+            fields: parse_fields的结果
+            compress: 是否返回gzip压缩后的内容（内容过小时不压缩）
+
+        Returns:
+            Tuple[bytes, str]: (响应体, 内容编码)，内容编码为 "gzip" 或 "identity"
+        """
+        key = (view, fields)
+        with self._lock:
+            rendered = self._rendered.get(key)
+            if rendered is None:
+                data = {view: self.data[view]} if view else self.data
+                body = json.dumps(select_fields(data, fields), ensure_ascii=False,
+                                  separators=(",", ":")).encode("utf-8")
+                rendered = self._rendered[key] = {"body": body, "gzip": None}
+            if not compress or len(rendered["body"]) < GZIP_MIN_SIZE:
+                return rendered["body"], "identity"
+            if rendered["gzip"] is None:
+                rendered["gzip"] = gzip.compress(rendered["body"], compresslevel=5, mtime=0)
+            return rendered["gzip"], "gzip"
+
+    def etag(self, view: Optional[str] = None, fields: Optional[Tuple[str, ...]] = None) -> str:
+        """
+        进程启动标识、快照版本和字段选择对应的ETag
+        """
+        variant = hashlib.sha1(repr((view, fields)).encode("utf-8")).hexdigest()[:8]
+        return f'"{self.boot}-{self.version}-{variant}"'
+
+
+class StatusStore:
+    """
+    状态快照存储
+
+    系统状态只在变化时重建：录制、守护和监控模块通过事件总线通知变化的房间，
+    下一次请求时只重新查询变化的房间，生成新版本的快照并编码一次；
+    状态未变化时所有请求直接复用同一快照的编码结果（支持ETag和gzip）。
+    快照中的房间是配置的副本，不会修改配置管理器中的房间字典。
+    """
+
+    def __init__(self,
+                 room_status_provider: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 monitor_status_provider: Callable[[], Dict[str, Any]],
+                 recorder_status_provider: Callable[[], Dict[str, Any]]):
+        """
+        初始化状态存储
+
+        Args:
+            room_status_provider: 查询单个房间录制状态的函数，参数为房间配置
+            monitor_status_provider: 查询监控状态的函数
+            recorder_status_provider: 查询录制进程统计的函数
+        """
+        self.room_status_provider = room_status_provider
+        self.monitor_status_provider = monitor_status_provider
+        self.recorder_status_provider = recorder_status_provider
+        # 漏掉事件时的兜底：快照最长使用时间（秒），0表示只在变化时重建
+        self.max_age = 60
+
+        self._lock = threading.Lock()
+        # 进程启动标识：版本号在每个进程中都从0开始，重启后ETag不能与重启前的重复
+        self._boot = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._snapshot: Optional[StatusSnapshot] = None
+        self._rooms_source: Optional[list] = None
+        self._room_states: Dict[str, Dict[str, Any]] = {}
+        self._dirty_rooms: Dict[str, Dict[str, Any]] = {}
+        self._dirty = True
+
+    def attach(self):
+        """
+        订阅状态变化事件
+        """
+        self.max_age = config_manager.get("web.status.max_age", self.max_age)
+        for event_type in ROOM_EVENTS:
+            event_bus.subscribe(event_type, self._on_room_event)
+        event_bus.subscribe("monitor_state_changed", self._on_monitor_event)
+
+    def detach(self):
+        """
+        取消订阅状态变化事件
+        """
+        for event_type in ROOM_EVENTS:
+            event_bus.unsubscribe(event_type, self._on_room_event)
+        event_bus.unsubscribe("monitor_state_changed", self._on_monitor_event)
+
+    def mark_room(self, room: Dict[str, Any]):
+        """
+        标记房间状态已变化（可在任意线程调用）
+
+        Args:
+            room: 房间配置
+        """
+        with self._lock:
+            self._dirty_rooms[room_key_of(room)] = room
+            self._dirty = True
+
+    def mark_all(self):
+        """
+        标记全部状态已变化，下次请求时完整重建
+        """
+        with self._lock:
+            self._rooms_source = None
+            self._dirty = True
+
+    def _on_room_event(self, room: Dict[str, Any], **_):
+        self.mark_room(room)
+
+    def _on_monitor_event(self, **_):
+        with self._lock:
+            self._dirty = True
+
+    def snapshot(self) -> StatusSnapshot:
+        """
+        获取当前状态快照，有变化时先重建
+
+        Returns:
+            StatusSnapshot: 状态快照
+        """
+        rooms = config_manager.get_rooms()
+        with self._lock:
+            snapshot = self._snapshot
+            expired = (snapshot is not None and self.max_age
+                       and time.time() - snapshot.built_at >= self.max_age)
+            if snapshot is not None and not self._dirty and not expired and rooms is self._rooms_source:
+                return snapshot
+
+            if expired or rooms is not self._rooms_source:
+                # 房间配置重新加载或快照过期，全部重新查询
+                dirty = {room_key_of(room): room for room in rooms}
+                self._room_states = {}
+            else:
+                dirty = self._dirty_rooms
+            self._dirty_rooms = {}
+            self._dirty = False
+            self._rooms_source = rooms
+
+            for key, room in dirty.items():
+                self._room_states[key] = dict(room, status=self.room_status_provider(room)["status"])
+
+            room_list = []
+            rooms_by_id = {}
+            for room in rooms:
+                state = self._room_states.get(room_key_of(room))
+                if state is None:
+                    state = dict(room, status=self.room_status_provider(room)["status"])
+                    self._room_states[room_key_of(room)] = state
+                room_list.append(state)
+                if room.get("id") is not None:
+                    rooms_by_id[str(room.get("id"))] = state
+
+            self._version += 1
+            data = {
+                "system": {
+                    "name": config_manager.get("system.name"),
+                    "version": config_manager.get("system.version"),
+                    "log_level": config_manager.get("system.log_level")
+                },
+                "monitor": self.monitor_status_provider(),
+                "rooms": room_list,
+                "recorder": self.recorder_status_provider()
+            }
+            self._snapshot = StatusSnapshot(self._version, data, rooms_by_id, self._boot)
+            return self._snapshot
+
+
+def negotiate(snapshot: StatusSnapshot,
+              view: Optional[str],
+              fields: Optional[str],
+              if_none_match: Optional[str],
+              accept_encoding: Optional[str]) -> Tuple[int, bytes, Dict[str, str]]:
+    """
+    根据请求头生成快照响应：ETag匹配时返回304，客户端支持时返回gzip压缩内容
+
+    Args:
+        snapshot: 状态快照
+        view: 快照中的顶层字段，None表示完整快照
+        fields: 字段选择参数
+        if_none_match: If-None-Match请求头
+        accept_encoding: Accept-Encoding请求头
+
+    Returns:
+        Tuple[int, bytes, Dict[str, str]]: (状态码, 响应体, 响应头)
+    """
+    selected = parse_fields(fields)
+    etag = snapshot.etag(view, selected)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates or f"W/{etag}" in candidates:
+            return 304, b"", headers
+
+    compress = "gzip" in (accept_encoding or "").lower()
+    body, encoding = snapshot.render(view, selected, compress)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return 200, body, headers
@@ -0,0 +1,302 @@
+import os
+import stat
+import time
+import asyncio
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+from typing import Dict, Any, Optional, Tuple, List
+
+
+# 非零拷贝发送时每次读取的大小
+CHUNK_SIZE = 256 * 1024
+
+# ASGI零拷贝发送扩展（服务器支持时由sendfile直接从文件发送到套接字）
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+# 修改时间在该时间（秒）以内的文件视为仍在写入
+GROWING_WINDOW = 10
+
+MEDIA_TYPES = {
+    ".flv": "video/x-flv",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+    ".mkv": "video/x-matroska",
+    ".ts": "video/mp2t",
+    ".jpg": "image/jpeg",
+    ".xml": "application/xml",
+    ".json": "application/json",
+    ".txt": "text/plain; charset=utf-8"
+}
+
+
+class RangeNotSatisfiable(ValueError):
+    """
+    请求的范围超出文件大小
+    """
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析Range请求头（只支持单个字节范围，多个范围时按完整请求处理）
+
+    Args:
+        header: Range请求头，如 "bytes=0-1023"、"bytes=1024-"、"bytes=-500"
+        size: 文件大小
+
+    Returns:
+        Optional[Tuple[int, int]]: (起始位置, 结束位置)，结束位置包含在内；不是有效的单个范围返回None
+
+    Raises:
+        RangeNotSatisfiable: 范围起点超出文件大小
+    """
+    if not header:
+        return None
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, sep, last = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        start = int(first) if first else None
+        end = int(last) if last else None
+    except ValueError:
+        return None
+
+    if start is None:
+        # 后缀范围：最后N个字节
+        if end is None:
+            return None
+        if end <= 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - end, 0), size - 1
+
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def file_etag(st: os.stat_result) -> str:
+    """
+    根据文件大小和修改时间生成ETag（文件仍在写入时随之变化）
+    """
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def is_growing(st: os.stat_result, now: Optional[float] = None) -> bool:
+    """
+    文件是否仍在写入（最近修改过）
+    """
+    return (now or time.time()) - st.st_mtime < GROWING_WINDOW
+
+
+def content_disposition(name: str, attachment: bool) -> str:
+    """
+    生成Content-Disposition头，非ASCII文件名按RFC 5987编码
+    """
+    kind = "attachment" if attachment else "inline"
+    fallback = name.encode("ascii", "replace").decode("ascii").replace('"', "_").replace("?", "_")
+    return f"{kind}; filename=\"{fallback}\"; filename*=UTF-8''{quote(name)}"
+
+
+def _not_modified(headers: Dict[str, str], etag: str, mtime: float) -> bool:
+    """
+    按If-None-Match（优先）或If-Modified-Since判断内容是否未变化
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range_allowed(headers: Dict[str, str], etag: str, mtime: float) -> bool:
+    """
+    If-Range与当前文件一致时才按范围返回，否则返回完整内容
+    """
+    if_range = headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_range).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def plan_response(path: str, headers: Dict[str, str], method: str = "GET",
+                  download: bool = False) -> Dict[str, Any]:
+    """
+    根据请求头确定文件响应：状态码、响应头和发送的字节范围
+
+    正在写入的文件按请求时的大小返回，已写入的部分可以正常播放或下载，
+    之后再次请求（Range从上次结束处开始）即可获取新写入的内容。
+
+    Args:
+        path: 文件路径
+        headers: 请求头（小写键）
+        method: 请求方法（HEAD只返回响应头）
+        download: 是否作为附件下载
+
+    Returns:
+        Dict[str, Any]: 响应计划（status、headers、offset、length、path）
+
+    Raises:
+        OSError: 文件不存在或不是普通文件
+    """
+    st = os.stat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise FileNotFoundError(path)
+
+    size = st.st_size
+    etag = file_etag(st)
+    growing = is_growing(st)
+    response_headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+        "content-type": MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream"),
+        "content-disposition": content_disposition(os.path.basename(path), download),
+        # 正在写入的文件每次都要重新验证
+        "cache-control": "no-cache" if growing else "private, max-age=3600"
+    }
+    plan = {"status": 200, "headers": response_headers, "offset": 0, "length": size, "path": path}
+    if growing:
+        response_headers["x-file-growing"] = "1"
+
+    if method in ("GET", "HEAD") and _not_modified(headers, etag, st.st_mtime):
+        plan.update(status=304, length=0)
+        return plan
+
+    if _range_allowed(headers, etag, st.st_mtime):
+        try:
+            byte_range = parse_range(headers.get("range"), size)
+        except RangeNotSatisfiable:
+            response_headers["content-range"] = f"bytes */{size}"
+            plan.update(status=416, length=0)
+            return plan
+        if byte_range is not None:
+            start, end = byte_range
+            response_headers["content-range"] = f"bytes {start}-{end}/{size}"
+            plan.update(status=206, offset=start, length=end - start + 1)
+
+    return plan
+
+
+class FileSender:
+    """
+    支持Range和条件请求的文件响应（ASGI应用）
+
+    服务器支持ASGI零拷贝扩展时通过sendfile发送，否则在线程池中分块读取，不阻塞事件循环。
+    """
+
+    def __init__(self, path: str, download: bool = False, chunk_size: int = CHUNK_SIZE):
+        """
+        初始化文件响应
+
+        Args:
+            path: 文件路径（调用方已校验在允许的目录内）
+            download: 是否作为附件下载
+            chunk_size: 分块读取的大小
+        """
+        self.path = path
+        self.download = download
+        self.chunk_size = chunk_size
+
+    async def __call__(self, scope: Dict[str, Any], receive, send):
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        method = scope.get("method", "GET")
+        try:
+            plan = plan_response(self.path, headers, method, self.download)
+        except OSError:
+            await self._send_empty(send, 404, [])
+            return
+
+        length = plan["length"]
+        raw_headers = [(key.encode("latin-1"), value.encode("latin-1")) for key, value in plan["headers"].items()]
+        if plan["status"] in (304, 416):
+            await self._send_empty(send, plan["status"], raw_headers)
+            return
+
+        raw_headers.append((b"content-length", str(length).encode("latin-1")))
+        await send({"type": "http.response.start", "status": plan["status"], "headers": raw_headers})
+        if method == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, "rb") as f:
+            if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send({"type": ZEROCOPY_EXTENSION, "file": f, "offset": plan["offset"],
+                            "count": length, "more_body": False})
+                return
+            await self._send_chunks(f, plan["offset"], length, send)
+
+    async def _send_chunks(self, f, offset: int, length: int, send):
+        """
+        分块读取并发送，文件被截断时提前结束
+        """
+        loop = asyncio.get_running_loop()
+        fd = f.fileno()
+        remaining = length
+        while remaining > 0:
+            data = await loop.run_in_executor(None, os.pread, fd, min(self.chunk_size, remaining), offset)
+            if not data:
+                break
+            offset += len(data)
+            remaining -= len(data)
+            await send({"type": "http.response.body", "body": data, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_empty(self, send, status: int, headers: List[Tuple[bytes, bytes]]):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def list_directory(directory: str, root: str) -> List[Dict[str, Any]]:
+    """
+    列出录制目录中的子目录和文件（跳过隐藏文件）
+
+    Args:
+        directory: 目录路径
+        root: 录制目录，返回的路径相对于该目录
+
+    Returns:
+        List[Dict[str, Any]]: 目录在前、文件按修改时间倒序的条目列表
+    """
+    now = time.time()
+    directories = []
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            item = {
+                "name": entry.name,
+                "path": os.path.relpath(entry.path, root),
+                "mtime": st.st_mtime
+            }
+            if entry.is_dir():
+                item["type"] = "directory"
+                directories.append(item)
+            elif entry.is_file():
+                item.update(type="file", size=st.st_size, growing=is_growing(st, now))
+                files.append(item)
+    directories.sort(key=lambda item: item["name"])
+    files.sort(key=lambda item: item["mtime"], reverse=True)
+    return directories + files
@@ -0,0 +1,203 @@
+import time
+import uuid
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, List, Deque, Tuple
+from src.config.config import config_manager
+
+
+# 任务状态
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+FINISHED_STATES = (TASK_DONE, TASK_FAILED)
+
+
+class TaskManager:
+    """
+    后台操作管理类
+
+    启动监控、开始/停止录制等操作可能阻塞数秒（等待进程退出、下载录播姬），
+    Web接口把它们提交到线程池后立即返回任务ID，通过任务状态接口查询结果，
+    避免阻塞事件循环拖慢其他请求。同一对象的操作（如同一房间的开始和停止）按提交顺序串行执行。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, history_limit: Optional[int] = None):
+        """
+        初始化后台操作管理器
+
+        Args:
+            max_workers: 线程池大小，默认读取配置web.tasks.workers（未配置为4）
+            history_limit: 保留的已结束任务数，默认读取配置web.tasks.history_limit（未配置为200）
+        """
+        self.logger = logging.getLogger("TaskManager")
+        self.max_workers = max_workers
+        self.history_limit = history_limit
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        # 同一对象的操作队列，队首为正在执行的操作
+        self._key_queues: Dict[str, Deque[Tuple]] = {}
+
+    def start(self):
+        """
+        创建线程池
+        """
+        with self._lock:
+            if self._executor is None:
+                # 只有未显式指定的参数从配置读取（全局实例创建时配置尚未加载）
+                if self.max_workers is None:
+                    self.max_workers = config_manager.get("web.tasks.workers", 4)
+                if self.history_limit is None:
+                    self.history_limit = config_manager.get("web.tasks.history_limit", 200)
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="WebTask")
+
+    def stop(self, wait: bool = False):
+        """
+        关闭线程池
+
+        Args:
+            wait: 是否等待执行中的任务结束
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def submit(self, name: str, func: Callable[..., Any], *args: Any,
+               key: Optional[str] = None, failure_message: Optional[str] = None) -> Dict[str, Any]:
+        """
+        提交后台操作
+
+        Args:
+            name: 操作名称（如 start_recording）
+            func: 操作函数，返回值为假时视为失败
+            *args: 操作函数的参数
+            key: 串行执行的对象（如房间键），None表示不限制
+            failure_message: 操作函数返回假时记录的错误信息
+
+        Returns:
+            Dict[str, Any]: 任务记录
+        """
+        self.start()
+        task = {
+            "task_id": uuid.uuid4().hex,
+            "name": name,
+            "key": key,
+            "status": TASK_PENDING,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+        item = (task, func, args, failure_message)
+        with self._lock:
+            self._tasks[task["task_id"]] = task
+            self._prune()
+            if key is not None:
+                queue = self._key_queues.setdefault(key, deque())
+                queue.append(item)
+                if len(queue) > 1:
+                    # 前一个操作结束后再提交
+                    return dict(task)
+            executor = self._executor
+        executor.submit(self._run, *item)
+        return dict(task)
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务记录
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务记录，不存在返回None
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task) if task else None
+
+    def list_tasks(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取任务列表
+
+        Args:
+            status: 按状态过滤，None表示全部
+
+        Returns:
+            List[Dict[str, Any]]: 按创建时间倒序的任务列表
+        """
+        with self._lock:
+            tasks = [dict(task) for task in self._tasks.values() if status is None or task["status"] == status]
+        return sorted(tasks, key=lambda task: task["created_at"], reverse=True)
+
+    def wait(self, task_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        等待任务结束
+
+        Args:
+            task_id: 任务ID
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务记录，不存在返回None
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            task = self.get_task(task_id)
+            if task is None or task["status"] in FINISHED_STATES:
+                return task
+            if deadline is not None and time.time() >= deadline:
+                return task
+            time.sleep(0.05)
+
+    def _run(self, task: Dict[str, Any], func: Callable[..., Any], args: tuple, failure_message: Optional[str]):
+        """
+        在线程池中执行操作并记录结果，然后提交同一对象的下一个操作
+        """
+        with self._lock:
+            task["status"] = TASK_RUNNING
+            task["started_at"] = time.time()
+        try:
+            ok = func(*args)
+            error = None if ok or ok is None else (failure_message or "操作失败")
+        except Exception as e:
+            self.logger.error(f"后台操作 {task['name']} 出错: {e}")
+            error = str(e)
+
+        next_item = None
+        with self._lock:
+            task["status"] = TASK_FAILED if error else TASK_DONE
+            task["error"] = error
+            task["finished_at"] = time.time()
+            key = task["key"]
+            if key is not None:
+                queue = self._key_queues[key]
+                queue.popleft()
+                if queue:
+                    next_item = queue[0]
+                else:
+                    del self._key_queues[key]
+            executor = self._executor
+        if next_item is not None and executor is not None:
+            executor.submit(self._run, *next_item)
+
+    def _prune(self):
+        """
+        删除最早结束的任务，保留history_limit个已结束任务
+        """
+        finished = [task for task in self._tasks.values() if task["status"] in FINISHED_STATES]
+        if len(finished) <= self.history_limit:
+            return
+        finished.sort(key=lambda task: task["finished_at"])
+        for task in finished[:len(finished) - self.history_limit]:
+            self._tasks.pop(task["task_id"], None)
+
+
+# 全局后台操作管理器实例
+task_manager = TaskManager()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模拟FFmpeg/FFprobe测试脚本
+"""
+
+import sys
+
+
+def fake_tool(path, script: str, **values) -> str:
+    """
+    写入模拟的命令行工具并设置可执行权限
+
+    Args:
+        path: 脚本路径（pathlib.Path）
+        script: 脚本模板，{python} 替换为当前Python解释器，其余占位符由values提供
+        **values: 模板中的其他占位符
+
+    Returns:
+        str: 脚本路径
+    """
+    path.write_text(script.format(python=sys.executable, **values))
+    path.chmod(0o755)
+    return str(path)
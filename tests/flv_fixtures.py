@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+合成FLV测试文件
+"""
+
+import struct
+
+
+def flv_header(audio: bool = True, video: bool = True) -> bytes:
+    """
+    FLV文件头 + PreviousTagSize0
+    """
+    flags = (0x04 if audio else 0) | (0x01 if video else 0)
+    return b"FLV" + bytes((1, flags)) + struct.pack(">I", 9) + struct.pack(">I", 0)
+
+
+def tag(tag_type: int, timestamp: int, data: bytes) -> bytes:
+    """
+    标签头 + 数据 + PreviousTagSize
+    """
+    header = bytes((tag_type,)) + len(data).to_bytes(3, "big")
+    header += (timestamp & 0xFFFFFF).to_bytes(3, "big") + bytes(((timestamp >> 24) & 0xFF,))
+    header += b"\x00\x00\x00"
+    return header + data + struct.pack(">I", 11 + len(data))
+
+
+def video_tag(timestamp: int, keyframe: bool = False, sequence_header: bool = False, size: int = 64) -> bytes:
+    """
+    AVC视频标签
+    """
+    frame_type = 1 if keyframe or sequence_header else 2
+    packet_type = 0 if sequence_header else 1
+    data = bytes(((frame_type << 4) | 7, packet_type, 0, 0, 0)) + b"\x01" * size
+    return tag(9, timestamp, data)
+
+
+def audio_tag(timestamp: int, sequence_header: bool = False, size: int = 16) -> bytes:
+    """
+    AAC音频标签
+    """
+    data = bytes((0xAF, 0 if sequence_header else 1)) + b"\x02" * size
+    return tag(8, timestamp, data)
+
+
+def script_tag(data: bytes = b"\x02\x00\x0aonMetaData\x08\x00\x00\x00\x00\x00\x00\x09") -> bytes:
+    """
+    脚本标签（默认为空的onMetaData）
+    """
+    return tag(18, 0, data)
+
+
+def make_flv(duration_ms: int = 10000, fps: int = 25, keyframe_interval_ms: int = 2000,
+             start_timestamp: int = 0, with_headers: bool = True) -> bytes:
+    """
+    生成音视频交错的FLV数据
+
+    Args:
+        duration_ms: 时长（毫秒）
+        fps: 视频帧率
+        keyframe_interval_ms: 关键帧间隔（毫秒）
+        start_timestamp: 起始时间戳
+        with_headers: 是否包含文件头、onMetaData和序列头
+    """
+    data = b""
+    if with_headers:
+        data += flv_header() + script_tag()
+        data += video_tag(start_timestamp, sequence_header=True) + audio_tag(start_timestamp, sequence_header=True)
+
+    frame_ms = 1000 // fps
+    audio_ms = 23
+    video_time = 0
+    audio_time = 0
+    last_keyframe = None
+    while video_time < duration_ms or audio_time < duration_ms:
+        if video_time <= audio_time and video_time < duration_ms:
+            keyframe = last_keyframe is None or video_time - last_keyframe >= keyframe_interval_ms
+            if keyframe:
+                last_keyframe = video_time
+            data += video_tag(start_timestamp + video_time, keyframe=keyframe)
+            video_time += frame_ms
+        else:
+            data += audio_tag(start_timestamp + audio_time)
+            audio_time += audio_ms
+    return data
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+剪辑导出测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flv_fixtures import make_flv, video_tag, audio_tag
+from src.processor.flv import FLVReader, FLVError, TAG_VIDEO, analyze_flv
+from src.processor.keyframes import read_metadata
+from src.processor.clip import extract_clip
+
+
+def test_extract_single_file(tmp_path):
+    """
+    起点对齐到之前的关键帧，时间戳从0开始，包含序列头
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=20000, keyframe_interval_ms=2000))
+    output = tmp_path / "clips" / "clip.flv"
+
+    # 终点对齐到之后的关键帧（10秒）
+    result = extract_clip([str(path)], 5.0, 9.0, str(output))
+    assert result["start"] == 4.0
+    assert 5.9 < result["duration"] < 6.1
+
+    stats = analyze_flv(str(output))
+    assert stats["valid"], stats["error"]
+    assert stats["first_timestamp"] == 0
+    assert stats["keyframes"] == 4  # 4秒、6秒、8秒的关键帧 + 序列头
+    assert abs(read_metadata(str(output))["duration"] - result["duration"]) < 0.001
+
+    with FLVReader(str(output)) as reader:
+        tags = list(reader.tags())
+        assert reader.is_sequence_header(tags[1]) and reader.is_sequence_header(tags[2])
+        first_frame = next(tag for tag in tags[3:] if tag.tag_type == TAG_VIDEO)
+        assert reader.is_keyframe(first_frame) and first_frame.timestamp == 0
+
+
+def test_extract_across_segments(tmp_path):
+    """
+    跨分段导出时时间戳连续，正在写入的分段只使用已写完的部分
+    """
+    first = tmp_path / "part1.flv"
+    second = tmp_path / "part2.flv"
+    first.write_bytes(make_flv(duration_ms=10000))
+    # 第二个分段仍在写入，末尾有不完整的标签
+    second.write_bytes(make_flv(duration_ms=10000, start_timestamp=30000) + video_tag(40000)[:20])
+    output = tmp_path / "clip.flv"
+
+    result = extract_clip([str(first), str(second)], 8.0, 14.0, str(output))
+    assert result["start"] == 8.0
+    # 第二个分段从约10秒开始，终点对齐到该分段6秒处的关键帧
+    assert 7.9 < result["duration"] < 8.1
+
+    stats = analyze_flv(str(output))
+    assert stats["valid"], stats["error"]
+    assert stats["timestamp_backwards"] == 0
+    assert stats["timestamp_jumps"] == 0
+
+    # 分段增长后再次导出到末尾，只增量扫描新增部分
+    with open(second, "r+b") as f:
+        f.truncate(os.path.getsize(second) - 20)
+        f.seek(0, os.SEEK_END)
+        f.write(video_tag(40000, keyframe=True) + audio_tag(40000))
+    result = extract_clip([str(first), str(second)], 19.0, None, str(output))
+    assert 17.9 < result["start"] < 18.1
+    assert 1.9 < result["duration"] < 2.1
+
+
+def test_extract_invalid_range(tmp_path):
+    """
+    时间范围无效或超出录制时长
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=4000))
+
+    for start, end in ((3.0, 2.0), (10.0, 12.0)):
+        try:
+            extract_clip([str(path)], start, end, str(tmp_path / "clip.flv"))
+            assert False
+        except FLVError:
+            pass
+    assert not os.path.exists(tmp_path / "clip.flv")
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".part.flv")]
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+配置加载、检查和索引测试脚本
+"""
+
+import sys
+import os
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import ConfigManager
+from src.config.schema import ConfigError
+
+
+def _write(config_dir, name, content):
+    with open(os.path.join(config_dir, name), "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _load_error(config_dir, loader):
+    try:
+        loader()
+    except ConfigError as e:
+        return e
+    raise AssertionError("无效配置没有抛出ConfigError")
+
+
+def test_invalid_config_reports_all_errors():
+    """
+    测试拼写错误、类型错误、重复房间和YAML语法错误在加载时报告
+    """
+    with tempfile.TemporaryDirectory() as config_dir:
+        manager = ConfigManager(config_dir)
+
+        _write(config_dir, "config.yaml", "system:\n  log_levle: info\nmonitor:\n  interval: fast\n")
+        error = _load_error(config_dir, manager.load_config)
+        assert len(error.errors) == 2
+        assert "system.log_levle" in str(error) and "system.log_level" in str(error)
+        assert "monitor.interval" in str(error)
+
+        _write(config_dir, "config.yaml", "system:\n  log_level: [info\n")
+        error = _load_error(config_dir, manager.load_config)
+        assert error.source.endswith("config.yaml") and "line" in error.errors[0]
+
+        _write(config_dir, "rooms.yaml", (
+            "rooms:\n"
+            "  - {id: 1, platform: bilibili, room_id: 123}\n"
+            "  - {id: 2, room_id: '123'}\n"
+            "  - {id: 3, platform: bilibili}\n"
+        ))
+        error = _load_error(config_dir, manager.load_rooms)
+        assert len(error.errors) == 2
+        assert "bilibili" in str(error) and "room_id" in str(error)
+
+        # 加载失败时保留原有配置
+        assert manager.get_rooms() == ()
+
+
+def test_indexed_immutable_config():
+    """
+    测试点分隔键和房间索引查找、房间号统一为字符串以及配置只读
+    """
+    with tempfile.TemporaryDirectory() as config_dir:
+        _write(config_dir, "config.yaml", "system:\n  log_level: debug\nmonitor:\n  interval: 30\n")
+        _write(config_dir, "rooms.yaml", (
+            "rooms:\n"
+            "  - {id: 1, platform: bilibili, room_id: 123, name: A}\n"
+            "  - {id: 2, room_id: 456, name: B}\n"
+        ))
+        manager = ConfigManager(config_dir)
+        assert manager.load_config() and manager.load_rooms()
+
+    assert manager.get("system.log_level") == "debug"
+    assert manager.get("monitor.interval") == 30
+    assert manager.get("monitor.missing", 5) == 5
+    assert manager.get("system")["log_level"] == "debug"
+
+    assert manager.find_room("bilibili", "123")["name"] == "A"
+    assert manager.find_room("bilibili", 456)["name"] == "B"
+    assert manager.find_room("douyin", "123") is None
+    assert manager.get_room("2")["room_id"] == "456"
+    assert manager.get_room(9) == {}
+    assert manager.get_rooms() is manager.get_rooms()
+
+    for mutate in (lambda: manager.config["system"].update(log_level="info"),
+                   lambda: manager.get_room("1").__setitem__("room_id", "1")):
+        try:
+            mutate()
+        except TypeError:
+            pass
+        else:
+            raise AssertionError("配置应为只读")
+
+    # 直接赋值（测试中常用）同样生成索引
+    manager.config = {"monitor": {"interval": 10}}
+    manager.rooms = {"rooms": [{"id": "x", "platform": "bilibili", "room_id": "789"}]}
+    assert manager.get("monitor.interval") == 10
+    assert manager.find_room("bilibili", "789")["id"] == "x"
+    assert manager.find_room("bilibili", "123") is None
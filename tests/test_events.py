@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+状态推送测试脚本
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.events import event_bus
+from src.web.events import StatusBroadcaster
+
+
+ROOMS = [{"platform": "bilibili", "room_id": str(i)} for i in range(3)]
+
+
+def _parse(message):
+    fields = {}
+    for line in message.decode("utf-8").strip().splitlines():
+        key, _, value = line.partition(": ")
+        fields[key] = value
+    return fields["event"], json.loads(fields["data"])
+
+
+def _broadcaster(calls):
+    def room_status(room):
+        calls.append(room["room_id"])
+        return {"status": f"录制中 {room['room_id']}"}
+
+    broadcaster = StatusBroadcaster(
+        lambda: {"rooms": ROOMS, "monitor": {"is_running": False}},
+        room_status,
+        lambda: {"is_running": True}
+    )
+    broadcaster.coalesce_interval = 0.05
+    broadcaster.heartbeat_interval = 0.2
+    return broadcaster
+
+
+def test_snapshot_then_coalesced_delta():
+    """
+    连接时发送快照，合并窗口内的多次变化合并为一条增量，每个房间只查询一次状态
+    """
+    calls = []
+    broadcaster = _broadcaster(calls)
+
+    async def run():
+        broadcaster.attach()
+        try:
+            clients = [broadcaster.connect() for _ in range(3)]
+            streams = [broadcaster.stream(client) for client in clients]
+            for stream in streams:
+                assert (await stream.__anext__()).startswith(b"retry:")
+                event, data = _parse(await stream.__anext__())
+                assert event == "snapshot" and len(data["rooms"]) == 3
+
+            # 事件在其他线程发布
+            def publish():
+                for _ in range(5):
+                    event_bus.publish("recording_started", room=ROOMS[1], record_config={})
+                event_bus.publish("segment_closed", room=ROOMS[2], path="a.flv")
+                event_bus.publish("monitor_state_changed", is_running=True)
+            await asyncio.get_running_loop().run_in_executor(None, publish)
+
+            for stream in streams:
+                event, data = _parse(await asyncio.wait_for(stream.__anext__(), 2))
+                assert event == "delta"
+                assert data == {"rooms": {"bilibili_1": {"status": "录制中 1"},
+                                          "bilibili_2": {"status": "录制中 2"}},
+                                "monitor": {"is_running": True}}
+            assert sorted(calls) == ["1", "2"]
+
+            # 没有变化时只发送心跳
+            assert await asyncio.wait_for(streams[0].__anext__(), 2) == b": ping\n\n"
+            for stream in streams:
+                await stream.aclose()
+            assert broadcaster.client_count == 0
+        finally:
+            broadcaster.detach()
+
+    asyncio.run(run())
+
+
+def test_slow_client_resyncs_with_snapshot():
+    """
+    客户端积压的增量超过上限时丢弃积压，改为重新发送快照
+    """
+    broadcaster = _broadcaster([])
+    broadcaster.queue_size = 2
+
+    async def run():
+        client = broadcaster.connect()
+        stream = broadcaster.stream(client)
+        await stream.__anext__()
+        assert _parse(await stream.__anext__())[0] == "snapshot"
+
+        for room in ROOMS:
+            broadcaster.mark_room(room)
+            assert broadcaster.flush() is not None
+        assert broadcaster.flush() is None
+        assert client.resync
+
+        assert _parse(await stream.__anext__())[0] == "snapshot"
+        broadcaster.mark_room(ROOMS[0])
+        broadcaster.flush()
+        event, data = _parse(await stream.__anext__())
+        assert event == "delta" and list(data["rooms"]) == ["bilibili_0"]
+        await stream.aclose()
+        broadcaster.detach()
+
+    asyncio.run(run())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FLV解析与修复测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flv_fixtures import make_flv, flv_header, video_tag, audio_tag
+from src.processor.flv import FLVReader, FLVError, TAG_VIDEO, analyze_flv, truncate_flv, repair_timestamps
+
+
+def test_analyze_valid_file(tmp_path):
+    """
+    统计音视频标签数、关键帧数和时长
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=10000, fps=25, keyframe_interval_ms=2000))
+
+    stats = analyze_flv(str(path))
+    assert stats["valid"], stats["error"]
+    assert stats["video_tags"] == 251  # 250帧 + 序列头
+    assert stats["keyframes"] == 6  # 5个关键帧 + 序列头
+    assert stats["script_tags"] == 1
+    assert stats["video_codec"] == 7 and stats["audio_format"] == 10
+    assert stats["max_keyframe_interval"] == 2000
+    assert 9.9 < stats["duration"] < 10.1
+    assert stats["trailing_bytes"] == 0
+
+    with FLVReader(str(path)) as reader:
+        tags = list(reader.tags())
+        assert reader.is_sequence_header(tags[1]) and reader.is_sequence_header(tags[2])
+        assert reader.is_keyframe(tags[3]) and not reader.is_sequence_header(tags[3])
+        assert bytes(reader.tag_data(tags[3])[:2]) == b"\x17\x01"
+
+
+def test_truncate_incomplete_tag(tmp_path):
+    """
+    截断到最后一个完整标签
+    """
+    data = make_flv(duration_ms=2000)
+    path = tmp_path / "record.flv"
+    path.write_bytes(data + video_tag(2000)[:30])
+
+    stats = analyze_flv(str(path))
+    assert not stats["valid"]
+    assert stats["trailing_bytes"] == 30
+
+    assert truncate_flv(str(path)) == 30
+    assert path.read_bytes() == data
+    assert analyze_flv(str(path))["valid"]
+    assert truncate_flv(str(path)) == 0
+
+    # 中间损坏、之后仍有有效数据时不截断
+    corrupted = bytearray(data)
+    with FLVReader(str(path)) as reader:
+        damage = list(reader.tags())[10].offset
+    corrupted[damage:damage + 4] = b"\xff\xff\xff\xff"
+    path.write_bytes(bytes(corrupted) + video_tag(2000)[:30])
+    try:
+        truncate_flv(str(path))
+    except FLVError:
+        pass
+    else:
+        raise AssertionError("文件中间损坏时不应截断")
+    assert os.path.getsize(path) == len(data) + 30
+
+
+def test_repair_timestamp_discontinuity(tmp_path):
+    """
+    断流重连后时间戳归零，修复后音视频时间戳连续
+    """
+    data = make_flv(duration_ms=4000, start_timestamp=5000)
+    data += make_flv(duration_ms=4000, with_headers=False)
+    path = tmp_path / "record.flv"
+    path.write_bytes(data)
+
+    stats = analyze_flv(str(path))
+    assert stats["timestamp_backwards"] == 2
+
+    output = tmp_path / "fixed.flv"
+    result = repair_timestamps(str(path), str(output))
+    # 音视频共用偏移量，视频修正后音频随之连续
+    assert result["discontinuities"] == 1
+    assert path.read_bytes() == data
+
+    stats = analyze_flv(str(output))
+    assert stats["valid"]
+    assert stats["first_timestamp"] == 0
+    assert 7.9 < stats["duration"] < 8.1
+
+    with FLVReader(str(output)) as reader:
+        video = [tag.timestamp for tag in reader.tags() if tag.tag_type == TAG_VIDEO]
+    assert all(b > a for a, b in zip(video[1:], video[2:]))
+
+
+def test_invalid_files(tmp_path):
+    """
+    非FLV文件和损坏的标签头
+    """
+    path = tmp_path / "bad.flv"
+    path.write_bytes(b"not an flv file at all")
+    try:
+        FLVReader(str(path))
+        assert False
+    except FLVError:
+        pass
+    assert analyze_flv(str(path))["error"]
+
+    path.write_bytes(flv_header() + audio_tag(0) + b"\x07" + b"\x00" * 20)
+    stats = analyze_flv(str(path))
+    assert stats["audio_tags"] == 1
+    assert "无效" in stats["error"]
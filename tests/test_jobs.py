@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视频处理任务队列测试脚本
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import config_manager
+from src.processor.jobs import JobQueue, JOB_DONE, JOB_FAILED, JOB_CANCELLED, JOB_PENDING, check_job_request
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _make_queue(monkeypatch, tmp_path, workers=1):
+    monkeypatch.setattr(config_manager, "config", {
+        "processor": {
+            "queue": {
+                "state_file": str(tmp_path / "jobs.json"),
+                "workers": workers,
+                "retry_delay": 0
+            }
+        }
+    })
+    return JobQueue()
+
+
+def test_priority_order(monkeypatch, tmp_path):
+    """
+    数值小的优先级先执行
+    """
+    job_queue = _make_queue(monkeypatch, tmp_path)
+    order = []
+    gate = threading.Event()
+
+    def handler(params, context):
+        if params["name"] == "blocker":
+            gate.wait(5)
+        order.append(params["name"])
+        return True
+
+    job_queue.register_handler("test", handler)
+    job_queue.start()
+    try:
+        job_queue.submit("test", {"name": "blocker"})
+        assert _wait_until(lambda: job_queue.get_queue_status()["jobs"].get("running") == 1)
+        job_queue.submit("test", {"name": "low"}, priority=9)
+        job_queue.submit("test", {"name": "high"}, priority=1)
+        gate.set()
+        assert _wait_until(lambda: len(order) == 3)
+        assert order == ["blocker", "high", "low"]
+    finally:
+        job_queue.stop()
+
+
+def test_retry_then_fail(monkeypatch, tmp_path):
+    """
+    失败的任务按重试次数重试，之后标记为失败
+    """
+    job_queue = _make_queue(monkeypatch, tmp_path)
+    calls = []
+
+    def handler(params, context):
+        calls.append(1)
+        return False
+
+    job_queue.register_handler("test", handler)
+    job_queue.start()
+    try:
+        job_id = job_queue.submit("test", {}, max_retries=2)
+        assert _wait_until(lambda: job_queue.get_job(job_id)["status"] == JOB_FAILED)
+        assert len(calls) == 3
+        assert job_queue.get_job(job_id)["attempts"] == 3
+    finally:
+        job_queue.stop()
+
+
+def test_cancel_running_job(monkeypatch, tmp_path):
+    """
+    取消正在执行的任务会设置取消事件
+    """
+    job_queue = _make_queue(monkeypatch, tmp_path)
+
+    def handler(params, context):
+        return not context["cancel_event"].wait(5)
+
+    job_queue.register_handler("test", handler)
+    job_queue.start()
+    try:
+        job_id = job_queue.submit("test", {})
+        assert _wait_until(lambda: job_queue.get_job(job_id)["status"] == "running")
+        assert job_queue.cancel(job_id)
+        assert _wait_until(lambda: job_queue.get_job(job_id)["status"] == JOB_CANCELLED)
+        assert not job_queue.cancel(job_id)
+    finally:
+        job_queue.stop()
+
+
+def test_persistence(monkeypatch, tmp_path):
+    """
+    未执行的任务在重启后恢复
+    """
+    job_queue = _make_queue(monkeypatch, tmp_path, workers=1)
+    job_queue.register_handler("test", lambda params, context: True)
+    job_queue.state_file = str(tmp_path / "jobs.json")
+    job_id = job_queue.submit("test", {"name": "persisted"})
+    assert job_queue.get_job(job_id)["status"] == JOB_PENDING
+
+    restored = _make_queue(monkeypatch, tmp_path, workers=1)
+    restored.register_handler("test", lambda params, context: True)
+    restored.start()
+    try:
+        assert _wait_until(lambda: (restored.get_job(job_id) or {}).get("status") == JOB_DONE)
+        assert restored.get_job(job_id)["params"] == {"name": "persisted"}
+    finally:
+        restored.stop()
+
+
+def test_check_job_request():
+    """
+    Web接口提交的任务只接受已知类型和参数，优先级和重试次数须在范围内
+    """
+    assert check_job_request("convert", {"input_file": "a.flv", "delete_original": True}) == []
+    assert check_job_request("watermark", {"input_file": "a.mp4", "position": "center", "opacity": 0.5}, 0, 0) == []
+
+    assert len(check_job_request("pipeline", {"path": "/etc/passwd"})) == 1
+    errors = check_job_request("watermark", {"input_file": "a.mp4", "fontfile": "/etc/shadow", "opacity": 2})
+    assert len(errors) == 2 and "params.fontfile" in errors[0] and "params.opacity" in errors[1]
+    assert check_job_request("thumbnails", {}) == ["params.input_file: 缺少输入文件"]
+    assert len(check_job_request("convert", {"input_file": "a.flv"}, priority="1", max_retries=100)) == 2
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__]))
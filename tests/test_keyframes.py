@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FLV关键帧索引与onMetaData注入测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flv_fixtures import make_flv, flv_header, script_tag, video_tag, audio_tag
+from src.processor.flv import FLVReader, analyze_flv
+from src.processor.keyframes import (
+    KeyframeIndex, build_keyframe_index, load_keyframe_index, inject_keyframes, read_metadata,
+    amf_encode, amf_decode
+)
+
+
+def _assert_positions_are_keyframes(path, metadata):
+    with FLVReader(path) as reader:
+        for position in metadata["keyframes"]["filepositions"]:
+            tag = next(reader.tags(start=int(position)))
+            assert reader.is_keyframe(tag)
+
+
+def test_build_save_and_find(tmp_path):
+    """
+    建立索引、保存后加载，按时间查找关键帧和字节范围
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=10000, keyframe_interval_ms=2000))
+
+    index = build_keyframe_index(str(path))
+    assert list(index.times) == [0, 2000, 4000, 6000, 8000]
+    assert index.video_header_offset is not None and index.audio_header_offset is not None
+    assert index.metadata_offset == 13
+
+    index.save()
+    loaded = KeyframeIndex.load(str(path))
+    assert list(loaded.offsets) == list(index.offsets)
+    assert not loaded.is_stale()
+
+    assert index.find(5.5) == 2
+    start, end, timestamp = index.byte_range(3.0, 5.0)
+    assert (start, end, timestamp) == (index.offsets[1], index.offsets[3], 2000)
+    assert index.byte_range(7.0)[1] == os.path.getsize(path)
+
+
+def test_incremental_update(tmp_path):
+    """
+    文件增长后只扫描新增部分
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=4000))
+    assert len(load_keyframe_index(str(path))) == 2
+
+    with open(path, "ab") as f:
+        f.write(video_tag(4000, keyframe=True) + audio_tag(4000))
+    index = load_keyframe_index(str(path))
+    assert list(index.times) == [0, 2000, 4000]
+    assert index.scanned_end == os.path.getsize(path)
+
+
+def test_inject_keyframes(tmp_path):
+    """
+    onMetaData放不下时重写文件并后移关键帧位置，有足够空间时原地改写
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=10000))
+    size = os.path.getsize(path)
+
+    result = inject_keyframes(str(path))
+    assert not result["in_place"]
+    metadata = read_metadata(str(path))
+    assert metadata["keyframes"]["times"] == [0, 2, 4, 6, 8]
+    assert 9.9 < metadata["duration"] < 10.1
+    assert os.path.getsize(path) > size
+    assert analyze_flv(str(path))["valid"]
+    _assert_positions_are_keyframes(str(path), metadata)
+
+    # 第二次注入时原有onMetaData已足够大
+    size = os.path.getsize(path)
+    assert inject_keyframes(str(path))["in_place"]
+    assert os.path.getsize(path) == size
+    metadata = read_metadata(str(path))
+    assert len(metadata["keyframes"]["filepositions"]) == 5
+    _assert_positions_are_keyframes(str(path), metadata)
+
+
+def test_inject_preserves_metadata(tmp_path):
+    """
+    保留原有onMetaData字段，没有onMetaData时插入
+    """
+    payload = amf_encode("onMetaData") + amf_encode({"encoder": "test", "width": 1920.0}, ecma_array=True)
+    path = tmp_path / "record.flv"
+    body = make_flv(duration_ms=4000)
+    path.write_bytes(flv_header() + script_tag(payload) + body[len(flv_header()) + len(script_tag()):])
+
+    inject_keyframes(str(path))
+    metadata = read_metadata(str(path))
+    assert metadata["encoder"] == "test" and metadata["width"] == 1920
+    assert "keyframes" in metadata
+
+    path.write_bytes(flv_header() + body[len(flv_header()) + len(script_tag()):])
+    inject_keyframes(str(path))
+    _assert_positions_are_keyframes(str(path), read_metadata(str(path)))
+
+    value, _ = amf_decode(amf_encode({"a": [1.0, True, None, "x"]}))
+    assert value == {"a": [1.0, True, None, "x"]}
+
+
+def test_index_follows_rewritten_file(tmp_path):
+    """
+    重写文件后索引随之后移，已保存的旧索引不会被误当作追加写入而继续使用
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=10000))
+
+    index = load_keyframe_index(str(path))
+    stale = KeyframeIndex.load(str(path))
+    assert not inject_keyframes(str(path), index)["in_place"]
+    fresh = build_keyframe_index(str(path))
+    assert list(index.offsets) == list(fresh.offsets)
+    assert index.scanned_end == fresh.scanned_end == os.path.getsize(path)
+    assert list(load_keyframe_index(str(path)).offsets) == list(fresh.offsets)
+
+    # 旧索引文件（如注入前复制的）对应的文件已整体后移，必须重新建立
+    stale.save()
+    reloaded = load_keyframe_index(str(path))
+    assert list(reloaded.offsets) == list(fresh.offsets)
+    assert reloaded.metadata_end == fresh.metadata_end
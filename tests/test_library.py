@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制文件库测试脚本
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flv_fixtures import make_flv
+from src.config.config import config_manager
+from src.library.catalog import RecordingCatalog
+from src.library.probe import probe_flv
+from src.library.library import RecordingLibrary
+from src.library.watcher import InotifyWatcher
+
+
+ROOM = {"platform": "bilibili", "room_id": "123"}
+
+
+def test_catalog_query_and_sessions(tmp_path):
+    """
+    按房间、场次、格式和文件名过滤分页，按前一个录制的结束时间判断场次
+    """
+    catalog = RecordingCatalog(str(tmp_path / "library.db"))
+    records = []
+    for i in range(250):
+        records.append({
+            "path": f"/rec/bilibili_{i % 2}/part{i:03d}.{'flv' if i % 5 else 'mp4'}",
+            "room_key": f"bilibili_{i % 2}",
+            "session": f"s{i // 100}",
+            "name": f"part{i:03d}.{'flv' if i % 5 else 'mp4'}",
+            "ext": "flv" if i % 5 else "mp4",
+            "size": i * 1000,
+            "mtime": 1000.0 + i,
+            "started_at": 1000.0 + i * 10,
+            "duration": 5.0
+        })
+    assert catalog.upsert(records) == 250
+
+    result = catalog.query(room_key="bilibili_0", limit=20, offset=20)
+    assert result["total"] == 125
+    assert [item["name"] for item in result["items"][:2]] == ["part208.flv", "part206.flv"]
+
+    assert catalog.query(ext="mp4")["total"] == 50
+    assert catalog.query(session="s2", room_key="bilibili_1")["total"] == 25
+    assert catalog.query(search="part01")["total"] == 10
+    assert catalog.query(search="%")["total"] == 0
+    assert catalog.query(since=2000, until=2100)["total"] == 10
+    assert catalog.query(sort="size", descending=False, limit=1)["items"][0]["size"] == 0
+
+    # 前一个录制在1000+248*10开始，时长5秒
+    assert catalog.find_session("bilibili_0", 1000 + 248 * 10 + 100, max_gap=300) == "s2"
+    assert catalog.find_session("bilibili_0", 1000 + 248 * 10 + 400, max_gap=300) is None
+    assert catalog.find_session("bilibili_9", 5000, max_gap=300) is None
+
+    assert catalog.remove(["/rec/bilibili_0/part000.mp4", "/missing"]) == 1
+    assert catalog.stats()["bilibili_0"]["files"] == 124
+    catalog.close()
+
+
+def test_probe_flv(tmp_path):
+    """
+    内置解析器读取FLV的时长、编码和码率
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=10000))
+    info = probe_flv(str(path))
+    assert info["format"] == "flv"
+    assert info["video_codec"] == "h264" and info["audio_codec"] == "aac"
+    assert 9.9 < info["duration"] < 10.1
+    assert info["bitrate"] == int(os.path.getsize(path) * 8 / info["duration"])
+
+
+def _library(tmp_path, output_dir):
+    library = RecordingLibrary()
+    library.catalog = RecordingCatalog(str(tmp_path / "library.db"))
+    library._output_dir_provider = lambda room: str(output_dir)
+    library.is_attached = True
+    return library
+
+
+def test_library_incremental_scan(tmp_path, monkeypatch):
+    """
+    未变化的文件不重新读取，已删除的文件移除，剪辑目录和隐藏文件不纳入
+    """
+    monkeypatch.setattr(config_manager, "config", {})
+    monkeypatch.setattr(config_manager, "rooms", {"rooms": [ROOM]})
+    output_dir = tmp_path / "recordings"
+    (output_dir / "clips").mkdir(parents=True)
+    (output_dir / "clips" / "clip.flv").write_bytes(make_flv(duration_ms=2000))
+    (output_dir / ".part.flv").write_bytes(b"")
+    first = output_dir / "录制-123-20240101-200000-000-a.flv"
+    second = output_dir / "录制-123-20240101-200012-000-a.flv"
+    other = output_dir / "录制-123-20240102-200000-000-b.flv"
+    for path in (first, second, other):
+        path.write_bytes(make_flv(duration_ms=10000))
+
+    library = _library(tmp_path, output_dir)
+    probed = []
+    original_probe = library._probe
+    monkeypatch.setattr(library, "_probe", lambda path: probed.append(path) or original_probe(path))
+
+    assert library.scan() == {"files": 3, "indexed": 3, "removed": 0}
+    result = library.query(room_key="bilibili_123")
+    assert result["total"] == 3
+    sessions = {item["name"]: item["session"] for item in result["items"]}
+    assert sessions[first.name] == sessions[second.name] == "bilibili_123-20240101-200000"
+    assert sessions[other.name] != sessions[first.name]
+    assert result["items"][0]["video_codec"] == "h264"
+
+    probed.clear()
+    assert library.scan()["indexed"] == 0
+    assert not probed
+
+    os.remove(other)
+    with open(second, "ab") as f:
+        f.write(make_flv(duration_ms=2000, start_timestamp=10000, with_headers=False))
+    assert library.scan() == {"files": 2, "indexed": 1, "removed": 1}
+    assert probed == [str(second)]
+    item = library.catalog.get(str(second))
+    assert 11.9 < item["duration"] < 12.1
+    assert item["session"] == sessions[second.name]
+
+    # 单个文件的增量更新（inotify事件）
+    assert not library.update_file(str(output_dir / "clips" / "clip.flv"))
+    os.remove(second)
+    assert library.update_file(str(second))
+    assert library.query()["total"] == 1
+    library.catalog.close()
+
+
+def test_inotify_watcher(tmp_path):
+    """
+    文件写入完成、删除和新建子目录中的文件都会通知
+    """
+    events = []
+    changed = threading.Event()
+
+    def callback(event, path):
+        events.append((event, os.path.basename(path)))
+        changed.set()
+
+    watcher = InotifyWatcher(callback)
+    if not watcher.start():
+        pytest.skip("当前系统不支持inotify")
+    try:
+        assert watcher.add_tree(str(tmp_path)) == 1
+        (tmp_path / "a.flv").write_bytes(b"FLV")
+        os.remove(tmp_path / "a.flv")
+        (tmp_path / "room").mkdir()
+        time.sleep(0.2)
+        (tmp_path / "room" / "b.flv").write_bytes(b"FLV")
+
+        deadline = time.time() + 5
+        while ("changed", "b.flv") not in events and time.time() < deadline:
+            changed.wait(0.1)
+            changed.clear()
+    finally:
+        watcher.stop()
+
+    assert events[:2] == [("changed", "a.flv"), ("deleted", "a.flv")]
+    assert ("changed", "b.flv") in events
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+HLS直播预览测试脚本
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flv_fixtures import make_flv
+from ffmpeg_fixtures import fake_tool
+from src.config.config import config_manager
+from src.processor.flv import analyze_flv
+from src.processor.live_preview import LivePreviewManager
+
+
+# 模拟FFmpeg：生成播放列表和一个分片，把标准输入原样保存下来（不缓冲，被终止时不丢数据）
+FAKE_FFMPEG = """#!{python}
+import os
+import sys
+args = sys.argv[1:]
+playlist = args[-1]
+segment = args[args.index("-hls_segment_filename") + 1].replace("%d", "1700000000")
+open(segment, "wb").write(b"ts")
+open(playlist, "w").write("#EXTM3U\\n#EXTINF:2.0,\\n" + os.path.basename(segment) + "\\n")
+with open({captured!r}, "wb", buffering=0) as f:
+    while True:
+        data = os.read(0, 4096)
+        if not data:
+            break
+        f.write(data)
+"""
+
+ROOM = {"platform": "bilibili", "room_id": "123"}
+
+
+def _manager(tmp_path, monkeypatch, **options):
+    captured = tmp_path / "captured.flv"
+    ffmpeg = fake_tool(tmp_path / "ffmpeg", FAKE_FFMPEG, captured=str(captured))
+    preview_config = dict({"work_dir": str(tmp_path / "preview"), "segment_time": 2, "list_size": 2}, **options)
+    monkeypatch.setattr(config_manager, "config", {
+        "processor": {"ffmpeg_path": ffmpeg, "preview": preview_config}
+    })
+    output_dir = tmp_path / "recordings"
+    output_dir.mkdir()
+    return LivePreviewManager(), output_dir, captured
+
+
+def test_preview_starts_near_live_edge(tmp_path, monkeypatch):
+    """
+    预览只从最近的关键帧开始读取，写入的数据仍是带序列头的有效FLV，并继续跟随新写入的数据
+    """
+    manager, output_dir, captured = _manager(tmp_path, monkeypatch)
+    old = output_dir / "old.flv"
+    old.write_bytes(make_flv(duration_ms=4000))
+    os.utime(old, (time.time() - 3600, time.time() - 3600))
+    recording = output_dir / "record.flv"
+    recording.write_bytes(make_flv(duration_ms=60000, keyframe_interval_ms=2000))
+
+    playlist = manager.open("bilibili_123", str(output_dir))
+    assert playlist and open(playlist).read().startswith("#EXTM3U")
+    assert manager.segment("bilibili_123", "seg_1700000000.ts")
+    assert manager.segment("bilibili_123", "../record.flv") is None
+    assert manager.list_sessions()[0]["input_file"] == str(recording)
+
+    with open(recording, "ab") as f:
+        f.write(make_flv(duration_ms=2000, start_timestamp=60000, with_headers=False))
+    time.sleep(0.5)
+    manager.stop("bilibili_123")
+    assert not os.path.exists(os.path.dirname(playlist))
+
+    # 序列头之后直接是回退 2×2 秒前最近的关键帧（54秒），再加上新写入的2秒
+    stats = analyze_flv(str(captured))
+    assert stats["error"] is None and stats["trailing_bytes"] == 0
+    assert stats["script_tags"] == 1 and stats["keyframes"] == 5
+    assert stats["video_tags"] == 1 + (6 + 2) * 25
+
+
+def test_preview_lifecycle(tmp_path, monkeypatch):
+    """
+    没有正在写入的录制时不启动；空闲超时、切换分段和录制结束时停止
+    """
+    manager, output_dir, _ = _manager(tmp_path, monkeypatch, idle_timeout=0)
+    assert manager.open("bilibili_123", str(output_dir)) is None
+
+    (output_dir / "record.flv").write_bytes(make_flv(duration_ms=10000))
+    assert manager.open("bilibili_123", str(output_dir))
+    time.sleep(0.1)
+    assert manager.reap() == ["bilibili_123"]
+
+    manager.attach()
+    try:
+        assert manager.open("bilibili_123", str(output_dir))
+        manager._on_segment_opened(ROOM, str(output_dir / "record.flv"))
+        assert manager.list_sessions()
+        manager._on_segment_opened(ROOM, str(output_dir / "next.flv"))
+        assert not manager.list_sessions()
+
+        assert manager.open("bilibili_123", str(output_dir))
+        manager._on_recording_stopped(ROOM)
+        assert not manager.list_sessions()
+    finally:
+        manager.detach()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制中实时转封装测试脚本
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ffmpeg_fixtures import fake_tool
+from src.processor.live_remux import LiveRemuxer
+
+
+# 模拟FFmpeg：把标准输入原样写入输出文件
+FAKE_FFMPEG = """#!{python}
+import sys
+with open(sys.argv[-1], "wb") as f:
+    while True:
+        data = sys.stdin.buffer.read(4096)
+        if not data:
+            break
+        f.write(data)
+"""
+
+
+def test_follows_growing_file(tmp_path):
+    """
+    跟随读取正在写入的文件，结束时读完剩余数据
+    """
+    script = fake_tool(tmp_path / "ffmpeg", FAKE_FFMPEG)
+
+    flv = tmp_path / "record.flv"
+    flv.write_bytes(b"FLV" + b"a" * 1000)
+
+    remuxer = LiveRemuxer(script, str(flv), chunk_size=64, poll_interval=0.05)
+    assert remuxer.output_file == str(tmp_path / "record.mp4")
+    assert remuxer.start()
+
+    with open(flv, "ab") as f:
+        for _ in range(5):
+            time.sleep(0.05)
+            f.write(b"b" * 500)
+            f.flush()
+        f.write(b"end")
+
+    assert remuxer.finish(timeout=10)
+    assert (tmp_path / "record.mp4").read_bytes() == flv.read_bytes()
+    assert remuxer.bytes_read == flv.stat().st_size
+
+
+def test_ffmpeg_failure(tmp_path):
+    """
+    FFmpeg异常退出时转封装失败
+    """
+    script = fake_tool(tmp_path / "ffmpeg", "#!{python}\nimport sys\nsys.stderr.write('Invalid data\\n')\nsys.exit(1)\n")
+
+    flv = tmp_path / "record.flv"
+    flv.write_bytes(b"FLV")
+
+    remuxer = LiveRemuxer(script, str(flv), poll_interval=0.05)
+    assert remuxer.start()
+    assert not remuxer.finish(timeout=10)
+    assert remuxer.error
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日志测试脚本
+"""
+
+import sys
+import os
+import json
+import time
+import queue
+import logging
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import config_manager
+from src.utils.logger import LogManager, NonBlockingQueueHandler, LOG_FILE, LOG_DROPPED, room_context
+
+
+def test_json_log_with_room_context_and_rate_limit(tmp_path, monkeypatch):
+    """
+    日志由后台线程写入JSON文件，带上房间上下文和extra字段；重复日志按房间限流并记录省略条数
+    """
+    monkeypatch.setattr(config_manager, "config", {
+        "system": {
+            "log_level": "info",
+            "log_dir": str(tmp_path),
+            "logging": {"console": False, "rate_limit_interval": 0.2}
+        }
+    })
+    manager = LogManager()
+    assert manager.setup()
+    assert not manager.setup()
+    logger = logging.getLogger("TestMonitor")
+    try:
+        def poll(room_key):
+            with room_context(room_key):
+                for _ in range(5):
+                    logger.info("未开播", extra={"rate_key": "room_status:False"})
+                time.sleep(0.3)
+                logger.info("未开播", extra={"rate_key": "room_status:False"})
+                logger.info("开始录制")
+
+        threads = [threading.Thread(target=poll, args=(f"bilibili_{i}",)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.debug("低于日志级别")
+        try:
+            raise ValueError("出错")
+        except ValueError:
+            logger.exception("处理失败", extra={"room": "bilibili_9"})
+    finally:
+        manager.shutdown()
+
+    with open(tmp_path / LOG_FILE, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    entries = [entry for entry in entries if entry["logger"] == "TestMonitor"]
+
+    for room in ("bilibili_0", "bilibili_1"):
+        room_entries = [entry for entry in entries if entry.get("room") == room]
+        # 第一轮5条只记录1条，窗口过后的一条带上省略的4条
+        assert [entry["message"] for entry in room_entries] == ["未开播", "未开播", "开始录制"]
+        assert room_entries[1]["suppressed"] == 4
+        assert room_entries[0]["rate_key"] == "room_status:False"
+
+    failure = entries[-1]
+    assert failure["room"] == "bilibili_9" and failure["level"] == "ERROR"
+    assert "ValueError: 出错" in failure["exception"]
+    assert not any(entry["message"] == "低于日志级别" for entry in entries)
+
+
+def test_full_queue_drops_without_blocking():
+    """
+    队列已满时丢弃日志并计数，不阻塞记录日志的线程
+    """
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    logger = logging.getLogger("TestFullQueue")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        dropped = LOG_DROPPED.labels().get()
+        started = time.time()
+        for i in range(100):
+            logger.warning(f"第 {i} 条")
+        assert time.time() - started < 1
+        assert handler.queue.qsize() == 1
+        assert handler.queue.get_nowait().msg == "第 0 条"
+        assert LOG_DROPPED.labels().get() - dropped == 99
+    finally:
+        logger.removeHandler(handler)
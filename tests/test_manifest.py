@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+处理清单与增量批量转换测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.processor.manifest import ProcessedManifest
+from src.processor.converter import VideoConverter
+from src.processor.watermark import WatermarkAdder
+
+
+def test_manifest_detects_changes(tmp_path):
+    """
+    源文件大小或内容变化时需要重新处理，仅修改时间变化时跳过
+    """
+    source = tmp_path / "a.flv"
+    output = tmp_path / "a.mp4"
+    source.write_bytes(b"x" * 1000)
+    output.write_bytes(b"y")
+
+    manifest = ProcessedManifest(str(tmp_path / "manifest.json"), base_dir=str(tmp_path))
+    assert not manifest.is_done(str(source), str(output))
+    manifest.mark_done(str(source), str(output))
+    manifest.save()
+
+    reloaded = ProcessedManifest(str(tmp_path / "manifest.json"), base_dir=str(tmp_path))
+    assert reloaded.is_done(str(source), str(output))
+    assert reloaded.is_output(str(output))
+    assert not reloaded.is_done(str(source), str(output), params_tag="other")
+
+    os.utime(source, (1, 1))
+    assert reloaded.is_done(str(source), str(output))
+
+    source.write_bytes(b"z" * 1000)
+    assert not reloaded.is_done(str(source), str(output))
+
+
+def test_batch_convert_is_incremental(monkeypatch, tmp_path):
+    """
+    重复执行批量转换只处理新文件
+    """
+    converted = []
+
+    def fake_convert(self, input_file, output_file=None, delete_original=False, **kwargs):
+        converted.append(os.path.basename(input_file))
+        with open(output_file, "wb") as f:
+            f.write(b"mp4")
+        return True
+
+    monkeypatch.setattr(VideoConverter, "convert_flv_to_mp4", fake_convert)
+    (tmp_path / "a.flv").write_bytes(b"a")
+    (tmp_path / "b.flv").write_bytes(b"b")
+
+    converter = VideoConverter()
+    assert converter.batch_convert(str(tmp_path)) == 2
+    assert (tmp_path / "a.mp4").exists()
+    assert not (tmp_path / "a.part.mp4").exists()
+
+    (tmp_path / "c.flv").write_bytes(b"c")
+    assert converter.batch_convert(str(tmp_path)) == 1
+    assert sorted(converted) == ["a.flv", "b.flv", "c.flv"]
+
+
+def test_batch_watermark_skips_outputs(monkeypatch, tmp_path):
+    """
+    批量添加水印不会处理自己的输出文件
+    """
+    processed = []
+
+    def fake_watermark(self, input_file, output_file=None, **kwargs):
+        processed.append(os.path.basename(input_file))
+        with open(output_file, "wb") as f:
+            f.write(b"mp4")
+        return True
+
+    monkeypatch.setattr(WatermarkAdder, "add_text_watermark", fake_watermark)
+    (tmp_path / "a.mp4").write_bytes(b"a")
+
+    watermark_adder = WatermarkAdder()
+    assert watermark_adder.batch_add_watermark(str(tmp_path)) == 1
+    assert watermark_adder.batch_add_watermark(str(tmp_path)) == 0
+    assert watermark_adder.batch_add_watermark(str(tmp_path), watermark_config={"watermark_text": "新水印"}) == 1
+    assert processed == ["a.mp4", "a.mp4"]
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制分段合并测试脚本
+"""
+
+import sys
+import os
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flv_fixtures import make_flv, flv_header, script_tag, video_tag, audio_tag
+from src.config.config import config_manager
+from src.processor.flv import FLVError, analyze_flv
+from src.processor.merge import parse_filename_time, plan_merge, merge_segments
+from src.processor.pipeline import PostProcessPipeline, FILE_DONE
+from src.processor.jobs import job_queue
+
+
+def _write_segment(path, start_timestamp=0, size=64):
+    data = flv_header() + script_tag()
+    data += video_tag(start_timestamp, sequence_header=True, size=size) + audio_tag(start_timestamp, sequence_header=True)
+    data += make_flv(duration_ms=4000, start_timestamp=start_timestamp, with_headers=False)
+    path.write_bytes(data)
+
+
+def test_plan_merge(tmp_path):
+    """
+    按文件名时间分组，间隔过大或编码参数变化时开始新的一组
+    """
+    names = [
+        "录制-123-20240101-200000-000-标题.flv",
+        "录制-123-20240101-200130-000-标题.flv",
+        "录制-123-20240101-200300-000-标题.flv",  # 分辨率变化
+        "录制-123-20240101-230000-000-标题.flv"   # 下一场
+    ]
+    for i, name in enumerate(names):
+        _write_segment(tmp_path / name, size=80 if i == 2 else 64)
+        mtime = parse_filename_time(name) + 60
+        os.utime(tmp_path / name, (mtime, mtime))
+    (tmp_path / "broken.flv").write_bytes(b"not flv")
+
+    # 8位房间号不会被当作日期
+    assert parse_filename_time("录制-22637261-20240101-200000-000-标题.flv") == parse_filename_time(names[0])
+    assert parse_filename_time("录制-22637261-标题.flv") is None
+
+    paths = [str(tmp_path / name) for name in reversed(names)] + [str(tmp_path / "broken.flv")]
+    groups = plan_merge(paths, max_gap=300)
+    assert [str(tmp_path / "broken.flv")] in groups
+    groups.remove([str(tmp_path / "broken.flv")])
+    assert groups == [
+        [str(tmp_path / names[0]), str(tmp_path / names[1])],
+        [str(tmp_path / names[2])],
+        [str(tmp_path / names[3])]
+    ]
+
+
+def test_merge_segments(tmp_path):
+    """
+    合并后时间戳从0开始连续，编码参数不一致时拒绝合并
+    """
+    first = tmp_path / "part1.flv"
+    second = tmp_path / "part2.flv"
+    _write_segment(first, start_timestamp=10000)
+    _write_segment(second, start_timestamp=0)
+    output = tmp_path / "merged.flv"
+
+    result = merge_segments([str(first), str(second)], str(output))
+    assert result["segments"] == 2
+    assert 7.9 < result["duration"] < 8.1
+
+    stats = analyze_flv(str(output))
+    assert stats["valid"], stats["error"]
+    assert stats["first_timestamp"] == 0
+    assert stats["timestamp_backwards"] == 0 and stats["timestamp_jumps"] == 0
+    assert stats["keyframes"] == 6  # 两个分段各2个关键帧 + 各自的序列头
+
+    _write_segment(second, size=80)
+    try:
+        merge_segments([str(first), str(second)], str(output))
+        assert False
+    except FLVError:
+        pass
+
+
+def test_pipeline_merges_session(monkeypatch, tmp_path):
+    """
+    整场录制结束后合并分段，分段结束时不单独处理
+    """
+    monkeypatch.setattr(config_manager, "config", {
+        "processor": {
+            "enabled": True,
+            "pipeline_state_file": str(tmp_path / "pipeline.json"),
+            "merge": {"enabled": True, "delete_segments": True}
+        }
+    })
+    submitted = []
+    monkeypatch.setattr(job_queue, "submit", lambda job_type, params, **kwargs: submitted.append(params) or "job1")
+    room = {"platform": "bilibili", "room_id": "123", "processor": {"format": "flv"}}
+
+    output_dir = tmp_path / "recordings"
+    output_dir.mkdir()
+    (output_dir / "clips").mkdir()
+    (output_dir / "clips" / "clip.flv").write_bytes(b"FLV")
+    first = output_dir / "录制-123-20240101-200000-000-标题.flv"
+    second = output_dir / "录制-123-20240101-200200-000-标题.flv"
+    _write_segment(first)
+    _write_segment(second)
+
+    pipeline = PostProcessPipeline()
+    assert pipeline.is_merge(room)
+    pipeline._on_segment_closed(room, str(first))
+    assert not submitted
+
+    monkeypatch.setattr(threading.Thread, "start", lambda thread: thread.run())
+    pipeline._on_recording_stopped(room, str(output_dir))
+    merged = str(output_dir / "录制-123-20240101-200000-000-标题_merged.flv")
+    assert submitted == [{"path": merged}]
+
+    record = pipeline.get_file(merged)
+    assert record["stages"] == ["merge", "finalize"]
+    assert pipeline.run({"path": merged}, {"cancel_event": threading.Event(), "threads": 1})
+    assert pipeline.get_file(merged)["status"] == FILE_DONE
+    assert analyze_flv(merged)["valid"]
+    assert not first.exists() and not second.exists()
+
+    # 已合并的分段和剪辑目录不会再次处理
+    pipeline._on_recording_stopped(room, str(output_dir))
+    assert len(submitted) == 1
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+运行指标测试脚本
+"""
+
+import sys
+import os
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.metrics import MetricsRegistry
+
+
+def test_render_prometheus_text():
+    """
+    计数器、函数读取的当前值和直方图按Prometheus文本格式导出，直方图分桶累加
+    """
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "请求数", ("route", "status"))
+    requests.labels("/api/status", 200).inc()
+    requests.labels("/api/status", 200).inc(2)
+    requests.labels("/api/room/{room_id}", 404).inc()
+    depth = registry.gauge("test_jobs", "任务数", ("status",))
+    depth.set_function(lambda: {("pending",): 3})
+    latency = registry.histogram("test_latency_seconds", "耗时", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 5):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{route="/api/status",status="200"} 3' in text
+    assert 'test_requests_total{route="/api/room/{room_id}",status="404"} 1' in text
+    assert 'test_jobs{status="pending"} 3' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "test_latency_seconds_count 4" in text
+    assert text.endswith("\n")
+
+    # 同名指标重复注册返回同一指标，类型或标签不同时报错
+    assert registry.counter("test_requests_total", "请求数", ("route", "status")) is requests
+    try:
+        registry.gauge("test_requests_total", "请求数")
+        assert False, "应当拒绝不同类型的同名指标"
+    except ValueError:
+        pass
+
+
+def test_concurrent_updates():
+    """
+    多个线程同时更新同一序列不丢失计数
+    """
+    registry = MetricsRegistry()
+    counter = registry.counter("test_bytes_total", "字节数", ("room",))
+    histogram = registry.histogram("test_lag_seconds", "延迟", ("room",))
+
+    def work():
+        series = counter.labels("bilibili_123")
+        lag = histogram.labels("bilibili_123")
+        for _ in range(10000):
+            series.inc(2)
+            lag.observe(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.labels("bilibili_123").get() == 160000
+    assert 'test_lag_seconds_count{room="bilibili_123"} 80000' in registry.render()
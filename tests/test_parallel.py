@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分块并行编码测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ffmpeg_fixtures import fake_tool
+from src.config.config import config_manager
+from src.processor.parallel import plan_split_times, parallel_encode, parallel_job_cost, parallel_workers_for
+
+
+# 模拟FFmpeg：切分时生成3个分块，其余命令把输入内容写入输出文件并记录命令
+FAKE_FFMPEG = """#!{python}
+import os, sys
+args = sys.argv[1:]
+with open({log!r}, "a") as f:
+    f.write(" ".join(args) + "\\n")
+output = args[-1]
+if "segment" in args:
+    for i in range(3):
+        open(output % i, "w").write(f"chunk{{i}}")
+elif "concat" in args:
+    open(output, "w").write("joined")
+else:
+    open(output, "w").write("encoded")
+"""
+
+# 模拟FFprobe：时长1小时，输出文件帧数由环境变量控制
+FAKE_FFPROBE = """#!{python}
+import os, sys
+if "format=duration" in sys.argv:
+    print("3600.0")
+elif sys.argv[-1].endswith(".flv"):
+    print("90000")
+else:
+    print(os.environ.get("FAKE_OUTPUT_FRAMES", "90000"))
+"""
+
+
+def _tools(tmp_path):
+    log = tmp_path / "ffmpeg.log"
+    ffmpeg = fake_tool(tmp_path / "ffmpeg", FAKE_FFMPEG, log=str(log))
+    fake_tool(tmp_path / "ffprobe", FAKE_FFPROBE)
+    return ffmpeg, log
+
+
+def test_plan_and_cost(monkeypatch):
+    """
+    切分时间点均匀分布，任务核心数按 进程数 × 每块线程数 计算
+    """
+    assert plan_split_times(100, 4) == [25, 50, 75]
+    assert plan_split_times(100, 1) == []
+
+    monkeypatch.setattr(config_manager, "config", {"processor": {"parallel": {"enabled": False}}})
+    assert parallel_job_cost(4) == 4
+    assert parallel_workers_for(16) == 0
+
+    monkeypatch.setattr(config_manager, "config", {
+        "processor": {"parallel": {"enabled": True, "workers": 8, "chunk_threads": 2}}
+    })
+    assert parallel_job_cost(4) == 16
+    assert parallel_workers_for(16) == 8
+    assert parallel_workers_for(1) == 1
+
+
+def test_parallel_encode(monkeypatch, tmp_path):
+    """
+    切分 → 并行编码 → 拼接，帧数一致时替换输出文件，不一致时失败
+    """
+    monkeypatch.setattr(config_manager, "config", {})
+    ffmpeg, log = _tools(tmp_path)
+    input_file = tmp_path / "record.flv"
+    input_file.write_text("flv")
+    output_file = tmp_path / "record_watermark.mp4"
+
+    updates = []
+    assert parallel_encode(ffmpeg, str(input_file), str(output_file), "drawtext=text=x",
+                           workers=2, threads=4, progress_callback=updates.append)
+    assert output_file.read_text() == "joined"
+
+    commands = log.read_text().splitlines()
+    assert "-segment_times 900.0,1800.0,2700.0" in commands[0]
+    encodes = [command for command in commands if "drawtext=text=x" in command]
+    assert len(encodes) == 3
+    assert all("-threads 2" in command for command in encodes)
+    assert "concat" in commands[-1]
+    # 临时分块目录已清理
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".parallel-")]
+
+    output_file.unlink()
+    monkeypatch.setenv("FAKE_OUTPUT_FRAMES", "89999")
+    assert not parallel_encode(ffmpeg, str(input_file), str(output_file), "drawtext=text=x", workers=2)
+    assert not output_file.exists()
+
+    # 短于最短时长时不分块
+    assert not parallel_encode(ffmpeg, str(input_file), str(output_file), "drawtext=text=x",
+                               workers=2, min_duration=7200)
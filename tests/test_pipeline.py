@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后期处理流水线测试脚本
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import config_manager
+from src.processor.pipeline import PostProcessPipeline, FILE_DONE, FILE_FAILED
+from src.processor.jobs import job_queue
+
+
+ROOM = {
+    "id": "1",
+    "platform": "bilibili",
+    "room_id": "123456",
+    "watermark": {"enabled": True, "text": "房间水印"},
+    "processor": {"enabled": True, "format": "mp4"}
+}
+
+
+def _config(monkeypatch, tmp_path, processor_enabled=True, fused=False):
+    monkeypatch.setattr(config_manager, "config", {
+        "processor": {
+            "enabled": processor_enabled,
+            "fused": fused,
+            "pipeline_state_file": str(tmp_path / "pipeline.json"),
+            "watermark": {"enabled": False, "text": "全局水印", "font_size": 24}
+        }
+    })
+
+
+def test_build_stages(monkeypatch, tmp_path):
+    """
+    房间级配置覆盖全局配置，全局关闭时不处理
+    """
+    _config(monkeypatch, tmp_path)
+    pipeline = PostProcessPipeline()
+    assert pipeline.build_stages(ROOM) == ["convert", "watermark", "finalize"]
+    assert pipeline.get_watermark_config(ROOM)["text"] == "房间水印"
+    assert pipeline.get_watermark_config(ROOM)["font_size"] == 24
+
+    room = dict(ROOM, watermark={"enabled": False})
+    assert pipeline.build_stages(room) == ["convert", "finalize"]
+
+    _config(monkeypatch, tmp_path, fused=True)
+    assert pipeline.build_stages(ROOM) == ["convert_watermark", "finalize"]
+    assert pipeline.build_stages(room) == ["convert", "finalize"]
+
+    # 已实时转封装的文件跳过转换阶段
+    assert pipeline.build_stages(ROOM, remuxed=True) == ["watermark", "finalize"]
+    assert pipeline.build_stages(room, remuxed=True) == ["finalize"]
+
+    _config(monkeypatch, tmp_path, processor_enabled=False)
+    assert pipeline.build_stages(ROOM) == []
+
+
+def test_run_resumes_from_recorded_stage(monkeypatch, tmp_path):
+    """
+    处理失败后记录所在阶段，重新执行时从该阶段继续
+    """
+    _config(monkeypatch, tmp_path)
+    monkeypatch.setattr(job_queue, "submit", lambda *args, **kwargs: "job1")
+
+    flv = tmp_path / "record.flv"
+    flv.write_bytes(b"FLV")
+    calls = []
+    fail_watermark = [True]
+
+    def fake_convert(record, context):
+        calls.append("convert")
+        mp4 = os.path.splitext(record["current_file"])[0] + ".mp4"
+        open(mp4, "wb").close()
+        record["current_file"] = mp4
+        return True
+
+    def fake_watermark(record, context):
+        calls.append("watermark")
+        if fail_watermark[0]:
+            return False
+        output = record["current_file"].replace(".mp4", "_watermark.mp4")
+        open(output, "wb").close()
+        record["intermediates"].append(record["current_file"])
+        record["current_file"] = output
+        return True
+
+    pipeline = PostProcessPipeline()
+    pipeline.attach()
+    monkeypatch.setattr(pipeline, "_stage_convert", fake_convert)
+    monkeypatch.setattr(pipeline, "_stage_watermark", fake_watermark)
+    try:
+        assert pipeline.submit_file(ROOM, str(flv)) == "job1"
+        assert pipeline.submit_file(ROOM, str(flv)) is None
+
+        context = {"cancel_event": threading.Event(), "threads": 1}
+        assert not pipeline.run({"path": str(flv)}, context)
+        record = pipeline.get_file(str(flv))
+        assert record["status"] == FILE_FAILED
+        assert record["stage"] == "watermark"
+
+        # 状态持久化后由新实例继续处理
+        restored = PostProcessPipeline()
+        restored.attach()
+        monkeypatch.setattr(restored, "_stage_convert", fake_convert)
+        monkeypatch.setattr(restored, "_stage_watermark", fake_watermark)
+        fail_watermark[0] = False
+        assert restored.run({"path": str(flv)}, context)
+        restored.detach()
+
+        record = restored.get_file(str(flv))
+        assert record["status"] == FILE_DONE
+        assert calls == ["convert", "watermark", "watermark"]
+        assert record["final_file"] == str(tmp_path / "record_watermark.mp4")
+        assert not (tmp_path / "record.mp4").exists()
+        assert flv.exists()
+    finally:
+        pipeline.detach()
+
+
+def test_state_file_records_changes_and_prunes(monkeypatch, tmp_path):
+    """
+    状态文件只追加变化的记录，处理结束超过保留时间的记录被删除
+    """
+    _config(monkeypatch, tmp_path)
+    monkeypatch.setattr(job_queue, "submit", lambda *args, **kwargs: "job1")
+    state_file = tmp_path / "pipeline.json"
+    old = tmp_path / "old.flv"
+    new = tmp_path / "new.flv"
+
+    pipeline = PostProcessPipeline()
+    pipeline.attach()
+    try:
+        pipeline.submit_file(ROOM, str(old))
+        lines = state_file.read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 2 and all(json.loads(line)["path"] == str(old) for line in lines)
+
+        with pipeline._lock:
+            pipeline._files[str(old)].update(status=FILE_DONE, updated_at=time.time() - pipeline.retention - 1)
+        pipeline.submit_file(ROOM, str(new))
+        assert pipeline.get_file(str(old)) is None
+    finally:
+        pipeline.detach()
+
+    restored = PostProcessPipeline()
+    restored.attach()
+    restored.detach()
+    assert [record["path"] for record in restored.list_files()] == [str(new)]
+    assert len(state_file.read_text(encoding="utf-8").splitlines()) == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+编码档位测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import config_manager
+from src.processor.profiles import select_profile, build_encoder_args
+
+
+def test_select_profile(monkeypatch):
+    """
+    按quality/compress/profile选择编码档位
+    """
+    monkeypatch.setattr(config_manager, "config", {
+        "processor": {"profiles": {"archive": {"preset": "slower", "crf": 28, "threads": 8}}}
+    })
+
+    assert select_profile({"quality": "high"})["name"] == "high"
+    assert select_profile({"quality": "high", "compress": True})["name"] == "high_compress"
+    assert select_profile({"quality": "high", "profile": "archive"})["crf"] == 28
+    assert select_profile({"quality": "unknown"})["name"] == "medium"
+    assert select_profile({})["name"] == "medium"
+
+
+def test_build_encoder_args():
+    """
+    生成FFmpeg编码参数
+    """
+    assert build_encoder_args(None) == ["-c:v", "libx264"]
+    assert build_encoder_args({"preset": "slow", "crf": 23, "tune": "film"}, threads=4) == [
+        "-c:v", "libx264", "-preset", "slow", "-crf", "23", "-tune", "film", "-threads", "4"
+    ]
+    # 码率优先于CRF，档位线程数优先于任务线程数
+    assert build_encoder_args({"bitrate": "4M", "crf": 23, "threads": 2}, threads=8) == [
+        "-c:v", "libx264", "-b:v", "4M", "-threads", "2"
+    ]
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FFmpeg执行与进度解析测试脚本
+"""
+
+import sys
+import os
+import time
+import subprocess
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ffmpeg_fixtures import fake_tool
+from src.processor.runner import ProgressParser, run_ffmpeg
+
+
+FAKE_FFMPEG = """#!{python}
+import sys
+sys.stderr.write("Input #0, flv, from 'in.flv':\\n  Duration: 00:01:40.00, start: 0.000000\\n")
+for i in range(1, 3):
+    print(f"frame={{i * 500}}\\nfps=50.0\\nout_time_us={{i * 20000000}}\\nspeed=2.0x\\nprogress=continue", flush=True)
+print("frame=5000\\nfps=50.0\\nout_time_us=100000000\\nspeed=2.0x\\nprogress=end", flush=True)
+for i in range(200):
+    sys.stderr.write(f"line {{i}}\\n")
+sys.exit(0)
+"""
+
+# 模拟FFmpeg：输出一组进度后不再前进
+STALLED_FFMPEG = """#!{python}
+import time
+print("frame=1\\nout_time_us=40000\\nprogress=continue", flush=True)
+time.sleep({seconds})
+"""
+
+
+def test_progress_parser():
+    """
+    每组进度输出以progress=结束，根据时长计算百分比和剩余时间
+    """
+    parser = ProgressParser(duration=100)
+    lines = ["frame=250", "fps=25.00", "out_time_us=40000000", "total_size=1024", "speed=2.5x"]
+    assert all(parser.feed_line(line) is None for line in lines)
+
+    progress = parser.feed_line("progress=continue")
+    assert progress["frame"] == 250
+    assert progress["speed"] == 2.5
+    assert progress["out_time"] == 40
+    assert progress["percent"] == 40
+    assert progress["eta"] == 24
+    assert not progress["finished"]
+
+    # speed为N/A时无法估计剩余时间
+    parser.feed_line("out_time_us=N/A")
+    parser.feed_line("speed=N/A")
+    progress = parser.feed_line("progress=end")
+    assert progress["finished"]
+    assert progress["out_time"] is None and progress["eta"] is None
+
+
+def test_run_ffmpeg_reports_progress(tmp_path):
+    """
+    从错误输出中获取时长，进度回调收到完整进度，错误输出只保留最后若干行
+    """
+    script = fake_tool(tmp_path / "ffmpeg", FAKE_FFMPEG)
+
+    updates = []
+    returncode, stderr = run_ffmpeg([script, "-i", "in.flv", "out.mp4"],
+                                    progress_callback=updates.append, stderr_tail_lines=10)
+
+    assert returncode == 0
+    assert stderr.splitlines() == [f"line {i}" for i in range(190, 200)]
+    assert [update["percent"] for update in updates] == [20, 40, 100]
+    assert updates[0]["eta"] == 40
+    assert updates[-1]["finished"]
+
+
+def test_run_ffmpeg_stall_timeout(tmp_path):
+    """
+    不限制总时长，进度长时间不前进时判定为卡死并终止
+    """
+    script = fake_tool(tmp_path / "ffmpeg", STALLED_FFMPEG, seconds=30)
+
+    started = time.time()
+    try:
+        run_ffmpeg([script, "-i", "in.flv", "out.mp4"], stall_timeout=1)
+    except subprocess.TimeoutExpired as e:
+        assert e.timeout == 1
+    else:
+        raise AssertionError("卡死的进程应被终止")
+    assert time.time() - started < 10
+
+    # 0表示不检测卡死
+    script = fake_tool(tmp_path / "ffmpeg", STALLED_FFMPEG, seconds=2)
+    assert run_ffmpeg([script, "-i", "in.flv", "out.mp4"], stall_timeout=0)[0] == 0
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+状态快照测试脚本
+"""
+
+import sys
+import os
+import gzip
+import json
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import config_manager
+from src.utils.events import event_bus
+from src.web.status import StatusStore, negotiate
+
+
+def _store(monkeypatch, count=200):
+    rooms = [{"id": str(i), "platform": "bilibili", "room_id": str(1000 + i), "name": f"主播{i}"}
+             for i in range(count)]
+    monkeypatch.setattr(config_manager, "rooms", {"rooms": rooms})
+    monkeypatch.setattr(config_manager, "config", {"system": {"name": "2233recorder"}})
+
+    calls = []
+    recording = set()
+
+    def room_status(room):
+        calls.append(room["room_id"])
+        return {"status": "录制中" if room["room_id"] in recording else "未录制"}
+
+    store = StatusStore(room_status, lambda: {"is_running": True}, lambda: {"record_processes_count": len(recording)})
+    store.max_age = 0
+    return store, rooms, calls, recording
+
+
+def test_snapshot_rebuilt_only_on_change(monkeypatch):
+    """
+    状态未变化时复用同一快照，变化时只重新查询变化的房间，不修改配置中的房间字典
+    """
+    store, rooms, calls, recording = _store(monkeypatch)
+    store.attach()
+    try:
+        first = store.snapshot()
+        assert len(calls) == 200
+        assert store.snapshot() is first
+        assert "status" not in rooms[0]
+
+        recording.add("1005")
+        event_bus.publish("recording_started", room=rooms[5], record_config={})
+        second = store.snapshot()
+        assert second.version == first.version + 1
+        assert calls[200:] == ["1005"]
+        assert second.rooms_by_id["5"]["status"] == "录制中"
+        assert second.data["recorder"]["record_processes_count"] == 1
+        # 旧快照保持不变
+        assert first.rooms_by_id["5"]["status"] == "未录制"
+        assert "status" not in rooms[5]
+
+        # 重新加载房间配置后完整重建
+        monkeypatch.setattr(config_manager, "rooms", {"rooms": rooms[:10]})
+        assert len(store.snapshot().data["rooms"]) == 10
+    finally:
+        store.detach()
+
+
+def test_negotiate_etag_gzip_and_fields(monkeypatch):
+    """
+    ETag匹配返回304，支持gzip时返回压缩内容，字段选择只返回指定字段
+    """
+    store, rooms, calls, recording = _store(monkeypatch)
+    snapshot = store.snapshot()
+
+    status, body, headers = negotiate(snapshot, None, None, None, "gzip, deflate")
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    data = json.loads(gzip.decompress(body))
+    assert len(data["rooms"]) == 200 and data["monitor"] == {"is_running": True}
+    # 同一版本只编码一次
+    assert negotiate(snapshot, None, None, None, "gzip")[1] is body
+
+    status, body, _ = negotiate(snapshot, None, None, headers["ETag"], None)
+    assert status == 304 and body == b""
+
+    status, body, fields_headers = negotiate(snapshot, "rooms", "rooms.room_id, rooms.status", None, None)
+    assert status == 200 and "Content-Encoding" not in fields_headers
+    assert fields_headers["ETag"] != headers["ETag"]
+    data = json.loads(body)
+    assert data["rooms"][0] == {"room_id": "1000", "status": "未录制"}
+
+    # 进程重启后版本号重新计数，旧ETag不能匹配同一版本号的新快照
+    restarted = StatusStore(store.room_status_provider, store.monitor_status_provider,
+                            store.recorder_status_provider)
+    assert restarted.snapshot().version == snapshot.version
+    assert negotiate(restarted.snapshot(), None, None, headers["ETag"], None)[0] == 200
+
+    store.mark_room(rooms[0])
+    assert negotiate(store.snapshot(), None, None, headers["ETag"], None)[0] == 200
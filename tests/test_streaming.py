@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制文件Range传输测试脚本
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.web.streaming import (
+    FileSender, RangeNotSatisfiable, parse_range, plan_response, list_directory, ZEROCOPY_EXTENSION
+)
+
+
+def _request(path, headers=None, method="GET", extensions=None, chunk_size=4096):
+    """
+    以ASGI方式调用文件响应，返回 (状态码, 响应头, 响应体, 发送的消息)
+    """
+    scope = {
+        "type": "http",
+        "method": method,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "extensions": extensions or {}
+    }
+    messages = []
+
+    async def send(message):
+        if message["type"] == ZEROCOPY_EXTENSION:
+            f = message["file"]
+            message = dict(message, body=os.pread(f.fileno(), message["count"], message["offset"]))
+        messages.append(message)
+
+    asyncio.run(FileSender(path, chunk_size=chunk_size)(scope, None, send))
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body, messages
+
+
+def test_parse_range():
+    """
+    解析单个字节范围、后缀范围，超出文件大小时报错，多个范围按完整请求处理
+    """
+    assert parse_range("bytes=0-99", 1000) == (0, 99)
+    assert parse_range("bytes=900-", 1000) == (900, 999)
+    assert parse_range("bytes=900-5000", 1000) == (900, 999)
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+    assert parse_range("bytes=0-1,5-6", 1000) is None
+    assert parse_range("items=0-1", 1000) is None
+    assert parse_range("bytes=abc", 1000) is None
+    assert parse_range(None, 1000) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+
+
+def test_range_and_conditional_requests(tmp_path):
+    """
+    Range返回206，ETag或修改时间未变化返回304，If-Range不一致时返回完整内容
+    """
+    path = tmp_path / "录制.flv"
+    data = os.urandom(10000)
+    path.write_bytes(data)
+    os.utime(path, (time.time() - 3600, time.time() - 3600))
+
+    status, headers, body, messages = _request(str(path))
+    assert status == 200 and body == data
+    assert headers["content-length"] == "10000" and headers["content-type"] == "video/x-flv"
+    assert len(messages) == 1 + 3  # 分块读取
+    assert "filename*=UTF-8''%E5%BD%95%E5%88%B6.flv" in headers["content-disposition"]
+    assert "x-file-growing" not in headers
+
+    status, range_headers, body, _ = _request(str(path), {"Range": "bytes=100-199"})
+    assert status == 206 and body == data[100:200]
+    assert range_headers["content-range"] == "bytes 100-199/10000"
+
+    assert _request(str(path), {"If-None-Match": headers["etag"]})[0] == 304
+    assert _request(str(path), {"If-Modified-Since": headers["last-modified"]})[0] == 304
+    assert _request(str(path), {"Range": "bytes=100-", "If-Range": '"other"'})[0] == 200
+    assert _request(str(path), {"Range": "bytes=100-", "If-Range": headers["etag"]})[0] == 206
+
+    status, headers, _, _ = _request(str(path), {"Range": "bytes=20000-"})
+    assert status == 416 and headers["content-range"] == "bytes */10000"
+
+    status, headers, body, _ = _request(str(path), method="HEAD")
+    assert status == 200 and headers["content-length"] == "10000" and body == b""
+
+    assert _request(str(tmp_path / "missing.flv"))[0] == 404
+
+
+def test_zerocopy_and_growing_file(tmp_path):
+    """
+    服务器支持零拷贝时通过一条消息发送文件区间；正在写入的文件按请求时的大小返回
+    """
+    path = tmp_path / "record.flv"
+    path.write_bytes(b"a" * 5000)
+
+    status, headers, body, messages = _request(str(path), {"Range": "bytes=1000-"},
+                                               extensions={ZEROCOPY_EXTENSION: {}})
+    assert status == 206 and body == b"a" * 4000
+    assert messages[1]["type"] == ZEROCOPY_EXTENSION and messages[1]["offset"] == 1000
+    assert headers["x-file-growing"] == "1" and headers["cache-control"] == "no-cache"
+    first_etag = headers["etag"]
+
+    with open(path, "ab") as f:
+        f.write(b"b" * 3000)
+    status, headers, body, _ = _request(str(path), {"Range": "bytes=5000-"})
+    assert status == 206 and body == b"b" * 3000
+    assert headers["etag"] != first_etag
+
+    plan = plan_response(str(path), {"if-none-match": first_etag})
+    assert plan["status"] == 200
+
+
+def test_list_directory(tmp_path):
+    """
+    列出子目录和文件，跳过隐藏文件
+    """
+    (tmp_path / "clips").mkdir()
+    (tmp_path / "a.flv").write_bytes(b"1")
+    (tmp_path / ".a.flv.kfindex").write_bytes(b"1")
+    entries = list_directory(str(tmp_path), str(tmp_path))
+    assert [(e["name"], e["type"]) for e in entries] == [("clips", "directory"), ("a.flv", "file")]
+    assert entries[1]["size"] == 1 and entries[1]["growing"]
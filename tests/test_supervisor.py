@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制进程守护测试脚本
+"""
+
+import sys
+import os
+import time
+import subprocess
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.recorder.supervisor import RecordSupervisor
+from src.utils.events import event_bus
+
+
+class FakeRecorder:
+    """
+    模拟录制核心，按给定命令启动进程
+    """
+
+    def __init__(self, commands):
+        self.commands = list(commands)
+        self.record_processes = {}
+        self.supervisor = None
+        self.spawned = []
+
+    def restart_recording(self, room, record_config):
+        return self.spawn(room, record_config)
+
+    def spawn(self, room, record_config):
+        command = self.commands.pop(0) if len(self.commands) > 1 else self.commands[0]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        room_key = f"{room['platform']}_{room['room_id']}"
+        self.record_processes[room_key] = {"process": process, "config": record_config, "start_time": time.time()}
+        self.supervisor.watch(room_key, room, process, record_config)
+        self.spawned.append(process)
+        return process
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _make_supervisor(recorder, live=True):
+    supervisor = RecordSupervisor(recorder, live_checker=lambda room: live)
+    supervisor.backoff_base = 0.1
+    supervisor.backoff_max = 1
+    supervisor.check_interval = 0.1
+    supervisor.stall_timeout = 0
+    supervisor._load_settings = lambda: None
+    recorder.supervisor = supervisor
+    return supervisor
+
+
+def test_restart_crashed_recorder(tmp_path):
+    """
+    进程异常退出且仍在直播时自动重启
+    """
+    recorder = FakeRecorder([["sh", "-c", "echo boom; exit 3"], ["sleep", "30"]])
+    supervisor = _make_supervisor(recorder)
+    room = {"platform": "bilibili", "room_id": "1"}
+
+    try:
+        recorder.spawn(room, {"output_dir": str(tmp_path)})
+        assert _wait_until(lambda: len(recorder.spawned) == 2)
+        assert supervisor.get_state("bilibili_1")["restarts"] == 1
+        assert supervisor.get_state("bilibili_1")["last_exit_code"] == 3
+        assert recorder.record_processes["bilibili_1"]["process"] is recorder.spawned[1]
+    finally:
+        supervisor.unwatch("bilibili_1")
+        for process in recorder.spawned:
+            process.kill()
+            process.wait()
+        supervisor.stop()
+
+
+def test_no_restart_when_offline(tmp_path):
+    """
+    已下播时不再重启，取消守护并发布录制结束事件
+    """
+    recorder = FakeRecorder([["sh", "-c", "exit 1"]])
+    supervisor = _make_supervisor(recorder, live=False)
+    room = {"platform": "bilibili", "room_id": "2"}
+    stopped = []
+    on_stopped = lambda room, output_dir: stopped.append(output_dir)
+    event_bus.subscribe("recording_stopped", on_stopped)
+
+    try:
+        recorder.spawn(room, {"output_dir": str(tmp_path)})
+        assert _wait_until(lambda: supervisor.get_state("bilibili_2") is None)
+        assert _wait_until(lambda: stopped == [str(tmp_path)])
+        assert len(recorder.spawned) == 1
+        assert "bilibili_2" not in recorder.record_processes
+    finally:
+        event_bus.unsubscribe("recording_stopped", on_stopped)
+        supervisor.stop()
+
+
+def test_stall_detection_kills_process(tmp_path):
+    """
+    输出不增长超过阈值时终止并重启进程
+    """
+    recorder = FakeRecorder([["sleep", "30"]])
+    supervisor = _make_supervisor(recorder)
+    supervisor.stall_timeout = 0.3
+    room = {"platform": "bilibili", "room_id": "3"}
+
+    try:
+        recorder.spawn(room, {"output_dir": str(tmp_path)})
+        assert _wait_until(lambda: len(recorder.spawned) >= 2)
+        assert recorder.spawned[0].poll() is not None
+    finally:
+        supervisor.unwatch("bilibili_3")
+        for process in recorder.spawned:
+            process.kill()
+            process.wait()
+        supervisor.stop()
+
+
+def test_stale_segment_not_treated_as_current(tmp_path):
+    """
+    目录中之前场次留下的FLV文件不会被当作当前分段，新分段出现时不会发布其结束事件
+    """
+    recorder = FakeRecorder([["sleep", "30"]])
+    supervisor = _make_supervisor(recorder)
+    room = {"platform": "bilibili", "room_id": "4"}
+    stale = tmp_path / "stale.flv"
+    stale.write_bytes(b"x" * 10)
+    past = time.time() - 60
+    os.utime(stale, (past, past))
+    events = []
+    on_opened = lambda room, path: events.append(("opened", path))
+    on_closed = lambda room, path: events.append(("closed", path))
+    event_bus.subscribe("segment_opened", on_opened)
+    event_bus.subscribe("segment_closed", on_closed)
+
+    try:
+        recorder.spawn(room, {"output_dir": str(tmp_path)})
+        time.sleep(0.3)
+        assert events == []
+
+        (tmp_path / "new.flv").write_bytes(b"z")
+        assert _wait_until(lambda: events == [("opened", str(tmp_path / "new.flv"))])
+        time.sleep(0.3)
+        assert events == [("opened", str(tmp_path / "new.flv"))]
+    finally:
+        event_bus.unsubscribe("segment_opened", on_opened)
+        event_bus.unsubscribe("segment_closed", on_closed)
+        supervisor.unwatch("bilibili_4")
+        for process in recorder.spawned:
+            process.kill()
+            process.wait()
+        supervisor.stop()
+
+
+def test_scan_output_only_lists_changed_directories(tmp_path, monkeypatch):
+    """
+    只列出有变化的目录，其他文件增长不影响录制进度
+    """
+    supervisor = RecordSupervisor(FakeRecorder([["true"]]))
+    session = tmp_path / "session"
+    session.mkdir()
+    (session / "old.flv").write_bytes(b"x" * 10)
+    (tmp_path / "clip.mp4").write_bytes(b"")
+    past = time.time() - 60
+    for path in (session / "old.flv", session, tmp_path):
+        os.utime(path, (past, past))
+
+    cache = {}
+    assert supervisor._scan_output(str(tmp_path), None, cache) == str(session / "old.flv")
+
+    # 目录没有变化时不再列出文件，其他文件增长不算进度
+    monkeypatch.setattr(os, "scandir", None)
+    (tmp_path / "clip.mp4").write_bytes(b"y" * 100)
+    os.utime(tmp_path, (past, past))
+    assert supervisor._scan_output(str(tmp_path), str(session / "old.flv"), cache) == str(session / "old.flv")
+    assert supervisor._file_size(str(session / "old.flv")) == 10
+    monkeypatch.undo()
+
+    (session / "new.flv").write_bytes(b"z")
+    assert supervisor._scan_output(str(tmp_path), str(session / "old.flv"), cache) == str(session / "new.flv")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__]))
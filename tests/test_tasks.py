@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台操作管理测试脚本
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.web.tasks import TaskManager, TASK_DONE, TASK_FAILED
+
+
+def test_submit_returns_immediately_and_records_result():
+    """
+    提交立即返回，操作结果、返回假和异常分别记录为完成和失败
+    """
+    manager = TaskManager(max_workers=2, history_limit=2)
+    release = threading.Event()
+    try:
+        started = time.time()
+        slow = manager.submit("slow", release.wait, 5)
+        assert time.time() - started < 0.5
+        assert slow["status"] in ("pending", "running")
+
+        failed = manager.submit("fail", lambda: False, failure_message="录制失败")
+        assert manager.wait(failed["task_id"], 5)["error"] == "录制失败"
+
+        def boom():
+            raise RuntimeError("下载失败")
+        crashed = manager.wait(manager.submit("boom", boom)["task_id"], 5)
+        assert crashed["status"] == TASK_FAILED and crashed["error"] == "下载失败"
+
+        release.set()
+        assert manager.wait(slow["task_id"], 5)["status"] == TASK_DONE
+        assert manager.wait(manager.submit("none", lambda: None)["task_id"], 5)["status"] == TASK_DONE
+
+        # 只保留最近结束的history_limit个任务
+        manager.submit("last", lambda: True)
+        assert len(manager.list_tasks()) <= 4
+        assert manager.get_task(failed["task_id"]) is None
+    finally:
+        manager.stop(wait=True)
+
+
+def test_same_key_runs_in_order():
+    """
+    同一对象的操作按提交顺序串行执行，不同对象并行执行
+    """
+    manager = TaskManager(max_workers=4)
+    order = []
+
+    def step(name, delay):
+        time.sleep(delay)
+        order.append(name)
+        return True
+
+    try:
+        tasks = [
+            manager.submit("start", step, "start", 0.3, key="bilibili_1"),
+            manager.submit("stop", step, "stop", 0, key="bilibili_1"),
+            manager.submit("other", step, "other", 0.1, key="bilibili_2")
+        ]
+        for task in tasks:
+            assert manager.wait(task["task_id"], 5)["status"] == TASK_DONE
+        assert order == ["other", "start", "stop"]
+    finally:
+        manager.stop(wait=True)
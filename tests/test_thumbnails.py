@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+缩略图生成测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flv_fixtures import make_flv
+from ffmpeg_fixtures import fake_tool
+from src.processor.flv import analyze_flv
+from src.processor.thumbnails import (
+    ThumbnailGenerator, get_thumbnail_config, select_keyframes, build_vtt, load_thumbnails
+)
+
+
+# 模拟FFmpeg：记录参数，分析输入的关键帧FLV，为每个输出文件生成内容
+FAKE_FFMPEG = """#!{python}
+import sys
+sys.path.insert(0, {root!r})
+from src.processor.flv import analyze_flv
+args = sys.argv[1:]
+input_file = args[args.index("-i") + 1]
+with open({log!r}, "a") as f:
+    f.write(" ".join(args) + "\\n")
+    if input_file.endswith(".keyframes.flv"):
+        stats = analyze_flv(input_file)
+        f.write(f"keyframes={{stats['keyframes']}} video={{stats['video_tags']}} audio={{stats['audio_tags']}}\\n")
+for i, arg in enumerate(args):
+    if arg.endswith(".jpg"):
+        for sheet in range(2 if "%03d" in arg else 1):
+            open(arg.replace("%03d", "%03d" % sheet), "wb").write(b"jpg")
+"""
+
+
+def _generator(tmp_path, **options):
+    log = tmp_path / "ffmpeg.log"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ffmpeg = fake_tool(tmp_path / "ffmpeg", FAKE_FFMPEG, root=root, log=str(log))
+
+    thumbnail_config = dict(get_thumbnail_config(), cache_dir=str(tmp_path / "cache"), interval=5,
+                            columns=2, rows=2, **options)
+    return ThumbnailGenerator(ffmpeg, thumbnail_config), log
+
+
+def test_select_keyframes_and_vtt():
+    """
+    按间隔挑选关键帧，WebVTT按行列指向雪碧图中的区域
+    """
+    assert select_keyframes([0, 2000, 4000, 6000, 8000, 10000, 12000], 5) == [0, 3, 6]
+    assert select_keyframes([], 5) == []
+
+    config = {"width": 160, "height": 90, "columns": 2, "rows": 2}
+    vtt = build_vtt([(0, 6), (6, 12), (12, 18), (18, 20), (20, 25)], config)
+    lines = vtt.splitlines()
+    assert lines[0] == "WEBVTT"
+    assert "00:00:06.000 --> 00:00:12.000" in lines
+    assert "sprite_000.jpg#xywh=160,0,160,90" in lines
+    assert "sprite_000.jpg#xywh=160,90,160,90" in lines
+    assert "sprite_001.jpg#xywh=0,0,160,90" in lines
+
+
+def test_generate_from_keyframe_index(tmp_path, monkeypatch):
+    """
+    FLV只读取选中的关键帧交给FFmpeg，结果按文件缓存，文件变化后重新生成
+    """
+    generator, log = _generator(tmp_path)
+    monkeypatch.setattr("src.processor.thumbnails.get_thumbnail_config", lambda: generator.thumbnail_config)
+
+    path = tmp_path / "record.flv"
+    path.write_bytes(make_flv(duration_ms=20000, keyframe_interval_ms=2000))
+
+    meta = generator.generate(str(path))
+    assert meta["count"] == 4  # 0、6、12、18秒的关键帧
+    assert meta["sheets"] == ["sprite_000.jpg", "sprite_001.jpg"]
+    assert meta["cover"] == "cover.jpg"
+    assert 19.9 < meta["duration"] < 20.1
+
+    commands = log.read_text().splitlines()
+    assert len(commands) == 2
+    # 只包含序列头和选中的4个关键帧，没有音频
+    assert commands[1] == "keyframes=5 video=5 audio=0"
+    assert "-skip_frame" not in commands[0]
+    assert not [name for name in os.listdir(meta["dir"]) if name.startswith(".")]
+
+    vtt = open(os.path.join(meta["dir"], "thumbnails.vtt"), encoding="utf-8").read()
+    assert "00:00:18.000 --> 00:00:19.987" in vtt
+
+    # 缓存有效时不再调用FFmpeg
+    assert generator.generate(str(path))["dir"] == meta["dir"]
+    assert load_thumbnails(str(path))["count"] == 4
+    assert len(log.read_text().splitlines()) == 2
+
+    with open(path, "ab") as f:
+        f.write(make_flv(duration_ms=2000, start_timestamp=20000, with_headers=False))
+    assert load_thumbnails(str(path)) is None
+    assert generator.generate(str(path))["dir"] != meta["dir"]
+    assert analyze_flv(str(path))["valid"]
+
+
+def test_generate_from_stream(tmp_path, monkeypatch):
+    """
+    非FLV文件由解码器跳过非关键帧，按时长估算WebVTT时间
+    """
+    generator, log = _generator(tmp_path)
+    monkeypatch.setattr("src.processor.thumbnails.probe_duration", lambda ffprobe, path: 22.0)
+
+    path = tmp_path / "record.mp4"
+    path.write_bytes(b"mp4")
+    meta = generator.generate(str(path))
+    assert meta["count"] == 5
+    assert meta["duration"] == 22.0
+
+    commands = log.read_text().splitlines()
+    assert "-skip_frame nokey" in commands[0] and "gte(t-prev_selected_t\\,5)" in commands[0]
+    assert "-ss 2.2" in commands[1]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+耗时追踪和采样分析测试脚本
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.tracing import Tracer, SamplingProfiler, format_folded
+
+
+def test_spans_exported_as_chrome_trace():
+    """
+    关闭时不记录任何区间；开启后嵌套区间、异常和补充参数按Chrome追踪格式导出，缓冲区大小固定
+    """
+    tracer = Tracer(buffer_size=3)
+    with tracer.span("monitor.poll", room="bilibili_1") as span:
+        span.set(live=True)
+    assert tracer.span("monitor.poll") is tracer.span("trigger.decide")
+    assert tracer.dump()["traceEvents"] == []
+
+    tracer.set_enabled(True)
+    with tracer.span("monitor.poll", room="bilibili_1") as span:
+        with tracer.span("api.bilibili.get_room_info", room_id="1"):
+            time.sleep(0.01)
+        span.set(live=True)
+    try:
+        with tracer.span("recorder.spawn", room="bilibili_1"):
+            raise OSError("找不到录播姬")
+    except OSError:
+        pass
+
+    trace = json.loads(json.dumps(tracer.dump()))
+    spans = {event["name"]: event for event in trace["traceEvents"] if event["ph"] == "X"}
+    poll, api = spans["monitor.poll"], spans["api.bilibili.get_room_info"]
+    assert poll["cat"] == "monitor" and poll["args"] == {"room": "bilibili_1", "live": True}
+    assert api["dur"] >= 10000
+    assert poll["ts"] <= api["ts"] and api["ts"] + api["dur"] <= poll["ts"] + poll["dur"]
+    assert spans["recorder.spawn"]["args"]["error"] == "OSError"
+    thread_names = [event for event in trace["traceEvents"] if event["ph"] == "M"]
+    assert thread_names[0]["args"]["name"] == threading.current_thread().name
+
+    for _ in range(5):
+        with tracer.span("job.convert"):
+            pass
+    assert len([event for event in tracer.dump()["traceEvents"] if event["ph"] == "X"]) == 3
+
+
+def test_sampling_profiler_finds_busy_function():
+    """
+    采样分析能找到正在忙碌的线程所在的函数；同一时间只允许一次采样
+    """
+    stop = threading.Event()
+
+    def busy_loop_for_profiler():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop_for_profiler, name="BusyWorker")
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        results = []
+        second = threading.Thread(target=lambda: (time.sleep(0.05), results.append(profiler.profile(0.1))))
+        second.start()
+        result = profiler.profile(0.3, 0.005)
+        second.join()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert results == [None]
+    assert result["samples"] > 10
+    folded = format_folded(result)
+    busy = [line for line in folded.splitlines() if line.startswith("BusyWorker;") and "busy_loop_for_profiler" in line]
+    assert busy
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in busy) >= result["samples"] // 2
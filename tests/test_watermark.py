@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+水印滤镜与预渲染水印图片测试脚本
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ffmpeg_fixtures import fake_tool
+from src.processor.watermark import WatermarkAdder
+
+
+# 模拟FFmpeg：bbox滤镜输出裁剪区域，其余命令生成输出文件，并记录调用次数
+FAKE_FFMPEG = """#!{python}
+import sys
+args = sys.argv[1:]
+with open({log!r}, "a") as f:
+    f.write(" ".join(args) + "\\n")
+if "alphaextract,bbox" in args:
+    sys.stderr.write("[Parsed_bbox_1 @ 0x1] n:0 x1:8 x2:107 y1:8 y2:37 w:100 h:30 crop=100:30:8:8\\n")
+else:
+    open(args[-1], "wb").write(b"png")
+"""
+
+
+def _adder(tmp_path, script=FAKE_FFMPEG):
+    log = tmp_path / "ffmpeg.log"
+    ffmpeg = fake_tool(tmp_path / "ffmpeg", script, log=str(log))
+    return WatermarkAdder(ffmpeg, cache_dir=str(tmp_path / "cache")), log
+
+
+def test_overlay_filter_uses_cached_image(tmp_path):
+    """
+    相同参数的水印图片只渲染一次，叠加位置与drawtext方式一致
+    """
+    adder, log = _adder(tmp_path)
+
+    video_filter = adder.build_watermark_filter(watermark_text="主播: 测试", position="bottom-right", margin=10)
+    assert video_filter.startswith(f"movie='{tmp_path / 'cache'}")
+    assert "overlay=x=main_w-overlay_w-10:y=main_h-overlay_h-10" in video_filter
+    commands = log.read_text().splitlines()
+    assert len(commands) == 3
+    assert "crop=100:30:8:8" in commands[2]
+    assert not [name for name in os.listdir(tmp_path / "cache") if name.startswith(".")]
+
+    # 位置不影响水印图片，不再重新渲染
+    adder.build_watermark_filter(watermark_text="主播: 测试", position="top-left")
+    assert len(log.read_text().splitlines()) == 3
+
+    adder.build_watermark_filter(watermark_text="另一个水印")
+    assert len(log.read_text().splitlines()) == 6
+
+
+def test_fallback_to_drawtext(tmp_path):
+    """
+    水印图片渲染失败或指定drawtext方式时逐帧绘制文字，特殊字符被转义
+    """
+    adder, log = _adder(tmp_path, script="#!{python}\nimport sys\nsys.exit(1)\n")
+
+    video_filter = adder.build_watermark_filter(watermark_text="50%: it's")
+    assert video_filter.startswith("drawtext=")
+    assert "text='50\\%\\: it'\\''s'" in video_filter
+
+    assert adder.build_watermark_filter(mode="drawtext").startswith("drawtext=")